@@ -32,6 +32,7 @@ from LiveStatus import LiveStatus
 from ActualConfigHandler import ActualConfigHandler
 from CommandStatusDict import CommandStatusDict
 from CustomServiceOrchestrator import CustomServiceOrchestrator
+from ExecutionCommandPool import ExecutionCommandPool
 from ambari_agent.BackgroundCommandExecutionHandle import BackgroundCommandExecutionHandle
 
 
@@ -44,7 +45,8 @@ class ActionQueue(threading.Thread):
   Note: Action and command terms in this and related classes are used interchangeably
   """
 
-  # How many actions can be performed in parallel. Feel free to change
+  # How many actions can be performed in parallel by default. Can be overridden
+  # by agent/parallel_execution_max_workers
   MAX_CONCURRENT_ACTIONS = 5
 
 
@@ -80,11 +82,17 @@ class ActionQueue(threading.Thread):
     self.tmpdir = config.get('agent', 'prefix')
     self.customServiceOrchestrator = CustomServiceOrchestrator(config, controller)
     self.parallel_execution = config.get_parallel_exec_option()
+    self.executionCommandPool = None
     if self.parallel_execution == 1:
-      logger.info("Parallel execution is enabled, will execute agent commands in parallel")
+      max_workers = config.get_parallel_exec_max_workers(self.MAX_CONCURRENT_ACTIONS)
+      self.executionCommandPool = ExecutionCommandPool(self.process_command, max_workers)
+      logger.info("Parallel execution is enabled, will execute agent commands in parallel "
+                  "using up to {0} workers".format(self.executionCommandPool.max_workers))
 
   def stop(self):
     self._stop.set()
+    if self.executionCommandPool:
+      self.executionCommandPool.stop()
 
   def stopped(self):
     return self._stop.isSet()
@@ -127,6 +135,8 @@ class ActionQueue(threading.Thread):
       reason = command['reason']
 
       # Remove from the command queue by task_id
+      if self.executionCommandPool:
+        self.executionCommandPool.cancel(task_id)
       queue = self.commandQueue
       self.commandQueue = Queue.Queue()
 
@@ -148,31 +158,15 @@ class ActionQueue(threading.Thread):
       self.processBackgroundQueueSafeEmpty();
       self.processStatusCommandQueueSafeEmpty();
       try:
-        if self.parallel_execution == 0:
-          command = self.commandQueue.get(True, self.EXECUTION_COMMAND_WAIT_TIME)
-          self.process_command(command)
+        command = self.commandQueue.get(True, self.EXECUTION_COMMAND_WAIT_TIME)
+        if self.executionCommandPool:
+          # Pool takes care of per-stage and per-role ordering and
+          # limits the number of commands running at the same time
+          logger.info("Submitting command to the execution pool, id=" +
+                      str(command['commandId']) + " taskId=" + str(command['taskId']))
+          self.executionCommandPool.submit(command)
         else:
-          # If parallel execution is enabled, just kick off all available
-          # commands using separate threads
-          while (True):
-            command = self.commandQueue.get(True, self.EXECUTION_COMMAND_WAIT_TIME)
-            # If command is not retry_enabled then do not start them in parallel
-            # checking just one command is enough as all commands for a stage is sent
-            # at the same time and retry is only enabled for initial start/install
-            retryAble = False
-            if 'command_retry_enabled' in command['commandParams']:
-              retryAble = command['commandParams']['command_retry_enabled'] == "true"
-            if retryAble:
-              logger.info("Kicking off a thread for the command, id=" +
-                          str(command['commandId']) + " taskId=" + str(command['taskId']))
-              t = threading.Thread(target=self.process_command, args=(command,))
-              t.daemon = True
-              t.start()
-            else:
-              self.process_command(command)
-              break;
-            pass
-          pass
+          self.process_command(command)
       except (Queue.Empty):
         pass
 
@@ -228,6 +222,8 @@ class ActionQueue(threading.Thread):
       return_val = True
     if self.controller.recovery_manager.has_active_command():
       return_val = True
+    if self.executionCommandPool and not self.executionCommandPool.is_idle():
+      return_val = True
     return return_val
     pass
 
@@ -525,8 +521,29 @@ class ActionQueue(threading.Thread):
     """
     self.controller.trigger_heartbeat()
 
+  def execution_pool_metrics(self):
+    """
+    Returns utilization of execution commands pool or None if commands are
+    executed serially
+    """
+    if self.executionCommandPool:
+      return self.executionCommandPool.get_metrics()
+    return None
+
+  def fork_server_metrics(self):
+    """
+    Returns startup latency of commands started by python fork server or None
+    if the fork server is disabled
+    """
+    fork_server = getattr(self.customServiceOrchestrator, "fork_server", None)
+    if fork_server is not None:
+      return fork_server.get_metrics()
+    return None
+
   # Removes all commands from the queue
   def reset(self):
     queue = self.commandQueue
     with queue.mutex:
       queue.queue.clear()
+    if self.executionCommandPool:
+      self.executionCommandPool.reset()
@@ -261,6 +261,18 @@ class AmbariConfig:
   def get_parallel_exec_option(self):
     return int(self.get('agent', 'parallel_execution', 0))
 
+  def get_parallel_exec_max_workers(self, default):
+    return int(self.get('agent', 'parallel_execution_max_workers', default))
+
+  def get_compress_requests_option(self):
+    return str(self.get('server', 'compress_requests', 'false')).lower() == 'true'
+
+  def get_delta_heartbeats_option(self):
+    return str(self.get('heartbeat', 'delta_heartbeats', 'false')).lower() == 'true'
+
+  def get_delta_heartbeats_alert_refresh_interval(self):
+    return int(self.get('heartbeat', 'delta_heartbeats_alert_refresh_interval', 60))
+
   def update_configuration_from_registration(self, reg_resp):
     if reg_resp and AmbariConfig.AMBARI_PROPERTIES_CATEGORY in reg_resp:
       if not self.has_section(AmbariConfig.AMBARI_PROPERTIES_CATEGORY):
@@ -77,6 +77,8 @@ class Controller(threading.Thread):
     self.repeatRegistration = False
     self.isRegistered = False
     self.cachedconnect = None
+    # kept here, so that they are not reset when the connection is re-created after an error
+    self.request_statistics = security.new_request_statistics()
     self.range = range
     self.hasMappedComponents = True
     # Event is used for synchronizing heartbeat iterations (to make possible
@@ -244,8 +246,9 @@ class Controller(threading.Thread):
     while not self.DEBUG_STOP_HEARTBEATING:
       try:
         if not retry:
-          data = json.dumps(
-              self.heartbeat.build(self.responseId, int(hb_interval), self.hasMappedComponents))
+          heartbeat = self.heartbeat.build(self.responseId, int(hb_interval), self.hasMappedComponents)
+          heartbeat['serverConnectionMetrics'] = dict(self.request_statistics)
+          data = json.dumps(heartbeat)
         else:
           self.DEBUG_HEARTBEAT_RETRIES += 1
 
@@ -309,6 +312,10 @@ class Controller(threading.Thread):
                         recovery_command['roleCommand'], recovery_command['role'])
             self.addToQueue([recovery_command])
 
+        if 'resyncHeartbeat' in response_keys and response['resyncHeartbeat']:
+          logger.info("Server requested full heartbeat")
+          self.heartbeat.reset_delta_state()
+
         if 'alertDefinitionCommands' in response_keys:
           self.alert_scheduler_handler.update_definitions(response)
 
@@ -357,6 +364,8 @@ class Controller(threading.Thread):
             logger.warn("Server certificate verify failed. Did you regenerate server certificate?")
             certVerifFailed = True
 
+        if self.cachedconnect is not None:
+          self.cachedconnect.close()
         self.cachedconnect = None  # Previous connection is broken now
         retry = True
 
@@ -416,9 +425,10 @@ class Controller(threading.Thread):
 
     try:
       if self.cachedconnect is None: # Lazy initialization
-        self.cachedconnect = security.CachedHTTPSConnection(self.config, self.serverHostname)
+        self.cachedconnect = security.CachedHTTPSConnection(self.config, self.serverHostname,
+                                                            self.request_statistics)
       req = urllib2.Request(url, data, {'Content-Type': 'application/json',
-                                        'Accept-encoding': 'gzip'})
+                                        'Accept-encoding': 'gzip, deflate'})
       response = self.cachedconnect.request(req)
       return json.loads(response)
     except Exception, exception:
@@ -18,19 +18,27 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 
+import hashlib
 import logging
+import marshal
 import os
 import ambari_simplejson as json
 import sys
 from ambari_commons import shell
+from ambari_commons.constants import COMMAND_MARSHAL_FILE_SUFFIX
+from ambari_commons.os_check import OSCheck
 import threading
 
 from FileCache import FileCache
 from AgentException import AgentException
 from PythonExecutor import PythonExecutor
 from PythonReflectiveExecutor import PythonReflectiveExecutor
+from PythonForkServer import PythonForkServer
 import Constants
 import hostname
+from resource_management.core.exceptions import Fail
+from resource_management.libraries.functions.cluster_host_info import decompress_cluster_host_info, \
+  expand_ranges, expand_mapped_ranges
 
 
 logger = logging.getLogger()
@@ -57,6 +65,17 @@ class CustomServiceOrchestrator():
 
   AMBARI_SERVER_HOST = "ambari_server_host"
 
+  # Formats of command files passed to scripts:
+  #   json - indented json
+  #   compact - json without indentation
+  #   marshal - compact json and its marshalled copy, loaded by scripts instead of json
+  COMMAND_FILE_FORMAT_JSON = "json"
+  COMMAND_FILE_FORMAT_COMPACT = "compact"
+  COMMAND_FILE_FORMAT_MARSHAL = "marshal"
+
+  # Number of distinct decompressed clusterHostInfo kept in memory
+  CLUSTER_HOST_INFO_CACHE_SIZE = 4
+
   FREQUENT_COMMANDS = [COMMAND_NAME_SECURITY_STATUS, COMMAND_NAME_STATUS]
   DONT_DEBUG_FAILURES_FOR_COMMANDS = FREQUENT_COMMANDS
   REFLECTIVELY_RUN_COMMANDS = FREQUENT_COMMANDS # -- commands which run a lot and often (this increases their speed)
@@ -66,7 +85,9 @@ class CustomServiceOrchestrator():
     self.config = config
     self.tmp_dir = config.get('agent', 'prefix')
     self.exec_tmp_dir = Constants.AGENT_TMP_DIR
-    self.file_cache = FileCache(config)
+    self.file_cache = FileCache(config, update_callback=self.on_cache_directory_update)
+    # long-lived, keeps compiled status scripts between runs
+    self.reflective_executor = None
     self.status_commands_stdout = os.path.join(self.tmp_dir,
                                                'status_command_stdout.txt')
     self.status_commands_stderr = os.path.join(self.tmp_dir,
@@ -83,6 +104,21 @@ class CustomServiceOrchestrator():
       pass # Ignore fail
     self.commands_in_progress_lock = threading.RLock()
     self.commands_in_progress = {}
+    self.compact_cluster_host_info = config.has_option('agent', 'compact_cluster_host_info') and \
+        config.get('agent', 'compact_cluster_host_info').lower() == 'true'
+    # non-root agent: let scripts serve privileged file operations from one long-lived sudo process
+    self.sudo_broker = config.has_option('agent', 'sudo_broker') and \
+        config.get('agent', 'sudo_broker').lower() == 'true'
+    # scripts are forked from a process with libraries already imported, instead of new interpreters
+    self.fork_server = None
+    if config.has_option('agent', 'python_fork_server') and \
+        config.get('agent', 'python_fork_server').lower() == 'true' and not OSCheck.is_windows_family():
+      self.fork_server = PythonForkServer()
+    self.command_file_format = self.COMMAND_FILE_FORMAT_JSON
+    if config.has_option('agent', 'command_file_format'):
+      self.command_file_format = config.get('agent', 'command_file_format').lower()
+    self.cluster_host_info_lock = threading.Lock()
+    self.cluster_host_info_cache = {}
 
   def map_task_to_process(self, task_id, processId):
     with self.commands_in_progress_lock:
@@ -107,9 +143,18 @@ class CustomServiceOrchestrator():
     :return:
     """
     if forced_command_name in self.REFLECTIVELY_RUN_COMMANDS:
-      return PythonReflectiveExecutor(self.tmp_dir, self.config)
+      if self.reflective_executor is None:
+        self.reflective_executor = PythonReflectiveExecutor(self.tmp_dir, self.config)
+      return self.reflective_executor
     else:
-      return PythonExecutor(self.tmp_dir, self.config)
+      return PythonExecutor(self.tmp_dir, self.config, self.fork_server)
+
+  def on_cache_directory_update(self, directory):
+    """
+    Called by FileCache every time directory content is replaced with a newer version
+    """
+    if self.reflective_executor is not None:
+      self.reflective_executor.invalidate_directory(directory)
 
   def runCommand(self, command, tmpoutfile, tmperrfile, forced_command_name=None,
                  override_output_files=True, retry=False):
@@ -147,8 +192,10 @@ class CustomServiceOrchestrator():
           command_name = command['hostLevelParams']['custom_command']
 
         # forces a hash challenge on the directories to keep them updated, even
-        # if the return type is not used
-        self.file_cache.get_host_scripts_base_dir(server_url_prefix)          
+        # if the return type is not used. Directories are checked concurrently,
+        # lookups below are answered from the cache
+        self.file_cache.refresh_command_directories(command, server_url_prefix)
+        self.file_cache.get_host_scripts_base_dir(server_url_prefix)
         hook_dir = self.file_cache.get_hook_base_dir(command, server_url_prefix)
         base_dir = self.file_cache.get_service_base_dir(command, server_url_prefix)
         
@@ -320,6 +367,8 @@ class CustomServiceOrchestrator():
     command['public_hostname'] = public_fqdn
     # Add cache dir to make it visible for commands
     command["hostLevelParams"]["agentCacheDir"] = self.config.get('agent', 'cache_dir')
+    if self.sudo_broker:
+      command["hostLevelParams"]["agentSudoBroker"] = "true"
     # Now, dump the json file
     command_type = command['commandType']
     from ActionQueue import ActionQueue  # To avoid cyclic dependency
@@ -330,7 +379,11 @@ class CustomServiceOrchestrator():
     else:
       task_id = command['taskId']
       if 'clusterHostInfo' in command and command['clusterHostInfo'] and not retry:
-        command['clusterHostInfo'] = self.decompressClusterHostInfo(command['clusterHostInfo'])
+        if self.compact_cluster_host_info:
+          # scripts expand host lists lazily, when they are accessed
+          command['clusterHostInfoCompressed'] = True
+        else:
+          command['clusterHostInfo'] = self.decompressClusterHostInfo(command['clusterHostInfo'])
       file_path = os.path.join(self.tmp_dir, "command-{0}.json".format(task_id))
       if command_type == ActionQueue.AUTO_EXECUTION_COMMAND:
         file_path = os.path.join(self.tmp_dir, "auto_command-{0}.json".format(task_id))
@@ -338,111 +391,62 @@ class CustomServiceOrchestrator():
     # Json may contain passwords, that's why we need proper permissions
     if os.path.isfile(file_path):
       os.unlink(file_path)
+    marshal_file_path = file_path + COMMAND_MARSHAL_FILE_SUFFIX
+    if os.path.isfile(marshal_file_path):
+      os.unlink(marshal_file_path)
     with os.fdopen(os.open(file_path, os.O_WRONLY | os.O_CREAT,
                            0600), 'w') as f:
-      content = json.dumps(command, sort_keys = False, indent = 4)
+      if self.command_file_format == self.COMMAND_FILE_FORMAT_JSON:
+        content = json.dumps(command, sort_keys = False, indent = 4)
+      else:
+        content = json.dumps(command, sort_keys = False, separators = (',', ':'))
       f.write(content)
+
+    if self.command_file_format == self.COMMAND_FILE_FORMAT_MARSHAL:
+      # written after json, so scripts consider it up-to-date
+      try:
+        content = marshal.dumps(command)
+      except ValueError, err:
+        logger.warn("Can not marshal command {0}: {1}".format(file_path, str(err)))
+      else:
+        with os.fdopen(os.open(marshal_file_path, os.O_WRONLY | os.O_CREAT,
+                               0600), 'wb') as f:
+          f.write(content)
     return file_path
 
   def decompressClusterHostInfo(self, clusterHostInfo):
-    info = clusterHostInfo.copy()
-    #Pop info not related to host roles
-    hostsList = info.pop(self.HOSTS_LIST_KEY)
-    pingPorts = info.pop(self.PING_PORTS_KEY)
-    racks = info.pop(self.RACKS_KEY)
-    ipv4_addresses = info.pop(self.IPV4_ADDRESSES_KEY)
-
-    ambariServerHost = info.pop(self.AMBARI_SERVER_HOST)
-
-    decompressedMap = {}
-
-    for k,v in info.items():
-      # Convert from 1-3,5,6-8 to [1,2,3,5,6,7,8]
-      indexes = self.convertRangeToList(v)
-      # Convert from [1,2,3,5,6,7,8] to [host1,host2,host3...]
-      decompressedMap[k] = [hostsList[i] for i in indexes]
-
-    #Convert from ['1:0-2,4', '42:3,5-7'] to [1,1,1,42,1,42,42,42]
-    pingPorts = self.convertMappedRangeToList(pingPorts)
-    racks = self.convertMappedRangeToList(racks)
-    ipv4_addresses = self.convertMappedRangeToList(ipv4_addresses)
-
-    #Convert all elements to str
-    pingPorts = map(str, pingPorts)
-
-    #Add ping ports to result
-    decompressedMap[self.PING_PORTS_KEY] = pingPorts
-    #Add hosts list to result
-    decompressedMap[self.HOSTS_LIST_KEY] = hostsList
-    #Add racks list to result
-    decompressedMap[self.RACKS_KEY] = racks
-    #Add ips list to result
-    decompressedMap[self.IPV4_ADDRESSES_KEY] = ipv4_addresses
-    #Add ambari-server host to result
-    decompressedMap[self.AMBARI_SERVER_HOST] = ambariServerHost
+    """
+    Returns expanded clusterHostInfo. Commands of the same stage carry the
+    same clusterHostInfo, so decompressed result is cached by digest of the
+    compressed form and shared between commands. Result must not be modified.
+    """
+    digest = hashlib.md5(json.dumps(clusterHostInfo, sort_keys=True)).hexdigest()
+    with self.cluster_host_info_lock:
+      if digest in self.cluster_host_info_cache:
+        return self.cluster_host_info_cache[digest]
 
+    try:
+      decompressedMap = decompress_cluster_host_info(clusterHostInfo)
+    except Fail, err:
+      raise AgentException(str(err))
+
+    with self.cluster_host_info_lock:
+      if len(self.cluster_host_info_cache) >= self.CLUSTER_HOST_INFO_CACHE_SIZE:
+        self.cluster_host_info_cache.clear()
+      self.cluster_host_info_cache[digest] = decompressedMap
     return decompressedMap
 
   # Converts from 1-3,5,6-8 to [1,2,3,5,6,7,8]
   def convertRangeToList(self, list):
-
-    resultList = []
-
-    for i in list:
-
-      ranges = i.split(',')
-
-      for r in ranges:
-        rangeBounds = r.split('-')
-        if len(rangeBounds) == 2:
-
-          if not rangeBounds[0] or not rangeBounds[1]:
-            raise AgentException("Broken data in given range, expected - ""m-n"" or ""m"", got : " + str(r))
-
-
-          resultList.extend(range(int(rangeBounds[0]), int(rangeBounds[1]) + 1))
-        elif len(rangeBounds) == 1:
-          resultList.append((int(rangeBounds[0])))
-        else:
-          raise AgentException("Broken data in given range, expected - ""m-n"" or ""m"", got : " + str(r))
-
-    return resultList
+    try:
+      return expand_ranges(list)
+    except Fail, err:
+      raise AgentException(str(err))
 
   #Converts from ['1:0-2,4', '42:3,5-7'] to [1,1,1,42,1,42,42,42]
   def convertMappedRangeToList(self, list):
-
-    resultDict = {}
-
-    for i in list:
-      valueToRanges = i.split(":")
-      if len(valueToRanges) <> 2:
-        raise AgentException("Broken data in given value to range, expected format - ""value:m-n"", got - " + str(i))
-      value = valueToRanges[0]
-      rangesToken = valueToRanges[1]
-
-      for r in rangesToken.split(','):
-
-        rangeIndexes = r.split('-')
-
-        if len(rangeIndexes) == 2:
-
-          if not rangeIndexes[0] or not rangeIndexes[1]:
-            raise AgentException("Broken data in given value to range, expected format - ""value:m-n"", got - " + str(r))
-
-          start = int(rangeIndexes[0])
-          end = int(rangeIndexes[1])
-
-          for k in range(start, end + 1):
-            resultDict[k] = value if not value.isdigit() else int(value)
-
-
-        elif len(rangeIndexes) == 1:
-          index = int(rangeIndexes[0])
-
-          resultDict[index] = value if not value.isdigit() else int(value)
-
-
-    resultList = dict(sorted(resultDict.items())).values()
-
-    return resultList
+    try:
+      return expand_mapped_ranges(list)
+    except Fail, err:
+      raise AgentException(str(err))
 
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger()
+
+
+class ExecutionCommandPool():
+  """
+  Bounded pool of worker threads for execution commands. Implementation is
+  thread-safe.
+
+  Scheduling rules:
+    - at most max_workers commands are running at any time
+    - commands of one stage (same commandId) may run concurrently, a command
+      of the next stage is started only after the current stage is drained
+    - commands for the same role are started in the order they were submitted
+      and never overlap
+    - commands with a role command not listed in PARALLEL_ROLE_COMMANDS run
+      exclusively
+  """
+
+  PARALLEL_ROLE_COMMANDS = ['INSTALL', 'START', 'STOP', 'CUSTOM_COMMAND']
+
+  # How long (in seconds) an idle worker waits before re-checking stop flag
+  WORKER_WAIT_TIME = 1
+
+  def __init__(self, process_command, max_workers):
+    """
+    process_command is called from worker threads for every submitted command
+    """
+    self.process_command = process_command
+    self.max_workers = max(1, max_workers)
+    self.condition = threading.Condition()
+    self.pending = [] # (command, submit time) in submission order
+    self.running = [] # commands currently being executed
+    self.workers = []
+    self._stopped = False
+
+    self.submitted_count = 0
+    self.completed_count = 0
+    self.total_wait_time = 0
+    self.max_wait_time = 0
+
+  def submit(self, command):
+    with self.condition:
+      self.pending.append((command, time.time()))
+      self.submitted_count += 1
+      if len(self.workers) < self.max_workers and len(self.workers) < len(self.pending) + len(self.running):
+        self._start_worker()
+      self.condition.notify_all()
+
+  def cancel(self, task_id):
+    """
+    Removes not yet started command from the pool. Returns True if the command
+    was found.
+    """
+    with self.condition:
+      for item in self.pending:
+        if item[0].get('taskId') == task_id:
+          self.pending.remove(item)
+          self.condition.notify_all()
+          return True
+    return False
+
+  def reset(self):
+    with self.condition:
+      del self.pending[:]
+      self.condition.notify_all()
+
+  def stop(self):
+    with self.condition:
+      self._stopped = True
+      self.condition.notify_all()
+
+  def is_idle(self):
+    with self.condition:
+      return not self.pending and not self.running
+
+  def get_metrics(self):
+    """
+    Returns a snapshot of pool utilization, times are in milliseconds
+    """
+    with self.condition:
+      started_count = self.completed_count + len(self.running)
+      average_wait_time = self.total_wait_time / started_count if started_count else 0
+      return {
+        'maxWorkers': self.max_workers,
+        'activeWorkers': len(self.running),
+        'queueDepth': len(self.pending),
+        'submittedCommands': self.submitted_count,
+        'completedCommands': self.completed_count,
+        'averageWaitTime': int(average_wait_time * 1000),
+        'maxWaitTime': int(self.max_wait_time * 1000)
+      }
+
+  def _start_worker(self):
+    worker = threading.Thread(target=self._worker_loop,
+                              name="ExecutionCommandWorker-{0}".format(len(self.workers) + 1))
+    worker.daemon = True
+    self.workers.append(worker)
+    worker.start()
+
+  def _worker_loop(self):
+    while True:
+      with self.condition:
+        command = self._take_next_command()
+        while command is None:
+          if self._stopped:
+            return
+          self.condition.wait(self.WORKER_WAIT_TIME)
+          command = self._take_next_command()
+
+      try:
+        logger.info("Starting command in worker {0}, id={1} taskId={2} role={3}".format(
+          threading.current_thread().name, command.get('commandId'), command.get('taskId'), command.get('role')))
+        self.process_command(command)
+      except Exception:
+        logger.exception("Unexpected error while executing command in worker")
+      finally:
+        with self.condition:
+          self.running.remove(command)
+          self.completed_count += 1
+          self.condition.notify_all()
+
+  def _take_next_command(self):
+    """
+    Picks the first pending command allowed to run under scheduling rules.
+    Must be called with self.condition held.
+    """
+    if self._stopped or not self.pending or len(self.running) >= self.max_workers:
+      return None
+
+    if self.running:
+      if not self._is_parallel(self.running[0]):
+        return None
+      current_stage = self.running[0].get('commandId')
+    else:
+      current_stage = self.pending[0][0].get('commandId')
+
+    busy_roles = set([running_command.get('role') for running_command in self.running])
+    for item in self.pending:
+      command = item[0]
+      if command.get('commandId') != current_stage:
+        break
+      role = command.get('role')
+      if role in busy_roles:
+        continue
+      if not self._is_parallel(command) and self.running:
+        break
+
+      self.pending.remove(item)
+      self.running.append(command)
+      wait_time = time.time() - item[1]
+      self.total_wait_time += wait_time
+      self.max_wait_time = max(self.max_wait_time, wait_time)
+      return command
+
+    return None
+
+  def _is_parallel(self, command):
+    return command.get('roleCommand') in self.PARALLEL_ROLE_COMMANDS
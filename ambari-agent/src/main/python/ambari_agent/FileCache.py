@@ -19,12 +19,17 @@ limitations under the License.
 '''
 import StringIO
 
+import httplib
 import logging
 import os
 import shutil
+import socket
+import tempfile
+import threading
 import zipfile
-import urllib2
+import zlib
 import urllib
+import urlparse
 from AmbariConfig import AmbariConfig
 
 logger = logging.getLogger()
@@ -37,6 +42,7 @@ class FileCache():
   Provides caching and lookup for service metadata files.
   If service metadata is not available at cache,
   downloads relevant files from the server.
+  Implementation is thread-safe.
   """
 
   CLUSTER_CONFIGURATION_CACHE_DIRECTORY="cluster_configuration"
@@ -50,17 +56,32 @@ class FileCache():
   ARCHIVE_NAME="archive.zip"
   ENABLE_AUTO_AGENT_CACHE_UPDATE_KEY = "agent.auto.cache.update"
 
+  # Suffixes of sibling directories used while directory is being replaced
+  NEW_DIRECTORY_SUFFIX=".new"
+  OLD_DIRECTORY_SUFFIX=".old"
+
   BLOCK_SIZE=1024*16
   SOCKET_TIMEOUT=10
+  MAX_IDLE_CONNECTIONS=4 # per server
 
-  def __init__(self, config):
+  def __init__(self, config, update_callback=None):
+    """
+    update_callback is called with full directory path every time
+    directory content is updated from the server
+    """
     self.service_component_pool = {}
     self.config = config
+    self.update_callback = update_callback
     self.cache_dir = config.get('agent', 'cache_dir')
     # Defines whether command should fail when downloading scripts
     # from the server is not possible or agent should rollback to local copy
     self.tolerate_download_failures = \
           config.get('agent','tolerate_download_failures').lower() == 'true'
+    # Idle keep-alive connections to the server, shared by all the threads
+    self.idle_connections = {}
+    self.idle_connections_lock = threading.Lock()
+    self.directory_locks = {}
+    self.directory_locks_lock = threading.Lock()
     self.reset()
 
 
@@ -109,6 +130,20 @@ class FileCache():
                                   server_url_prefix)
 
 
+  def refresh_command_directories(self, command, server_url_prefix):
+    """
+    Concurrently brings host scripts, hooks and service directories needed
+    by command up-to-date, so that following get_*_base_dir() calls
+    do not hit the server
+    """
+    subdirectories = [self.HOST_SCRIPTS_CACHE_DIRECTORY,
+                      command['commandParams']['service_package_folder']]
+    if 'hooks_folder' in command['commandParams']:
+      subdirectories.append(os.path.join(self.STACKS_CACHE_DIRECTORY,
+                                         command['commandParams']['hooks_folder']))
+    return self.provide_directories(self.cache_dir, subdirectories, server_url_prefix)
+
+
   def auto_cache_update_enabled(self):
     if self.config and \
         self.config.has_option(AmbariConfig.AMBARI_PROPERTIES_CATEGORY, FileCache.ENABLE_AUTO_AGENT_CACHE_UPDATE_KEY) and \
@@ -116,6 +151,32 @@ class FileCache():
       return False
     return True
 
+  def provide_directories(self, cache_path, subdirectories, server_url_prefix):
+    """
+    Same as provide_directory(), but checks and updates directories concurrently.
+    Returns a list of full paths in the same order as subdirectories
+    """
+    errors = []
+    def provide_directory_func(subdirectory):
+      try:
+        self.provide_directory(cache_path, subdirectory, server_url_prefix)
+      except Exception, err:
+        errors.append(err)
+
+    threads = []
+    for subdirectory in subdirectories:
+      if os.path.join(cache_path, subdirectory) not in self.uptodate_paths:
+        thread = threading.Thread(target=provide_directory_func, args=(subdirectory,))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+      thread.join()
+
+    if errors:
+      raise errors[0]
+    return [os.path.join(cache_path, subdirectory) for subdirectory in subdirectories]
+
   def provide_directory(self, cache_path, subdirectory, server_url_prefix):
     """
     Ensures that directory at cache is up-to-date. Throws a CachingException
@@ -135,30 +196,12 @@ class FileCache():
 
     try:
       if full_path not in self.uptodate_paths:
-        logger.debug("Checking if update is available for "
-                     "directory {0}".format(full_path))
-        # Need to check for updates at server
-        remote_url = self.build_download_url(server_url_prefix,
-                                             subdirectory, self.HASH_SUM_FILE)
-        memory_buffer = self.fetch_url(remote_url)
-        remote_hash = memory_buffer.getvalue().strip()
-        local_hash = self.read_hash_sum(full_path)
-        if not local_hash or local_hash != remote_hash:
-          logger.debug("Updating directory {0}".format(full_path))
-          download_url = self.build_download_url(server_url_prefix,
-                                                 subdirectory, self.ARCHIVE_NAME)
-          membuffer = self.fetch_url(download_url)
-          # extract only when the archive is not zero sized
-          if (membuffer.getvalue().strip()):
-            self.invalidate_directory(full_path)
-            self.unpack_archive(membuffer, full_path)
-            self.write_hash_sum(full_path, remote_hash)
-          else:
-            logger.warn("Skipping empty archive: {0}. "
-                        "Expected archive was not found. Cached copy will be used.".format(download_url))
-            pass
-        # Finally consider cache directory up-to-date
-        self.uptodate_paths.append(full_path)
+        with self.get_directory_lock(full_path):
+          # directory could have been updated by another thread meanwhile
+          if full_path not in self.uptodate_paths:
+            self.update_directory_if_needed(full_path, subdirectory, server_url_prefix)
+            # Finally consider cache directory up-to-date
+            self.uptodate_paths.append(full_path)
     except CachingException, e:
       if self.tolerate_download_failures:
         # ignore
@@ -171,6 +214,61 @@ class FileCache():
     return full_path
 
 
+  def update_directory_if_needed(self, full_path, subdirectory, server_url_prefix):
+    """
+    Compares local and remote hash sums and replaces directory with
+    content of remote archive if they differ
+    """
+    logger.debug("Checking if update is available for "
+                 "directory {0}".format(full_path))
+    # Need to check for updates at server
+    remote_url = self.build_download_url(server_url_prefix,
+                                         subdirectory, self.HASH_SUM_FILE)
+    memory_buffer = self.fetch_url(remote_url)
+    remote_hash = memory_buffer.getvalue().strip()
+    local_hash = self.read_hash_sum(full_path)
+    if local_hash and local_hash == remote_hash:
+      return
+
+    logger.debug("Updating directory {0}".format(full_path))
+    download_url = self.build_download_url(server_url_prefix,
+                                           subdirectory, self.ARCHIVE_NAME)
+    parent_directory = os.path.dirname(os.path.abspath(full_path))
+    try:
+      if not os.path.isdir(parent_directory):
+        os.makedirs(parent_directory)
+      fd, archive_path = tempfile.mkstemp(suffix=".zip", dir=parent_directory)
+    except Exception, err:
+      raise CachingException("Can not create temporary file in {0} : {1}".format(
+        parent_directory, str(err)))
+
+    try:
+      with os.fdopen(fd, "w+b") as archive_file:
+        self.fetch_url(download_url, archive_file)
+        # extract only when the archive is not zero sized
+        if archive_file.tell() > 0:
+          new_path = full_path + self.NEW_DIRECTORY_SUFFIX
+          self.invalidate_directory(new_path)
+          archive_file.seek(0)
+          self.unpack_archive(archive_file, new_path, full_path)
+          self.write_hash_sum(new_path, remote_hash)
+          self.replace_directory(new_path, full_path)
+          if self.update_callback:
+            self.update_callback(full_path)
+        else:
+          logger.warn("Skipping empty archive: {0}. "
+                      "Expected archive was not found. Cached copy will be used.".format(download_url))
+    finally:
+      os.unlink(archive_path)
+
+
+  def get_directory_lock(self, full_path):
+    with self.directory_locks_lock:
+      if full_path not in self.directory_locks:
+        self.directory_locks[full_path] = threading.RLock()
+      return self.directory_locks[full_path]
+
+
   def build_download_url(self, server_url_prefix,
                          directory, filename):
     """
@@ -183,31 +281,88 @@ class FileCache():
                                 urllib.pathname2url(directory), filename)
 
 
-  def fetch_url(self, url):
+  def fetch_url(self, url, output=None):
     """
-    Fetches content on url to in-memory buffer and returns the resulting buffer.
+    Fetches content on url to output file object (or in-memory buffer, if output
+    is not specified) and returns the output.
+    Connections to the server are kept alive and reused by subsequent calls,
+    of any thread.
     May throw exceptions because of various reasons
     """
     logger.debug("Trying to download {0}".format(url))
+    if output is None:
+      output = StringIO.StringIO()
+    connection = None
     try:
-      memory_buffer = StringIO.StringIO()
-      proxy_handler = urllib2.ProxyHandler({})
-      opener = urllib2.build_opener(proxy_handler)
-      u = opener.open(url, timeout=self.SOCKET_TIMEOUT)
-      logger.debug("Connected with {0} with code {1}".format(u.geturl(),
-                                                             u.getcode()))
-      buff = u.read(self.BLOCK_SIZE)
+      connection, response = self.open_url(url)
+      logger.debug("Connected with {0} with code {1}".format(url,
+                                                             response.status))
+      if response.status != httplib.OK:
+        response.read()
+        raise CachingException("HTTP Error {0}: {1}".format(response.status, response.reason))
+      buff = response.read(self.BLOCK_SIZE)
       while buff:
-        memory_buffer.write(buff)
-        buff = u.read(self.BLOCK_SIZE)
-        if not buff:
-          break
-      return memory_buffer
+        output.write(buff)
+        buff = response.read(self.BLOCK_SIZE)
+      self.release_connection(url, connection, response)
+      return output
     except Exception, err:
+      if connection is not None:
+        connection.close()
       raise CachingException("Can not download file from"
                              " url {0} : {1}".format(url, str(err)))
 
 
+  def open_url(self, url):
+    """
+    Sends GET request over an idle kept-alive connection, or a new one, and
+    returns (connection, response). The connection is not used by anyone else
+    until it is given back by release_connection(). If server has closed the
+    idle connection, request is retried once over a new one
+    """
+    parsed_url = urlparse.urlparse(url)
+    path = parsed_url.path
+    if parsed_url.query:
+      path += "?" + parsed_url.query
+    connection = self.get_idle_connection(parsed_url)
+    if connection is not None:
+      try:
+        connection.request("GET", path)
+        return connection, connection.getresponse()
+      except (httplib.HTTPException, socket.error):
+        connection.close()
+
+    if parsed_url.scheme == 'https':
+      connection = httplib.HTTPSConnection(parsed_url.netloc, timeout=self.SOCKET_TIMEOUT)
+    else:
+      connection = httplib.HTTPConnection(parsed_url.netloc, timeout=self.SOCKET_TIMEOUT)
+    try:
+      connection.request("GET", path)
+      return connection, connection.getresponse()
+    except:
+      connection.close()
+      raise
+
+
+  def get_idle_connection(self, parsed_url):
+    with self.idle_connections_lock:
+      idle = self.idle_connections.get((parsed_url.scheme, parsed_url.netloc))
+      return idle.pop() if idle else None
+
+
+  def release_connection(self, url, connection, response):
+    """
+    Keeps connection, once the response is read as a whole, for subsequent requests
+    """
+    parsed_url = urlparse.urlparse(url)
+    with self.idle_connections_lock:
+      idle = self.idle_connections.setdefault((parsed_url.scheme, parsed_url.netloc), [])
+      if not response.will_close and len(idle) < self.MAX_IDLE_CONNECTIONS:
+        idle.append(connection)
+        return
+    connection.close()
+
+
   def read_hash_sum(self, directory):
     """
     Tries to read a hash sum from previously generated file. Returns string
@@ -256,22 +411,78 @@ class FileCache():
                              directory, str(err))
 
 
-  def unpack_archive(self, mem_buffer, target_directory):
+  def replace_directory(self, new_directory, directory):
     """
-    Unpacks contents of in-memory buffer to file system.
-    In-memory buffer is expected to contain a valid zip archive
+    Moves new_directory in place of directory. Old content is removed only
+    after the new one is in place
     """
+    old_directory = directory + self.OLD_DIRECTORY_SUFFIX
     try:
-      zfile = zipfile.ZipFile(mem_buffer)
-      for name in zfile.namelist():
+      if os.path.exists(old_directory):
+        shutil.rmtree(old_directory)
+      if os.path.exists(directory):
+        os.rename(directory, old_directory)
+      try:
+        os.rename(new_directory, directory)
+      except:
+        # keep using previous content
+        if os.path.exists(old_directory):
+          os.rename(old_directory, directory)
+        raise
+    except Exception, err:
+      raise CachingException("Can not replace cache directory {0}: {1}".format(
+        directory, str(err)))
+    shutil.rmtree(old_directory, ignore_errors=True)
+
+
+  def unpack_archive(self, archive, target_directory, existing_directory=None):
+    """
+    Unpacks contents of a zip archive (file object) to file system.
+    Entries which are present at existing_directory with the same size and
+    CRC are linked (or copied) from there instead of being extracted
+    """
+    try:
+      zfile = zipfile.ZipFile(archive)
+      target_directory = os.path.abspath(target_directory)
+      for info in zfile.infolist():
+        name = info.filename
         (dirname, filename) = os.path.split(name)
         concrete_dir=os.path.abspath(os.path.join(target_directory, dirname))
         if not os.path.isdir(concrete_dir):
           os.makedirs(concrete_dir)
-        logger.debug("Unpacking file {0} to {1}".format(name, concrete_dir))
-        if filename!='':
-          zfile.extract(name, target_directory)
+        if filename=='':
+          continue
+        existing_file = os.path.join(existing_directory, name) if existing_directory else None
+        if existing_file and self.is_same_file(existing_file, info):
+          logger.debug("Reusing unchanged file {0} from {1}".format(name, existing_directory))
+          self.link_file(existing_file, os.path.join(concrete_dir, filename))
+        else:
+          logger.debug("Unpacking file {0} to {1}".format(name, concrete_dir))
+          zfile.extract(info, target_directory)
     except Exception, err:
       raise CachingException("Can not unpack zip file to "
                              "directory {0} : {1}".format(
                             target_directory, str(err)))
+
+
+  def is_same_file(self, path, zip_info):
+    """
+    Checks whether file at path has the same size and CRC as archive entry
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) != zip_info.file_size:
+      return False
+    crc = 0
+    with open(path, "rb") as fp:
+      buff = fp.read(self.BLOCK_SIZE)
+      while buff:
+        crc = zlib.crc32(buff, crc)
+        buff = fp.read(self.BLOCK_SIZE)
+    return (crc & 0xffffffff) == (zip_info.CRC & 0xffffffff)
+
+
+  def link_file(self, source, target):
+    try:
+      os.link(source, target)
+    except (AttributeError, OSError):
+      # hard links are not supported by os or file system
+      shutil.copy2(source, target)
@@ -20,12 +20,12 @@ limitations under the License.
 
 import os.path
 import logging
-import subprocess
 from resource_management.core.shell import call
 from resource_management.core.exceptions import ExecuteTimeoutException
 from ambari_commons.constants import AMBARI_SUDO_BINARY
 from ambari_commons.shell import shellRunner
 from Facter import Facter
+from MountInventory import MountInventory
 from ambari_commons.os_check import OSConst
 from ambari_commons.os_family_impl import OsFamilyFuncImpl, OsFamilyImpl
 from AmbariConfig import AmbariConfig
@@ -37,6 +37,7 @@ class Hardware:
   CHECK_REMOTE_MOUNTS_KEY = 'agent.check.remote.mounts'
   CHECK_REMOTE_MOUNTS_TIMEOUT_KEY = 'agent.check.mounts.timeout'
   CHECK_REMOTE_MOUNTS_TIMEOUT_DEFAULT = '10'
+  mount_inventory = None
 
   def __init__(self):
     self.hardware = {}
@@ -68,39 +69,31 @@ class Hardware:
   @staticmethod
   @OsFamilyFuncImpl(OsFamilyImpl.DEFAULT)
   def osdisks(config = None):
-    """ Run df to find out the disks on the host. Only works on linux
-    platforms. Note that this parser ignores any filesystems with spaces
-    and any mounts with spaces. """
-    mounts = []
-    command = []
+    """ Find out the disks on the host from /proc/self/mountinfo and statvfs.
+    Only works on linux platforms. Remote mounts are checked in background,
+    so a hung mount delays the report at most by the mounts check timeout. """
     timeout = Hardware.CHECK_REMOTE_MOUNTS_TIMEOUT_DEFAULT
     if config and \
         config.has_option(AmbariConfig.AMBARI_PROPERTIES_CATEGORY, Hardware.CHECK_REMOTE_MOUNTS_TIMEOUT_KEY) and \
         config.get(AmbariConfig.AMBARI_PROPERTIES_CATEGORY, Hardware.CHECK_REMOTE_MOUNTS_TIMEOUT_KEY) != "0":
         timeout = config.get(AmbariConfig.AMBARI_PROPERTIES_CATEGORY, Hardware.CHECK_REMOTE_MOUNTS_TIMEOUT_KEY)
-    command.append("timeout")
-    command.append(timeout)
-    command.append("df")
-    command.append("-kPT")
+    check_remote = True
     if config and \
         config.has_option(AmbariConfig.AMBARI_PROPERTIES_CATEGORY, Hardware.CHECK_REMOTE_MOUNTS_KEY) and \
         config.get(AmbariConfig.AMBARI_PROPERTIES_CATEGORY, Hardware.CHECK_REMOTE_MOUNTS_KEY).lower() == "false":
       #limit listing to local file systems
-      command.append("-l")
+      check_remote = False
 
-    df = subprocess.Popen(command, stdout=subprocess.PIPE)
-    dfdata = df.communicate()[0]
-    lines = dfdata.splitlines()
-    for l in lines:
-      mountinfo = Hardware.extractMountInfo(l)
-      if mountinfo != None and Hardware._chk_mount(mountinfo['mountpoint']):
-        mounts.append(mountinfo)
-      pass
-    pass
-    return mounts
+    if Hardware.mount_inventory is None:
+      Hardware.mount_inventory = MountInventory(lambda mountpoint: Hardware._chk_mount(mountpoint))
+    return Hardware.mount_inventory.get_mounts(float(timeout), check_remote)
 
   @staticmethod
   def _chk_mount(mountpoint):
+    """ Called once per mount identity, MountInventory caches the result.
+    Read-only mounts are filtered out before. """
+    if os.geteuid() == 0:
+      return os.access(mountpoint, os.W_OK)
     try:
       return call(['test', '-w', mountpoint], sudo=True, timeout=int(Hardware.CHECK_REMOTE_MOUNTS_TIMEOUT_DEFAULT)/2)[0] == 0
     except ExecuteTimeoutException:
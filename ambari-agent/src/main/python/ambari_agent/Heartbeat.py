@@ -19,6 +19,7 @@ limitations under the License.
 '''
 
 import ambari_simplejson as json
+import hashlib
 import logging
 import os
 import time
@@ -27,6 +28,7 @@ from pprint import pformat
 from ambari_agent.hostname import hostname
 from ambari_agent.HostInfo import HostInfo
 from ambari_agent.Hardware import Hardware
+from alerts.http_client import get_http_client_statistics
 
 
 logger = logging.getLogger(__name__)
@@ -34,11 +36,29 @@ logger = logging.getLogger(__name__)
 firstContact = True
 class Heartbeat:
 
+  # Keys which change on every collection and do not describe a state change
+  DIGEST_EXCLUDED_KEYS = ['timestamp', 'agentTimeStampAtReporting']
+
   def __init__(self, actionQueue, config=None, alert_collector=None):
     self.actionQueue = actionQueue
     self.config = config
     self.reports = []
     self.collector = alert_collector
+    # kept between heartbeats, so host facts are not collected again every time
+    self.host_info = HostInfo(config)
+    self.delta_heartbeats = config is not None and config.get_delta_heartbeats_option()
+    if self.delta_heartbeats:
+      self.alert_refresh_interval = config.get_delta_heartbeats_alert_refresh_interval()
+    # latest reported status of every component, sent again on resync
+    self.component_statuses = {}
+    self.reset_delta_state()
+
+  def reset_delta_state(self):
+    """
+    Forgets the state acknowledged by the server, so next heartbeat carries
+    a full snapshot
+    """
+    self.sent_states = {} # responseId -> state known to server after heartbeat is acknowledged
 
   def build(self, id='-1', state_interval=-1, componentsMapped=False):
     global clusterId, clusterDefinitionRevision, firstContact
@@ -63,6 +83,20 @@ class Heartbeat:
     if not self.actionQueue.commandQueue.empty():
       commandsInProgress = True
 
+    pool_metrics = self.actionQueue.execution_pool_metrics()
+    if pool_metrics is not None:
+      heartbeat['executionPoolMetrics'] = pool_metrics
+      if pool_metrics['queueDepth'] > 0 or pool_metrics['activeWorkers'] > 0:
+        commandsInProgress = True
+
+    fork_server_metrics = self.actionQueue.fork_server_metrics()
+    if fork_server_metrics is not None:
+      heartbeat['pythonForkServerMetrics'] = fork_server_metrics
+
+    alert_http_client_metrics = get_http_client_statistics()
+    if alert_http_client_metrics is not None:
+      heartbeat['alertHttpClientMetrics'] = alert_http_client_metrics
+
     if len(queueResult) != 0:
       heartbeat['reports'] = queueResult['reports']
       heartbeat['componentStatus'] = queueResult['componentStatus']
@@ -83,12 +117,11 @@ class Heartbeat:
     if logger.isEnabledFor(logging.DEBUG):
       logger.debug("Heartbeat: %s", pformat(heartbeat))
 
-    hostInfo = HostInfo(self.config)
     if (int(id) >= 0) and state_interval > 0 and (int(id) % state_interval) == 0:
       nodeInfo = { }
       # for now, just do the same work as registration
       # this must be the last step before returning heartbeat
-      hostInfo.register(nodeInfo, componentsMapped, commandsInProgress)
+      self.host_info.register(nodeInfo, componentsMapped, commandsInProgress)
       heartbeat['agentEnv'] = nodeInfo
       mounts = Hardware.osdisks(self.config)
       heartbeat['mounts'] = mounts
@@ -99,9 +132,93 @@ class Heartbeat:
 
     if self.collector is not None:
       heartbeat['alerts'] = self.collector.alerts()
-    
+
+    if self.delta_heartbeats:
+      self.apply_delta(heartbeat, int(id))
+
     return heartbeat
 
+  def apply_delta(self, heartbeat, id):
+    """
+    Removes component statuses, alerts, agentEnv and mounts which did not change
+    since the heartbeat last acknowledged by the server and adds a digest of
+    the full state. If nothing was acknowledged yet (after registration or
+    resync request) all known component statuses are sent.
+
+    Alerts are observations at a point of time, so unchanged alerts are still
+    sent every alert_refresh_interval seconds to prevent them from going stale
+    at the server.
+    """
+    # server acknowledges heartbeat by responding with the next responseId
+    acknowledged_state = self.sent_states.get(id - 1)
+    for response_id in self.sent_states.keys():
+      if response_id < id:
+        del self.sent_states[response_id]
+
+    for report in heartbeat.get('componentStatus', []):
+      key = (report.get('clusterName'), report.get('serviceName'), report.get('componentName'))
+      self.component_statuses[key] = report
+
+    if acknowledged_state is None:
+      state = {'componentStatus': {}, 'alerts': {}, 'agentEnv': None, 'mounts': None}
+      if self.component_statuses:
+        heartbeat['componentStatus'] = self.component_statuses.values()
+    else:
+      state = {
+        'componentStatus': dict(acknowledged_state['componentStatus']),
+        'alerts': dict(acknowledged_state['alerts']),
+        'agentEnv': acknowledged_state['agentEnv'],
+        'mounts': acknowledged_state['mounts']
+      }
+
+    if 'componentStatus' in heartbeat:
+      changed_statuses = []
+      for report in heartbeat['componentStatus']:
+        key = (report.get('clusterName'), report.get('serviceName'), report.get('componentName'))
+        digest = self.get_digest(report)
+        if state['componentStatus'].get(key) != digest:
+          state['componentStatus'][key] = digest
+          changed_statuses.append(report)
+      heartbeat['componentStatus'] = changed_statuses
+
+    if 'alerts' in heartbeat:
+      now = heartbeat['timestamp']
+      changed_alerts = []
+      for alert in heartbeat['alerts']:
+        key = (alert.get('cluster'), alert.get('name'))
+        digest = self.get_digest(alert)
+        if key in state['alerts']:
+          previous_digest, sent_at = state['alerts'][key]
+          if previous_digest == digest and now - sent_at < self.alert_refresh_interval * 1000:
+            continue
+        state['alerts'][key] = (digest, now)
+        changed_alerts.append(alert)
+      heartbeat['alerts'] = changed_alerts
+
+    for section in ['agentEnv', 'mounts']:
+      if section in heartbeat:
+        digest = self.get_digest(heartbeat[section])
+        if state[section] == digest:
+          del heartbeat[section]
+        else:
+          state[section] = digest
+
+    self.sent_states[id] = state
+    heartbeat['deltaHeartbeat'] = acknowledged_state is not None
+    heartbeat['stateDigest'] = self.get_digest([sorted(state['componentStatus'].items()),
+                                                sorted([(key, value[0]) for key, value in state['alerts'].items()]),
+                                                state['agentEnv'], state['mounts']])
+
+  def get_digest(self, value):
+    return hashlib.md5(json.dumps(self.strip_excluded_keys(value), sort_keys=True)).hexdigest()
+
+  def strip_excluded_keys(self, value):
+    if isinstance(value, dict):
+      return dict((k, self.strip_excluded_keys(v)) for k, v in value.items() if k not in self.DIGEST_EXCLUDED_KEYS)
+    if isinstance(value, (list, tuple)):
+      return [self.strip_excluded_keys(item) for item in value]
+    return value
+
 def main(argv=None):
   from ambari_agent.ActionQueue import ActionQueue
   from ambari_agent.AmbariConfig import AmbariConfig
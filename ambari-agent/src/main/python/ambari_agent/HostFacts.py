@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import logging
+import os
+import threading
+import time
+import Queue
+
+logger = logging.getLogger()
+
+
+class Fact(object):
+  def __init__(self, name, collect, refresh_interval, watched_paths):
+    self.name = name
+    self.collect = collect
+    # seconds, None if the fact never changes
+    self.refresh_interval = refresh_interval
+    self.watched_paths = watched_paths
+    self.value = None
+    self.collected = False
+    self.collect_time = None
+    self.watched_state = None
+    self.refresh_pending = False
+
+  def get_watched_state(self):
+    state = []
+    for path in self.watched_paths:
+      try:
+        stat = os.stat(path)
+        state.append((stat.st_ino, stat.st_mtime, stat.st_size))
+      except OSError:
+        state.append(None)
+    return state
+
+  def is_stale(self):
+    if self.refresh_interval is not None and time.time() - self.collect_time >= self.refresh_interval:
+      return True
+    return bool(self.watched_paths) and self.get_watched_state() != self.watched_state
+
+
+class HostFacts(object):
+  """
+  Cache of host facts reported by HostInfo.register. Each fact has its own refresh
+  interval and may be invalidated earlier by a change of watched files (mtime of
+  /etc/alternatives directory changes when an alternative is switched, for example).
+
+  A fact is collected on the calling thread only the first time it is needed. Once it
+  gets stale, the cached value is still returned while a background thread collects
+  a fresh one, so commands forked by the collectors never delay a heartbeat.
+  """
+
+  def __init__(self):
+    self.facts = {}
+    self.lock = threading.Lock()
+    self.refresh_queue = Queue.Queue()
+    self.refresh_thread = None
+    self.collected_count = 0
+    self.cached_count = 0
+
+  def add(self, name, collect, refresh_interval=None, watched_paths=()):
+    self.facts[name] = Fact(name, collect, refresh_interval, list(watched_paths))
+
+  def get(self, name):
+    fact = self.facts[name]
+    with self.lock:
+      if fact.collected:
+        self.cached_count += 1
+        if not fact.refresh_pending and fact.is_stale():
+          fact.refresh_pending = True
+          self._schedule_refresh(fact)
+        return fact.value
+
+    # first use, nothing to report yet
+    self._collect(fact)
+    return fact.value
+
+  def _collect(self, fact):
+    watched_state = fact.get_watched_state()
+    start_time = time.time()
+    value = fact.collect()
+    logger.debug("Collected host fact {0} in {1} ms".format(fact.name, int((time.time() - start_time) * 1000)))
+    with self.lock:
+      fact.value = value
+      fact.collected = True
+      fact.collect_time = time.time()
+      fact.watched_state = watched_state
+      self.collected_count += 1
+
+  def _schedule_refresh(self, fact):
+    self.refresh_queue.put(fact)
+    if self.refresh_thread is None or not self.refresh_thread.isAlive():
+      self.refresh_thread = threading.Thread(target=self._refresh_facts, name="HostFactsRefresh")
+      self.refresh_thread.daemon = True
+      self.refresh_thread.start()
+
+  def _refresh_facts(self):
+    while True:
+      fact = self.refresh_queue.get()
+      try:
+        self._collect(fact)
+      except Exception:
+        logger.exception("Failed to collect host fact {0}, keeping previous value".format(fact.name))
+        # retried once it gets stale again
+        with self.lock:
+          fact.collect_time = time.time()
+          fact.watched_state = fact.get_watched_state()
+      finally:
+        with self.lock:
+          fact.refresh_pending = False
@@ -30,8 +30,10 @@ import time
 from ambari_commons import OSCheck, OSConst
 from ambari_commons.firewall import Firewall
 from ambari_commons.os_family_impl import OsFamilyImpl
+from ambari_commons.process_table import get_process_table
 
 from ambari_agent.HostCheckReportFileHandler import HostCheckReportFileHandler
+from ambari_agent.HostFacts import HostFacts
 
 
 logger = logging.getLogger()
@@ -166,8 +168,50 @@ class HostInfoLinux(HostInfo):
   THP_FILE_REDHAT = "/sys/kernel/mm/redhat_transparent_hugepage/enabled"
   THP_FILE_UBUNTU = "/sys/kernel/mm/transparent_hugepage/enabled"
 
+  # Seconds facts reported by register are cached for, None if they do not change while the agent runs
+  FACT_REFRESH_INTERVALS = {
+    'activeJavaProcs': 30,
+    'liveServices': 300,
+    'umask': None,
+    'transparentHugePage': 600,
+    'firewallRunning': 300,
+    'firewallName': None,
+    'reverseLookup': 300,
+    'alternatives': 3600,
+    'existingUsers': 3600,
+    'stackFoldersAndFiles': 300
+  }
+  # Files which invalidate cached facts once changed
+  FACT_WATCHED_PATHS = {
+    'alternatives': ['/etc/alternatives'],
+    'existingUsers': ['/etc/passwd']
+  }
+
   def __init__(self, config=None):
     super(HostInfoLinux, self).__init__(config)
+    self.facts = HostFacts()
+    collectors = {
+      'activeJavaProcs': lambda: self.collect(self.javaProcs),
+      'liveServices': lambda: self.collect(self.checkLiveServices, self.DEFAULT_LIVE_SERVICES),
+      'umask': lambda: str(self.getUMask()),
+      'transparentHugePage': lambda: self.getTransparentHugePage(),
+      'firewallRunning': lambda: self.checkFirewall(),
+      'firewallName': lambda: self.getFirewallName(),
+      'reverseLookup': lambda: self.checkReverseLookup(),
+      'alternatives': lambda: self.collect(self.etcAlternativesConf, self.DEFAULT_PROJECT_NAMES),
+      'existingUsers': lambda: self.collect(self.checkUsers, self.DEFAULT_USERS),
+      'stackFoldersAndFiles': lambda: self.collect(self.checkFolders, self.DEFAULT_BASEDIRS, self.DEFAULT_PROJECT_NAMES,
+                                                   self.EXACT_DIRECTORIES, self.facts.get('existingUsers'))
+    }
+    for name, collect in collectors.items():
+      self.facts.add(name, collect, self.FACT_REFRESH_INTERVALS[name], self.FACT_WATCHED_PATHS.get(name, []))
+
+  @staticmethod
+  def collect(check, *args):
+    # checks append their results to the list passed last
+    results = []
+    check(*(args + (results,)))
+    return results
 
   def checkUsers(self, users, results):
     f = open('/etc/passwd', 'r')
@@ -207,23 +251,19 @@ class HostInfoLinux(HostInfo):
     import pwd
 
     try:
-      pids = [pid for pid in os.listdir('/proc') if pid.isdigit()]
-      for pid in pids:
-        cmd = open(os.path.join('/proc', pid, 'cmdline'), 'rb').read()
-        cmd = cmd.replace('\0', ' ')
+      for process in get_process_table().get_processes():
+        cmd = process.cmdline
         if not 'AmbariServer' in cmd:
           if 'java' in cmd:
             dict = {}
-            dict['pid'] = int(pid)
+            dict['pid'] = process.pid
             dict['hadoop'] = False
             for filter in self.PROC_FILTER:
               if filter in cmd:
                 dict['hadoop'] = True
-            dict['command'] = cmd.strip()
-            for line in open(os.path.join('/proc', pid, 'status')):
-              if line.startswith('Uid:'):
-                uid = int(line.split()[1])
-                dict['user'] = pwd.getpwuid(uid).pw_name
+            dict['command'] = cmd
+            if process.uid is not None:
+              dict['user'] = pwd.getpwuid(process.uid).pw_name
             list.append(dict)
     except:
       logger.exception("Checking java processes failed")
@@ -278,20 +318,15 @@ class HostInfoLinux(HostInfo):
 
     dict['hostHealth'] = {}
 
-    java = []
-    self.javaProcs(java)
-    dict['hostHealth']['activeJavaProcs'] = java
+    dict['hostHealth']['activeJavaProcs'] = self.facts.get('activeJavaProcs')
+    dict['hostHealth']['liveServices'] = self.facts.get('liveServices')
 
-    liveSvcs = []
-    self.checkLiveServices(self.DEFAULT_LIVE_SERVICES, liveSvcs)
-    dict['hostHealth']['liveServices'] = liveSvcs
-
-    dict['umask'] = str(self.getUMask())
+    dict['umask'] = self.facts.get('umask')
 
-    dict['transparentHugePage'] = self.getTransparentHugePage()
-    dict['firewallRunning'] = self.checkFirewall()
-    dict['firewallName'] = self.getFirewallName()
-    dict['reverseLookup'] = self.checkReverseLookup()
+    dict['transparentHugePage'] = self.facts.get('transparentHugePage')
+    dict['firewallRunning'] = self.facts.get('firewallRunning')
+    dict['firewallName'] = self.facts.get('firewallName')
+    dict['reverseLookup'] = self.facts.get('reverseLookup')
     # If commands are in progress or components are already mapped to this host
     # Then do not perform certain expensive host checks
     if componentsMapped or commandsInProgress:
@@ -300,17 +335,9 @@ class HostInfoLinux(HostInfo):
       dict['existingUsers'] = []
 
     else:
-      etcs = []
-      self.etcAlternativesConf(self.DEFAULT_PROJECT_NAMES, etcs)
-      dict['alternatives'] = etcs
-
-      existingUsers = []
-      self.checkUsers(self.DEFAULT_USERS, existingUsers)
-      dict['existingUsers'] = existingUsers
-
-      dirs = []
-      self.checkFolders(self.DEFAULT_BASEDIRS, self.DEFAULT_PROJECT_NAMES, self.EXACT_DIRECTORIES, existingUsers, dirs)
-      dict['stackFoldersAndFiles'] = dirs
+      dict['alternatives'] = self.facts.get('alternatives')
+      dict['existingUsers'] = self.facts.get('existingUsers')
+      dict['stackFoldersAndFiles'] = self.facts.get('stackFoldersAndFiles')
 
       self.reportFileHandler.writeHostCheckFile(dict)
       pass
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger()
+
+MOUNTINFO_FILE = "/proc/self/mountinfo"
+
+# file systems probed in background threads, since a hung server blocks statvfs
+REMOTE_FS_TYPES = ["nfs", "nfs4", "cifs", "smbfs", "ncpfs", "afs", "coda", "9p", "ceph", "glusterfs",
+                   "gpfs", "lustre", "fuse.sshfs", "fuse.glusterfs", "fuse.s3fs", "davfs", "fuse.davfs"]
+
+ST_RDONLY = 1
+
+
+class Mount(object):
+  """
+  Entry of /proc/self/mountinfo
+  """
+
+  def __init__(self, mount_id, device_id, root, mountpoint, options, fs_type, source):
+    self.mount_id = mount_id
+    self.device_id = device_id
+    self.root = root
+    self.mountpoint = mountpoint
+    self.options = options
+    self.fs_type = fs_type
+    self.source = source
+
+  def get_key(self):
+    """
+    Identity of the mount, it changes when something is mounted in place of it or it is remounted
+    """
+    return self.mount_id, self.device_id, self.mountpoint, self.options
+
+  def is_remote(self):
+    return self.fs_type in REMOTE_FS_TYPES or ":" in self.source or self.source.startswith("//")
+
+  def is_read_only(self):
+    return "ro" in self.options.split(",")
+
+
+def unescape(value):
+  # kernel escapes space, tab, newline and backslash as \ooo
+  return re.sub(r"\\([0-7]{3})", lambda match: chr(int(match.group(1), 8)), value)
+
+
+def read_mountinfo(path=MOUNTINFO_FILE):
+  mounts = []
+  with open(path) as fp:
+    for line in fp:
+      fields = line.split()
+      try:
+        separator = fields.index("-", 6)
+        mounts.append(Mount(int(fields[0]), fields[2], unescape(fields[3]), unescape(fields[4]), fields[5],
+                            fields[separator + 1], unescape(fields[separator + 2])))
+      except (ValueError, IndexError):
+        logger.warn("Cannot parse mount info line: {0}".format(line.strip()))
+  return mounts
+
+
+class MountProbe(object):
+  """
+  statvfs and writability check of one mount, run in a background thread for remote mounts
+  """
+
+  def __init__(self, mount):
+    self.mount = mount
+    self.started = time.time()
+    self.done = threading.Event()
+    self.result = None
+
+  def start(self, probe_function):
+    def run():
+      try:
+        self.result = probe_function(self.mount)
+      finally:
+        self.done.set()
+    thread = threading.Thread(target=run, name="MountProbe-{0}".format(self.mount.mountpoint))
+    thread.daemon = True
+    thread.start()
+
+
+class MountInventory(object):
+  """
+  Disks usage report built in-process from /proc/self/mountinfo and statvfs, in place
+  of running df and a sudo test -w for every mount.
+
+  Writability is checked once per mount identity (see Mount.get_key) and cached.
+  Remote mounts are probed in background threads, waited for at most timeout seconds.
+  A mount whose probe did not finish is left out of the report; no new probe is started
+  for it until the hung one finishes, and reports do not wait for it any more.
+  """
+
+  def __init__(self, check_writable, mountinfo_file=MOUNTINFO_FILE):
+    self.check_writable = check_writable
+    self.mountinfo_file = mountinfo_file
+    self.lock = threading.Lock()
+    self.writable = {} # mount key -> writability check result
+    self.probes = {} # mount key -> MountProbe of a remote mount
+
+  def get_mounts(self, timeout, check_remote=True):
+    """
+    Returns mounts in the format of df -kPT output parsed by Hardware.extractMountInfo
+    """
+    try:
+      mounts = read_mountinfo(self.mountinfo_file)
+    except IOError, ex:
+      logger.warn("Cannot read mounts from {0}. {1}".format(self.mountinfo_file, ex))
+      return []
+    # a mount hides the ones mounted on the same mount point before it
+    visible = dict((mount.mountpoint, mount) for mount in mounts)
+    mounts = [mount for mount in mounts if visible[mount.mountpoint] is mount]
+
+    deadline = time.time() + timeout
+    results = {}
+    waiting = []
+    with self.lock:
+      keys = set(mount.get_key() for mount in mounts)
+      for key in self.writable.keys():
+        if key not in keys:
+          del self.writable[key]
+
+      for mount in mounts:
+        if not mount.is_remote():
+          results[mount.get_key()] = self._probe(mount)
+        elif check_remote:
+          probe = self.probes.get(mount.get_key())
+          # not probed again while the previous probe is still running
+          if probe is None or probe.done.isSet():
+            probe = self.probes[mount.get_key()] = MountProbe(mount)
+            probe.start(self._probe)
+            waiting.append(probe)
+          else:
+            logger.warn("Mount {0} has not responded for {1} seconds, skipping it".format(
+              mount.mountpoint, int(time.time() - probe.started)))
+
+    for probe in waiting:
+      if probe.done.wait(max(0, deadline - time.time())):
+        results[probe.mount.get_key()] = probe.result
+      else:
+        logger.warn("Timeout while checking mount {0}".format(probe.mount.mountpoint))
+
+    with self.lock:
+      for key in self.probes.keys():
+        if key not in keys and self.probes[key].done.isSet():
+          del self.probes[key]
+
+    return self._build_report(mounts, results)
+
+  def _probe(self, mount):
+    """
+    Returns (statvfs result, writable), None if the mount can not be accessed
+    """
+    try:
+      stat = os.statvfs(mount.mountpoint)
+    except OSError, ex:
+      logger.debug("Cannot stat mount {0}. {1}".format(mount.mountpoint, ex))
+      return None
+    # pseudo file systems (proc, sysfs, cgroup...) are not reported by df either
+    if not stat.f_blocks:
+      return None
+
+    key = mount.get_key()
+    writable = self.writable.get(key)
+    if writable is None:
+      writable = not mount.is_read_only() and not stat.f_flag & ST_RDONLY and self.check_writable(mount.mountpoint)
+      self.writable[key] = writable
+    return stat, writable
+
+  def _build_report(self, mounts, results):
+    report = []
+    devices = {}
+    for mount in mounts:
+      result = results.get(mount.get_key())
+      if result is None:
+        continue
+      stat, writable = result
+      if not writable:
+        continue
+
+      block_size = stat.f_frsize or stat.f_bsize
+      size = stat.f_blocks * block_size / 1024
+      available = stat.f_bavail * block_size / 1024
+      used = (stat.f_blocks - stat.f_bfree) * block_size / 1024
+      percent = (used * 100 + used + available - 1) / (used + available) if used + available else 0
+      mountinfo = {
+        'size': str(size),
+        'used': str(used),
+        'available': str(available),
+        'percent': "{0}%".format(percent),
+        'mountpoint': mount.mountpoint,
+        'type': mount.fs_type,
+        'device': mount.source}
+
+      # same file system mounted more than once is reported under its shortest mount point, like df does
+      if mount.device_id in devices:
+        previous = devices[mount.device_id]
+        if len(mount.mountpoint) < len(previous['mountpoint']):
+          previous.update(mountinfo)
+        continue
+      devices[mount.device_id] = mountinfo
+      report.append(mountinfo)
+    return report
@@ -26,6 +26,7 @@ import threading
 import platform
 from threading import Thread
 import time
+from AgentException import AgentException
 from BackgroundCommandExecutionHandle import BackgroundCommandExecutionHandle
 from ambari_commons.os_check import OSConst, OSCheck
 from Grep import Grep
@@ -44,12 +45,14 @@ class PythonExecutor(object):
   """
   NO_ERROR = "none"
 
-  def __init__(self, tmpDir, config):
+  def __init__(self, tmpDir, config, fork_server=None):
     self.grep = Grep()
     self.event = threading.Event()
     self.python_process_has_been_killed = False
     self.tmpDir = tmpDir
     self.config = config
+    # PythonForkServer used to start scripts, if enabled
+    self.fork_server = fork_server
     pass
 
 
@@ -182,9 +185,20 @@ class PythonExecutor(object):
       for k, v in command_env.iteritems():
         command_env[k] = str(v)
 
-    return subprocess.Popen(command,
+    if self.fork_server is not None:
+      try:
+        process = self.fork_server.launch(command, tmpout, tmperr, command_env)
+        logger.info("Command {0} started by python fork server in {1} ms".format(command[1], int(process.startup_time * 1000)))
+        return process
+      except AgentException, ex:
+        logger.warn("Starting command in a new interpreter. {0}".format(ex))
+
+    start_time = time.time()
+    process = subprocess.Popen(command,
       stdout=tmpout,
       stderr=tmperr, close_fds=close_fds, env=command_env, preexec_fn=self.preexec_fn)
+    logger.debug("Command {0} process created in {1} ms".format(command[1], int((time.time() - start_time) * 1000)))
+    return process
 
   def isSuccessfull(self, returncode):
     return not self.python_process_has_been_killed and returncode == 0
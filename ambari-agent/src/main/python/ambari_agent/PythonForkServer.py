@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import errno
+import logging
+import os
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+from AgentException import AgentException
+from resource_management.core.sudo_broker_server import read_frame, write_frame
+
+logger = logging.getLogger()
+
+SERVER_SCRIPT = os.path.splitext(os.path.abspath(__file__))[0] + ".py"
+
+# Libraries every command script imports, loaded once by the fork server
+PRELOADED_MODULES = ["ambari_simplejson", "ambari_jinja2", "ambari_commons", "resource_management"]
+
+try:
+  MAXFD = os.sysconf("SC_OPEN_MAX")
+except (AttributeError, ValueError):
+  MAXFD = 256
+
+
+class PythonForkServer(object):
+  """
+  Python process with command script libraries already imported, which forks
+  a child per command instead of starting a new interpreter for every script.
+
+  A child gets the same argv, environment, sys.path, working directory, stdout and
+  stderr files the subprocess would have got, and runs in its own process group, so
+  the watchdog can kill it along with its children by pid. The fork server reaps
+  children and reports their exit codes back to the agent.
+
+  The fork server runs with the agent's environment, the one commands normally get,
+  so modules it has preloaded are what a new interpreter would import. A child drops
+  the ones it could not import from its own sys.path, and all of them if its
+  environment differs, so they are imported again the usual way.
+  """
+
+  def __init__(self, command=None):
+    self.command = command or [sys.executable, SERVER_SCRIPT]
+    self.process = None
+    self.lock = threading.Lock()
+    self.next_request_id = 0
+    self.requests = {} # request id -> [event, pid or error message]
+    self.processes = {} # pid -> ForkedProcess
+
+    self.launched_count = 0
+    self.total_startup_time = 0
+    self.max_startup_time = 0
+
+  def start(self):
+    """
+    Starts the fork server, returns False if it could not be started
+    """
+    try:
+      process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                 close_fds=True, env=dict(os.environ))
+      ready = read_frame(process.stdout)
+    except (OSError, IOError, ValueError, EOFError), ex:
+      logger.warn("Cannot start python fork server, commands will be run in new interpreters. {0}".format(ex))
+      return False
+
+    if ready is None:
+      logger.warn("Python fork server has terminated on start, commands will be run in new interpreters.")
+      process.wait()
+      return False
+
+    logger.info("Python fork server started, pid={0}, preloaded modules: {1}".format(process.pid, ready[1]))
+    self.process = process
+    reader = threading.Thread(target=self._read_responses, args=(process,), name="PythonForkServerReader")
+    reader.daemon = True
+    reader.start()
+    return True
+
+  def is_running(self):
+    return self.process is not None and self.process.poll() is None
+
+  def stop(self):
+    with self.lock:
+      process, self.process = self.process, None
+    if process is not None:
+      try:
+        process.stdin.close()
+        process.wait()
+      except (OSError, IOError):
+        pass
+
+  def launch(self, command, tmpout, tmperr, env):
+    """
+    Forks a child running command ([python, script, args...]) with stdout and stderr
+    appended to tmpout and tmperr files. Returns ForkedProcess, which can be used
+    in place of subprocess.Popen. Raises AgentException if the fork server is not available.
+    """
+    start_time = time.time()
+    event = threading.Event()
+    with self.lock:
+      if not self.is_running() and not self.start():
+        raise AgentException("Python fork server is not available")
+      request_id = self.next_request_id
+      self.next_request_id += 1
+      self.requests[request_id] = [event, None]
+      request = {
+        "id": request_id,
+        "command": list(command),
+        "stdout": os.path.abspath(tmpout.name),
+        "stderr": os.path.abspath(tmperr.name),
+        "env": env,
+        "cwd": os.getcwd()
+      }
+      try:
+        write_frame(self.process.stdin, request)
+      except (IOError, ValueError), ex:
+        del self.requests[request_id]
+        raise AgentException("Cannot send command to python fork server. {0}".format(ex))
+
+    event.wait()
+    with self.lock:
+      result = self.requests.pop(request_id)[1]
+      if not isinstance(result, ForkedProcess):
+        raise AgentException("Python fork server has not started the command. {0}".format(result))
+
+      result.startup_time = time.time() - start_time
+      self.launched_count += 1
+      self.total_startup_time += result.startup_time
+      self.max_startup_time = max(self.max_startup_time, result.startup_time)
+    return result
+
+  def get_metrics(self):
+    """
+    Returns startup times of forked commands in milliseconds
+    """
+    with self.lock:
+      average_startup_time = self.total_startup_time / self.launched_count if self.launched_count else 0
+      return {
+        'launchedCommands': self.launched_count,
+        'runningCommands': len(self.processes),
+        'averageStartupTime': int(average_startup_time * 1000),
+        'maxStartupTime': int(self.max_startup_time * 1000)
+      }
+
+  def _read_responses(self, process):
+    while True:
+      try:
+        response = read_frame(process.stdout)
+      except (IOError, ValueError, EOFError), ex:
+        logger.warn("Communication with python fork server failed. {0}".format(ex))
+        response = None
+
+      if response is None:
+        try:
+          process.kill()
+        except OSError:
+          pass
+        process.wait()
+        with self.lock:
+          self._on_server_lost(process)
+        return
+
+      with self.lock:
+
+        if response[0] == "started":
+          request_id, pid = response[1:]
+          forked_process = ForkedProcess(pid)
+          self.processes[pid] = forked_process
+          self._complete_request(request_id, forked_process)
+        elif response[0] == "failed":
+          request_id, message = response[1:]
+          self._complete_request(request_id, message)
+        elif response[0] == "exited":
+          pid, returncode = response[1:]
+          forked_process = self.processes.pop(pid, None)
+          if forked_process is not None:
+            forked_process.set_returncode(returncode)
+
+  def _complete_request(self, request_id, result):
+    if request_id in self.requests:
+      self.requests[request_id][1] = result
+      self.requests[request_id][0].set()
+
+  def _on_server_lost(self, process):
+    logger.warn("Python fork server (pid={0}) has terminated".format(process.pid))
+    if self.process is process:
+      self.process = None
+    for request_id in self.requests.keys():
+      self._complete_request(request_id, "Python fork server has terminated")
+    # exit codes of running children can not be known any more
+    for forked_process in self.processes.values():
+      forked_process.orphaned = True
+    self.processes = {}
+
+
+class ForkedProcess(object):
+  """
+  Command forked by the fork server. Supports the part of subprocess.Popen
+  interface used by PythonExecutor.
+  """
+  ORPHAN_POLL_INTERVAL = 1
+  ORPHAN_RETURNCODE = 1
+
+  def __init__(self, pid):
+    self.pid = pid
+    self.returncode = None
+    self.startup_time = None
+    self.orphaned = False
+    self.exited = threading.Event()
+
+  def set_returncode(self, returncode):
+    self.returncode = returncode
+    self.exited.set()
+
+  def poll(self):
+    if self.returncode is None and self.orphaned and not self._is_alive():
+      logger.warn("Command pid={0} has been orphaned by python fork server, exit code is unknown".format(self.pid))
+      self.set_returncode(self.ORPHAN_RETURNCODE)
+    return self.returncode
+
+  def wait(self):
+    while self.poll() is None:
+      self.exited.wait(self.ORPHAN_POLL_INTERVAL)
+    return self.returncode
+
+  def communicate(self):
+    self.wait()
+    return None, None
+
+  def _is_alive(self):
+    try:
+      os.kill(self.pid, 0)
+    except OSError, ex:
+      return ex.errno != errno.ESRCH
+    # orphaned zombie, which is not reaped yet
+    try:
+      with open("/proc/{0}/stat".format(self.pid)) as fp:
+        return fp.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except (IOError, IndexError):
+      return True
+
+
+#
+# Fork server side
+#
+# sys.path entries of the interpreter itself (stdlib, site-packages), set by main()
+interpreter_path = []
+# environment preloaded modules were imported in
+server_env = {}
+
+
+def preload_modules():
+  loaded = []
+  for name in PRELOADED_MODULES:
+    try:
+      __import__(name)
+      loaded.append(name)
+    except Exception:
+      traceback.print_exc()
+  return loaded
+
+
+def fork_command(request):
+  pid = os.fork()
+  if pid:
+    # set by both sides, so the group exists before the agent learns the pid
+    try:
+      os.setpgid(pid, pid)
+    except OSError:
+      pass
+    return pid
+
+  # child, never returns
+  code = 1
+  try:
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    os.setpgid(0, 0)
+
+    stdin = os.open(os.devnull, os.O_RDONLY)
+    stdout = os.open(request["stdout"], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0644)
+    stderr = os.open(request["stderr"], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0644)
+    os.dup2(stdin, 0)
+    os.dup2(stdout, 1)
+    os.dup2(stderr, 2)
+    os.closerange(3, MAXFD)
+
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    script = request["command"][1]
+    sys.argv = request["command"][1:]
+    sys.path[:] = get_command_path(script, request["env"])
+    if request["env"] == server_env:
+      drop_unreachable_modules(sys.path)
+    else:
+      drop_unreachable_modules(interpreter_path)
+
+    # runpy would clear globals of the script once it returns, while its threads and
+    # exit handlers may still use them
+    import imp
+    main_module = imp.new_module("__main__")
+    main_module.__file__ = script
+    sys.modules["__main__"] = main_module
+    with open(script, "rU") as fp:
+      source = fp.read()
+    exec compile(source, script, "exec") in main_module.__dict__
+    code = 0
+  except SystemExit, ex:
+    if ex.code is None:
+      code = 0
+    elif isinstance(ex.code, (int, long)):
+      code = ex.code
+    else:
+      sys.stderr.write(str(ex.code) + "\n")
+      code = 1
+  except:
+    traceback.print_exc()
+  finally:
+    try:
+      run_exit_handlers()
+      sys.stdout.flush()
+      sys.stderr.flush()
+    finally:
+      os._exit(code & 0xff)
+
+
+def get_command_path(script, env):
+  """
+  Returns sys.path a new interpreter would start script with
+  """
+  path = [os.path.dirname(os.path.abspath(script))]
+  path += [os.path.abspath(entry) for entry in env.get("PYTHONPATH", "").split(os.pathsep) if entry]
+  return path + interpreter_path
+
+
+def drop_unreachable_modules(path):
+  """
+  Removes modules imported from outside of path, so the command imports them itself
+  """
+  directories = [os.path.join(os.path.abspath(entry), "") for entry in path]
+  for name, module in sys.modules.items():
+    module_file = getattr(module, "__file__", None)
+    if name == "__main__" or module is None or not module_file:
+      continue
+    module_file = os.path.abspath(module_file)
+    if not any(module_file.startswith(directory) for directory in directories):
+      del sys.modules[name]
+
+
+def run_exit_handlers():
+  # done by a new interpreter on exit, but skipped by os._exit
+  try:
+    threading._shutdown()
+  except:
+    traceback.print_exc()
+  try:
+    import atexit
+    atexit._run_exitfuncs()
+  except:
+    pass
+
+
+def get_returncode(status):
+  # same as subprocess.Popen.returncode
+  if os.WIFSIGNALED(status):
+    return -os.WTERMSIG(status)
+  return os.WEXITSTATUS(status)
+
+
+def serve(input_fp, output_fp):
+  """
+  Serves launch requests until input_fp is closed by the agent
+  """
+  import fcntl
+  wakeup_r, wakeup_w = os.pipe()
+  for fd in (wakeup_r, wakeup_w):
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+  # SIGCHLD interrupts select via the wakeup pipe
+  signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+  signal.set_wakeup_fd(wakeup_w)
+
+  while True:
+    try:
+      readable = select.select([input_fp, wakeup_r], [], [])[0]
+    except select.error, ex:
+      if ex.args[0] != errno.EINTR:
+        raise
+      readable = []
+
+    if wakeup_r in readable:
+      try:
+        os.read(wakeup_r, 1024)
+      except OSError:
+        pass
+
+    while True:
+      try:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+      except OSError:
+        break
+      if not pid:
+        break
+      write_frame(output_fp, ("exited", pid, get_returncode(status)))
+
+    if input_fp in readable:
+      request = read_frame(input_fp)
+      if request is None:
+        return
+      try:
+        write_frame(output_fp, ("started", request["id"], fork_command(request)))
+      except OSError, ex:
+        write_frame(output_fp, ("failed", request["id"], str(ex)))
+
+
+def main():
+  # protocol uses its own descriptors, so anything printed by the libraries does not break it
+  input_fp = os.fdopen(os.dup(sys.stdin.fileno()), "rb", 0)
+  output_fp = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+  os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+  os.dup2(sys.stderr.fileno(), 1)
+
+  global interpreter_path, server_env
+  server_env = dict(os.environ)
+  pythonpath = [os.path.abspath(entry) for entry in os.environ.get("PYTHONPATH", "").split(os.pathsep) if entry]
+  interpreter_path = [entry for entry in sys.path[1:] if os.path.abspath(entry) not in pythonpath]
+
+  loaded = preload_modules()
+  write_frame(output_fp, ("ready", loaded))
+  sys.stdout.flush()
+  sys.stderr.flush()
+  serve(input_fp, output_fp)
+
+
+if __name__ == "__main__":
+  main()
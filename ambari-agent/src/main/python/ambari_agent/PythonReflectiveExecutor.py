@@ -27,6 +27,8 @@ import os
 import pprint
 import logging
 import copy
+import hashlib
+import threading
 
 logger = logging.getLogger()
 
@@ -36,10 +38,21 @@ class PythonReflectiveExecutor(PythonExecutor):
   Otherwise agent will hang waiting for them to complete every X seconds.
   
   Running the commands not in new proccess, but reflectively makes this really fast.
+
+  Instance is meant to be long-lived: compiled scripts and service modules imported by them
+  (params, status_params, etc.) are kept between runs and reused while the command json stays
+  the same. Library modules (resource_management, ambari_commons, ...) stay imported.
+  Cached scripts are dropped by invalidate_directory() when FileCache updates a directory.
   """
+
+  # sys.modules, sys.path and sys.argv are shared by the whole process
+  lock = threading.RLock()
   
   def __init__(self, tmpDir, config):
     super(PythonReflectiveExecutor, self).__init__(tmpDir, config)
+    self.scripts_cache = {} # script path -> CachedScript
+    self.cache_hits = 0
+    self.cache_misses = 0
     
   def run_file(self, script, script_params, tmpoutfile, tmperrfile,
                timeout, tmpstructedoutfile, callback, task_id,
@@ -49,33 +62,101 @@ class PythonReflectiveExecutor(PythonExecutor):
     logger.debug("Running command reflectively " + pprint.pformat(pythonCommand))
     
     script_dir = os.path.dirname(script)
-    self.open_subprocess_files(tmpoutfile, tmperrfile, override_output_files, backup_log_files)
+    json_path, base_dir = script_params[1], script_params[2]
+    tmpout, tmperr = self.open_subprocess_files(tmpoutfile, tmperrfile, override_output_files, backup_log_files)
+    tmpout.close()
+    tmperr.close()
     returncode = 1
 
-    try:
-      with PythonContext(script_dir, pythonCommand):
-        imp.load_source('__main__', script)
-    except SystemExit as e:
-      returncode = e.code
-      if returncode:
-        logger.debug("Reflective command failed with return_code=" + str(e))
-    except (ClientComponentHasNoStatus, ComponentIsNotRunning):
-      logger.debug("Reflective command failed with exception:", exc_info=1)
-    except Exception:
-      logger.info("Reflective command failed with exception:", exc_info=1)
-    else: 
-      returncode = 0
+    with self.lock:
+      cached_script = self.get_cached_script(script, json_path)
+      context = PythonContext(script_dir, pythonCommand, cached_script.modules, [script_dir, base_dir])
+      try:
+        with context:
+          main_module = imp.new_module('__main__')
+          main_module.__file__ = script
+          sys.modules['__main__'] = main_module
+          exec cached_script.code in main_module.__dict__
+      except SystemExit as e:
+        returncode = e.code
+        if returncode:
+          logger.debug("Reflective command failed with return_code=" + str(e))
+      except (ClientComponentHasNoStatus, ComponentIsNotRunning):
+        logger.debug("Reflective command failed with exception:", exc_info=1)
+      except Exception:
+        logger.info("Reflective command failed with exception:", exc_info=1)
+        # modules may be left in inconsistent state, import them again next time
+        context.service_modules = None
+      else: 
+        returncode = 0
+      cached_script.modules = context.service_modules
       
     return self.prepare_process_result(returncode, tmpoutfile, tmperrfile, tmpstructedoutfile, timeout=timeout)
+
+  def get_cached_script(self, script, json_path):
+    """
+    Returns CachedScript for script, compiling it if needed. Cached service modules
+    are only kept if command json has not changed since the previous run.
+    """
+    command_digest = self.get_file_digest(json_path)
+    cached_script = self.scripts_cache.get(script)
+
+    if cached_script is None:
+      self.cache_misses += 1
+      with open(script) as fp:
+        code = compile(fp.read(), script, 'exec')
+      cached_script = CachedScript(code, command_digest)
+      self.scripts_cache[script] = cached_script
+    elif cached_script.command_digest != command_digest:
+      self.cache_misses += 1
+      cached_script.command_digest = command_digest
+      cached_script.modules = None
+    else:
+      self.cache_hits += 1
+
+    logger.debug("Reflective scripts cache: hits={0}, misses={1}".format(self.cache_hits, self.cache_misses))
+    return cached_script
+
+  def get_file_digest(self, path):
+    with open(path, 'rb') as fp:
+      return hashlib.md5(fp.read()).hexdigest()
+
+  def invalidate_directory(self, directory):
+    """
+    Drops cached scripts located in directory. Called when directory content is updated.
+    """
+    prefix = os.path.join(os.path.abspath(directory), '')
+    with self.lock:
+      for script in self.scripts_cache.keys():
+        if os.path.abspath(script).startswith(prefix):
+          logger.debug("Dropping cached script {0}".format(script))
+          del self.scripts_cache[script]
+
+
+class CachedScript:
+  """
+  Compiled script and service modules imported by its last run
+  """
+  def __init__(self, code, command_digest):
+    self.code = code
+    self.command_digest = command_digest
+    self.modules = None
+
   
 class PythonContext:
   """
   Sets and resets some context like imports, pythonpath, args.
   Also it disable logging into ambari-agent.log for reflectively called scripts.
+
+  Modules loaded from service_dirs are removed from sys.modules on exit and stored
+  in service_modules, so they can be passed to the next run of the same script.
+  Other newly imported modules stay in sys.modules.
   """
-  def __init__(self, script_dir, pythonCommand):
+  def __init__(self, script_dir, pythonCommand, service_modules=None, service_dirs=()):
     self.script_dir = script_dir
     self.pythonCommand = pythonCommand
+    self.service_modules = service_modules
+    self.service_dirs = [os.path.join(os.path.abspath(d), '') for d in service_dirs if d]
     
   def __enter__(self):
     self.old_sys_path = copy.copy(sys.path)
@@ -86,17 +167,35 @@ class PythonContext:
     logging.disable(logging.ERROR)
     sys.path.insert(0, self.script_dir)
     sys.argv = self.pythonCommand[1:]
+    if self.service_modules:
+      sys.modules.update(self.service_modules)
 
   def __exit__(self, exc_type, exc_val, exc_tb):
     sys.path = self.old_sys_path
     sys.argv = self.old_agv
     logging.disable(self.old_logging_disable)
-    self.revert_sys_modules(self.old_sys_modules)
+    self.service_modules = self.revert_sys_modules(self.old_sys_modules)
     return False
   
   def revert_sys_modules(self, value):
+    """
+    Restores modules replaced during the run and unloads service modules.
+    Returns unloaded service modules.
+    """
     sys.modules.update(value)
-    
+
+    service_modules = {}
     for k in copy.copy(sys.modules):
-      if not k in value:
-        del sys.modules[k]
\ No newline at end of file
+      if not k in value and self.is_service_module(sys.modules[k]):
+        service_modules[k] = sys.modules.pop(k)
+    return service_modules
+
+  def is_service_module(self, module):
+    path = getattr(module, '__file__', None)
+    if not path:
+      return False
+    path = os.path.abspath(path)
+    for service_dir in self.service_dirs:
+      if path.startswith(service_dir):
+        return True
+    return False
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import httplib
+import logging
+import socket
+import threading
+import time
+import urllib2
+from collections import namedtuple
+from StringIO import StringIO
+from urllib import addinfourl
+
+from ambari_commons.urllib_handlers import RefreshHeaderProcessor
+
+logger = logging.getLogger(__name__)
+
+# code is the HTTP status code, error_msg is set for HTTP errors (4xx, 5xx) only
+HttpResponse = namedtuple('HttpResponse', 'code body error_msg fetch_time')
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+  """
+  Returns client shared by all the alerts
+  """
+  global _client
+  with _client_lock:
+    if _client is None:
+      _client = AlertHttpClient()
+    return _client
+
+
+def get_http_client_statistics():
+  """
+  Returns statistics of the shared client, None if no alert has used it yet
+  """
+  with _client_lock:
+    client = _client
+  return client.get_statistics() if client is not None else None
+
+
+class EndpointPool(object):
+  """
+  Idle keep-alive connections to one host:port, and a limit of requests sent to it at once
+  """
+  def __init__(self, max_connections):
+    self.max_connections = max_connections
+    self.active = 0
+    self.lock = threading.Lock()
+    self.slot_released = threading.Condition(self.lock)
+    self.idle = []
+
+  def acquire(self, timeout):
+    """
+    Waits up to timeout seconds (forever if None) until a request may be sent,
+    returns False if it has not been possible in time
+    """
+    deadline = time.time() + timeout if timeout is not None else None
+    with self.lock:
+      while self.active >= self.max_connections:
+        if deadline is None:
+          self.slot_released.wait()
+        else:
+          remaining = deadline - time.time()
+          if remaining <= 0:
+            return False
+          self.slot_released.wait(remaining)
+      self.active += 1
+      return True
+
+  def release(self):
+    with self.lock:
+      self.active -= 1
+      self.slot_released.notify()
+
+  def get(self):
+    with self.lock:
+      return self.idle.pop() if self.idle else None
+
+  def put(self, connection):
+    with self.lock:
+      self.idle.append(connection)
+
+  def close(self):
+    with self.lock:
+      idle, self.idle = self.idle, []
+    for connection in idle:
+      connection.close()
+
+
+class InFlightRequest(object):
+  def __init__(self):
+    self.done = threading.Event()
+    self.response = None
+    self.error = None
+
+
+class AlertHttpClient(object):
+  """
+  HTTP client for web and metric alerts. Connections are kept alive per endpoint,
+  so alerts polling the same daemon do not connect again for every request, and
+  at most MAX_CONNECTIONS_PER_ENDPOINT requests are sent to one endpoint at once.
+
+  Identical requests made while one is already in flight wait for its response
+  instead of being sent again. Callers which can use a recent response (such as
+  JMX metrics read by several alerts in the same run) may also get one fetched up
+  to max_age seconds ago.
+  """
+  MAX_CONNECTIONS_PER_ENDPOINT = 2
+  MAX_RESPONSE_AGE = 60
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.pools = {}
+    self.in_flight = {}
+    self.responses = {}
+
+    self.requests_count = 0
+    self.connections_count = 0
+    self.reused_count = 0
+    self.coalesced_count = 0
+    self.cached_count = 0
+    self.queue_timeouts_count = 0
+
+  def fetch(self, url, timeout, follow_refresh=False, max_age=0):
+    """
+    Returns HttpResponse for url. Errors other than HTTP errors (connection refused,
+    timeout etc.) are raised.
+    :param follow_refresh: follow non-standard Refresh header, see RefreshHeaderProcessor
+    :param max_age: seconds a response fetched before may be reused for
+    """
+    key = (url, follow_refresh)
+    with self.lock:
+      now = time.time()
+      for cached_key in [k for k, v in self.responses.iteritems() if now - v.fetch_time > self.MAX_RESPONSE_AGE]:
+        del self.responses[cached_key]
+
+      cached = self.responses.get(key)
+      if max_age and cached is not None and now - cached.fetch_time <= max_age:
+        self.cached_count += 1
+        return cached
+
+      request = self.in_flight.get(key)
+      owner = request is None
+      if owner:
+        request = self.in_flight[key] = InFlightRequest()
+      else:
+        self.coalesced_count += 1
+
+    if not owner:
+      request.done.wait()
+      if request.error is not None:
+        raise request.error
+      return request.response
+
+    try:
+      request.response = self._fetch(url, timeout, follow_refresh)
+      return request.response
+    except Exception, exception:
+      request.error = exception
+      raise
+    finally:
+      with self.lock:
+        del self.in_flight[key]
+        if request.response is not None:
+          self.responses[key] = request.response
+      request.done.set()
+
+  def get_statistics(self):
+    with self.lock:
+      return {
+        'requests': self.requests_count,
+        'connections': self.connections_count,
+        'reusedConnections': self.reused_count,
+        'coalescedRequests': self.coalesced_count,
+        'cachedResponses': self.cached_count,
+        'queueTimeouts': self.queue_timeouts_count
+      }
+
+  def close(self):
+    with self.lock:
+      pools, self.pools = self.pools, {}
+    for pool in pools.values():
+      pool.close()
+
+  def _fetch(self, url, timeout, follow_refresh):
+    handlers = [PooledHTTPHandler(self, timeout), PooledHTTPSHandler(self, timeout)]
+    if follow_refresh:
+      handlers.append(RefreshHeaderProcessor())
+    # openers are cheap, connections are kept by the client
+    opener = urllib2.build_opener(*handlers)
+    response = None
+    try:
+      response = opener.open(url, timeout=timeout)
+      return HttpResponse(code=response.getcode(), body=response.read(), error_msg=None, fetch_time=time.time())
+    except urllib2.HTTPError, httpError:
+      return HttpResponse(code=httpError.code, body=httpError.read(), error_msg=str(httpError), fetch_time=time.time())
+    finally:
+      if response is not None:
+        response.close()
+
+  def _get_pool(self, key):
+    with self.lock:
+      if key not in self.pools:
+        self.pools[key] = EndpointPool(self.MAX_CONNECTIONS_PER_ENDPOINT)
+      return self.pools[key]
+
+  def _open(self, connection_class, req, timeout):
+    """
+    Sends urllib2 request over a pooled connection, returns the response read as a whole
+    """
+    # requests made by RefreshHeaderProcessor come with no timeout of their own
+    if req.timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+      timeout = req.timeout
+    host = req.get_host()
+    if not host:
+      raise urllib2.URLError('no host given')
+
+    headers = dict(req.unredirected_hdrs)
+    headers.update(dict((k, v) for k, v in req.headers.items() if k not in headers))
+    headers = dict((name.title(), val) for name, val in headers.items())
+    headers["Connection"] = "keep-alive"
+
+    pool = self._get_pool((req.get_type(), host))
+    # time spent waiting for a busy endpoint counts against the request timeout,
+    # so that alerts queued behind a hanging one still finish in time
+    start_time = time.time()
+    if not pool.acquire(timeout):
+      with self.lock:
+        self.queue_timeouts_count += 1
+      raise urllib2.URLError(socket.timeout('timed out waiting for a connection to {0}'.format(host)))
+    try:
+      if timeout is not None:
+        timeout = max(timeout - (time.time() - start_time), 0.001)
+      connection = pool.get()
+      reused = connection is not None
+      if not reused:
+        connection = connection_class(host, timeout=timeout)
+      with self.lock:
+        self.requests_count += 1
+        if reused:
+          self.reused_count += 1
+        else:
+          self.connections_count += 1
+
+      try:
+        response, body = self._request(connection, req, headers, timeout)
+      except (httplib.HTTPException, socket.error), err:
+        connection.close()
+        if not reused or isinstance(err, socket.timeout):
+          raise urllib2.URLError(err)
+        # server has closed the idle connection in the meantime
+        connection = connection_class(host, timeout=timeout)
+        with self.lock:
+          self.connections_count += 1
+        try:
+          response, body = self._request(connection, req, headers, timeout)
+        except (httplib.HTTPException, socket.error), err:
+          connection.close()
+          raise urllib2.URLError(err)
+
+      if response.will_close:
+        connection.close()
+      else:
+        pool.put(connection)
+    finally:
+      pool.release()
+
+    result = addinfourl(StringIO(body), response.msg, req.get_full_url())
+    result.code = response.status
+    result.msg = response.reason
+    return result
+
+  def _request(self, connection, req, headers, timeout):
+    connection.timeout = timeout
+    if connection.sock is not None:
+      connection.sock.settimeout(timeout)
+    connection.request(req.get_method(), req.get_selector(), req.data, headers)
+    response = connection.getresponse()
+    return response, response.read()
+
+
+class PooledHTTPHandler(urllib2.HTTPHandler):
+  def __init__(self, client, timeout):
+    urllib2.HTTPHandler.__init__(self)
+    self.client = client
+    self.timeout = timeout
+
+  def http_open(self, req):
+    # connections tunneled through a proxy are not pooled
+    if req._tunnel_host:
+      return urllib2.HTTPHandler.http_open(self, req)
+    return self.client._open(httplib.HTTPConnection, req, self.timeout)
+
+
+class PooledHTTPSHandler(urllib2.HTTPSHandler):
+  def __init__(self, client, timeout):
+    urllib2.HTTPSHandler.__init__(self)
+    self.client = client
+    self.timeout = timeout
+
+  def https_open(self, req):
+    if req._tunnel_host:
+      return urllib2.HTTPSHandler.https_open(self, req)
+    return self.client._open(httplib.HTTPSConnection, req, self.timeout)
@@ -22,12 +22,11 @@ import imp
 import ambari_simplejson as json
 import logging
 import re
-import urllib2
 import uuid
 
 from  tempfile import gettempdir
 from alerts.base_alert import BaseAlert
-from ambari_commons.urllib_handlers import RefreshHeaderProcessor
+from alerts.http_client import get_http_client
 from resource_management.libraries.functions.get_port_from_url import get_port_from_url
 from resource_management.libraries.functions.curl_krb_request import curl_krb_request
 from ambari_agent import Constants
@@ -39,6 +38,9 @@ SECURITY_ENABLED_KEY = '{{cluster-env/security_enabled}}'
 # default timeout
 DEFAULT_CONNECTION_TIMEOUT = 5.0
 
+# seconds a JMX response fetched for one alert is reused by the others
+JMX_RESPONSE_MAX_AGE = 10
+
 class MetricAlert(BaseAlert):
   
   def __init__(self, alert_meta, alert_source_meta, config):
@@ -194,8 +196,6 @@ class MetricAlert(BaseAlert):
       url = "{0}://{1}:{2}/jmx?qry={3}".format(
         "https" if ssl else "http", host, str(port), jmx_property_key)
 
-      # use a customer header processor that will look for the non-standard
-      # "Refresh" header and attempt to follow the redirect
       response = None
       content = ''
       try:
@@ -213,20 +213,16 @@ class MetricAlert(BaseAlert):
 
           content = response
         else:
-          url_opener = urllib2.build_opener(RefreshHeaderProcessor())
-          response = url_opener.open(url, timeout=self.connection_timeout)
-          content = response.read()
+          # follow the non-standard "Refresh" header; the same bean read by other
+          # alerts in this run is fetched only once
+          response = get_http_client().fetch(url, self.connection_timeout, follow_refresh=True,
+                                             max_age=JMX_RESPONSE_MAX_AGE)
+          if response.error_msg is not None:
+            raise Exception(response.error_msg)
+          content = response.body
       except Exception, exception:
         if logger.isEnabledFor(logging.DEBUG):
           logger.exception("[Alert][{0}] Unable to make a web request: {1}".format(self.get_name(), str(exception)))
-      finally:
-        # explicitely close the connection as we've seen python hold onto these
-        if response is not None:
-          try:
-            response.close()
-          except:
-            logger.debug("[Alert][{0}] Unable to close JMX URL connection to {1}".format
-              (self.get_name(), url))
 
       json_is_valid = True
       try:
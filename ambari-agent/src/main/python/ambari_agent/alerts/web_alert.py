@@ -20,14 +20,13 @@ limitations under the License.
 
 import logging
 import time
-import urllib2
 import ssl
 
 from functools import wraps
-from urllib2 import HTTPError
 
 from tempfile import gettempdir
 from alerts.base_alert import BaseAlert
+from alerts.http_client import get_http_client
 from collections import namedtuple
 from resource_management.libraries.functions.get_port_from_url import get_port_from_url
 from resource_management.libraries.functions.get_path_from_url import get_path_from_url
@@ -204,7 +203,7 @@ class WebAlert(BaseAlert):
           "web_alert", kerberos_executable_search_paths, True, self.get_name(), smokeuser,
           connection_timeout=self.curl_connection_timeout, kinit_timer_ms = self.kinit_timeout)
       else:
-        # kerberos is not involved; use urllib2
+        # kerberos is not involved; use the shared alert HTTP client
         response_code, time_millis, error_msg = self._make_web_request_urllib(url)
 
       return WebResponse(status_code=response_code, time_millis=time_millis,
@@ -219,33 +218,15 @@ class WebAlert(BaseAlert):
 
   def _make_web_request_urllib(self, url):
     """
-    Make a web request using urllib2. This function does not handle exceptions.
+    Make a web request using the shared alert HTTP client. This function does not handle exceptions.
     :param url: the URL to request
     :return: a tuple of the response code and the total time in ms
     """
-    response = None
-    error_message = None
-
     start_time = time.time()
+    response = get_http_client().fetch(url, self.connection_timeout)
+    time_millis = time.time() - start_time
 
-    try:
-      response = urllib2.urlopen(url, timeout=self.connection_timeout)
-      response_code = response.getcode()
-      time_millis = time.time() - start_time
-
-      return response_code, time_millis, error_message
-    except HTTPError, httpError:
-      time_millis = time.time() - start_time
-      error_message = str(httpError)
-
-      return httpError.code, time_millis, error_message
-    finally:
-      if response is not None:
-        try:
-          response.close()
-        except Exception, exception:
-          if logger.isEnabledFor(logging.DEBUG):
-            logger.exception("[Alert][{0}] Unable to close socket connection".format(self.get_name()))
+    return response.code, time_millis, response.error_msg
 
 
   def _get_reporting_text(self, state):
@@ -29,6 +29,8 @@ import pprint
 import traceback
 import hostname
 import platform
+import time
+import zlib
 
 logger = logging.getLogger(__name__)
 
@@ -107,14 +109,36 @@ class VerifiedHTTPSConnection(httplib.HTTPSConnection):
     return sock
 
 
-class CachedHTTPSConnection:
-  """ Caches a ssl socket and uses a single https connection to the server. """
+def new_request_statistics():
+  """
+  Number of requests, total latency (ms) and total bytes of request and response
+  bodies on the wire
+  """
+  return {'requests': 0, 'latency': 0, 'bytesSent': 0, 'bytesReceived': 0}
 
-  def __init__(self, config, server_hostname):
+
+class CachedHTTPSConnection:
+  """
+  Caches a ssl socket and uses a single keep-alive https connection to the
+  server. Request bodies are gzipped if enabled in config and accepted by the
+  server, gzip and deflate encoded responses are decoded.
+  """
+
+  # Bodies smaller than that are not worth compressing
+  COMPRESSION_THRESHOLD = 1024
+
+  def __init__(self, config, server_hostname, statistics=None):
+    """
+    :param statistics: dict the request counters are added to, so that they can
+    outlive this connection
+    """
     self.connected = False
     self.config = config
     self.server = server_hostname
     self.port = config.get('server', 'secured_url_port')
+    self.compress_requests = config.get_compress_requests_option()
+    self.requests_on_connection = 0
+    self.statistics = statistics if statistics is not None else new_request_statistics()
     self.connect()
 
   def connect(self):
@@ -123,6 +147,7 @@ class CachedHTTPSConnection:
                                                self.config)
       self.httpsconn.connect()
       self.connected = True
+      self.requests_on_connection = 0
     # possible exceptions are caught and processed in Controller
 
   def forceClear(self):
@@ -130,17 +155,23 @@ class CachedHTTPSConnection:
                                              self.config)
     self.connect()
 
+  def close(self):
+    self.connected = False
+    self.httpsconn.close()
+
   def request(self, req):
     self.connect()
     try:
-      self.httpsconn.request(req.get_method(), req.get_full_url(),
-                             req.get_data(), req.headers)
-      response = self.httpsconn.getresponse()
-      # Ungzip if gzipped
-      if response.getheader('Content-Encoding') == 'gzip':
-        buf = StringIO(response.read())
-        response = gzip.GzipFile(fileobj=buf)
-      readResponse = response.read()
+      try:
+        response = self.send(req)
+      except (httplib.HTTPException, socket.error):
+        if self.requests_on_connection == 0:
+          raise
+        # server has closed kept-alive connection, try again on a fresh one
+        logger.info("Connection to the server was closed, reconnecting")
+        self.close()
+        self.connect()
+        response = self.send(req)
     except Exception as ex:
       # This exception is caught later in Controller
       logger.debug("Error in sending/receving data from the server " +
@@ -148,8 +179,84 @@ class CachedHTTPSConnection:
       logger.info("Encountered communication error. Details: " + repr(ex))
       self.connected = False
       raise IOError("Error occured during connecting to the server: " + str(ex))
+    return response
+
+  def send(self, req):
+    """
+    Sends request over current connection and returns decoded response body
+    """
+    compressed, status, readResponse = self.send_once(req, self.compress_requests)
+    if not compressed:
+      return readResponse
+
+    if status == httplib.UNSUPPORTED_MEDIA_TYPE:
+      logger.info("Server does not accept compressed requests (status {0}), "
+                  "sending uncompressed requests from now on".format(status))
+      self.compress_requests = False
+      return self.send_once(req, False)[2]
+
+    if status == httplib.BAD_REQUEST:
+      # Servers not able to decode the body answer with 400 as well, but so they do
+      # for requests which are bad anyway. Compression is given up only if the same
+      # request is accepted uncompressed.
+      status, readResponse = self.send_once(req, False)[1:]
+      if status != httplib.BAD_REQUEST:
+        logger.info("Server has rejected compressed request but accepted the uncompressed one, "
+                    "sending uncompressed requests from now on")
+        self.compress_requests = False
     return readResponse
 
+  def send_once(self, req, compress):
+    """
+    Returns (whether request body was compressed, response status, decoded response body)
+    """
+    start_time = time.time()
+    data = req.get_data()
+    headers = req.headers
+    compressed = compress and data is not None and len(data) >= self.COMPRESSION_THRESHOLD
+    if compressed:
+      data = self.compress(data)
+      headers = dict(headers)
+      headers['Content-Encoding'] = 'gzip'
+
+    self.httpsconn.request(req.get_method(), req.get_full_url(), data, headers)
+    response = self.httpsconn.getresponse()
+    raw_response = response.read()
+    self.requests_on_connection += 1
+
+    readResponse = self.decompress(raw_response, response.getheader('Content-Encoding'))
+
+    bytes_sent = len(data) if data is not None else 0
+    latency = int((time.time() - start_time) * 1000)
+    self.statistics['requests'] += 1
+    self.statistics['latency'] += latency
+    self.statistics['bytesSent'] += bytes_sent
+    self.statistics['bytesReceived'] += len(raw_response)
+    logger.debug("Request to {0} took {1} ms, sent {2} bytes, received {3} bytes "
+                 "({4} bytes decoded)".format(req.get_full_url(), latency, bytes_sent,
+                                              len(raw_response), len(readResponse)))
+    return compressed, response.status, readResponse
+
+  def compress(self, data):
+    buf = StringIO()
+    gzip_file = gzip.GzipFile(fileobj=buf, mode='wb')
+    try:
+      gzip_file.write(data)
+    finally:
+      gzip_file.close()
+    return buf.getvalue()
+
+  def decompress(self, data, encoding):
+    if encoding == 'gzip':
+      return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+      try:
+        return zlib.decompress(data)
+      except zlib.error:
+        # some servers send raw deflate stream without zlib header
+        return zlib.decompress(data, -zlib.MAX_WBITS)
+    return data
+
 
 class CertificateManager():
   def __init__(self, config, server_hostname):
@@ -894,6 +894,7 @@ class TestActionQueue(TestCase):
     config = MagicMock()
     gpeo_mock.return_value = 1
     config.get_parallel_exec_option = gpeo_mock
+    config.get_parallel_exec_max_workers.return_value = ActionQueue.MAX_CONCURRENT_ACTIONS
     actionQueue = ActionQueue(config, dummy_controller)
     actionQueue.put([self.datanode_install_command, self.hbase_install_command])
     self.assertEqual(2, actionQueue.commandQueue.qsize())
@@ -905,17 +906,17 @@ class TestActionQueue(TestCase):
     self.assertEqual(2, process_command_mock.call_count)
     process_command_mock.assert_any_calls([call(self.datanode_install_command), call(self.hbase_install_command)])
 
-  @patch("threading.Thread")
   @patch.object(AmbariConfig, "get_parallel_exec_option")
   @patch.object(ActionQueue, "process_command")
   @patch.object(CustomServiceOrchestrator, "__init__")
   def test_parallel_exec_no_retry(self, CustomServiceOrchestrator_mock,
-                         process_command_mock, gpeo_mock, threading_mock):
+                         process_command_mock, gpeo_mock):
     CustomServiceOrchestrator_mock.return_value = None
     dummy_controller = MagicMock()
     config = MagicMock()
     gpeo_mock.return_value = 1
     config.get_parallel_exec_option = gpeo_mock
+    config.get_parallel_exec_max_workers.return_value = 2
     actionQueue = ActionQueue(config, dummy_controller)
     actionQueue.put([self.datanode_install_no_retry_command, self.snamenode_install_command])
     self.assertEqual(2, actionQueue.commandQueue.qsize())
@@ -924,9 +925,34 @@ class TestActionQueue(TestCase):
     actionQueue.stop()
     actionQueue.join()
     self.assertEqual(actionQueue.stopped(), True, 'Action queue is not stopped.')
-    self.assertEqual(1, process_command_mock.call_count)
-    self.assertEqual(0, threading_mock.call_count)
-    process_command_mock.assert_any_calls([call(self.datanode_install_command), call(self.hbase_install_command)])
+    # Commands of one stage are executed by the pool regardless of retry settings
+    self.assertEqual(2, process_command_mock.call_count)
+    process_command_mock.assert_any_calls([call(self.datanode_install_no_retry_command), call(self.snamenode_install_command)])
+    metrics = actionQueue.execution_pool_metrics()
+    self.assertEqual(2, metrics['maxWorkers'])
+    self.assertEqual(2, metrics['completedCommands'])
+    self.assertEqual(0, metrics['queueDepth'])
+
+  @patch.object(AmbariConfig, "get_parallel_exec_option")
+  @patch.object(CustomServiceOrchestrator, "__init__")
+  def test_no_execution_pool_metrics_without_parallel_exec(self, CustomServiceOrchestrator_mock, gpeo_mock):
+    CustomServiceOrchestrator_mock.return_value = None
+    config = MagicMock()
+    gpeo_mock.return_value = 0
+    config.get_parallel_exec_option = gpeo_mock
+    actionQueue = ActionQueue(config, MagicMock())
+    self.assertEqual(None, actionQueue.executionCommandPool)
+    self.assertEqual(None, actionQueue.execution_pool_metrics())
+
+  @patch.object(CustomServiceOrchestrator, "__init__")
+  def test_fork_server_metrics(self, CustomServiceOrchestrator_mock):
+    CustomServiceOrchestrator_mock.return_value = None
+    actionQueue = ActionQueue(AmbariConfig(), MagicMock())
+    self.assertEqual(None, actionQueue.fork_server_metrics())
+
+    actionQueue.customServiceOrchestrator.fork_server = MagicMock()
+    actionQueue.customServiceOrchestrator.fork_server.get_metrics.return_value = {'launchedCommands': 1}
+    self.assertEqual({'launchedCommands': 1}, actionQueue.fork_server_metrics())
 
   @not_for_platform(PLATFORM_LINUX)
   @patch("time.sleep")
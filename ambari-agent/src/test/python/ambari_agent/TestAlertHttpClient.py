@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import BaseHTTPServer
+import SocketServer
+import threading
+import time
+import urllib2
+from unittest import TestCase
+
+from ambari_agent.alerts.http_client import AlertHttpClient
+
+
+class JmxHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  protocol_version = "HTTP/1.1"
+
+  def do_GET(self):
+    self.server.requests.append(self.path)
+    if self.path.startswith("/slow"):
+      time.sleep(0.3)
+    elif self.path.startswith("/hang"):
+      time.sleep(1.5)
+    # standby daemon refers to the active one on another host
+    if self.path.startswith("/refresh") and self.headers.get("Host").startswith("127.0.0.1"):
+      self.send_reply(200, "", {"Refresh": "0; url=http://localhost:{0}/".format(self.server.server_port)})
+    elif self.path.startswith("/error"):
+      self.send_reply(500, "failed")
+    else:
+      self.send_reply(200, '{"beans": [{"path": "%s"}]}' % self.path)
+
+  def send_reply(self, code, body, headers={}):
+    self.send_response(code)
+    self.send_header("Content-Length", str(len(body)))
+    for name, value in headers.items():
+      self.send_header(name, value)
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  # kept-alive connections are served at once
+  daemon_threads = True
+
+
+class TestAlertHttpClient(TestCase):
+
+  def setUp(self):
+    self.server = ThreadingHTTPServer(("127.0.0.1", 0), JmxHandler)
+    self.server.requests = []
+    thread = threading.Thread(target=self.server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    self.url = "http://localhost:{0}".format(self.server.server_port)
+    self.client = AlertHttpClient()
+
+  def tearDown(self):
+    self.client.close()
+    self.server.shutdown()
+    self.server.server_close()
+
+  def test_keep_alive(self):
+    response = self.client.fetch(self.url + "/jmx?qry=a", 5)
+    self.assertEqual(response.code, 200)
+    self.assertEqual(response.body, '{"beans": [{"path": "/jmx?qry=a"}]}')
+    self.assertEqual(response.error_msg, None)
+
+    self.assertEqual(self.client.fetch(self.url + "/jmx?qry=b", 5).code, 200)
+    statistics = self.client.get_statistics()
+    self.assertEqual(statistics['requests'], 2)
+    self.assertEqual(statistics['connections'], 1)
+    self.assertEqual(statistics['reusedConnections'], 1)
+
+    response = self.client.fetch(self.url + "/error", 5)
+    self.assertEqual(response.code, 500)
+    self.assertTrue(response.error_msg.startswith("HTTP Error 500"))
+
+    # non-standard Refresh header is followed on request
+    standby_url = "http://127.0.0.1:{0}/refresh".format(self.server.server_port)
+    self.assertEqual(self.client.fetch(standby_url, 5).body, "")
+    self.assertEqual(self.client.fetch(standby_url, 5, follow_refresh=True).body, '{"beans": [{"path": "/refresh"}]}')
+
+  def test_coalescing(self):
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(self.client.fetch(self.url + "/slow", 5)))
+               for i in range(3)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(len(responses), 3)
+    self.assertEqual(self.server.requests, ["/slow"])
+    self.assertEqual(self.client.get_statistics()['coalescedRequests'], 2)
+
+    # response can be reused while it is recent enough
+    self.client.fetch(self.url + "/slow", 5, max_age=10)
+    self.assertEqual(self.server.requests, ["/slow"])
+    self.client.fetch(self.url + "/slow", 5)
+    self.assertEqual(self.server.requests, ["/slow", "/slow"])
+
+  def test_busy_endpoint_timeout(self):
+    # both connections to the endpoint are taken by requests to a hanging daemon
+    threads = [threading.Thread(target=self.client.fetch, args=(self.url + "/hang?qry=" + str(i), 5))
+               for i in range(2)]
+    for thread in threads:
+      thread.start()
+    time.sleep(0.2)
+
+    start_time = time.time()
+    self.assertRaises(urllib2.URLError, self.client.fetch, self.url + "/jmx?qry=c", 0.3)
+    self.assertTrue(time.time() - start_time < 1)
+    self.assertEqual(self.client.get_statistics()['queueTimeouts'], 1)
+
+    for thread in threads:
+      thread.join()
+    self.assertEqual(self.client.fetch(self.url + "/jmx?qry=c", 5).code, 200)
+
+  def test_connection_error(self):
+    url = self.url
+    self.server.shutdown()
+    self.server.server_close()
+    self.assertRaises(urllib2.URLError, self.client.fetch, url, 1)
@@ -245,6 +245,8 @@ class TestController(unittest.TestCase):
 
     self.controller.registerAndHeartbeat = registerAndHeartbeat
     self.controller.run()
+    # make sure mocked ActionQueue.run is executed before the patch is removed
+    self.controller.actionQueue.join()
     self.assertTrue(installMock.called)
     self.assertTrue(buildMock.called)
     self.controller.registerAndHeartbeat.assert_called_once_with()
@@ -258,6 +260,7 @@ class TestController(unittest.TestCase):
 
     registerAndHeartbeat.side_effect = switchBool
     self.controller.run()
+    self.controller.actionQueue.join()
     self.assertEqual(2, registerAndHeartbeat.call_count)
 
     self.controller.registerAndHeartbeat = \
@@ -389,7 +392,7 @@ class TestController(unittest.TestCase):
     self.assertEqual(actual, expected)
     
     security_mock.CachedHTTPSConnection.assert_called_once_with(
-      self.controller.config, self.controller.serverHostname)
+      self.controller.config, self.controller.serverHostname, self.controller.request_statistics)
     requestMock.called_once_with(url, data,
       {'Content-Type': 'application/ambari_simplejson'})
 
@@ -531,6 +534,15 @@ class TestController(unittest.TestCase):
 
     addToStatusQueue.assert_has_calls([call("statusCommands")])
 
+    # resync of delta heartbeats
+    self.controller.responseId = 1
+    response["resyncHeartbeat"] = True
+    self.controller.DEBUG_STOP_HEARTBEATING = False
+    self.controller.heartbeatWithServer()
+
+    hearbeat.reset_delta_state.assert_called_once_with()
+    del response["resyncHeartbeat"]
+
     # restartAgent command
     self.controller.responseId = 1
     self.controller.DEBUG_STOP_HEARTBEATING = False
@@ -18,8 +18,10 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 import ConfigParser
+import marshal
 from multiprocessing.pool import ThreadPool
 import os
+import ambari_simplejson as json
 
 import pprint
 from ambari_commons import shell
@@ -192,6 +194,105 @@ class TestCustomServiceOrchestrator(TestCase):
     self.assertEquals(command['public_hostname'], "test.hst")
     self.assertTrue(unlink_mock.called)
 
+  @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
+  @patch("ambari_agent.hostname.public_hostname")
+  @patch.object(FileCache, "__init__")
+  def test_dump_command_to_json_formats(self, FileCache_mock, hostname_mock):
+    FileCache_mock.return_value = None
+    hostname_mock.return_value = "test.hst"
+    command = {
+      'commandType': 'EXECUTION_COMMAND',
+      'taskId': 3,
+      'configurations':{'global' : {'a': 'b'}},
+      'hostLevelParams':{}
+    }
+    config = AmbariConfig().getConfig()
+    config.set('agent', 'prefix', tempfile.gettempdir())
+
+    config.set('agent', 'command_file_format', 'compact')
+    orchestrator = CustomServiceOrchestrator(config, MagicMock())
+    json_file = orchestrator.dump_command_to_json(command)
+    with open(json_file) as f:
+      content = f.read()
+    self.assertFalse('\n' in content)
+    self.assertEquals(json.loads(content), command)
+    self.assertFalse(os.path.exists(json_file + ".marshal"))
+
+    config.set('agent', 'command_file_format', 'marshal')
+    orchestrator = CustomServiceOrchestrator(config, MagicMock())
+    json_file = orchestrator.dump_command_to_json(command)
+    with open(json_file + ".marshal", "rb") as f:
+      self.assertEquals(marshal.load(f), command)
+    if get_platform() != PLATFORM_WINDOWS:
+      self.assertEqual(oct(os.stat(json_file + ".marshal").st_mode & 0777), '0600')
+
+    # stale marshalled copy is removed
+    config.remove_option('agent', 'command_file_format')
+    orchestrator = CustomServiceOrchestrator(config, MagicMock())
+    json_file = orchestrator.dump_command_to_json(command)
+    self.assertFalse(os.path.exists(json_file + ".marshal"))
+    os.unlink(json_file)
+
+
+  @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
+  @patch.object(FileCache, "__init__")
+  def test_decompressClusterHostInfo_cache(self, FileCache_mock):
+    FileCache_mock.return_value = None
+    cluster_host_info = {'namenode_host' : ['1'],
+                         'slave_hosts'   : ['0-1'],
+                         'all_racks'   : [u'/default-rack:0-1'],
+                         'ambari_server_host' : 'a.b.c',
+                         'all_ipv4_ips'   : [u'192.168.12.101:0', u'192.168.12.102:1'],
+                         'all_hosts'     : ['h1.hortonworks.com', 'h2.hortonworks.com'],
+                         'all_ping_ports': ['8670:0,1']}
+    config = AmbariConfig().getConfig()
+    orchestrator = CustomServiceOrchestrator(config, MagicMock())
+
+    info = orchestrator.decompressClusterHostInfo(cluster_host_info)
+    self.assertEquals(info['slave_hosts'], ['h1.hortonworks.com', 'h2.hortonworks.com'])
+    self.assertEquals(info['all_ping_ports'], ['8670', '8670'])
+    # commands of the same stage share decompressed result
+    self.assertTrue(orchestrator.decompressClusterHostInfo(dict(cluster_host_info)) is info)
+
+    cluster_host_info['namenode_host'] = ['0']
+    self.assertEquals(orchestrator.decompressClusterHostInfo(cluster_host_info)['namenode_host'],
+                      ['h1.hortonworks.com'])
+
+    cluster_host_info['namenode_host'] = ['0-']
+    self.assertRaises(AgentException, orchestrator.decompressClusterHostInfo, cluster_host_info)
+
+
+  @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
+  @patch("ambari_agent.hostname.public_hostname")
+  @patch.object(CustomServiceOrchestrator, 'decompressClusterHostInfo')
+  @patch.object(FileCache, "__init__")
+  def test_dump_command_to_json_compact_cluster_host_info(self, FileCache_mock,
+                                                          decompress_cluster_host_info_mock, hostname_mock):
+    FileCache_mock.return_value = None
+    hostname_mock.return_value = "test.hst"
+    command = {
+      'commandType': 'EXECUTION_COMMAND',
+      'taskId': 3,
+      'clusterHostInfo':{'namenode_host' : ['1'],
+                         'all_hosts'     : ['h1.hortonworks.com', 'h2.hortonworks.com']},
+      'hostLevelParams':{}
+    }
+    config = AmbariConfig().getConfig()
+    config.set('agent', 'prefix', tempfile.gettempdir())
+    config.set('agent', 'compact_cluster_host_info', 'true')
+    orchestrator = CustomServiceOrchestrator(config, MagicMock())
+
+    json_file = orchestrator.dump_command_to_json(command)
+    with open(json_file) as f:
+      dumped_command = json.load(f)
+    os.unlink(json_file)
+    config.remove_option('agent', 'compact_cluster_host_info')
+
+    self.assertFalse(decompress_cluster_host_info_mock.called)
+    self.assertTrue(dumped_command['clusterHostInfoCompressed'])
+    self.assertEquals(dumped_command['clusterHostInfo']['namenode_host'], ['1'])
+
+
   @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
   @patch("os.path.exists")
   @patch.object(FileCache, "__init__")
@@ -217,6 +318,7 @@ class TestCustomServiceOrchestrator(TestCase):
 
   @patch.object(CustomServiceOrchestrator, "resolve_script_path")
   @patch.object(CustomServiceOrchestrator, "resolve_hook_script_path")
+  @patch.object(FileCache, "refresh_command_directories", new = MagicMock())
   @patch.object(FileCache, "get_host_scripts_base_dir")
   @patch.object(FileCache, "get_service_base_dir")
   @patch.object(FileCache, "get_hook_base_dir")
@@ -306,6 +408,7 @@ class TestCustomServiceOrchestrator(TestCase):
   @patch("ambari_commons.shell.kill_process_with_children")
   @patch.object(CustomServiceOrchestrator, "resolve_script_path")
   @patch.object(CustomServiceOrchestrator, "resolve_hook_script_path")
+  @patch.object(FileCache, "refresh_command_directories", new = MagicMock())
   @patch.object(FileCache, "get_host_scripts_base_dir")
   @patch.object(FileCache, "get_service_base_dir")
   @patch.object(FileCache, "get_hook_base_dir")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import threading
+import time
+from unittest import TestCase
+from ambari_agent.ExecutionCommandPool import ExecutionCommandPool
+from mock.mock import patch, MagicMock
+
+
+def make_command(task_id, role, command_id='1-1', role_command='START'):
+  return {
+    'commandType': 'EXECUTION_COMMAND',
+    'commandId': command_id,
+    'taskId': task_id,
+    'role': role,
+    'roleCommand': role_command,
+  }
+
+
+class TestExecutionCommandPool(TestCase):
+
+  @patch.object(ExecutionCommandPool, "_start_worker")
+  def test_bounded_by_max_workers(self, start_worker_mock):
+    pool = ExecutionCommandPool(MagicMock(), 2)
+    start_worker_mock.side_effect = lambda: pool.workers.append(MagicMock())
+    for i in range(4):
+      pool.submit(make_command(i, 'ROLE' + str(i)))
+    self.assertEqual(2, start_worker_mock.call_count)
+
+    self.assertEqual(0, pool._take_next_command()['taskId'])
+    self.assertEqual(1, pool._take_next_command()['taskId'])
+    self.assertEqual(None, pool._take_next_command())
+
+    metrics = pool.get_metrics()
+    self.assertEqual(2, metrics['activeWorkers'])
+    self.assertEqual(2, metrics['queueDepth'])
+    self.assertEqual(4, metrics['submittedCommands'])
+
+  @patch.object(ExecutionCommandPool, "_start_worker", new = MagicMock())
+  def test_role_order_is_kept(self):
+    pool = ExecutionCommandPool(MagicMock(), 5)
+    pool.submit(make_command(1, 'DATANODE', role_command='INSTALL'))
+    pool.submit(make_command(2, 'DATANODE'))
+    pool.submit(make_command(3, 'NODEMANAGER'))
+
+    first = pool._take_next_command()
+    self.assertEqual(1, first['taskId'])
+    # second DATANODE command waits for the first one
+    self.assertEqual(3, pool._take_next_command()['taskId'])
+    self.assertEqual(None, pool._take_next_command())
+
+    pool.running.remove(first)
+    self.assertEqual(2, pool._take_next_command()['taskId'])
+
+  @patch.object(ExecutionCommandPool, "_start_worker", new = MagicMock())
+  def test_stage_barrier(self):
+    pool = ExecutionCommandPool(MagicMock(), 5)
+    pool.submit(make_command(1, 'DATANODE', command_id='1-1'))
+    pool.submit(make_command(2, 'NODEMANAGER', command_id='1-2'))
+
+    first = pool._take_next_command()
+    self.assertEqual(1, first['taskId'])
+    self.assertEqual(None, pool._take_next_command())
+
+    pool.running.remove(first)
+    self.assertEqual(2, pool._take_next_command()['taskId'])
+
+  @patch.object(ExecutionCommandPool, "_start_worker", new = MagicMock())
+  def test_exclusive_role_command(self):
+    pool = ExecutionCommandPool(MagicMock(), 5)
+    pool.submit(make_command(1, 'DATANODE'))
+    pool.submit(make_command(2, 'HDFS_SERVICE_CHECK', role_command='SERVICE_CHECK'))
+    pool.submit(make_command(3, 'NODEMANAGER'))
+
+    first = pool._take_next_command()
+    self.assertEqual(1, first['taskId'])
+    self.assertEqual(None, pool._take_next_command())
+
+    pool.running.remove(first)
+    exclusive = pool._take_next_command()
+    self.assertEqual(2, exclusive['taskId'])
+    self.assertEqual(None, pool._take_next_command())
+
+    pool.running.remove(exclusive)
+    self.assertEqual(3, pool._take_next_command()['taskId'])
+
+  @patch.object(ExecutionCommandPool, "_start_worker", new = MagicMock())
+  def test_cancel_and_reset(self):
+    pool = ExecutionCommandPool(MagicMock(), 5)
+    pool.submit(make_command(1, 'DATANODE'))
+    pool.submit(make_command(2, 'NODEMANAGER'))
+    pool.submit(make_command(3, 'HBASE_REGIONSERVER'))
+
+    self.assertTrue(pool.cancel(2))
+    self.assertFalse(pool.cancel(2))
+    self.assertEqual([1, 3], [item[0]['taskId'] for item in pool.pending])
+
+    pool.reset()
+    self.assertTrue(pool.is_idle())
+
+  def test_commands_run_concurrently(self):
+    lock = threading.Lock()
+    state = {'running': 0, 'max_running': 0}
+
+    def process_command(command):
+      with lock:
+        state['running'] += 1
+        state['max_running'] = max(state['max_running'], state['running'])
+      time.sleep(0.1)
+      with lock:
+        state['running'] -= 1
+
+    pool = ExecutionCommandPool(process_command, 3)
+    for i in range(6):
+      pool.submit(make_command(i, 'ROLE' + str(i)))
+
+    deadline = time.time() + 5
+    while not pool.is_idle() and time.time() < deadline:
+      time.sleep(0.05)
+    pool.stop()
+
+    self.assertTrue(pool.is_idle())
+    self.assertEqual(3, state['max_running'])
+    self.assertEqual(6, pool.get_metrics()['completedCommands'])
@@ -18,6 +18,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 import ConfigParser
+import httplib
 import os
 
 import pprint
@@ -34,6 +35,7 @@ from mock.mock import MagicMock, patch
 import StringIO
 import sys
 import shutil
+import urlparse
 
 
 class TestFileCache(TestCase):
@@ -139,45 +141,60 @@ class TestFileCache(TestCase):
   @patch.object(FileCache, "invalidate_directory")
   @patch.object(FileCache, "unpack_archive")
   @patch.object(FileCache, "write_hash_sum")
-  def test_provide_directory(self, write_hash_sum_mock, unpack_archive_mock,
-                             invalidate_directory_mock,
+  @patch.object(FileCache, "replace_directory")
+  def test_provide_directory(self, replace_directory_mock, write_hash_sum_mock,
+                             unpack_archive_mock, invalidate_directory_mock,
                              read_hash_sum_mock, fetch_url_mock,
                              build_download_url_mock):
     build_download_url_mock.return_value = "http://dummy-url/"
     HASH1 = "hash1"
-    membuffer = MagicMock()
-    membuffer.getvalue.return_value.strip.return_value = HASH1
-    fileCache = FileCache(self.config)
+    archive_content = {'data': "archive"}
+    def fetch_url(url, output=None):
+      if output is None:
+        return StringIO.StringIO(HASH1)
+      output.write(archive_content['data'])
+      return output
+    cache_path = tempfile.mkdtemp()
+    update_callback = MagicMock()
+    fileCache = FileCache(self.config, update_callback=update_callback)
 
     # Test uptodate dirs after start
     self.assertFalse(fileCache.uptodate_paths)
-    path = os.path.join("cache_path", "subdirectory")
+    path = os.path.join(cache_path, "subdirectory")
     # Test initial downloading (when dir does not exist)
-    fetch_url_mock.return_value = membuffer
+    fetch_url_mock.side_effect = fetch_url
     read_hash_sum_mock.return_value = "hash2"
-    res = fileCache.provide_directory("cache_path", "subdirectory",
+    res = fileCache.provide_directory(cache_path, "subdirectory",
                                       "server_url_prefix")
-    self.assertTrue(invalidate_directory_mock.called)
-    self.assertTrue(write_hash_sum_mock.called)
+    invalidate_directory_mock.assert_called_once_with(path + ".new")
+    self.assertEquals(unpack_archive_mock.call_args[0][1:], (path + ".new", path))
+    write_hash_sum_mock.assert_called_once_with(path + ".new", HASH1)
+    replace_directory_mock.assert_called_once_with(path + ".new", path)
+    update_callback.assert_called_once_with(path)
     self.assertEquals(fetch_url_mock.call_count, 2)
     self.assertEquals(pprint.pformat(fileCache.uptodate_paths),
                       pprint.pformat([path]))
     self.assertEquals(res, path)
+    # temporary archive is removed
+    self.assertEquals(os.listdir(cache_path), [])
 
     fetch_url_mock.reset_mock()
     write_hash_sum_mock.reset_mock()
     invalidate_directory_mock.reset_mock()
     unpack_archive_mock.reset_mock()
+    replace_directory_mock.reset_mock()
 
     # Test cache invalidation when local hash does not differ
-    fetch_url_mock.return_value = membuffer
     read_hash_sum_mock.return_value = HASH1
     fileCache.reset()
+    update_callback.reset_mock()
 
-    res = fileCache.provide_directory("cache_path", "subdirectory",
+    res = fileCache.provide_directory(cache_path, "subdirectory",
                                       "server_url_prefix")
     self.assertFalse(invalidate_directory_mock.called)
     self.assertFalse(write_hash_sum_mock.called)
+    self.assertFalse(replace_directory_mock.called)
+    self.assertFalse(update_callback.called)
     self.assertEquals(fetch_url_mock.call_count, 1)
 
     self.assertEquals(pprint.pformat(fileCache.uptodate_paths),
@@ -190,7 +207,7 @@ class TestFileCache(TestCase):
     unpack_archive_mock.reset_mock()
 
     # Test execution path when path is up-to date (already checked)
-    res = fileCache.provide_directory("cache_path", "subdirectory",
+    res = fileCache.provide_directory(cache_path, "subdirectory",
                                       "server_url_prefix")
     self.assertFalse(invalidate_directory_mock.called)
     self.assertFalse(write_hash_sum_mock.called)
@@ -204,7 +221,7 @@ class TestFileCache(TestCase):
     fetch_url_mock.side_effect = self.caching_exc_side_effect
     fileCache = FileCache(self.config)
     try:
-      fileCache.provide_directory("cache_path", "subdirectory",
+      fileCache.provide_directory(cache_path, "subdirectory",
                                   "server_url_prefix")
       self.fail('CachingException not thrown')
     except CachingException:
@@ -218,7 +235,7 @@ class TestFileCache(TestCase):
     fetch_url_mock.side_effect = self.exc_side_effect
     fileCache = FileCache(self.config)
     try:
-      fileCache.provide_directory("cache_path", "subdirectory",
+      fileCache.provide_directory(cache_path, "subdirectory",
                                   "server_url_prefix")
       self.fail('Exception not thrown')
     except Exception:
@@ -229,7 +246,7 @@ class TestFileCache(TestCase):
     self.config.set('agent', 'tolerate_download_failures', "true")
     fetch_url_mock.side_effect = self.caching_exc_side_effect
     fileCache = FileCache(self.config)
-    res = fileCache.provide_directory("cache_path", "subdirectory",
+    res = fileCache.provide_directory(cache_path, "subdirectory",
                                   "server_url_prefix")
     self.assertEquals(res, path)
 
@@ -239,25 +256,75 @@ class TestFileCache(TestCase):
     read_hash_sum_mock.reset_mock()
     invalidate_directory_mock.reset_mock()
     unpack_archive_mock.reset_mock()
+    replace_directory_mock.reset_mock()
     fileCache.reset()
 
-    fetch_url_mock.side_effect = None
-    membuffer_empty = MagicMock()
-    membuffer_empty.getvalue.return_value.strip.return_value = ""
-    fetch_url_mock.return_value = membuffer_empty # Remote hash and content
+    fetch_url_mock.side_effect = fetch_url
+    archive_content['data'] = ""
     read_hash_sum_mock.return_value = "hash2" # Local hash
 
-    res = fileCache.provide_directory("cache_path", "subdirectory",
+    res = fileCache.provide_directory(cache_path, "subdirectory",
                                       "server_url_prefix")
-    self.assertTrue(fetch_url_mock.return_value.strip() != read_hash_sum_mock.return_value.strip())
     self.assertEquals(build_download_url_mock.call_count, 2)
     self.assertEquals(fetch_url_mock.call_count, 2)
     self.assertFalse(invalidate_directory_mock.called)
     self.assertFalse(unpack_archive_mock.called)
     self.assertFalse(write_hash_sum_mock.called)
+    self.assertFalse(replace_directory_mock.called)
     self.assertEquals(pprint.pformat(fileCache.uptodate_paths), pprint.pformat([path]))
     self.assertEquals(res, path)
-    pass
+    self.assertEquals(os.listdir(cache_path), [])
+    shutil.rmtree(cache_path)
+
+
+  @patch.object(FileCache, "provide_directory")
+  def test_provide_directories(self, provide_directory_mock):
+    fileCache = FileCache(self.config)
+    fileCache.uptodate_paths.append(os.path.join("cache_path", "host_scripts"))
+    threads = set()
+    def provide_directory(cache_path, subdirectory, server_url_prefix):
+      threads.add(threading.current_thread().ident)
+      time.sleep(0.1)
+    provide_directory_mock.side_effect = provide_directory
+
+    res = fileCache.provide_directories("cache_path", ["host_scripts", "stacks/HDP/2.0.6/hooks",
+                                                       "common-services/HDFS/2.1.0.2.0/package"],
+                                        "server_url_prefix")
+    self.assertEquals(res, [os.path.join("cache_path", "host_scripts"),
+                            os.path.join("cache_path", "stacks/HDP/2.0.6/hooks"),
+                            os.path.join("cache_path", "common-services/HDFS/2.1.0.2.0/package")])
+    # up-to-date directory is not checked again, others are checked in parallel
+    self.assertEquals(provide_directory_mock.call_count, 2)
+    self.assertEquals(len(threads), 2)
+
+    # Test exception propagation
+    provide_directory_mock.side_effect = self.caching_exc_side_effect
+    try:
+      fileCache.provide_directories("cache_path", ["stacks/HDP/2.0.6/hooks"], "server_url_prefix")
+      self.fail('CachingException not thrown')
+    except CachingException:
+      pass # Expected
+
+
+  @patch.object(FileCache, "provide_directories")
+  def test_refresh_command_directories(self, provide_directories_mock):
+    fileCache = FileCache(self.config)
+    command = {
+      'commandParams': {
+        'service_package_folder': 'common-services/HDFS/2.1.0.2.0/package',
+        'hooks_folder': 'HDP/2.0.6/hooks'
+      }
+    }
+    fileCache.refresh_command_directories(command, "server_url_prefix")
+    provide_directories_mock.assert_called_once_with("/var/lib/ambari-agent/cache",
+      ['host_scripts', 'common-services/HDFS/2.1.0.2.0/package', os.path.join('stacks', 'HDP/2.0.6/hooks')],
+      "server_url_prefix")
+
+    provide_directories_mock.reset_mock()
+    del command['commandParams']['hooks_folder']
+    fileCache.refresh_command_directories(command, "server_url_prefix")
+    provide_directories_mock.assert_called_once_with("/var/lib/ambari-agent/cache",
+      ['host_scripts', 'common-services/HDFS/2.1.0.2.0/package'], "server_url_prefix")
 
 
   def test_build_download_url(self):
@@ -268,23 +335,46 @@ class TestFileCache(TestCase):
         'http://localhost:8080/resources//stacks/HDP/2.1.1/hooks/archive.zip')
 
 
-  @patch("urllib2.OpenerDirector.open")
-  def test_fetch_url(self, urlopen_mock):
+  @patch.object(FileCache, "open_url")
+  @patch.object(FileCache, "release_connection")
+  def test_fetch_url(self, release_connection_mock, open_url_mock):
     fileCache = FileCache(self.config)
     remote_url = "http://dummy-url/"
     # Test normal download
     test_str = 'abc' * 100000 # Very long string
     test_string_io = StringIO.StringIO(test_str)
-    test_buffer = MagicMock()
-    test_buffer.read.side_effect = test_string_io.read
-    urlopen_mock.return_value = test_buffer
+    test_connection = MagicMock()
+    test_response = MagicMock()
+    test_response.status = 200
+    test_response.read.side_effect = test_string_io.read
+    open_url_mock.return_value = (test_connection, test_response)
 
     memory_buffer = fileCache.fetch_url(remote_url)
 
     self.assertEquals(memory_buffer.getvalue(), test_str)
-    self.assertEqual(test_buffer.read.call_count, 20) # depends on buffer size
+    self.assertEqual(test_response.read.call_count, 20) # depends on buffer size
+    release_connection_mock.assert_called_once_with(remote_url, test_connection, test_response)
+    self.assertFalse(test_connection.close.called)
+
+    # Test download to file object
+    test_string_io.seek(0)
+    output = StringIO.StringIO()
+    self.assertTrue(fileCache.fetch_url(remote_url, output) is output)
+    self.assertEquals(output.getvalue(), test_str)
+
+    # Test unexpected response status
+    test_response.status = 404
+    try:
+      fileCache.fetch_url(remote_url)
+      self.fail('CachingException not thrown')
+    except CachingException:
+      pass # Expected
+    self.assertEqual(release_connection_mock.call_count, 2)
+    test_connection.close.assert_called_once_with()
+
     # Test exception handling
-    test_buffer.read.side_effect = self.exc_side_effect
+    test_response.status = 200
+    test_response.read.side_effect = self.exc_side_effect
     try:
       fileCache.fetch_url(remote_url)
       self.fail('CachingException not thrown')
@@ -294,6 +384,44 @@ class TestFileCache(TestCase):
       self.fail('Unexpected exception thrown:' + str(e))
 
 
+  @patch("httplib.HTTPConnection")
+  def test_open_url(self, connection_mock):
+    fileCache = FileCache(self.config)
+    connection_mock.side_effect = lambda *args, **kwargs: MagicMock()
+    hash_url = "http://dummy-url:8080/resources/host_scripts/.hash"
+    archive_url = "http://dummy-url:8080/resources/stacks/HDP/2.0.6/hooks/archive.zip"
+
+    connection, response = fileCache.open_url(hash_url)
+    response.will_close = False
+    fileCache.release_connection(hash_url, connection, response)
+    # connection is kept alive for requests of any thread, for another directory as well
+    thread = threading.Thread(target=lambda: fileCache.open_url(archive_url))
+    thread.start()
+    thread.join()
+    self.assertEquals(connection_mock.call_count, 1)
+    connection.request.assert_called_with("GET", "/resources/stacks/HDP/2.0.6/hooks/archive.zip")
+
+    # connection in use is not shared, so a concurrent request gets a new one
+    other_connection, other_response = fileCache.open_url(hash_url)
+    self.assertEquals(connection_mock.call_count, 2)
+    self.assertFalse(other_connection is connection)
+
+    # Test reconnect when server has closed the idle connection
+    other_response.will_close = False
+    fileCache.release_connection(hash_url, other_connection, other_response)
+    other_connection.getresponse.side_effect = httplib.BadStatusLine("")
+    new_connection, new_response = fileCache.open_url(hash_url)
+    self.assertEquals(connection_mock.call_count, 3)
+    self.assertTrue(other_connection.close.called)
+    self.assertFalse(new_connection is other_connection)
+
+    # connection the server is going to close is not kept
+    new_response.will_close = True
+    fileCache.release_connection(hash_url, new_connection, new_response)
+    self.assertTrue(new_connection.close.called)
+    self.assertEquals(fileCache.get_idle_connection(urlparse.urlparse(hash_url)), None)
+
+
   def test_read_write_hash_sum(self):
     tmpdir = tempfile.mkdtemp()
     dummyhash = "DUMMY_HASH"
@@ -417,6 +545,64 @@ class TestFileCache(TestCase):
         self.fail('Unexpected exception thrown:' + str(e))
 
 
+  def test_unpack_archive_reuses_unchanged_files(self):
+    tmpdir = tempfile.mkdtemp()
+    existing_dir = os.path.join(tmpdir, "existing")
+    new_dir = os.path.join(tmpdir, "new")
+    dummy_archive_name = os.path.join("ambari_agent", "dummy_files",
+                                 "dummy_archive.zip")
+    fileCache = FileCache(self.config)
+    with open(dummy_archive_name, "rb") as archive_file:
+      fileCache.unpack_archive(archive_file, existing_dir)
+    changed_file = None
+    for dirpath, dirnames, filenames in os.walk(existing_dir):
+      if filenames:
+        changed_file = os.path.relpath(os.path.join(dirpath, filenames[0]), existing_dir)
+        break
+    with open(os.path.join(existing_dir, changed_file), "a") as fp:
+      fp.write("local change")
+
+    with open(dummy_archive_name, "rb") as archive_file:
+      fileCache.unpack_archive(archive_file, new_dir, existing_dir)
+
+    total_files = 0
+    for dirpath, dirnames, filenames in os.walk(new_dir):
+      for f in filenames:
+        new_file = os.path.join(dirpath, f)
+        relative_path = os.path.relpath(new_file, new_dir)
+        existing_file = os.path.join(existing_dir, relative_path)
+        # unchanged files are hard linked, changed ones are extracted
+        self.assertEquals(os.path.samefile(new_file, existing_file), relative_path != changed_file)
+        total_files += 1
+    self.assertEquals(total_files, 28)
+    shutil.rmtree(tmpdir)
+
+
+  def test_replace_directory(self):
+    tmpdir = tempfile.mkdtemp()
+    directory = os.path.join(tmpdir, "dir")
+    new_directory = os.path.join(tmpdir, "dir.new")
+    os.makedirs(directory)
+    os.makedirs(new_directory)
+    open(os.path.join(directory, "old_file"), "w").close()
+    open(os.path.join(new_directory, "new_file"), "w").close()
+
+    fileCache = FileCache(self.config)
+    fileCache.replace_directory(new_directory, directory)
+
+    self.assertEquals(os.listdir(tmpdir), ["dir"])
+    self.assertEquals(os.listdir(directory), ["new_file"])
+
+    # Test exception handling
+    try:
+      fileCache.replace_directory(new_directory, directory)
+      self.fail('CachingException not thrown')
+    except CachingException:
+      pass # Expected
+    self.assertEquals(os.listdir(directory), ["new_file"])
+    shutil.rmtree(tmpdir)
+
+
   def tearDown(self):
     # enable stdout
     sys.stdout = sys.__stdout__
@@ -248,5 +248,99 @@ class TestHeartbeat(TestCase):
     self.assertFalse(args[2])
 
 
+  @patch.object(ActionQueue, "result")
+  def test_delta_heartbeats(self, result_mock):
+    config = AmbariConfig.AmbariConfig()
+    config.set('agent', 'prefix', 'tmp')
+    config.set('agent', 'cache_dir', "/var/lib/ambari-agent/cache")
+    config.set('agent', 'tolerate_download_failures', "true")
+    config.set('heartbeat', 'delta_heartbeats', "true")
+    dummy_controller = MagicMock()
+    dummy_controller.recovery_manager.recovery_timestamp = -1
+    actionQueue = ActionQueue(config, dummy_controller)
+    collector = MagicMock()
+    heartbeat = Heartbeat(actionQueue, config, collector)
+
+    datanode = {'clusterName': 'c1', 'serviceName': 'HDFS', 'componentName': 'DATANODE', 'status': 'STARTED'}
+    namenode = {'clusterName': 'c1', 'serviceName': 'HDFS', 'componentName': 'NAMENODE', 'status': 'STARTED'}
+    alert = {'cluster': 'c1', 'name': 'datanode_process', 'state': 'OK', 'text': 'TCP OK', 'timestamp': 1}
+    result_mock.return_value = {'reports': [], 'componentStatus': [dict(datanode), dict(namenode)]}
+    collector.alerts.return_value = [dict(alert)]
+
+    # first heartbeat carries full snapshot
+    result = heartbeat.build(1)
+    self.assertFalse(result['deltaHeartbeat'])
+    self.assertEquals(2, len(result['componentStatus']))
+    self.assertEquals(1, len(result['alerts']))
+    digest = result['stateDigest']
+
+    # heartbeat 1 is acknowledged, unchanged entries are skipped
+    alert['timestamp'] = 2
+    result_mock.return_value = {'reports': [], 'componentStatus': [dict(datanode), dict(namenode)]}
+    collector.alerts.return_value = [dict(alert)]
+    result = heartbeat.build(2)
+    self.assertTrue(result['deltaHeartbeat'])
+    self.assertEquals([], result['componentStatus'])
+    self.assertEquals([], result['alerts'])
+    self.assertEquals(digest, result['stateDigest'])
+
+    # only changed entries are sent
+    namenode['status'] = 'INSTALLED'
+    alert['state'] = 'CRITICAL'
+    result_mock.return_value = {'reports': [], 'componentStatus': [dict(datanode), dict(namenode)]}
+    collector.alerts.return_value = [dict(alert)]
+    result = heartbeat.build(3)
+    self.assertEquals([namenode], result['componentStatus'])
+    self.assertEquals('CRITICAL', result['alerts'][0]['state'])
+    self.assertNotEquals(digest, result['stateDigest'])
+
+    # heartbeat 3 was not acknowledged (responseId sequence restarted), full snapshot is sent
+    result_mock.return_value = {}
+    collector.alerts.return_value = []
+    result = heartbeat.build(0)
+    self.assertFalse(result['deltaHeartbeat'])
+    self.assertEquals(2, len(result['componentStatus']))
+
+    # server requested resync
+    heartbeat.reset_delta_state()
+    result = heartbeat.build(1)
+    self.assertFalse(result['deltaHeartbeat'])
+    self.assertEquals(2, len(result['componentStatus']))
+
+  @patch.object(Hardware, "osdisks")
+  @patch.object(HostInfoLinux, "register")
+  @patch.object(ActionQueue, "result")
+  def test_delta_heartbeats_agent_env(self, result_mock, register_mock, osdisks_mock):
+    config = AmbariConfig.AmbariConfig()
+    config.set('agent', 'prefix', 'tmp')
+    config.set('agent', 'cache_dir', "/var/lib/ambari-agent/cache")
+    config.set('agent', 'tolerate_download_failures', "true")
+    config.set('heartbeat', 'delta_heartbeats', "true")
+    dummy_controller = MagicMock()
+    dummy_controller.recovery_manager.recovery_timestamp = -1
+    actionQueue = ActionQueue(config, dummy_controller)
+    heartbeat = Heartbeat(actionQueue, config)
+    result_mock.return_value = {}
+    osdisks_mock.return_value = [{'mountpoint': '/'}]
+    timestamps = [1, 2, 3]
+    def register(dict, componentsMapped=True, commandsInProgress=True):
+      dict['umask'] = '18'
+      dict['hostHealth'] = {'agentTimeStampAtReporting': timestamps.pop(0)}
+    register_mock.side_effect = register
+
+    result = heartbeat.build(1, 1)
+    self.assertTrue('agentEnv' in result)
+    self.assertTrue('mounts' in result)
+
+    result = heartbeat.build(2, 1)
+    self.assertFalse('agentEnv' in result)
+    self.assertFalse('mounts' in result)
+
+    osdisks_mock.return_value = [{'mountpoint': '/'}, {'mountpoint': '/grid/0'}]
+    result = heartbeat.build(3, 1)
+    self.assertFalse('agentEnv' in result)
+    self.assertEquals(2, len(result['mounts']))
+
+
 if __name__ == "__main__":
   unittest.main(verbosity=2)
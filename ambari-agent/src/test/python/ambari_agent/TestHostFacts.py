@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from mock.mock import MagicMock
+
+from ambari_agent.HostFacts import HostFacts
+
+
+class TestHostFacts(TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.facts = HostFacts()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def wait_refreshed(self, name):
+    fact = self.facts.facts[name]
+    for i in range(50):
+      if not fact.refresh_pending:
+        return
+      time.sleep(0.1)
+    self.fail("Fact {0} was not refreshed".format(name))
+
+  def test_refresh_interval(self):
+    collect = MagicMock(side_effect=[1, 2, Exception("failed"), 4])
+    self.facts.add("fact", collect, 60)
+    self.facts.add("static", MagicMock(return_value="value"))
+
+    self.assertEqual(self.facts.get("fact"), 1)
+    self.assertEqual(self.facts.get("fact"), 1)
+    self.assertEqual(collect.call_count, 1)
+    self.assertEqual(self.facts.get("static"), "value")
+
+    # stale value is returned while the fresh one is collected in background
+    self.facts.facts["fact"].collect_time -= 60
+    self.assertEqual(self.facts.get("fact"), 1)
+    self.wait_refreshed("fact")
+    self.assertEqual(self.facts.get("fact"), 2)
+
+    # previous value is kept if collection fails
+    self.facts.facts["fact"].collect_time -= 60
+    self.facts.get("fact")
+    self.wait_refreshed("fact")
+    self.assertEqual(self.facts.get("fact"), 2)
+    self.assertEqual(collect.call_count, 3)
+
+    self.facts.facts["static"].collect_time -= 3600
+    self.assertEqual(self.facts.get("static"), "value")
+    self.assertEqual(self.facts.collected_count, 3)
+
+  def test_watched_paths(self):
+    path = os.path.join(self.tmp_dir, "alternatives")
+    os.mkdir(path)
+    collect = MagicMock(side_effect=lambda: sorted(os.listdir(path)))
+    self.facts.add("alternatives", collect, 3600, [path])
+
+    self.assertEqual(self.facts.get("alternatives"), [])
+    self.assertEqual(self.facts.get("alternatives"), [])
+    self.assertEqual(collect.call_count, 1)
+
+    os.mkdir(os.path.join(path, "hadoop-conf"))
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    self.facts.get("alternatives")
+    self.wait_refreshed("alternatives")
+    self.assertEqual(self.facts.get("alternatives"), ["hadoop-conf"])
+    self.assertEqual(collect.call_count, 2)
@@ -312,6 +312,28 @@ class TestHostInfo(TestCase):
     self.assertTrue(cit_mock.called)
     self.assertEqual(1, cit_mock.call_count)
 
+  @patch.object(OSCheck, "get_os_type", new = MagicMock(return_value = "redhat"))
+  @patch.object(HostInfoLinux, 'checkReverseLookup', new = MagicMock(return_value = True))
+  @patch.object(HostInfoLinux, 'getFirewallName', new = MagicMock(return_value = "iptables"))
+  @patch.object(HostInfoLinux, 'getTransparentHugePage', new = MagicMock(return_value = "never"))
+  @patch.object(HostInfoLinux, 'checkFirewall')
+  @patch.object(HostInfoLinux, 'checkLiveServices')
+  @patch.object(HostInfoLinux, 'javaProcs')
+  def test_hostinfo_register_cached_facts(self, java_procs_mock, check_live_services_mock, check_firewall_mock):
+    java_procs_mock.side_effect = lambda procs: procs.append({'pid': 1})
+    check_firewall_mock.return_value = False
+
+    hostInfo = HostInfoLinux()
+    dict = {}
+    hostInfo.register(dict, True, True)
+    hostInfo.register(dict, True, True)
+
+    self.assertEqual(dict['hostHealth']['activeJavaProcs'], [{'pid': 1}])
+    self.assertFalse(dict['firewallRunning'])
+    self.assertEqual(java_procs_mock.call_count, 1)
+    self.assertEqual(check_live_services_mock.call_count, 1)
+    self.assertEqual(check_firewall_mock.call_count, 1)
+
   def verifyReturnedValues(self, dict):
     hostInfo = HostInfoLinux()
     self.assertEqual(dict['alternatives'], [])
@@ -385,21 +407,22 @@ class TestHostInfo(TestCase):
     self.assertEquals(result, 0)
 
   @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = ('redhat','11','Final')))
-  @patch("os.listdir", create=True, autospec=True)
-  @patch("__builtin__.open", create=True, autospec=True)
+  @patch("ambari_agent.HostInfo.get_process_table")
   @patch("pwd.getpwuid", create=True, autospec=True)
-  def test_javaProcs(self, pwd_getpwuid_mock, buitin_open_mock, os_listdir_mock):
+  def test_javaProcs(self, pwd_getpwuid_mock, get_process_table_mock):
     hostInfo = HostInfoLinux()
-    openRead = MagicMock()
-    openRead.read.return_value = '/java/;/hadoop/'
-    buitin_open_mock.side_effect = [openRead, ['Uid: 22']]
+    java_process = MagicMock(pid=1, cmdline='/java/;/hadoop/', uid=22)
+    server_process = MagicMock(pid=2, cmdline='/java/ org.apache.ambari.server.controller.AmbariServer', uid=0)
+    other_process = MagicMock(pid=3, cmdline='/bin/bash', uid=0)
+    get_process_table_mock.return_value.get_processes.return_value = [java_process, server_process, other_process]
     pwuid = MagicMock()
     pwd_getpwuid_mock.return_value = pwuid
     pwuid.pw_name = 'user'
-    os_listdir_mock.return_value = ['1']
     list = []
     hostInfo.javaProcs(list)
 
+    self.assertEquals(len(list), 1)
+    pwd_getpwuid_mock.assert_called_with(22)
     self.assertEquals(list[0]['command'], '/java/;/hadoop/')
     self.assertEquals(list[0]['pid'], 1)
     self.assertTrue(list[0]['hadoop'])
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase
+from mock.mock import patch, MagicMock
+
+from ambari_agent.MountInventory import MountInventory, read_mountinfo
+from only_for_platform import not_for_platform, PLATFORM_WINDOWS
+
+MOUNTINFO = """22 1 0:20 / /proc rw,nosuid,nodev,noexec,relatime shared:5 - proc proc rw
+28 1 253:0 / / rw,relatime shared:1 - xfs /dev/mapper/root rw,attr2
+40 28 8:17 / /grid/0 rw,relatime shared:20 - ext4 /dev/sdb1 rw
+41 28 8:33 / /grid/1 ro,relatime shared:21 - ext4 /dev/sdc1 ro
+42 28 8:17 /data /var/data\\040dir rw,relatime shared:20 - ext4 /dev/sdb1 rw
+43 28 0:45 / /mnt/nfs rw,relatime shared:30 - nfs4 nfs-server:/export rw,vers=4.1
+"""
+
+
+def statvfs_result(blocks, free, available, block_size=4096, flag=0):
+  return MagicMock(f_blocks=blocks, f_bfree=free, f_bavail=available, f_frsize=block_size, f_bsize=block_size,
+                   f_flag=flag)
+
+
+@not_for_platform(PLATFORM_WINDOWS)
+class TestMountInventory(TestCase):
+
+  def setUp(self):
+    fd, self.mountinfo_file = tempfile.mkstemp()
+    os.write(fd, MOUNTINFO)
+    os.close(fd)
+    self.check_writable = MagicMock(return_value=True)
+    self.inventory = MountInventory(self.check_writable, self.mountinfo_file)
+    self.nfs_responding = threading.Event()
+    self.nfs_responding.set()
+
+  def tearDown(self):
+    self.nfs_responding.set()
+    os.remove(self.mountinfo_file)
+
+  def statvfs(self, path):
+    if path == "/proc":
+      return statvfs_result(0, 0, 0)
+    if path == "/mnt/nfs":
+      self.nfs_responding.wait()
+    return statvfs_result(1000, 250, 200)
+
+  def test_read_mountinfo(self):
+    mounts = read_mountinfo(self.mountinfo_file)
+
+    self.assertEqual(len(mounts), 6)
+    self.assertEqual(mounts[4].mountpoint, "/var/data dir")
+    self.assertEqual(mounts[4].root, "/data")
+    self.assertEqual(mounts[5].source, "nfs-server:/export")
+    self.assertTrue(mounts[5].is_remote())
+    self.assertFalse(mounts[2].is_remote())
+    self.assertTrue(mounts[3].is_read_only())
+
+  @patch("os.statvfs")
+  def test_get_mounts(self, statvfs_mock):
+    statvfs_mock.side_effect = self.statvfs
+    mounts = self.inventory.get_mounts(1)
+
+    self.assertEqual([mount['mountpoint'] for mount in mounts], ["/", "/grid/0", "/mnt/nfs"])
+    self.assertEqual(mounts[1], {'size': '4000', 'used': '3000', 'available': '800', 'percent': '79%',
+                                 'mountpoint': '/grid/0', 'type': 'ext4', 'device': '/dev/sdb1'})
+
+    # writability is checked once per mount
+    self.assertEqual(self.check_writable.call_count, 4)
+    self.inventory.get_mounts(1)
+    self.assertEqual(self.check_writable.call_count, 4)
+
+    mounts = self.inventory.get_mounts(1, check_remote=False)
+    self.assertEqual([mount['mountpoint'] for mount in mounts], ["/", "/grid/0"])
+
+  @patch("os.statvfs")
+  def test_hung_remote_mount(self, statvfs_mock):
+    statvfs_mock.side_effect = self.statvfs
+    self.nfs_responding.clear()
+
+    start_time = time.time()
+    mounts = self.inventory.get_mounts(0.2)
+    self.assertEqual([mount['mountpoint'] for mount in mounts], ["/", "/grid/0"])
+    # mount known to be hung does not delay next reports, and is not probed again
+    mounts = self.inventory.get_mounts(5)
+    self.assertTrue(time.time() - start_time < 5)
+    self.assertEqual([mount['mountpoint'] for mount in mounts], ["/", "/grid/0"])
+    self.assertEqual(len([call for call in statvfs_mock.call_args_list if call[0][0] == "/mnt/nfs"]), 1)
+
+    self.nfs_responding.set()
+    time.sleep(0.1)
+    mounts = self.inventory.get_mounts(1)
+    self.assertEqual([mount['mountpoint'] for mount in mounts], ["/", "/grid/0", "/mnt/nfs"])
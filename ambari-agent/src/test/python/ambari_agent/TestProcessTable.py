@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from unittest import TestCase
+
+from ambari_commons import process_table
+from ambari_commons.process_table import ProcessTable, get_process_table, kill_process_tree
+from only_for_platform import not_for_platform, PLATFORM_WINDOWS
+
+
+@not_for_platform(PLATFORM_WINDOWS)
+class TestProcessTable(TestCase):
+
+  def setUp(self):
+    self.proc_dir = tempfile.mkdtemp()
+    process_table.invalidate_process_table()
+
+  def tearDown(self):
+    shutil.rmtree(self.proc_dir)
+
+  def kill(self, processes):
+    for process in processes:
+      if process.is_alive():
+        os.kill(process.pid, signal.SIGKILL)
+
+  def add_process(self, pid, ppid, name="java", state="S", start_time=100, cmdline="", uid=0):
+    path = os.path.join(self.proc_dir, str(pid))
+    os.mkdir(path)
+    with open(os.path.join(path, "stat"), "w") as fp:
+      fields = [state, ppid] + [0] * 17 + [start_time, 0]
+      fp.write("{0} ({1}) {2}\n".format(pid, name, " ".join(str(field) for field in fields)))
+    with open(os.path.join(path, "cmdline"), "w") as fp:
+      fp.write(cmdline.replace(" ", "\0"))
+    with open(os.path.join(path, "status"), "w") as fp:
+      fp.write("Name:\t{0}\nUid:\t{1}\t{1}\t{1}\t{1}\n".format(name, uid))
+
+  def test_process_tree(self):
+    self.add_process(1, 0)
+    self.add_process(10, 1, name="ambari (agent) x")
+    self.add_process(11, 10, cmdline="/usr/bin/java -Xmx1g Main", uid=1001)
+    self.add_process(12, 11)
+    self.add_process(13, 10, state="Z")
+    self.add_process(20, 1)
+    os.mkdir(os.path.join(self.proc_dir, "self"))
+    os.mkdir(os.path.join(self.proc_dir, "99")) # exited while being read
+
+    table = ProcessTable(self.proc_dir)
+
+    self.assertEqual(sorted(table.processes), [1, 10, 11, 12, 13, 20])
+    self.assertEqual([p.pid for p in table.get_tree(10)], [10, 11, 13, 12])
+    self.assertEqual([p.pid for p in table.get_children(1)], [10, 20])
+    self.assertEqual(table.get_tree(99), [])
+    self.assertEqual(table.processes[10].ppid, 1)
+    self.assertEqual(table.processes[11].cmdline, "/usr/bin/java -Xmx1g Main")
+    self.assertEqual(table.processes[11].uid, 1001)
+    self.assertTrue(table.processes[12].is_alive())
+    self.assertFalse(table.processes[13].is_alive())
+
+    # same pid reused by a new process
+    shutil.rmtree(os.path.join(self.proc_dir, "12"))
+    self.add_process(12, 1, start_time=200)
+    self.assertFalse(table.processes[12].is_alive())
+
+    # exec and setuid keep the pid, a new snapshot sees the current command line and owner
+    shutil.rmtree(os.path.join(self.proc_dir, "20"))
+    self.add_process(20, 1, cmdline="/bin/bash hadoop-daemon.sh", uid=0)
+    self.assertEqual(ProcessTable(self.proc_dir).processes[20].cmdline, "/bin/bash hadoop-daemon.sh")
+    shutil.rmtree(os.path.join(self.proc_dir, "20"))
+    self.add_process(20, 1, cmdline="/usr/bin/java NameNode", uid=1001)
+    self.assertEqual(ProcessTable(self.proc_dir).processes[20].cmdline, "/usr/bin/java NameNode")
+    self.assertEqual(ProcessTable(self.proc_dir).processes[20].uid, 1001)
+
+  def test_shared_snapshot(self):
+    table = get_process_table()
+    self.assertTrue(os.getpid() in table.processes)
+    self.assertTrue(get_process_table() is table)
+    self.assertFalse(get_process_table(max_age=-1) is table)
+
+  def test_kill_process_tree(self):
+    test_process = subprocess.Popen("(sleep 314159265 & sleep 314159265) ; sleep 314159265", shell=True)
+    time.sleep(0.3)
+    tree = ProcessTable().get_tree(test_process.pid)
+    self.addCleanup(self.kill, tree)
+    self.assertTrue(len(tree) >= 3)
+
+    start_time = time.time()
+    self.assertEqual(kill_process_tree(test_process.pid, 5), [])
+    # exit is detected without waiting for the whole timeout
+    self.assertTrue(time.time() - start_time < 5)
+    self.assertEqual(test_process.wait(), -signal.SIGTERM)
+    self.assertFalse([p.pid for p in tree if p.is_alive()])
+
+  def test_kill_process_tree_escalation(self):
+    test_process = subprocess.Popen(["sh", "-c", "trap '' TERM; sleep 314159265 & wait"])
+    time.sleep(0.3)
+    tree = ProcessTable().get_tree(test_process.pid)
+    self.addCleanup(self.kill, tree)
+
+    killed = kill_process_tree(test_process.pid, 0.3)
+    # ignored SIGTERM is inherited by the child as well
+    self.assertEqual(killed, sorted(p.pid for p in tree))
+    self.assertEqual(test_process.wait(), -signal.SIGKILL)
+    self.assertFalse([p.pid for p in tree if p.is_alive()])
+
+    self.assertEqual(kill_process_tree(test_process.pid, 0.3), [])
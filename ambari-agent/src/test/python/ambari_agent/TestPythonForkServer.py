@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import shutil
+import signal
+import sys
+import tempfile
+from unittest import TestCase
+from mock.mock import MagicMock, patch
+
+from ambari_agent.AgentException import AgentException
+from ambari_agent.AmbariConfig import AmbariConfig
+from ambari_agent.PythonExecutor import PythonExecutor
+from ambari_agent.PythonForkServer import PythonForkServer, ForkedProcess
+from only_for_platform import not_for_platform, PLATFORM_WINDOWS
+
+SCRIPT = """
+import os
+import sys
+import resource_management
+print "argv=" + " ".join(sys.argv[1:])
+print "env=" + os.environ.get("FORK_SERVER_TEST", "")
+print "cwd=" + os.getcwd()
+sys.stderr.write("error output\\n")
+if sys.argv[1] == "sleep":
+  import time
+  time.sleep(60)
+sys.exit(int(sys.argv[1]) if sys.argv[1].isdigit() else 0)
+"""
+
+INTERPRETER_STATE_SCRIPT = """
+import atexit
+import os
+import sys
+import threading
+import time
+print "path=" + str(sys.path[0] == os.path.dirname(os.path.abspath(__file__)))
+print "agent_path=" + str(os.path.dirname(sys.argv[1]) in sys.path)
+print "agent_modules=" + str("AgentException" in sys.modules)
+atexit.register(lambda: sys.stdout.write("atexit\\n"))
+thread = threading.Thread(target=lambda: (time.sleep(0.2), sys.stdout.write("thread\\n")))
+thread.start()
+"""
+
+@not_for_platform(PLATFORM_WINDOWS)
+class TestPythonForkServer(TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.script = os.path.join(self.tmp_dir, "script.py")
+    with open(self.script, "w") as fp:
+      fp.write(SCRIPT)
+    self.fork_server = PythonForkServer()
+
+  def tearDown(self):
+    self.fork_server.stop()
+    shutil.rmtree(self.tmp_dir)
+
+  def launch(self, *args):
+    out_path = os.path.join(self.tmp_dir, "out.txt")
+    err_path = os.path.join(self.tmp_dir, "err.txt")
+    with open(out_path, "w") as tmpout:
+      with open(err_path, "w") as tmperr:
+        env = dict(os.environ)
+        env["FORK_SERVER_TEST"] = "value"
+        process = self.fork_server.launch([sys.executable, self.script] + list(args), tmpout, tmperr, env)
+    return process, out_path, err_path
+
+  def test_launch(self):
+    process, out_path, err_path = self.launch("3", "arg")
+    self.assertEqual(process.communicate(), (None, None))
+    self.assertEqual(process.returncode, 3)
+
+    with open(out_path) as fp:
+      self.assertEqual(fp.read(), "argv=3 arg\nenv=value\ncwd={0}\n".format(os.getcwd()))
+    with open(err_path) as fp:
+      self.assertEqual(fp.read(), "error output\n")
+
+    # one fork server serves all commands
+    pid = self.fork_server.process.pid
+    process, out_path, err_path = self.launch("0")
+    self.assertEqual(process.wait(), 0)
+    self.assertEqual(self.fork_server.process.pid, pid)
+    metrics = self.fork_server.get_metrics()
+    self.assertEqual(metrics['launchedCommands'], 2)
+    self.assertEqual(metrics['runningCommands'], 0)
+
+  def test_interpreter_state(self):
+    import ambari_agent.PythonForkServer
+    with open(self.script, "w") as fp:
+      fp.write(INTERPRETER_STATE_SCRIPT)
+    process, out_path, err_path = self.launch(ambari_agent.PythonForkServer.SERVER_SCRIPT)
+    self.assertEqual(process.wait(), 0)
+
+    # agent's own directory and modules are not visible to the command, exit handlers
+    # and non-daemon threads are run same as by a new interpreter
+    with open(out_path) as fp:
+      self.assertEqual(fp.read(), "path=True\nagent_path=False\nagent_modules=False\nthread\natexit\n")
+    self.assertEqual(self.fork_server.get_metrics()['launchedCommands'], 1)
+
+  def test_kill(self):
+    process, out_path, err_path = self.launch("sleep")
+    self.assertEqual(process.poll(), None)
+    # command runs in its own process group
+    self.assertEqual(os.getpgid(process.pid), process.pid)
+
+    os.kill(process.pid, signal.SIGKILL)
+    self.assertEqual(process.wait(), -signal.SIGKILL)
+
+  def test_server_terminated(self):
+    process, out_path, err_path = self.launch("sleep")
+    self.fork_server.process.kill()
+
+    process.ORPHAN_POLL_INTERVAL = 0.1
+    os.kill(process.pid, signal.SIGKILL)
+    self.assertEqual(process.wait(), ForkedProcess.ORPHAN_RETURNCODE)
+
+    # fork server is started again for the next command
+    process, out_path, err_path = self.launch("0")
+    self.assertEqual(process.wait(), 0)
+
+  def test_start_failure(self):
+    self.fork_server = PythonForkServer(["/bin/false"])
+    self.assertRaises(AgentException, self.launch, "0")
+
+  @patch("subprocess.Popen")
+  def test_python_executor_fallback(self, popen_mock):
+    fork_server = MagicMock()
+    fork_server.launch.side_effect = AgentException("not available")
+    executor = PythonExecutor(self.tmp_dir, AmbariConfig().getConfig(), fork_server)
+
+    process = executor.launch_python_subprocess([sys.executable, self.script], MagicMock(), MagicMock())
+    self.assertEqual(fork_server.launch.call_count, 1)
+    self.assertTrue(process is popen_mock.return_value)
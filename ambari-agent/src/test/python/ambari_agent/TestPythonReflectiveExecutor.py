@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+from mock.mock import MagicMock
+from ambari_agent.PythonReflectiveExecutor import PythonReflectiveExecutor
+
+SCRIPT_CONTENT = """
+import sys
+import reflective_test_params
+reflective_test_params.runs.append(sys.argv[1])
+if reflective_test_params.exit_code:
+  sys.exit(reflective_test_params.exit_code)
+"""
+
+PARAMS_CONTENT = """
+import sys
+import_counter = sys.modules['__builtin__'].__dict__.setdefault('reflective_test_imports', [])
+import_counter.append(1)
+runs = []
+exit_code = 0
+"""
+
+
+class TestPythonReflectiveExecutor(TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.base_dir = os.path.join(self.tmp_dir, "package")
+    scripts_dir = os.path.join(self.base_dir, "scripts")
+    os.makedirs(scripts_dir)
+    self.script = os.path.join(scripts_dir, "reflective_test_script.py")
+    with open(self.script, "w") as fp:
+      fp.write(SCRIPT_CONTENT)
+    with open(os.path.join(scripts_dir, "reflective_test_params.py"), "w") as fp:
+      fp.write(PARAMS_CONTENT)
+    self.json_path = os.path.join(self.tmp_dir, "status_command.json")
+    self.write_command_json('{"configurations": {}}')
+
+    import __builtin__
+    __builtin__.reflective_test_imports = []
+    self.imports = __builtin__.reflective_test_imports
+
+    config = MagicMock()
+    config.get.return_value = 0
+    self.executor = PythonReflectiveExecutor(self.tmp_dir, config)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def write_command_json(self, content):
+    with open(self.json_path, "w") as fp:
+      fp.write(content)
+
+  def run_script(self):
+    out = os.path.join(self.tmp_dir, "out.txt")
+    err = os.path.join(self.tmp_dir, "err.txt")
+    structured_out = os.path.join(self.tmp_dir, "structured-out.json")
+    script_params = ["STATUS", self.json_path, self.base_dir, structured_out, "INFO", self.tmp_dir]
+    return self.executor.run_file(self.script, script_params, out, err, 600, structured_out,
+                                  MagicMock(), "status", backup_log_files=False)
+
+  def test_service_modules_are_reused(self):
+    main_module = sys.modules['__main__']
+
+    self.assertEqual(0, self.run_script()['exitcode'])
+    self.assertEqual(0, self.run_script()['exitcode'])
+
+    # params module was imported once and is not visible outside of script runs
+    self.assertEqual(1, len(self.imports))
+    self.assertFalse('reflective_test_params' in sys.modules)
+    self.assertTrue(sys.modules['__main__'] is main_module)
+    self.assertEqual(1, self.executor.cache_misses)
+    self.assertEqual(1, self.executor.cache_hits)
+
+    cached_params = self.executor.scripts_cache[self.script].modules['reflective_test_params']
+    self.assertEqual(['STATUS', 'STATUS'], cached_params.runs)
+
+  def test_modules_reloaded_on_command_change(self):
+    self.run_script()
+    self.write_command_json('{"configurations": {"hdfs-site": {}}}')
+    self.run_script()
+
+    self.assertEqual(2, len(self.imports))
+    self.assertEqual(2, self.executor.cache_misses)
+
+  def test_invalidate_directory(self):
+    self.run_script()
+    self.executor.invalidate_directory(os.path.join(self.tmp_dir, "other"))
+    self.assertTrue(self.script in self.executor.scripts_cache)
+
+    self.executor.invalidate_directory(self.base_dir)
+    self.assertFalse(self.script in self.executor.scripts_cache)
+
+    self.run_script()
+    self.assertEqual(2, len(self.imports))
+
+  def test_exit_code(self):
+    self.run_script()
+    self.executor.scripts_cache[self.script].modules['reflective_test_params'].exit_code = 3
+
+    self.assertEqual(3, self.run_script()['exitcode'])
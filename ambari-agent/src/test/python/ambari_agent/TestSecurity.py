@@ -18,7 +18,9 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 import StringIO
+import httplib
 import sys, subprocess
+import zlib
 from mock.mock import MagicMock, patch, ANY
 import mock.mock
 import unittest
@@ -146,6 +148,7 @@ class TestSecurity(unittest.TestCase):
 
     responce_mock = MagicMock(create = True)
     responce_mock.read.return_value = "dummy responce"
+    responce_mock.getheader.return_value = None
     httpsconn_mock.getresponse.return_value = responce_mock
 
     # Testing normal case
@@ -170,6 +173,107 @@ class TestSecurity(unittest.TestCase):
       pass
 
 
+  @patch.object(security.CachedHTTPSConnection, "connect")
+  def test_request_compression(self, connect_mock):
+    httpsconn_mock = MagicMock(create = True)
+    self.cachedHTTPSConnection.httpsconn = httpsconn_mock
+    self.cachedHTTPSConnection.compress_requests = True
+
+    data = '{"componentStatus": []}' * 100
+    dummy_request = MagicMock(create = True)
+    dummy_request.get_method.return_value = "POST"
+    dummy_request.get_full_url.return_value = "https://example.com:8441/agent/v1/heartbeat/host"
+    dummy_request.get_data.return_value = data
+    dummy_request.headers = {'Content-Type': 'application/json'}
+
+    compressed_response = self.cachedHTTPSConnection.compress('{"responseId": 1}')
+    responce_mock = MagicMock(create = True)
+    responce_mock.status = 200
+    responce_mock.read.return_value = compressed_response
+    responce_mock.getheader.return_value = 'gzip'
+    httpsconn_mock.getresponse.return_value = responce_mock
+
+    responce = self.cachedHTTPSConnection.request(dummy_request)
+
+    self.assertEqual(responce, '{"responseId": 1}')
+    args = httpsconn_mock.request.call_args[0]
+    self.assertEqual(args[3]['Content-Encoding'], 'gzip')
+    self.assertEqual(zlib.decompress(args[2], 16 + zlib.MAX_WBITS), data)
+    statistics = self.cachedHTTPSConnection.statistics
+    self.assertEqual(statistics['requests'], 1)
+    self.assertEqual(statistics['bytesSent'], len(args[2]))
+    self.assertEqual(statistics['bytesReceived'], len(compressed_response))
+
+    # Server is not able to decode compressed requests
+    httpsconn_mock.reset_mock()
+    rejected_mock = MagicMock(create = True)
+    rejected_mock.status = 415
+    responce_mock.getheader.return_value = None
+    responce_mock.read.return_value = '{"responseId": 2}'
+    httpsconn_mock.getresponse.side_effect = [rejected_mock, responce_mock]
+
+    responce = self.cachedHTTPSConnection.request(dummy_request)
+
+    self.assertEqual(responce, '{"responseId": 2}')
+    self.assertFalse(self.cachedHTTPSConnection.compress_requests)
+    self.assertEqual(httpsconn_mock.request.call_args[0][2], data)
+
+    # 400 for a request which is bad anyway does not turn compression off
+    self.cachedHTTPSConnection.compress_requests = True
+    httpsconn_mock.reset_mock()
+    bad_request_mock = MagicMock(create = True)
+    bad_request_mock.status = 400
+    bad_request_mock.read.return_value = '{"status": 400}'
+    bad_request_mock.getheader.return_value = None
+    httpsconn_mock.getresponse.side_effect = [bad_request_mock, bad_request_mock]
+
+    self.assertEqual(self.cachedHTTPSConnection.request(dummy_request), '{"status": 400}')
+    self.assertTrue(self.cachedHTTPSConnection.compress_requests)
+    self.assertEqual(httpsconn_mock.request.call_count, 2)
+
+    # 400 for the compressed body only does
+    httpsconn_mock.reset_mock()
+    httpsconn_mock.getresponse.side_effect = [bad_request_mock, responce_mock]
+
+    self.assertEqual(self.cachedHTTPSConnection.request(dummy_request), '{"responseId": 2}')
+    self.assertFalse(self.cachedHTTPSConnection.compress_requests)
+    self.assertEqual(httpsconn_mock.request.call_args[0][2], data)
+
+    # Deflate encoded response
+    self.assertEqual(self.cachedHTTPSConnection.decompress(zlib.compress(data), 'deflate'), data)
+
+
+  @patch.object(security.VerifiedHTTPSConnection, "connect")
+  def test_request_reconnect(self, connect_mock):
+    old_httpsconn_mock = MagicMock(create = True)
+    old_httpsconn_mock.getresponse.side_effect = httplib.BadStatusLine("")
+    self.cachedHTTPSConnection.httpsconn = old_httpsconn_mock
+    self.cachedHTTPSConnection.requests_on_connection = 1
+
+    dummy_request = MagicMock(create = True)
+    dummy_request.get_data.return_value = None
+    dummy_request.headers = {}
+
+    with patch.object(security, "VerifiedHTTPSConnection") as vhc_mock:
+      responce_mock = vhc_mock.return_value.getresponse.return_value
+      responce_mock.read.return_value = "dummy responce"
+      responce_mock.getheader.return_value = None
+      responce = self.cachedHTTPSConnection.request(dummy_request)
+
+    self.assertEqual(responce, "dummy responce")
+    self.assertTrue(old_httpsconn_mock.close.called)
+    self.assertEqual(self.cachedHTTPSConnection.requests_on_connection, 1)
+
+    # first request on fresh connection is not retried
+    self.cachedHTTPSConnection.httpsconn = old_httpsconn_mock
+    self.cachedHTTPSConnection.requests_on_connection = 0
+    try:
+      self.cachedHTTPSConnection.request(dummy_request)
+      self.fail("Should raise IOError")
+    except IOError:
+      pass # Expected
+
+
   ### CertificateManager ###
 
 
@@ -0,0 +1,70 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+from unittest import TestCase
+
+from resource_management.core.exceptions import Fail
+from resource_management.libraries.functions.cluster_host_info import decompress_cluster_host_info, \
+  expand_ranges, expand_mapped_ranges
+from resource_management.libraries.script.config_dictionary import ConfigDictionary, ClusterHostInfoDictionary
+
+COMPRESSED_CLUSTER_HOST_INFO = {
+  'namenode_host': ['1'],
+  'slave_hosts': ['0-2'],
+  'all_hosts': ['h1.example.com', 'h2.example.com', 'h3.example.com'],
+  'all_ping_ports': ['8670:0-1', '8671:2'],
+  'all_racks': ['/default-rack:0-2'],
+  'all_ipv4_ips': ['192.168.12.101:0', '192.168.12.102:1', '192.168.12.103:2'],
+  'ambari_server_host': ['a.b.c']
+}
+
+
+class TestClusterHostInfo(TestCase):
+
+  def test_expand_ranges(self):
+    self.assertEquals(expand_ranges(['1-3,5', '6-8']), [1, 2, 3, 5, 6, 7, 8])
+    self.assertRaises(Fail, expand_ranges, ['1-'])
+    self.assertRaises(Fail, expand_ranges, ['1-2-3'])
+
+  def test_expand_mapped_ranges(self):
+    self.assertEquals(expand_mapped_ranges(['1:0-2,4', '42:3,5-7']), [1, 1, 1, 42, 1, 42, 42, 42])
+    # result is ordered by index for large tables as well
+    self.assertEquals(expand_mapped_ranges(['b:10-1999', 'a:0-9']), ['a'] * 10 + ['b'] * 1990)
+    self.assertRaises(Fail, expand_mapped_ranges, ['1-3'])
+    self.assertRaises(Fail, expand_mapped_ranges, ['1:1-'])
+
+  def test_decompress_cluster_host_info(self):
+    info = decompress_cluster_host_info(COMPRESSED_CLUSTER_HOST_INFO)
+    self.assertEquals(info['namenode_host'], ['h2.example.com'])
+    self.assertEquals(info['slave_hosts'], ['h1.example.com', 'h2.example.com', 'h3.example.com'])
+    self.assertEquals(info['all_ping_ports'], ['8670', '8670', '8671'])
+    self.assertEquals(info['all_racks'], ['/default-rack'] * 3)
+    self.assertEquals(info['all_ipv4_ips'], ['192.168.12.101', '192.168.12.102', '192.168.12.103'])
+    self.assertEquals(info['ambari_server_host'], ['a.b.c'])
+
+  def test_cluster_host_info_dictionary(self):
+    config = ConfigDictionary({'clusterHostInfo': ClusterHostInfoDictionary(dict(COMPRESSED_CLUSTER_HOST_INFO))})
+    cluster_host_info = config['clusterHostInfo']
+    self.assertTrue(isinstance(cluster_host_info, ClusterHostInfoDictionary))
+
+    self.assertEquals(cluster_host_info['namenode_host'], ['h2.example.com'])
+    self.assertEquals(cluster_host_info.expanded_keys, set(['namenode_host']))
+    self.assertEquals(cluster_host_info.get('all_ping_ports'), ['8670', '8670', '8671'])
+    self.assertEquals(cluster_host_info.get('hbase_master_hosts', []), [])
+    self.assertEquals(dict(cluster_host_info.items()), decompress_cluster_host_info(COMPRESSED_CLUSTER_HOST_INFO))
+    self.assertRaises(Fail, cluster_host_info.__setitem__, 'namenode_host', [])
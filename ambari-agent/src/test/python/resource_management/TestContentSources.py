@@ -28,6 +28,8 @@ from resource_management.core.source import StaticFile
 from resource_management.core.source import DownloadSource
 from resource_management.core.source import Template
 from resource_management.core.source import InlineTemplate
+from resource_management.core.source import TemplateCache
+from resource_management.core import source
 
 if get_platform() != PLATFORM_WINDOWS:
   from resource_management.core import sudo
@@ -35,6 +37,8 @@ if get_platform() != PLATFORM_WINDOWS:
 from ambari_jinja2 import UndefinedError, TemplateNotFound
 import urllib2
 import os
+import shutil
+import tempfile
 
 
 @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
@@ -256,3 +260,75 @@ class TestContentSources(TestCase):
       template = InlineTemplate("{{test_arg1}} template content {{os.path.join(path[0],path[1])}}", [os], test_arg1 = "test", path = ["/one","two"])
       content = template.get_content()
     self.assertEqual(u'test template content /one/two', content)
+
+  def test_template_cache(self):
+    """
+    Testing that templates are compiled once per process
+    """
+    statistics = source.template_cache.get_statistics()
+    text = "{{test_arg1}} cached template content"
+    with Environment("/base") as env:
+      content1 = InlineTemplate(text, [], test_arg1 = "one").get_content()
+      content2 = InlineTemplate(text, [], test_arg1 = "two").get_content()
+
+    self.assertEqual(u'one cached template content', content1)
+    self.assertEqual(u'two cached template content', content2)
+    self.assertEqual(statistics['misses'] + 1, source.template_cache.get_statistics()['misses'])
+    self.assertEqual(statistics['hits'] + 1, source.template_cache.get_statistics()['hits'])
+
+  def test_template_bytecode_cache(self):
+    """
+    Testing that compiled templates are reused by other processes
+    """
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      cache_dir = os.path.join(tmp_dir, "bytecode")
+      template_path = os.path.join(tmp_dir, "config.j2")
+      with open(template_path, "w") as fp:
+        fp.write("{{test_arg1}} template content")
+      with Environment("/base") as env:
+        for i in range(2):
+          # every process starts with an empty in-memory cache
+          template_cache = TemplateCache()
+          self.assertTrue(template_cache.set_bytecode_cache_dir(cache_dir))
+          with patch.object(source, "template_cache", new = template_cache):
+            content = Template(template_path, test_arg1 = "test").get_content()
+            # inline templates are not stored on disk
+            InlineTemplate("{{test_arg1}} inline content", [], test_arg1 = "test").get_content()
+          self.assertEqual(u'test template content', content)
+
+      self.assertEqual({'hits': 0, 'misses': 2, 'bytecode_hits': 1, 'bytecode_misses': 0},
+                       template_cache.get_statistics())
+      self.assertEqual(1, len(os.listdir(cache_dir)))
+
+      os.chmod(cache_dir, 0777)
+      self.assertFalse(TemplateCache().set_bytecode_cache_dir(cache_dir))
+    finally:
+      shutil.rmtree(tmp_dir)
+
+  def test_template_bytecode_cache_bounded(self):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      cache_dir = os.path.join(tmp_dir, "bytecode")
+      template_cache = TemplateCache()
+      self.assertTrue(template_cache.set_bytecode_cache_dir(cache_dir))
+      template_cache.bytecode_cache.MAX_FILES = 2
+      cached_files = []
+      with Environment("/base") as env:
+        with patch.object(source, "template_cache", new = template_cache):
+          for i in range(3):
+            template_path = os.path.join(tmp_dir, "config{0}.j2".format(i))
+            with open(template_path, "w") as fp:
+              fp.write("template {0}".format(i))
+            existing_files = os.listdir(cache_dir)
+            Template(template_path).get_content()
+            os.remove(template_path)
+            new_file = (set(os.listdir(cache_dir)) - set(existing_files)).pop()
+            # written in order, even if within the same second
+            os.utime(os.path.join(cache_dir, new_file), (1000 + i, 1000 + i))
+            cached_files.append(new_file)
+
+      # the least recently written one is removed
+      self.assertEqual(sorted(cached_files[1:]), sorted(os.listdir(cache_dir)))
+    finally:
+      shutil.rmtree(tmp_dir)
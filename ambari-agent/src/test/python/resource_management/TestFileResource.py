@@ -362,3 +362,100 @@ class TestFileResource(TestCase):
 
     read_file_mock.assert_called_with('/directory/file', encoding='UTF-8')
 
+
+  @patch("resource_management.core.metadata_cache.MetadataCache._get_validator")
+  @patch("resource_management.core.providers.system._ensure_metadata")
+  @patch("resource_management.core.sudo.read_file")
+  @patch("resource_management.core.sudo.create_file")
+  @patch("resource_management.core.sudo.path_exists")
+  @patch("resource_management.core.sudo.path_isdir")
+  def test_action_create_known_content(self, isdir_mock, exists_mock, create_file_mock, read_file_mock, ensure_mock,
+                                       validator_mock):
+    validator_mock.return_value = (1, 1)
+    isdir_mock.side_effect = lambda path: path == '/directory'
+    exists_mock.side_effect = [False, True, True]
+    read_file_mock.return_value = 'old-content'
+
+    with Environment('/') as env:
+      File('/directory/file', content='file-content')
+      # content written by the previous resource is not read again
+      File('/directory/file', content='file-content')
+      File('/directory/file', content='new-content')
+
+    self.assertEqual(1, read_file_mock.call_count)
+    self.assertEqual(2, create_file_mock.call_count)
+    # parent directory is checked only once
+    self.assertEqual(['/directory/file', '/directory', '/directory/file', '/directory/file'],
+                     [call[0][0] for call in isdir_mock.call_args_list])
+    self.assertEqual(3, len(env.resource_timings))
+
+  @patch("resource_management.core.providers.system._ensure_metadata")
+  @patch("resource_management.core.shell.checked_call")
+  @patch("resource_management.core.sudo.read_file")
+  @patch("resource_management.core.sudo.create_file")
+  @patch("resource_management.core.sudo.path_exists")
+  @patch("resource_management.core.sudo.path_isdir")
+  def test_action_create_known_content_reset(self, isdir_mock, exists_mock, create_file_mock, read_file_mock,
+                                             checked_call_mock, ensure_mock):
+    from resource_management.core.resources import Execute
+    isdir_mock.side_effect = lambda path: path == '/directory'
+    exists_mock.return_value = True
+    read_file_mock.return_value = 'file-content'
+    checked_call_mock.return_value = (0, '')
+
+    with Environment('/') as env:
+      File('/directory/file', content='file-content')
+      Execute('echo changes everything')
+      File('/directory/file', content='file-content')
+
+    self.assertEqual(2, read_file_mock.call_count)
+    self.assertFalse(create_file_mock.called)
+
+  @patch("resource_management.core.metadata_cache.MetadataCache._get_validator")
+  @patch("resource_management.core.providers.system._ensure_metadata")
+  @patch("resource_management.core.sudo.read_file")
+  @patch("resource_management.core.sudo.create_file")
+  @patch("resource_management.core.sudo.path_exists")
+  @patch("resource_management.core.sudo.path_isdir")
+  def test_action_create_known_content_changed(self, isdir_mock, exists_mock, create_file_mock, read_file_mock,
+                                               ensure_mock, validator_mock):
+    validators = {'/directory': (1, 1), '/directory/file': (1, 2, 100.0, 12)}
+    validator_mock.side_effect = lambda path, is_dir: validators.get(path)
+    isdir_mock.side_effect = lambda path: path == '/directory'
+    exists_mock.return_value = True
+    read_file_mock.return_value = 'old-content'
+
+    with Environment('/') as env:
+      # not replaced, so the content is not known
+      File('/directory/file', content='file-content', replace=False)
+      File('/directory/file', content='file-content')
+      # file changed by the script in between
+      validators['/directory/file'] = (1, 2, 101.0, 3)
+      File('/directory/file', content='file-content')
+
+    self.assertEqual(2, read_file_mock.call_count)
+    self.assertEqual(2, create_file_mock.call_count)
+
+  @patch("resource_management.core.metadata_cache.MetadataCache._get_validator")
+  @patch("resource_management.core.providers.system._ensure_metadata")
+  @patch("resource_management.core.sudo.create_file")
+  @patch("resource_management.core.sudo.path_exists")
+  @patch("resource_management.core.sudo.path_isdir")
+  def test_action_create_known_directory_removed(self, isdir_mock, exists_mock, create_file_mock, ensure_mock,
+                                                 validator_mock):
+    validators = {'/directory': (1, 1)}
+    validator_mock.side_effect = lambda path, is_dir: validators.get(path)
+    isdir_mock.side_effect = lambda path: path in validators
+    exists_mock.return_value = False
+
+    with Environment('/') as env:
+      File('/directory/file', content='file-content')
+      # directory removed by the script in between
+      del validators['/directory']
+      try:
+        File('/directory/other', content='file-content')
+        self.fail("Must fail when parent directory doesn't exist")
+      except Fail as e:
+        self.assertEqual("Applying File['/directory/other'] failed, parent directory /directory doesn't exist", str(e))
+
+    self.assertEqual(1, create_file_mock.call_count)
@@ -0,0 +1,78 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+from unittest import TestCase
+from mock.mock import patch, MagicMock
+
+from resource_management.core import Environment
+from resource_management.core.logger import Logger, SensitiveStrings
+from resource_management.libraries.functions.format import format, ConfigurationFormatter
+
+
+class TestFormat(TestCase):
+
+  def setUp(self):
+    self.sensitive_strings = Logger.sensitive_strings
+    Logger.sensitive_strings = SensitiveStrings()
+
+  def tearDown(self):
+    Logger.sensitive_strings = self.sensitive_strings
+
+  def test_format(self):
+    with Environment('/') as env:
+      env.set_params({'conf_dir': '/etc/conf', 'user': 'env-user', 'props': {'a': 'b'}})
+      user = 'local-user'
+      width = 8
+
+      self.assertEqual("/etc/conf local-user", format("{conf_dir} {user}"))
+      self.assertEqual("local-user env-user", format("{user} {env_user}", env_user=env.config.params.user))
+      self.assertEqual("'a b'|b|      /x", format("{arg!e}|{props.a}|{path:>{width}}", arg='a b', path='/x'))
+      self.assertRaises(KeyError, format, "{missing}")
+      self.assertEqual(0, len(Logger.sensitive_strings))
+
+  def test_format_sensitive(self):
+    with Environment('/') as env:
+      password = "secret pass"
+      result = format("cmd --password {password!p} --user {user!h:>3}", user="u")
+
+      self.assertEqual("cmd --password 'secret pass' --user   u", result)
+      # only the secrets are registered, the formatted string is not
+      self.assertEqual(["'secret pass'", "  u"], Logger.sensitive_strings.keys())
+      self.assertEqual("log: cmd --password [PROTECTED] --user [PROTECTED]", Logger.filter_text("log: " + result))
+      self.assertEqual("echo [PROTECTED]", Logger.filter_text(format("echo {password!p}")))
+      self.assertEqual(2, len(Logger.sensitive_strings))
+
+  def test_parse_cache(self):
+    with patch.object(ConfigurationFormatter, "_parse_cache", new = {}) as parse_cache:
+      value = 1
+      format("{value}")
+      format("{value}")
+      self.assertEqual(["{value}"], parse_cache.keys())
+
+  def test_sensitive_strings_bounded(self):
+    sensitive_strings = SensitiveStrings(max_len=2)
+    sensitive_strings["pass"] = "[PROTECTED]"
+    sensitive_strings["password"] = "[PROTECTED]"
+    sensitive_strings[""] = "[PROTECTED]"
+    self.assertEqual(["password", "pass"], sensitive_strings.keys())
+
+    # registering a string again keeps it from being the first one forgotten
+    sensitive_strings["pass"] = "[PROTECTED]"
+    sensitive_strings["key"] = "[PROTECTED]"
+    self.assertEqual(["pass", "key"], sensitive_strings.keys())
+    self.assertEqual("[PROTECTED]", sensitive_strings["key"])
@@ -18,7 +18,9 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 import ConfigParser
+import marshal
 import os
+import shutil
 
 import pprint
 
@@ -115,6 +117,26 @@ class TestScript(TestCase):
     self.assertEqual(open_mock.call_count, 3)
     self.assertEqual(Script.structuredOut, {"1": "3", "2": "2"})
 
+  def test_load_command_data(self):
+    tmpdir = tempfile.mkdtemp()
+    command_file = os.path.join(tmpdir, "command-1.json")
+    with open(command_file, "w") as f:
+      f.write('{"roleCommand": "START"}')
+    self.assertEqual(Script.load_command_data(command_file), {"roleCommand": "START"})
+
+    # marshalled copy is preferred
+    with open(command_file + ".marshal", "wb") as f:
+      marshal.dump({"roleCommand": "STOP"}, f)
+    self.assertEqual(Script.load_command_data(command_file), {"roleCommand": "STOP"})
+
+    # stale or broken copy is ignored
+    os.utime(command_file + ".marshal", (0, 0))
+    self.assertEqual(Script.load_command_data(command_file), {"roleCommand": "START"})
+    with open(command_file + ".marshal", "wb") as f:
+      f.write("broken")
+    self.assertEqual(Script.load_command_data(command_file), {"roleCommand": "START"})
+    shutil.rmtree(tmpdir)
+
 
   def tearDown(self):
     # enable stdout
@@ -0,0 +1,82 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+import os
+import subprocess
+import tempfile
+from unittest import TestCase
+
+from mock.mock import MagicMock, patch
+from only_for_platform import not_for_platform, PLATFORM_WINDOWS
+from resource_management.core import shell
+from resource_management.core.exceptions import Fail
+from resource_management.core.logger import Logger
+
+
+@patch.object(Logger, "logger", new = MagicMock())
+class TestShellCall(TestCase):
+
+  def test_output_buffer(self):
+    buffer = shell.OutputBuffer()
+    for chunk in ["abc", "def", "g"]:
+      buffer.append(chunk)
+    self.assertEqual(buffer.getvalue(), "abcdefg")
+
+  def test_output_buffer_max_size(self):
+    buffer = shell.OutputBuffer(4)
+    for chunk in ["abc", "def", "g"]:
+      buffer.append(chunk)
+    self.assertEqual(buffer.getvalue(), "defg")
+    # chunks out of the window are dropped
+    self.assertEqual(len(buffer.chunks), 2)
+
+    buffer.append("hijklm")
+    self.assertEqual(buffer.getvalue(), "jklm")
+    self.assertEqual(len(buffer.chunks), 1)
+
+  @not_for_platform(PLATFORM_WINDOWS)
+  def test_call_max_output_size_and_spool_file(self):
+    spool_file = tempfile.mktemp()
+    lines = []
+    try:
+      code, out = shell.call("seq 1 100000", quiet=True, logoutput=False, max_output_size=13, spool_file=spool_file,
+                             on_new_line=lambda line, is_stderr: lines.append(line))
+      with open(spool_file) as fp:
+        spooled = fp.read()
+    finally:
+      if os.path.exists(spool_file):
+        os.unlink(spool_file)
+
+    expected = "\n".join(str(i) for i in xrange(1, 100001)) + "\n"
+    self.assertEqual(code, 0)
+    self.assertEqual(out, "99999\n100000")
+    self.assertEqual(spooled, expected)
+    self.assertEqual("".join(lines), expected)
+
+  @not_for_platform(PLATFORM_WINDOWS)
+  def test_checked_call_failure_output(self):
+    try:
+      shell.checked_call("seq 1 1000; exit 1", quiet=True, logoutput=False, max_output_size=5)
+      self.fail("Fail not thrown")
+    except Fail, err:
+      self.assertTrue(str(err).endswith("1000"))
+      self.assertFalse("999\n" in str(err))
+
+  @not_for_platform(PLATFORM_WINDOWS)
+  def test_call_separate_stderr(self):
+    code, out, err = shell.call("echo out; echo err >&2", quiet=True, logoutput=False, stderr=subprocess.PIPE)
+    self.assertEqual((code, out, err), (0, "out", "err"))
@@ -0,0 +1,119 @@
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+from mock.mock import patch, MagicMock
+
+from resource_management.core import sudo_broker_server
+from resource_management.core.exceptions import Fail
+from resource_management.core.logger import Logger
+from resource_management.core.sudo_broker import SudoBroker, SERVER_SCRIPT
+
+
+@patch.object(Logger, "logger", new = MagicMock())
+class TestSudoBroker(TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    # run privileged side as current user, sudo is not needed for the protocol itself
+    self.broker = SudoBroker([sys.executable, SERVER_SCRIPT])
+
+  def tearDown(self):
+    self.broker.stop()
+    shutil.rmtree(self.tmp_dir)
+
+  def test_execute_request(self):
+    path = os.path.join(self.tmp_dir, "file")
+    results = sudo_broker_server.execute_request([("create_file", (path, "content")),
+                                                  ("read_file", (os.path.join(self.tmp_dir, "missing"),)),
+                                                  ("chmod", (path, 0640)),
+                                                  ("stat", (path,)),
+                                                  ("unknown", ())])
+
+    self.assertEqual(("ok", None), results[0])
+    self.assertEqual("error", results[1][0])
+    self.assertEqual(2, results[1][1])
+    self.assertEqual(("ok", None), results[2])
+    self.assertEqual(("ok", (os.getuid(), os.getgid(), 0640)), results[3])
+    self.assertEqual("error", results[4][0])
+
+  def test_file_operations(self):
+    self.assertTrue(self.broker.start())
+    path = os.path.join(self.tmp_dir, "dir", "subdir", "file")
+    link = os.path.join(self.tmp_dir, "link")
+
+    self.broker.call("makedirs", os.path.dirname(path), 0750)
+    self.broker.call("create_file", path, "\x00binary\ncontent")
+    self.broker.call("symlink", path, link)
+    self.broker.call("symlink", path, link)
+
+    self.assertEqual("\x00binary\ncontent", self.broker.call("read_file", link))
+    self.assertEqual(0750, self.broker.call("stat", os.path.dirname(path))[2])
+    self.assertTrue(self.broker.call("isdir", os.path.dirname(path)))
+    self.assertTrue(self.broker.call("lexists", link))
+    self.assertEqual(path, self.broker.call("readlink", link))
+
+    self.broker.call("unlink", link)
+    self.broker.call("unlink", link)
+    self.assertFalse(self.broker.call("exists", link))
+    self.assertRaises(Fail, self.broker.call, "read_file", link)
+
+    # one process serves all requests
+    self.assertTrue(self.broker.is_running())
+    self.assertEqual(14, self.broker.requests_count)
+
+  def test_call_many(self):
+    self.assertTrue(self.broker.start())
+    results = self.broker.call_many([("exists", (self.tmp_dir,)), ("isfile", (self.tmp_dir,))])
+
+    self.assertEqual([("ok", True), ("ok", False)], results)
+    self.assertEqual(2, self.broker.requests_count)
+    self.assertEqual(3, self.broker.operations_count)
+
+  def test_default_command(self):
+    command = SudoBroker().command
+    interpreter = command.index(sys.executable)
+
+    # environment of the caller is neither kept by sudo nor used by the root interpreter
+    self.assertFalse("-E" in command[:interpreter])
+    self.assertEqual([sys.executable, "-E", "-s", SERVER_SCRIPT], command[interpreter:])
+
+    broker = SudoBroker(command[interpreter:])
+    with patch.dict(os.environ, {"PYTHONPATH": self.tmp_dir}):
+      with open(os.path.join(self.tmp_dir, "struct.py"), "w") as fp:
+        fp.write("raise ImportError('shadowed')\n")
+      self.assertTrue(broker.start())
+    broker.stop()
+
+  def test_start_failure(self):
+    broker = SudoBroker(["/bin/false"])
+    self.assertFalse(broker.start())
+    self.assertFalse(broker.is_running())
+    self.assertRaises(Fail, broker.call, "ping")
+
+  def test_terminated_broker(self):
+    self.assertTrue(self.broker.start())
+    self.broker.process.kill()
+    self.broker.process.wait()
+
+    self.assertRaises(Fail, self.broker.call, "exists", self.tmp_dir)
+    self.assertFalse(self.broker.is_running())
@@ -185,6 +185,38 @@ class TestXmlConfigResource(TestCase):
 
     create_file_mock.assert_called_with('/dir/conf/file.xml', u'  <configuration>\n    \n    <property>\n      <name></name>\n      <value></value>\n    </property>\n    \n    <property>\n      <name>first</name>\n      <value>should be first</value>\n    </property>\n    \n    <property>\n      <name>second</name>\n      <value>should be second</value>\n    </property>\n    \n    <property>\n      <name>third</name>\n      <value>should be third</value>\n    </property>\n    \n    <property>\n      <name>z_last</name>\n      <value>should be last</value>\n    </property>\n    \n  </configuration>', encoding='UTF-8')
 
+  @patch("resource_management.core.providers.system._ensure_metadata")
+  @patch("resource_management.core.sudo.create_file")
+  @patch("resource_management.core.sudo.path_exists")
+  @patch("resource_management.core.sudo.path_isdir")
+  @patch("resource_management.libraries.providers.xml_config.InlineTemplate")
+  def test_action_create_xml_config_with_templates(self,
+                                                   inline_template_mock,
+                                                   os_path_isdir_mock,
+                                                   os_path_exists_mock,
+                                                   create_file_mock,
+                                                   ensure_mock):
+    """
+    Tests that only values which look like templates are rendered as templates,
+    while plain values are written the same way Jinja would render them
+    """
+    os_path_isdir_mock.side_effect = [False, True]
+    os_path_exists_mock.return_value = False
+    inline_template_mock.side_effect = lambda text: MagicMock(get_content = MagicMock(return_value = text.replace("{{ conf_dir }}", "/etc/conf").replace("{# comment #}", "")))
+
+    with Environment('/') as env:
+      XmlConfig('file.xml',
+                conf_dir='/dir/conf',
+                configurations={"prop.1": "{{ conf_dir }}/file",
+                                "prop.2": "line1\r\nline2\n",
+                                "prop.3": "{# comment #}<value>",
+                                "prop.4": 42},
+                configuration_attributes={'final': {'prop.1': 'true'}}
+                )
+
+    self.assertEqual(["{{ conf_dir }}/file", "{# comment #}<value>"], [call[0][0] for call in inline_template_mock.call_args_list])
+    create_file_mock.assert_called_with('/dir/conf/file.xml', u'  <configuration>\n    \n    <property>\n      <name>prop.1</name>\n      <value>/etc/conf/file</value>\n      <final>true</final>\n    </property>\n    \n    <property>\n      <name>prop.2</name>\n      <value>line1\nline2</value>\n    </property>\n    \n    <property>\n      <name>prop.3</name>\n      <value>&lt;value&gt;</value>\n    </property>\n    \n    <property>\n      <name>prop.4</name>\n      <value>42</value>\n    </property>\n    \n  </configuration>', encoding='UTF-8')
+
   @patch("resource_management.libraries.providers.xml_config.File")
   @patch("resource_management.core.sudo.path_exists")
   @patch("resource_management.core.sudo.path_isdir")
@@ -22,3 +22,6 @@ AMBARI_SUDO_BINARY = "ambari-sudo.sh"
 
 UPGRADE_TYPE_ROLLING = "rolling"
 UPGRADE_TYPE_NON_ROLLING = "nonrolling"
+
+# Suffix of marshalled copy of command json file, written by the agent next to the json
+COMMAND_MARSHAL_FILE_SUFFIX = ".marshal"
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+__all__ = ["ProcessInfo", "ProcessTable", "get_process_table", "kill_process_tree"]
+
+import errno
+import logging
+import os
+import signal
+import threading
+import time
+
+logger = logging.getLogger()
+
+PROC_DIR = "/proc"
+SNAPSHOT_TTL = 2 # seconds a shared snapshot is reused for
+KILL_POLL_INTERVAL = 0.1 # seconds between checks whether killed processes have exited
+KILL_WAIT_TIMEOUT = 5 # seconds to wait for processes to exit after SIGKILL
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+class ProcessInfo(object):
+  """
+  Process read from /proc/<pid>/stat. Command line and owner are read on first
+  access only, since most of the callers do not need them. Both may change without
+  a new pid (exec, setuid), so they are never carried over into a later snapshot.
+  """
+
+  def __init__(self, pid, ppid, state, start_time, proc_dir=PROC_DIR):
+    self.pid = pid
+    self.ppid = ppid
+    self.state = state
+    # in clock ticks since boot, tells a process from a later one which got the same pid
+    self.start_time = start_time
+    self.proc_dir = proc_dir
+    self._cmdline = None
+    self._uid = None
+
+  @property
+  def cmdline(self):
+    if self._cmdline is None:
+      try:
+        with open(os.path.join(self.proc_dir, str(self.pid), "cmdline"), "rb") as fp:
+          self._cmdline = fp.read().replace("\0", " ").strip()
+      except IOError:
+        self._cmdline = ""
+    return self._cmdline
+
+  @property
+  def uid(self):
+    """
+    Real user id of the process, None if the process has exited
+    """
+    if self._uid is None:
+      try:
+        with open(os.path.join(self.proc_dir, str(self.pid), "status")) as fp:
+          for line in fp:
+            if line.startswith("Uid:"):
+              self._uid = int(line.split()[1])
+              break
+      except (IOError, ValueError, IndexError):
+        pass
+    return self._uid
+
+  def is_alive(self):
+    """
+    False once the process has exited (including not yet reaped zombies)
+    """
+    current = read_process(self.pid, self.proc_dir)
+    return current is not None and current.start_time == self.start_time and current.state != "Z"
+
+
+def read_process(pid, proc_dir=PROC_DIR):
+  """
+  Returns ProcessInfo for pid, None if there is no such process
+  """
+  try:
+    with open(os.path.join(proc_dir, str(pid), "stat")) as fp:
+      stat = fp.read()
+    # process name is in parentheses and may contain spaces and parentheses itself
+    fields = stat.rsplit(")", 1)[1].split()
+    return ProcessInfo(int(pid), int(fields[1]), fields[0], long(fields[19]), proc_dir)
+  except (IOError, ValueError, IndexError):
+    return None
+
+
+class ProcessTable(object):
+  """
+  Snapshot of all the processes, read from /proc in one pass, with
+  parent -> children index.
+  """
+
+  def __init__(self, proc_dir=PROC_DIR):
+    self.created = time.time()
+    self.processes = {}
+    self.children = {}
+
+    try:
+      pids = [name for name in os.listdir(proc_dir) if name.isdigit()]
+    except OSError, ex:
+      logger.warn("Cannot list processes in {0}. {1}".format(proc_dir, ex))
+      pids = []
+
+    for pid in pids:
+      process = read_process(pid, proc_dir)
+      if process is None:
+        # exited while the table was being read
+        continue
+      self.processes[process.pid] = process
+      self.children.setdefault(process.ppid, []).append(process.pid)
+
+  def get_processes(self):
+    """
+    Returns all the processes ordered by pid
+    """
+    return [self.processes[pid] for pid in sorted(self.processes)]
+
+  def get_children(self, pid):
+    return [self.processes[child] for child in sorted(self.children.get(pid, []))]
+
+  def get_tree(self, pid):
+    """
+    Returns process pid followed by all its descendants, parents always before their children.
+    Empty list if there is no such process.
+    """
+    if pid not in self.processes:
+      return []
+    tree = [self.processes[pid]]
+    seen = set([pid])
+    i = 0
+    while i < len(tree):
+      for child in self.get_children(tree[i].pid):
+        if child.pid not in seen:
+          seen.add(child.pid)
+          tree.append(child)
+      i += 1
+    return tree
+
+  def is_expired(self, max_age):
+    return time.time() - self.created > max_age
+
+
+def get_process_table(max_age=SNAPSHOT_TTL):
+  """
+  Returns snapshot shared by all the callers, re-read once it is older than max_age seconds
+  """
+  global _snapshot
+  with _snapshot_lock:
+    if _snapshot is None or _snapshot.is_expired(max_age):
+      _snapshot = ProcessTable()
+    return _snapshot
+
+
+def invalidate_process_table():
+  global _snapshot
+  with _snapshot_lock:
+    _snapshot = None
+
+
+def kill_process_tree(pid, timeout, poll_interval=KILL_POLL_INTERVAL):
+  """
+  Sends SIGTERM to pid and all its descendants and waits up to timeout seconds
+  for them to exit. Processes still running after that, along with any children they
+  have started meanwhile, are killed with SIGKILL and waited for up to KILL_WAIT_TIMEOUT
+  seconds.
+
+  Returns list of pids which had to be killed with SIGKILL.
+  """
+  tree = ProcessTable().get_tree(pid)
+  if not tree:
+    logger.debug("Process with pid {0} is not running".format(pid))
+    return []
+
+  _send_signal(tree, signal.SIGTERM)
+
+  deadline = time.time() + timeout
+  running = [process for process in tree if process.is_alive()]
+  while running and time.time() < deadline:
+    time.sleep(poll_interval)
+    running = [process for process in running if process.is_alive()]
+
+  killed = []
+  if running:
+    table = ProcessTable()
+    survivors = {}
+    for process in running:
+      current = table.processes.get(process.pid)
+      if current is not None and current.start_time == process.start_time:
+        for descendant in table.get_tree(process.pid):
+          survivors[descendant.pid] = descendant
+    survivors = [survivors[p] for p in sorted(survivors)]
+    killed = _send_signal(survivors, signal.SIGKILL)
+    logger.info("Processes {0} did not exit in {1} seconds after SIGTERM and were killed".format(killed, timeout))
+
+    # SIGKILL is delivered asynchronously, callers expect the tree to be gone on return
+    deadline = time.time() + KILL_WAIT_TIMEOUT
+    running = [process for process in survivors if process.is_alive()]
+    while running and time.time() < deadline:
+      time.sleep(poll_interval)
+      running = [process for process in running if process.is_alive()]
+    if running:
+      logger.warn("Processes {0} are still running after SIGKILL".format([process.pid for process in running]))
+
+  invalidate_process_table()
+  return killed
+
+
+def _send_signal(processes, signum):
+  signalled = []
+  for process in processes:
+    try:
+      os.kill(process.pid, signum)
+      signalled.append(process.pid)
+    except OSError, ex:
+      if ex.errno != errno.ESRCH:
+        logger.warn("Failed to send signal {0} to pid {1}. {2}".format(signum, process.pid, ex))
+  return signalled
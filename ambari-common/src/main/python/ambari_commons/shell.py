@@ -22,15 +22,14 @@ import logging
 import subprocess
 import os
 import tempfile
-import signal
 import sys
 import threading
-import time
 import traceback
 import pprint
 import platform
 
 from ambari_commons import OSConst
+from ambari_commons import process_table
 from ambari_commons.os_family_impl import OsFamilyImpl, OsFamilyFuncImpl
 
 logger = logging.getLogger()
@@ -106,40 +105,16 @@ class shellRunnerWindows(shellRunner):
 #linux specific code
 @OsFamilyFuncImpl(os_family=OsFamilyImpl.DEFAULT)
 def kill_process_with_children(parent_pid):
-  def kill_tree_function(pid, signal):
-    '''
-    Kills process tree starting from a given pid.
-    '''
-    # The command below starts 'ps' linux utility and then parses it's
-    # output using 'awk'. AWK recursively extracts PIDs of all children of
-    # a given PID and then passes list of "kill -<SIGNAL> PID" commands to 'sh'
-    # shell.
-    CMD = """ps xf | awk -v PID=""" + str(pid) + \
-          """ ' $1 == PID { P = $1; next } P && /_/ { P = P " " $1;""" + \
-          """K=P } P && !/_/ { P="" }  END { print "kill -""" \
-          + str(signal) + """ "K }' | sh """
-    process = subprocess.Popen(CMD, stdout=subprocess.PIPE,
-                               stderr=subprocess.PIPE, shell=True)
-    process.communicate()
-
-  _run_kill_function(kill_tree_function, parent_pid)
-
-
-def _run_kill_function(kill_function, pid):
+  """
+  Kills process tree starting from a given pid: SIGTERM first, then SIGKILL
+  for processes which have not exited in gracefull_kill_delay seconds.
+  """
   try:
-    kill_function(pid, signal.SIGTERM)
+    process_table.kill_process_tree(parent_pid, gracefull_kill_delay)
   except Exception, e:
-    logger.warn("Failed to kill PID %d" % (pid))
+    logger.warn("Failed to kill process tree of PID %d" % (parent_pid))
     logger.warn("Reported error: " + repr(e))
 
-  time.sleep(gracefull_kill_delay)
-
-  try:
-    kill_function(pid, signal.SIGKILL)
-  except Exception, e:
-    logger.error("Failed to send SIGKILL to PID %d. Process exited?" % (pid))
-    logger.error("Reported error: " + repr(e))
-
 
 def _changeUid():
   try:
@@ -23,6 +23,7 @@ Ambari Agent
 __all__ = ["Environment"]
 
 import os
+import collections
 import types
 import logging
 import shutil
@@ -36,11 +37,15 @@ from resource_management.core.providers import find_provider
 from resource_management.core.utils import AttributeDictionary
 from resource_management.core.system import System
 from resource_management.core.logger import Logger
+from resource_management.core.metadata_cache import MetadataCache, FILESYSTEM_RESOURCES
 from threading import Thread, local
 
 _local_data = local()
 _instance_name = 'instance'
 
+# how many of the slowest resources are logged when leaving the environment
+TIMING_PROFILE_SIZE = 10
+
 class Environment(object):
 
   def __init__(self, basedir=None, tmp_dir=None, test_mode=False, logger=None, logging_level=logging.INFO):
@@ -62,6 +67,9 @@ class Environment(object):
     self.resources = {}
     self.resource_list = []
     self.delayed_actions = set()
+    self.metadata_cache = MetadataCache()
+    # (resource, seconds spent) for every applied resource, in order of execution
+    self.resource_timings = []
     self.test_mode = test_mode
     self.tmp_dir = tmp_dir
     self.update_config({
@@ -137,39 +145,80 @@ class Environment(object):
     raise Exception("Unknown condition type %r" % cond) 
     
   def run(self):
-      # Run resource actions
+      # Run resource actions. Resources are taken in batches, so that popping them is not
+      # quadratic on long lists; resources added while running go to self.resource_list
+      # and are picked up after the current batch, same as before.
       while self.resource_list:
-        resource = self.resource_list.pop(0)
-        Logger.info_resource(resource)
-        
-        if resource.initial_wait:
-          time.sleep(resource.initial_wait)
-
-        if resource.not_if is not None and self._check_condition(
-          resource.not_if):
-          Logger.info("Skipping %s due to not_if" % resource)
-          continue
+        pending = collections.deque(self.resource_list)
+        del self.resource_list[:]
 
-        if resource.only_if is not None and not self._check_condition(
-          resource.only_if):
-          Logger.info("Skipping %s due to only_if" % resource)
-          continue
-
-        for action in resource.action:
-          if not resource.ignore_failures:
-            self.run_action(resource, action)
-          else:
+        try:
+          while pending:
+            resource = pending.popleft()
+            start_time = time.time()
             try:
-              self.run_action(resource, action)
-            except Exception as ex:
-              Logger.info("Skipping failure of %s due to ignore_failures. Failure reason: %s" % (resource, str(ex)))
-              pass
+              self._run_resource(resource)
+            finally:
+              self.resource_timings.append((resource, time.time() - start_time))
+        finally:
+          # keep not applied resources in the list if one of them has failed
+          self.resource_list[0:0] = pending
 
       # Run delayed actions
       while self.delayed_actions:
         action, resource = self.delayed_actions.pop()
         self.run_action(resource, action)
 
+  def _run_resource(self, resource):
+    Logger.info_resource(resource)
+
+    # facts about the filesystem gathered by previous resources are valid only
+    # while nothing but filesystem resources is applied
+    is_filesystem_resource = resource.__class__.__name__ in FILESYSTEM_RESOURCES
+    if not is_filesystem_resource:
+      self.metadata_cache.clear()
+    
+    if resource.initial_wait:
+      time.sleep(resource.initial_wait)
+
+    if resource.not_if is not None and self._check_condition(
+      resource.not_if):
+      Logger.info("Skipping %s due to not_if" % resource)
+      return
+
+    if resource.only_if is not None and not self._check_condition(
+      resource.only_if):
+      Logger.info("Skipping %s due to only_if" % resource)
+      return
+
+    try:
+      for action in resource.action:
+        if not resource.ignore_failures:
+          self.run_action(resource, action)
+        else:
+          try:
+            self.run_action(resource, action)
+          except Exception as ex:
+            Logger.info("Skipping failure of %s due to ignore_failures. Failure reason: %s" % (resource, str(ex)))
+            pass
+    finally:
+      if not is_filesystem_resource:
+        self.metadata_cache.clear()
+
+  def get_timing_profile(self, count=TIMING_PROFILE_SIZE):
+    """
+    Returns [(resource, seconds spent)] for the slowest resources, slowest first
+    """
+    return sorted(self.resource_timings, key=lambda item: item[1], reverse=True)[:count]
+
+  def log_timing_profile(self):
+    if not self.resource_timings:
+      return
+    total_time = sum(timing for resource, timing in self.resource_timings)
+    Logger.info("Applied {0} resources in {1:.3f} sec".format(len(self.resource_timings), total_time))
+    for resource, timing in self.get_timing_profile():
+      Logger.debug("  {0:.3f} sec {1}".format(timing, resource))
+
   @classmethod
   def has_instance(cls):
     instance = getattr(_local_data, _instance_name, None)
@@ -22,17 +22,67 @@ Ambari Agent
 
 __all__ = ["Logger"]
 import sys
+import collections
 import logging
 from resource_management.libraries.script.config_dictionary import UnknownConfiguration
 from resource_management.core.utils import PasswordString
 
 MESSAGE_MAX_LEN = 512
 DICTIONARY_MAX_LEN = 5
+SENSITIVE_STRINGS_MAX_LEN = 1000
+
+
+class SensitiveStrings(object):
+  """
+  Map of unprotected string : protected string. format() registers the values of
+  !h/!p fields here, not every string they were formatted into, so the map stays
+  as small as the set of secrets a command uses.
+
+  At most max_len strings are kept. Registering a string again makes it the most
+  recent one, so only secrets not used for the longest time can be forgotten.
+  """
+  def __init__(self, max_len=SENSITIVE_STRINGS_MAX_LEN):
+    self.max_len = max_len
+    self.strings = collections.OrderedDict()
+    # unprotected strings, longest first, so that a secret containing another one is replaced whole
+    self.replace_order = None
+
+  def __setitem__(self, unprotected_string, protected_string):
+    if not unprotected_string:
+      # replacing an empty string would insert protected string between every character
+      return
+    is_new = unprotected_string not in self.strings
+    if not is_new:
+      del self.strings[unprotected_string]
+    self.strings[unprotected_string] = protected_string
+    if is_new:
+      self.replace_order = None
+      if len(self.strings) > self.max_len:
+        self.strings.popitem(last=False)
+
+  def __getitem__(self, unprotected_string):
+    return self.strings[unprotected_string]
+
+  def __contains__(self, unprotected_string):
+    return unprotected_string in self.strings
+
+  def __len__(self):
+    return len(self.strings)
+
+  def keys(self):
+    if self.replace_order is None:
+      self.replace_order = sorted(self.strings, key=len, reverse=True)
+    return self.replace_order
+
+  def iteritems(self):
+    for unprotected_string in self.keys():
+      yield unprotected_string, self.strings[unprotected_string]
+
 
 class Logger:
   logger = None
   # unprotected_strings : protected_strings map
-  sensitive_strings = {}
+  sensitive_strings = SensitiveStrings()
   
   @staticmethod
   def initialize_logger(name='resource_management', logging_level=logging.INFO, format='%(asctime)s - %(message)s'):
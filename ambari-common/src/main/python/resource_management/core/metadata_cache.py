@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Ambari Agent
+
+"""
+
+__all__ = ["MetadataCache", "FILESYSTEM_RESOURCES"]
+
+import hashlib
+import os
+import stat
+
+from resource_management.core import sudo
+from resource_management.core import sudo_broker
+
+# Resources which only touch files they are given. While consecutive resources of
+# these types are applied, facts gathered by one of them stay valid for the next ones.
+FILESYSTEM_RESOURCES = ["File", "Directory", "XmlConfig", "PropertiesFile", "TemplateConfig"]
+
+
+class FileInfo(object):
+  def __init__(self, is_dir, exists, parent_is_dir, content=None):
+    self.is_dir = is_dir
+    self.exists = exists
+    self.parent_is_dir = parent_is_dir
+    self.content = content
+
+
+class MetadataCache(object):
+  """
+  Filesystem facts shared by a group of consecutive filesystem resources:
+  directories known to exist and checksums of file contents written or verified
+  by previous resources. Environment clears it before and after any other
+  resource (Execute etc.) is applied, since that one can change anything.
+
+  Resources are applied as soon as they are declared, so script code between two
+  resources (shell.call, sudo or os functions) may change the filesystem as well.
+  Each entry is therefore kept along with a validator taken by a plain stat, and
+  is trusted only while the path still has the same validator.
+  """
+
+  def __init__(self):
+    # path -> validator
+    self.directories = {}
+    # path -> (checksum, validator)
+    self.checksums = {}
+    self.hits = 0
+    self.misses = 0
+
+  def clear(self):
+    self.directories.clear()
+    self.checksums.clear()
+
+  def add_directory(self, path):
+    path = os.path.normpath(path)
+    validator = self._get_validator(path, True)
+    if validator is not None:
+      self.directories[path] = validator
+
+  def forget(self, path):
+    """
+    Called when path (and everything below it) is removed
+    """
+    path = os.path.normpath(path)
+    prefix = path.rstrip(os.sep) + os.sep
+    for directory in [d for d in self.directories if d == path or d.startswith(prefix)]:
+      del self.directories[directory]
+    for file_path in [p for p in self.checksums if p == path or p.startswith(prefix)]:
+      del self.checksums[file_path]
+
+  def path_isdir(self, path):
+    path = os.path.normpath(path)
+    if self._is_known_directory(path):
+      self.hits += 1
+      return True
+    self.misses += 1
+    if sudo.path_isdir(path):
+      self.add_directory(path)
+      return True
+    return False
+
+  def set_content(self, path, content):
+    if isinstance(content, basestring):
+      path = os.path.normpath(path)
+      validator = self._get_validator(path, False)
+      if validator is not None:
+        self.checksums[path] = (self._checksum(content), validator)
+
+  def is_content_known(self, path, content):
+    """
+    True if content was written to (or found in) path by one of the previous resources of this group
+    """
+    if not isinstance(content, basestring):
+      return False
+    path = os.path.normpath(path)
+    if path not in self.checksums:
+      return False
+    checksum, validator = self.checksums[path]
+    if self._get_validator(path, False) != validator:
+      # changed by something else than this group of resources
+      del self.checksums[path]
+      return False
+    return checksum == self._checksum(content)
+
+  def probe_file(self, path, read_content, encoding=None):
+    """
+    Gathers everything File resource needs to know about path. With the sudo broker
+    running all the checks are sent in one request instead of one sudo call each.
+    """
+    broker = sudo_broker.get_broker()
+
+    if broker is None:
+      is_dir = sudo.path_isdir(path)
+      parent_is_dir = is_dir or self.path_isdir(os.path.dirname(path))
+      exists = is_dir or (parent_is_dir and sudo.path_exists(path))
+      info = FileInfo(is_dir, exists, parent_is_dir)
+      if exists and not is_dir and read_content:
+        info.content = sudo.read_file(path, encoding=encoding)
+      return info
+
+    dirname = os.path.dirname(path)
+    parent_known = self._is_known_directory(os.path.normpath(dirname))
+    operations = [("isdir", (path,)), ("exists", (path,))]
+    if not parent_known:
+      operations.append(("isdir", (dirname,)))
+    if read_content:
+      operations.append(("read_file", (path,)))
+    results = broker.call_many(operations)
+
+    is_dir = broker.unpack_result("isdir", (path,), results[0])
+    exists = broker.unpack_result("exists", (path,), results[1])
+    if parent_known:
+      self.hits += 1
+      parent_is_dir = True
+    else:
+      self.misses += 1
+      parent_is_dir = broker.unpack_result("isdir", (dirname,), results[2])
+      if parent_is_dir:
+        self.add_directory(dirname)
+
+    info = FileInfo(is_dir, exists, parent_is_dir)
+    if read_content and exists and not is_dir:
+      content = broker.unpack_result("read_file", (path,), results[-1])
+      info.content = content.decode(encoding) if encoding else content
+    return info
+
+  def _is_known_directory(self, path):
+    if path not in self.directories:
+      return False
+    if self._get_validator(path, True) != self.directories[path]:
+      del self.directories[path]
+      return False
+    return True
+
+  @staticmethod
+  def _get_validator(path, is_dir):
+    """
+    Cheap fingerprint of path, None if it cannot be stat-ed without sudo. Directory
+    mtime changes whenever a file is created in it, so only its identity is compared.
+    """
+    try:
+      stat_result = os.stat(path)
+    except OSError:
+      return None
+    if is_dir:
+      return (stat_result.st_dev, stat_result.st_ino) if stat.S_ISDIR(stat_result.st_mode) else None
+    return (stat_result.st_dev, stat_result.st_ino, stat_result.st_mtime, stat_result.st_size)
+
+  @staticmethod
+  def _checksum(content):
+    if isinstance(content, unicode):
+      content = content.encode("utf-8")
+    return hashlib.md5(content).hexdigest()
@@ -90,7 +90,9 @@ def _ensure_metadata(path, user, group, mode=None, cd_access=None, recursive_own
     sudo.chmod_recursive(path, recursive_mode_flags, recursion_follow_links)
 
   if mode:
-    stat = sudo.stat(path)
+    # ownership changes can drop setuid/setgid bits, so stat again only if something was changed
+    if not (user or group) or user_entity or group_entity or recursive_ownership or recursive_mode_flags:
+      stat = sudo.stat(path)
     if stat.st_mode != mode:
       Logger.info("Changing permission for %s from %o to %o" % (
       path, stat.st_mode, mode))
@@ -111,32 +113,40 @@ def _ensure_metadata(path, user, group, mode=None, cd_access=None, recursive_own
 class FileProvider(Provider):
   def action_create(self):
     path = self.resource.path
-    
-    if sudo.path_isdir(path):
+    metadata_cache = self.resource.env.metadata_cache
+
+    content = self._get_content()
+    # content written or verified earlier in this group of filesystem resources is not read again
+    content_known = content is not None and metadata_cache.is_content_known(path, content)
+    read_content = self.resource.replace and content is not None and not content_known
+    info = metadata_cache.probe_file(path, read_content, encoding=self.resource.encoding)
+
+    if info.is_dir:
       raise Fail("Applying %s failed, directory with name %s exists" % (self.resource, path))
     
     dirname = os.path.dirname(path)
-    if not sudo.path_isdir(dirname):
+    if not info.parent_is_dir:
       raise Fail("Applying %s failed, parent directory %s doesn't exist" % (self.resource, dirname))
     
     write = False
-    content = self._get_content()
-    if not sudo.path_exists(path):
+    if not info.exists:
       write = True
       reason = "it doesn't exist"
-    elif self.resource.replace:
-      if content is not None:
-        old_content = sudo.read_file(path, encoding=self.resource.encoding)
-        if content != old_content:
-          write = True
-          reason = "contents don't match"
-          if self.resource.backup:
-            self.resource.env.backup_file(path)
+    elif read_content:
+      if content != info.content:
+        write = True
+        reason = "contents don't match"
+        if self.resource.backup:
+          self.resource.env.backup_file(path)
 
     if write:
       Logger.info("Writing %s because %s" % (self.resource, reason))
       sudo.create_file(path, content, encoding=self.resource.encoding)
 
+    # with replace=False existing content was neither written nor compared
+    if content is not None and (write or read_content):
+      metadata_cache.set_content(path, content)
+
     _ensure_metadata(self.resource.path, self.resource.owner,
                         self.resource.group, mode=self.resource.mode, cd_access=self.resource.cd_access)
 
@@ -149,6 +159,7 @@ class FileProvider(Provider):
     if sudo.path_exists(path):
       Logger.info("Deleting %s" % self.resource)
       sudo.unlink(path)
+    self.resource.env.metadata_cache.forget(path)
 
   def _get_content(self):
     content = self.resource.content
@@ -192,6 +203,7 @@ class DirectoryProvider(Provider):
       
     if not sudo.path_isdir(path):
       raise Fail("Applying %s failed, file %s already exists" % (self.resource, path))
+    self.resource.env.metadata_cache.add_directory(path)
     
     _ensure_metadata(path, self.resource.owner, self.resource.group,
                         mode=self.resource.mode, cd_access=self.resource.cd_access,
@@ -206,6 +218,7 @@ class DirectoryProvider(Provider):
       
       Logger.info("Removing directory %s and all its content" % self.resource)
       sudo.rmtree(path)
+    self.resource.env.metadata_cache.forget(path)
 
 
 class LinkProvider(Provider):
@@ -270,7 +283,8 @@ class ExecuteProvider(Provider):
                         sudo=self.resource.sudo,
                         on_new_line=self.resource.on_new_line,
                         stdout=self.resource.stdout,stderr=self.resource.stderr,
-                        tries=self.resource.tries, try_sleep=self.resource.try_sleep)
+                        tries=self.resource.tries, try_sleep=self.resource.try_sleep,
+                        max_output_size=self.resource.max_output_size, spool_file=self.resource.spool_file)
        
 
 class ExecuteScriptProvider(Provider):
@@ -240,6 +240,15 @@ class Execute(Resource):
   """
   stdout = ResourceArgument(default=subprocess.PIPE)
   stderr = ResourceArgument(default=subprocess.STDOUT)
+  """
+  Only the last max_output_size bytes of output are kept in memory (and shown on failure),
+  for commands which produce a lot of output. on_new_line still gets all of the output.
+  """
+  max_output_size = ResourceArgument()
+  """
+  Name of a file to which all of the output is written as it arrives.
+  """
+  spool_file = ResourceArgument()
 
 class ExecuteScript(Resource):
   action = ForcedListArgument(default="run")
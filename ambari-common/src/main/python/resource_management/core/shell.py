@@ -23,6 +23,7 @@ Ambari Agent
 __all__ = ["non_blocking_call", "checked_call", "call", "quote_bash_args", "as_user", "as_sudo"]
 
 import time
+import collections
 import copy
 import os
 import select
@@ -42,6 +43,9 @@ NOT_LOGGED_FOLDER = 'resource_management/core'
 EXPORT_PLACEHOLDER = "[RMF_EXPORT_PLACEHOLDER]"
 ENV_PLACEHOLDER = "[RMF_ENV_PLACEHOLDER]"
 
+# Bytes read from command output at once
+OUTPUT_CHUNK_SIZE = 64 * 1024
+
 PLACEHOLDERS_TO_STR = {
   EXPORT_PLACEHOLDER: "export {env_str} > /dev/null ; ",
   ENV_PLACEHOLDER: "{env_str}"
@@ -80,7 +84,7 @@ def log_function_call(function):
 @log_function_call
 def checked_call(command, quiet=False, logoutput=None, stdout=subprocess.PIPE,stderr=subprocess.STDOUT,
          cwd=None, env=None, preexec_fn=None, user=None, wait_for_finish=True, timeout=None, on_timeout=None,
-         path=None, sudo=False, on_new_line=None, tries=1, try_sleep=0):
+         path=None, sudo=False, on_new_line=None, tries=1, try_sleep=0, max_output_size=None, spool_file=None):
   """
   Execute the shell command and throw an exception on failure.
   @throws Fail
@@ -89,12 +93,12 @@ def checked_call(command, quiet=False, logoutput=None, stdout=subprocess.PIPE,st
   return _call_wrapper(command, logoutput=logoutput, throw_on_failure=True, stdout=stdout, stderr=stderr,
                               cwd=cwd, env=env, preexec_fn=preexec_fn, user=user, wait_for_finish=wait_for_finish, 
                               on_timeout=on_timeout, timeout=timeout, path=path, sudo=sudo, on_new_line=on_new_line,
-                              tries=tries, try_sleep=try_sleep)
+                              tries=tries, try_sleep=try_sleep, max_output_size=max_output_size, spool_file=spool_file)
   
 @log_function_call
 def call(command, quiet=False, logoutput=None, stdout=subprocess.PIPE,stderr=subprocess.STDOUT,
          cwd=None, env=None, preexec_fn=None, user=None, wait_for_finish=True, timeout=None, on_timeout=None,
-         path=None, sudo=False, on_new_line=None, tries=1, try_sleep=0):
+         path=None, sudo=False, on_new_line=None, tries=1, try_sleep=0, max_output_size=None, spool_file=None):
   """
   Execute the shell command despite failures.
   @return: return_code, output
@@ -102,7 +106,7 @@ def call(command, quiet=False, logoutput=None, stdout=subprocess.PIPE,stderr=sub
   return _call_wrapper(command, logoutput=logoutput, throw_on_failure=False, stdout=stdout, stderr=stderr,
                               cwd=cwd, env=env, preexec_fn=preexec_fn, user=user, wait_for_finish=wait_for_finish, 
                               on_timeout=on_timeout, timeout=timeout, path=path, sudo=sudo, on_new_line=on_new_line,
-                              tries=tries, try_sleep=try_sleep)
+                              tries=tries, try_sleep=try_sleep, max_output_size=max_output_size, spool_file=spool_file)
 
 @log_function_call
 def non_blocking_call(command, quiet=False, stdout=subprocess.PIPE,stderr=subprocess.STDOUT,
@@ -156,7 +160,7 @@ def _call_wrapper(command, **kwargs):
 
 def _call(command, logoutput=None, throw_on_failure=True, stdout=subprocess.PIPE,stderr=subprocess.STDOUT,
          cwd=None, env=None, preexec_fn=None, user=None, wait_for_finish=True, timeout=None, on_timeout=None, 
-         path=None, sudo=False, on_new_line=None, tries=1, try_sleep=0):
+         path=None, sudo=False, on_new_line=None, tries=1, try_sleep=0, max_output_size=None, spool_file=None):
   """
   Execute shell command
   
@@ -170,6 +174,9 @@ def _call(command, logoutput=None, throw_on_failure=True, stdout=subprocess.PIPE
     None - disable output to variable, and output to Python out straightly (even if logoutput is False)
     {int fd} - redirect to file with descriptor.
     {string filename} - redirects to a file with name.
+  @param max_output_size: if set, only the last max_output_size bytes of output are returned
+  (on_new_line still receives all of the output)
+  @param spool_file: name of a file to which all of the output is written as it arrives
   """
   command_alias = Logger.format_command_for_output(command)
   command_alias = string_cmd_from_args_list(command_alias) if isinstance(command_alias, (list, tuple)) else command_alias
@@ -229,11 +236,14 @@ def _call(command, logoutput=None, throw_on_failure=True, stdout=subprocess.PIPE
     if stderr == subprocess.PIPE:
       read_set.append(proc.stderr)
     
-    fd_to_string = {
-      proc.stdout: "",
-      proc.stderr: ""
+    fd_to_buffer = {
+      proc.stdout: OutputBuffer(max_output_size),
+      proc.stderr: OutputBuffer(max_output_size)
     }
-    all_output = ""
+    all_output_buffer = OutputBuffer(max_output_size)
+    if spool_file:
+      spool_fp = open(spool_file, 'wb')
+      files_to_close.append(spool_fp)
                   
     while read_set:
 
@@ -245,7 +255,7 @@ def _call(command, logoutput=None, throw_on_failure=True, stdout=subprocess.PIPE
 
       for out_fd in read_set:
         if out_fd in ready:
-          line = os.read(out_fd.fileno(), 1024)
+          line = os.read(out_fd.fileno(), OUTPUT_CHUNK_SIZE)
           
           if not line:
             read_set = copy.copy(read_set)
@@ -253,8 +263,10 @@ def _call(command, logoutput=None, throw_on_failure=True, stdout=subprocess.PIPE
             out_fd.close()
             continue
           
-          fd_to_string[out_fd] += line
-          all_output += line
+          fd_to_buffer[out_fd].append(line)
+          all_output_buffer.append(line)
+          if spool_file:
+            spool_fp.write(line)
             
           if on_new_line:
             try:
@@ -274,9 +286,9 @@ def _call(command, logoutput=None, throw_on_failure=True, stdout=subprocess.PIPE
     for fp in files_to_close:
       fp.close()
       
-  out = fd_to_string[proc.stdout].strip('\n')
-  err = fd_to_string[proc.stderr].strip('\n')
-  all_output = all_output.strip('\n')
+  out = fd_to_buffer[proc.stdout].getvalue().strip('\n')
+  err = fd_to_buffer[proc.stderr].getvalue().strip('\n')
+  all_output = all_output_buffer.getvalue().strip('\n')
   
   if timeout: 
     if not timeout_event.is_set():
@@ -298,6 +310,31 @@ def _call(command, logoutput=None, throw_on_failure=True, stdout=subprocess.PIPE
   
   return code, out
 
+class OutputBuffer(object):
+  """
+  Accumulates command output in chunks, so that collecting output takes
+  linear time. If max_size is set, works as a ring buffer which keeps only
+  the last max_size bytes.
+  """
+  def __init__(self, max_size=None):
+    self.chunks = collections.deque()
+    self.size = 0
+    self.max_size = max_size
+
+  def append(self, data):
+    self.chunks.append(data)
+    self.size += len(data)
+    if self.max_size is not None:
+      # drop chunks which are entirely out of retained window
+      while len(self.chunks) > 1 and self.size - len(self.chunks[0]) >= self.max_size:
+        self.size -= len(self.chunks.popleft())
+
+  def getvalue(self):
+    value = "".join(self.chunks)
+    if self.max_size is not None and len(value) > self.max_size:
+      value = value[len(value) - self.max_size:]
+    return value
+
 def as_sudo(command, env=None, auto_escape=True):
   """
   command - list or tuple of arguments.
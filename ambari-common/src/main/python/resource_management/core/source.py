@@ -28,7 +28,10 @@ from resource_management.core.utils import checked_unite
 
 __all__ = ["Source", "Template", "InlineTemplate", "StaticFile", "DownloadSource"]
 
+import hashlib
 import os
+import tempfile
+import threading
 import time
 import urllib2
 import urlparse
@@ -88,7 +91,9 @@ class StaticFile(Source):
 
 
 try:
-  from ambari_jinja2 import Environment as JinjaEnvironment, BaseLoader, TemplateNotFound, FunctionLoader, StrictUndefined
+  from ambari_jinja2 import Environment as JinjaEnvironment, BaseLoader, TemplateNotFound, StrictUndefined
+  from ambari_jinja2.bccache import FileSystemBytecodeCache
+  from ambari_jinja2.utils import LRUCache
 except ImportError:
   class Template(Source):
     def __init__(self, name, variables=None, env=None):
@@ -98,7 +103,157 @@ except ImportError:
     def __init__(self, name, variables=None, env=None):
       raise Exception("Jinja2 required for Template/InlineTemplate")
 else:
-  class TemplateLoader(BaseLoader):
+  class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """
+    On-disk bytecode cache which can be shared by concurrently running commands:
+    files are written atomically and broken ones are treated as a miss. Once there
+    are more than MAX_FILES files, the least recently written ones are removed.
+    """
+    MAX_FILES = 1000
+    def load_bytecode(self, bucket):
+      try:
+        FileSystemBytecodeCache.load_bytecode(self, bucket)
+      except Exception:
+        bucket.reset()
+
+    def dump_bytecode(self, bucket):
+      fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp")
+      try:
+        with os.fdopen(fd, "wb") as fp:
+          bucket.write_bytecode(fp)
+        os.rename(tmp_path, self._get_cache_filename(bucket))
+      except (OSError, IOError), ex:
+        Logger.debug("Cannot save template bytecode to {0}. {1}".format(self.directory, ex))
+        if os.path.exists(tmp_path):
+          os.unlink(tmp_path)
+        return
+      self.remove_old_files()
+
+    def remove_old_files(self):
+      try:
+        names = [name for name in os.listdir(self.directory) if not name.startswith(".tmp")]
+        if len(names) <= self.MAX_FILES:
+          return
+        files = []
+        for name in names:
+          path = os.path.join(self.directory, name)
+          try:
+            files.append((os.path.getmtime(path), path))
+          except OSError:
+            pass
+        files.sort()
+        for mtime, path in files[:len(files) - self.MAX_FILES]:
+          try:
+            os.unlink(path)
+          except OSError:
+            pass
+      except OSError, ex:
+        Logger.debug("Cannot clean up template bytecode cache {0}. {1}".format(self.directory, ex))
+
+
+  class TemplateCache(object):
+    """
+    Process-wide cache of compiled templates. Compiled code is looked up by template
+    name and checksum of its source, so a template is lexed, parsed and compiled
+    once per process (or once at all, if bytecode cache directory is set), no matter
+    how many Template/InlineTemplate instances render it.
+
+    Only templates loaded from files go to the bytecode cache directory. Inline
+    templates are mostly configuration content, which changes with every edit and
+    should not be left on disk.
+    """
+    CACHE_SIZE = 500
+
+    def __init__(self):
+      self.code_cache = LRUCache(self.CACHE_SIZE)
+      self.bytecode_cache = None
+      self.lock = threading.Lock()
+      self.hits = 0
+      self.misses = 0
+      self.bytecode_hits = 0
+      self.bytecode_misses = 0
+
+    def set_bytecode_cache_dir(self, directory):
+      """
+      Enables on-disk bytecode cache. Since cached bytecode is executed, the directory
+      is used only if it is owned by current user and not writable by anybody else.
+      """
+      try:
+        if not os.path.isdir(directory):
+          os.makedirs(directory, 0700)
+        st = os.stat(directory)
+      except OSError, ex:
+        Logger.debug("Cannot use {0} as template bytecode cache. {1}".format(directory, ex))
+        return False
+
+      if st.st_uid != os.geteuid() or st.st_mode & 022:
+        Logger.warning("Not using {0} as template bytecode cache, since it's not owned by current user or is writable by others".format(directory))
+        return False
+
+      self.bytecode_cache = TemplateBytecodeCache(directory)
+      return True
+
+    def get_code(self, environment, source, name, filename):
+      # lexer settings (trim_blocks etc.) change the compiled code, so they are a part of the key
+      checksum = hashlib.sha1(source.encode('utf-8') if isinstance(source, unicode) else source).hexdigest()
+      key = (name, filename, checksum, environment.trim_blocks, environment.autoescape)
+      code = self.code_cache.get(key)
+      if code is not None:
+        with self.lock:
+          self.hits += 1
+        return code
+
+      bytecode_cache = self.bytecode_cache if filename is not None else None
+      bucket = None
+      if bytecode_cache is not None:
+        bucket = bytecode_cache.get_bucket(environment, name, filename, source)
+        code = bucket.code
+
+      with self.lock:
+        self.misses += 1
+        if bucket is not None:
+          if code is not None:
+            self.bytecode_hits += 1
+          else:
+            self.bytecode_misses += 1
+
+      if code is None:
+        code = environment.compile(source, name, filename)
+        if bucket is not None:
+          bucket.code = code
+          bytecode_cache.set_bucket(bucket)
+
+      self.code_cache[key] = code
+      return code
+
+    def get_statistics(self):
+      with self.lock:
+        return {
+          'hits': self.hits,
+          'misses': self.misses,
+          'bytecode_hits': self.bytecode_hits,
+          'bytecode_misses': self.bytecode_misses,
+        }
+
+  template_cache = TemplateCache()
+
+
+  class CachingLoader(BaseLoader):
+    """
+    Loader which takes compiled templates from template_cache
+    """
+    def load(self, environment, name, globals=None):
+      source, filename, uptodate = self.get_source(environment, name)
+      code = template_cache.get_code(environment, source, name, filename)
+      return environment.template_class.from_code(environment, code, globals or {}, uptodate)
+
+
+  class InlineTemplateLoader(CachingLoader):
+    def get_source(self, environment, template_name):
+      return template_name, None, None
+
+
+  class TemplateLoader(CachingLoader):
     def __init__(self, env=None):
       self.env = env or Environment.get_instance()
 
@@ -144,7 +299,7 @@ else:
     
   class InlineTemplate(Template):
     def __init__(self, name, extra_imports=[], **kwargs):
-      self.template_env = JinjaEnvironment(loader=FunctionLoader(lambda text: text))
+      self.template_env = JinjaEnvironment(loader=InlineTemplateLoader())
       super(InlineTemplate, self).__init__(name, extra_imports, **kwargs) 
   
     def __repr__(self):
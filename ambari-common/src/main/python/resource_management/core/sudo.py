@@ -26,6 +26,7 @@ import shutil
 import stat
 import errno
 from resource_management.core import shell
+from resource_management.core import sudo_broker
 from resource_management.core.logger import Logger
 from resource_management.core.exceptions import Fail
 from ambari_commons.os_check import OSCheck
@@ -144,8 +145,15 @@ if os.geteuid() == 0:
     
     
 else:
+  # Every function below first tries the sudo broker (if it was started for this process)
+  # and falls back to a separate sudo call otherwise.
+
   # os.chown replacement
   def chown(path, owner, group):
+    broker = sudo_broker.get_broker()
+    if broker and (owner or group):
+      return broker.call("chown", path, owner.pw_uid if owner else -1, group.gr_gid if group else -1)
+
     owner = owner.pw_name if owner else ""
     group = group.gr_name if group else ""
     if owner or group:
@@ -162,6 +170,9 @@ else:
       
   # os.chmod replacement
   def chmod(path, mode):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("chmod", path, mode)
     shell.checked_call(["chmod", oct(mode), path], sudo=True)
     
   def chmod_extended(path, mode):
@@ -169,24 +180,39 @@ else:
     
   # os.makedirs replacement
   def makedirs(path, mode):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("makedirs", path, mode)
     shell.checked_call(["mkdir", "-p", path], sudo=True)
     chmod(path, mode)
     
   # os.makedir replacement
   def makedir(path, mode):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("makedir", path, mode)
     shell.checked_call(["mkdir", path], sudo=True)
     chmod(path, mode)
     
   # os.symlink replacement
   def symlink(source, link_name):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("symlink", source, link_name)
     shell.checked_call(["ln","-sf", source, link_name], sudo=True)
     
   # os.link replacement
   def link(source, link_name):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("link", source, link_name)
     shell.checked_call(["ln", "-f", source, link_name], sudo=True)
     
   # os unlink
   def unlink(path):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("unlink", path)
     shell.checked_call(["rm","-f", path], sudo=True)
     
   # shutil.rmtree
@@ -200,6 +226,10 @@ else:
     """
     content = content if content else ""
     content = content.encode(encoding) if encoding else content
+
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("create_file", filename, content)
     
     tmpf_name = tempfile.gettempdir() + os.sep + tempfile.template + str(time.time())
     
@@ -213,40 +243,64 @@ else:
       
   # fp.read replacement
   def read_file(filename, encoding=None):
-    tmpf = tempfile.NamedTemporaryFile()
-    shell.checked_call(["cp", "-f", filename, tmpf.name], sudo=True)
-    
-    with tmpf:
-      with open(tmpf.name, "rb") as fp:
-        content = fp.read()
+    broker = sudo_broker.get_broker()
+    if broker:
+      content = broker.call("read_file", filename)
+    else:
+      tmpf = tempfile.NamedTemporaryFile()
+      shell.checked_call(["cp", "-f", filename, tmpf.name], sudo=True)
+
+      with tmpf:
+        with open(tmpf.name, "rb") as fp:
+          content = fp.read()
         
     content = content.decode(encoding) if encoding else content
     return content
       
   # os.path.exists
   def path_exists(path):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("exists", path)
     return (shell.call(["test", "-e", path], sudo=True)[0] == 0)
   
   # os.path.isdir
   def path_isdir(path):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("isdir", path)
     return (shell.call(["test", "-d", path], sudo=True)[0] == 0)
   
   # os.path.lexists
   def path_lexists(path):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("lexists", path)
     return (shell.call(["test", "-L", path], sudo=True)[0] == 0)
   
   # os.readlink
   def readlink(path):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("readlink", path)
     return shell.checked_call(["readlink", path], sudo=True)[1].strip()
   
   # os.path.isfile
   def path_isfile(path):
+    broker = sudo_broker.get_broker()
+    if broker:
+      return broker.call("isfile", path)
     return (shell.call(["test", "-f", path], sudo=True)[0] == 0)
 
   # os.stat
   def stat(path):
     class Stat:
       def __init__(self, path):
+        broker = sudo_broker.get_broker()
+        if broker:
+          self.st_uid, self.st_gid, self.st_mode = broker.call("stat", path)
+          return
+
         cmd = ["stat", "-c", "%u %g %a", path]
         code, out, err = shell.checked_call(cmd, sudo=True, stderr=subprocess.PIPE)
         values = out.split(' ')
@@ -260,6 +314,9 @@ else:
   # os.kill replacement
   def kill(pid, signal):
     try:
+      broker = sudo_broker.get_broker()
+      if broker:
+        return broker.call("kill", int(pid), int(signal))
       shell.checked_call(["kill", "-"+str(signal), str(pid)], sudo=True)
     except Fail as ex:
       raise OSError(str(ex))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Ambari Agent
+
+"""
+
+__all__ = ["SudoBroker", "start", "stop", "get_broker"]
+
+import atexit
+import os
+import subprocess
+import sys
+import threading
+
+from resource_management.core import sudo_broker_server
+from resource_management.core.exceptions import Fail
+from resource_management.core.logger import Logger
+from ambari_commons.constants import AMBARI_SUDO_BINARY
+
+SERVER_SCRIPT = os.path.splitext(sudo_broker_server.__file__)[0] + ".py"
+
+
+class SudoBroker(object):
+  """
+  Long-lived privileged helper used by resource_management.core.sudo in
+  non-root mode. Instead of forking 'sudo <command>' for every stat, read or
+  chmod, requests are sent to a single process started via sudo and served
+  in batches over a pipe.
+  """
+
+  def __init__(self, command=None):
+    # The root interpreter must not take PYTHONPATH, PYTHONHOME etc. or user site-packages from
+    # the caller, they could shadow the standard library. The server needs no environment at all.
+    self.command = command or [AMBARI_SUDO_BINARY, "-n", "-H", sys.executable, "-E", "-s", SERVER_SCRIPT]
+    self.process = None
+    self.lock = threading.Lock()
+    self.requests_count = 0
+    self.operations_count = 0
+
+  def start(self):
+    """
+    Starts the privileged process, returns False if it could not be started
+    (e.g. sudo rules do not allow it)
+    """
+    try:
+      self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, close_fds=True)
+      self.call("ping")
+    except (OSError, Fail) as ex:
+      Logger.warning("Cannot start sudo broker, privileged file operations will be run via sudo. {0}".format(ex))
+      self.stop()
+      return False
+    return True
+
+  def is_running(self):
+    return self.process is not None and self.process.poll() is None
+
+  def stop(self):
+    if self.process is None:
+      return
+    process, self.process = self.process, None
+    try:
+      process.stdin.close()
+      process.wait()
+    except (OSError, IOError):
+      pass
+
+  def call(self, operation, *args):
+    """
+    Executes single operation, raises Fail if it has failed
+    """
+    return self.unpack_result(operation, args, self.call_many([(operation, args)])[0])
+
+  def call_many(self, operations):
+    """
+    Executes list of (operation, args) in one round-trip. Returns raw results
+    as given by sudo_broker_server.execute_request.
+    """
+    with self.lock:
+      if self.process is None:
+        raise Fail("Sudo broker is not running")
+      try:
+        sudo_broker_server.write_frame(self.process.stdin, [(operation, tuple(args)) for operation, args in operations])
+        results = sudo_broker_server.read_frame(self.process.stdout)
+      except (IOError, ValueError, EOFError) as ex:
+        results = None
+        Logger.warning("Communication with sudo broker failed. {0}".format(ex))
+
+      if results is None:
+        self.stop()
+        raise Fail("Sudo broker has terminated unexpectedly")
+
+      self.requests_count += 1
+      self.operations_count += len(operations)
+      return results
+
+  @staticmethod
+  def unpack_result(operation, args, result):
+    """
+    Returns value of the operation result or raises Fail
+    """
+    if result[0] == sudo_broker_server.RESULT_OK:
+      return result[1]
+    raise Fail("Privileged operation {0}{1} failed. {2}".format(operation, args, result[2]))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def start():
+  """
+  Starts broker used by sudo module for the rest of this process life
+  """
+  global _broker
+  with _broker_lock:
+    if _broker is not None and _broker.is_running():
+      return _broker
+    broker = SudoBroker()
+    if broker.start():
+      _broker = broker
+      atexit.register(stop)
+    return _broker
+
+
+def stop():
+  global _broker
+  with _broker_lock:
+    if _broker is not None:
+      Logger.debug("Sudo broker has served {0} operations in {1} requests".format(_broker.operations_count,
+                                                                                 _broker.requests_count))
+      _broker.stop()
+      _broker = None
+
+
+def get_broker():
+  """
+  Returns running broker or None, if privileged operations should be run via sudo
+  """
+  broker = _broker
+  if broker is not None and broker.is_running():
+    return broker
+  return None
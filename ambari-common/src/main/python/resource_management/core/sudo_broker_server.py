@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Ambari Agent
+
+Privileged side of the sudo broker (see sudo_broker.py). It is started once
+per command via ambari-sudo.sh and serves file operations over stdin/stdout
+until stdin is closed.
+
+This file is executed as a plain script by root, so it must depend on the
+standard library only.
+"""
+
+import errno
+import marshal
+import os
+import struct
+import sys
+
+HEADER_FORMAT = "!I"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+RESULT_OK = "ok"
+RESULT_ERROR = "error"
+
+
+def read_frame(fp):
+  """
+  Returns unmarshalled frame or None if the other side has closed the stream
+  """
+  header = _read_exactly(fp, HEADER_SIZE)
+  if header is None:
+    return None
+  length, = struct.unpack(HEADER_FORMAT, header)
+  payload = _read_exactly(fp, length)
+  if payload is None:
+    return None
+  return marshal.loads(payload)
+
+
+def write_frame(fp, data):
+  payload = marshal.dumps(data)
+  fp.write(struct.pack(HEADER_FORMAT, len(payload)) + payload)
+  fp.flush()
+
+
+def _read_exactly(fp, size):
+  chunks = []
+  while size > 0:
+    chunk = fp.read(size)
+    if not chunk:
+      return None
+    chunks.append(chunk)
+    size -= len(chunk)
+  return "".join(chunks)
+
+
+def do_create_file(path, content):
+  with open(path, "wb") as fp:
+    fp.write(content)
+
+
+def do_read_file(path):
+  with open(path, "rb") as fp:
+    return fp.read()
+
+
+def do_stat(path):
+  st = os.stat(path)
+  return (st.st_uid, st.st_gid, st.st_mode & 07777)
+
+
+def do_unlink(path):
+  # same as 'rm -f'
+  try:
+    os.unlink(path)
+  except OSError as ex:
+    if ex.errno != errno.ENOENT:
+      raise
+
+
+def do_makedirs(path, mode):
+  # same as 'mkdir -p' followed by 'chmod'
+  if not os.path.isdir(path):
+    os.makedirs(path)
+  os.chmod(path, mode)
+
+
+def do_makedir(path, mode):
+  os.mkdir(path)
+  os.chmod(path, mode)
+
+
+def do_symlink(source, link_name):
+  # same as 'ln -sf'
+  do_unlink(link_name)
+  os.symlink(source, link_name)
+
+
+def do_link(source, link_name):
+  # same as 'ln -f'
+  do_unlink(link_name)
+  os.link(source, link_name)
+
+
+OPERATIONS = {
+  "ping": lambda: True,
+  "exists": os.path.exists,
+  "isdir": os.path.isdir,
+  "isfile": os.path.isfile,
+  "lexists": os.path.islink,
+  "readlink": os.readlink,
+  "stat": do_stat,
+  "read_file": do_read_file,
+  "create_file": do_create_file,
+  "chmod": os.chmod,
+  "chown": os.chown,
+  "unlink": do_unlink,
+  "makedirs": do_makedirs,
+  "makedir": do_makedir,
+  "symlink": do_symlink,
+  "link": do_link,
+  "kill": os.kill,
+}
+
+
+def execute_request(request):
+  """
+  request is a list of (operation, args) tuples, result contains
+  (RESULT_OK, value) or (RESULT_ERROR, errno, message) for every operation.
+  An error does not stop execution of the rest of the batch.
+  """
+  results = []
+  for operation, args in request:
+    try:
+      if operation not in OPERATIONS:
+        raise ValueError("Unknown operation '{0}'".format(operation))
+      results.append((RESULT_OK, OPERATIONS[operation](*args)))
+    except (OSError, IOError) as ex:
+      results.append((RESULT_ERROR, ex.errno or 0, str(ex)))
+    except Exception as ex:
+      results.append((RESULT_ERROR, 0, "{0}: {1}".format(ex.__class__.__name__, ex)))
+  return results
+
+
+def serve(input_fp, output_fp):
+  while True:
+    request = read_frame(input_fp)
+    if request is None:
+      return
+    write_frame(output_fp, execute_request(request))
+
+
+if __name__ == "__main__":
+  # marshal data must not be mangled by any text mode conversions
+  serve(os.fdopen(sys.stdin.fileno(), "rb", 0), os.fdopen(sys.stdout.fileno(), "wb"))
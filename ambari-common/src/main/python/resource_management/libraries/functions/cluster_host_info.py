@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Ambari Agent
+
+"""
+
+__all__ = ["decompress_cluster_host_info", "expand_cluster_host_info_value",
+           "expand_ranges", "expand_mapped_ranges"]
+
+from resource_management.core.exceptions import Fail
+
+HOSTS_LIST_KEY = "all_hosts"
+PING_PORTS_KEY = "all_ping_ports"
+RACKS_KEY = "all_racks"
+IPV4_ADDRESSES_KEY = "all_ipv4_ips"
+AMBARI_SERVER_HOST = "ambari_server_host"
+
+# Keys holding ['value:m-n,k', ...] lists indexed the same way as all_hosts
+MAPPED_RANGE_KEYS = [PING_PORTS_KEY, RACKS_KEY, IPV4_ADDRESSES_KEY]
+# Keys which are not compressed at all
+PLAIN_KEYS = [HOSTS_LIST_KEY, AMBARI_SERVER_HOST]
+
+_MISSING = object()
+
+
+def _parse_ranges(ranges_token, error_message):
+  """
+  Converts '1-3,5' to [(1, 3), (5, 5)]
+  """
+  result = []
+  for r in ranges_token.split(','):
+    bounds = r.split('-')
+    if len(bounds) == 2:
+      if not bounds[0] or not bounds[1]:
+        raise Fail(error_message + str(r))
+      result.append((int(bounds[0]), int(bounds[1])))
+    elif len(bounds) == 1:
+      index = int(bounds[0])
+      result.append((index, index))
+    else:
+      raise Fail(error_message + str(r))
+  return result
+
+
+def expand_ranges(ranges):
+  """
+  Converts ['1-3,5', '6-8'] to [1,2,3,5,6,7,8]
+  """
+  result = []
+  for token in ranges:
+    for start, end in _parse_ranges(token, "Broken data in given range, expected - ""m-n"" or ""m"", got : "):
+      result.extend(xrange(start, end + 1))
+  return result
+
+
+def expand_mapped_ranges(mapped_ranges):
+  """
+  Converts ['1:0-2,4', '42:3,5-7'] to [1,1,1,42,1,42,42,42]
+  Values are placed to a table indexed by host index, so result is ordered
+  the same way as all_hosts
+  """
+  table = []
+  for token in mapped_ranges:
+    value_to_ranges = token.split(":")
+    if len(value_to_ranges) != 2:
+      raise Fail("Broken data in given value to range, expected format - ""value:m-n"", got - " + str(token))
+    value = value_to_ranges[0]
+    if value.isdigit():
+      value = int(value)
+    for start, end in _parse_ranges(value_to_ranges[1], "Broken data in given value to range, expected format - ""value:m-n"", got - "):
+      if end >= len(table):
+        table.extend([_MISSING] * (end + 1 - len(table)))
+      table[start:end + 1] = [value] * (end - start + 1)
+  return [value for value in table if value is not _MISSING]
+
+
+def expand_cluster_host_info_value(key, value, hosts_list):
+  """
+  Expands single compressed clusterHostInfo entry
+  """
+  if key in PLAIN_KEYS:
+    return value
+  if key in MAPPED_RANGE_KEYS:
+    expanded = expand_mapped_ranges(value)
+    if key == PING_PORTS_KEY:
+      expanded = map(str, expanded)
+    return expanded
+  return [hosts_list[i] for i in expand_ranges(value)]
+
+
+def decompress_cluster_host_info(cluster_host_info):
+  """
+  Expands host lists of clusterHostInfo compressed by the server.
+  Role keys are converted from ['1-3,5'] to [host1,host2,host3,host5]
+  """
+  hosts_list = cluster_host_info[HOSTS_LIST_KEY]
+  result = {}
+  for key, value in cluster_host_info.iteritems():
+    result[key] = expand_cluster_host_info_value(key, value, hosts_list)
+  return result
@@ -29,6 +29,26 @@ from resource_management.core.environment import Environment
 from resource_management.core.logger import Logger
 from resource_management.core.shell import quote_bash_args
 from resource_management.core import utils
+from resource_management.core.utils import AttributeDictionary
+
+
+class LayeredLookup(object):
+  """
+  Read-only mapping which looks a key up in local variables first and then in
+  environment params, so that format() does not need to merge (copy) them on
+  every call. Values are converted the same way as if they were stored in params.
+  """
+  def __init__(self, variables, params, hidden_variables=()):
+    self.variables = variables
+    self.params = params
+    self.hidden_variables = hidden_variables
+    self.convert_value = params._convert_value if isinstance(params, AttributeDictionary) else None
+
+  def __getitem__(self, key):
+    if key in self.variables and not key in self.hidden_variables:
+      value = self.variables[key]
+      return self.convert_value(value) if self.convert_value else value
+    return self.params[key]
 
 
 class ConfigurationFormatter(Formatter):
@@ -37,45 +57,75 @@ class ConfigurationFormatter(Formatter):
   !e - escape bash properties flag
   !h - hide sensitive information from the logs
   !p - password flag, !p=!s+!e. Has both !e, !h effect
+
+  Format strings are parsed once and cached. The string is rendered in a single pass;
+  values of !h and !p fields are registered in Logger.sensitive_strings, so that
+  they are masked wherever they appear in the logs.
   """
+  PARSE_CACHE_SIZE = 2000
+  _parse_cache = {}
+
+  SENSITIVE_CONVERSIONS = ['h', 'p']
+
   def format(self, format_string, *args, **kwargs):
-    variables = kwargs
-    
+    return self.format_with_variables(format_string, args, kwargs)
+
+  def format_with_variables(self, format_string, args, variables, hidden_variables=()):
     if Environment.has_instance():
-      env = Environment.get_instance()
-      params = env.config.params
-  
-      # don't use checked_unite for this as it would interfere with reload(module)
-      # for things like params and status_params; instead, start out copying
-      # the environment parameters and add in any locally declared variables to
-      # override existing env parameters
-      all_params = params.copy()
+      params = Environment.get_instance().config.params
     else:
-      all_params = {}
-      
-    all_params.update(variables)
-
-    self.convert_field = self.convert_field_protected
-    result_protected = self.vformat(format_string, args, all_params)
-    
-    self.convert_field = self.convert_field_unprotected
-    result_unprotected = self.vformat(format_string, args, all_params)
-    
-    if result_protected != result_unprotected:
-      Logger.sensitive_strings[result_unprotected] = result_protected
-      
-    return result_unprotected
-  
-  def convert_field_unprotected(self, value, conversion):
-    return self._convert_field(value, conversion, False)
-  
-  def convert_field_protected(self, value, conversion):
+      params = {}
+
+    # locally declared variables override environment parameters
+    lookup = LayeredLookup(variables, params, hidden_variables)
+
+    pieces = []
+    self._render(format_string, args, lookup, pieces, 2)
+    return "".join(pieces)
+
+  def parse(self, format_string):
+    parsed = self._parse_cache.get(format_string)
+    if parsed is None:
+      parsed = list(super(ConfigurationFormatter, self).parse(format_string))
+      if len(self._parse_cache) >= self.PARSE_CACHE_SIZE:
+        self._parse_cache.clear()
+      self._parse_cache[format_string] = parsed
+    return parsed
+
+  def vformat(self, format_string, args, kwargs):
+    pieces = []
+    self._render(format_string, args, kwargs, pieces, 2)
+    return "".join(pieces)
+
+  def _render(self, format_string, args, kwargs, pieces, recursion_depth):
     """
-    Enable masking sensitive information like
-    passwords from logs via !p (password) format flag.
+    Same as string.Formatter._vformat, but appends results to pieces and registers
+    pieces produced by !h/!p fields as sensitive strings.
     """
-    return self._convert_field(value, conversion, True)
-  
+    if recursion_depth < 0:
+      raise ValueError('Max string recursion exceeded')
+
+    for literal_text, field_name, format_spec, conversion in self.parse(format_string):
+      if literal_text:
+        pieces.append(literal_text)
+
+      if field_name is not None:
+        obj, arg_used = self.get_field(field_name, args, kwargs)
+        obj = self._convert_field(obj, conversion, False)
+
+        if format_spec:
+          spec_pieces = []
+          self._render(format_spec, args, kwargs, spec_pieces, recursion_depth - 1)
+          format_spec = "".join(spec_pieces)
+
+        piece = self.format_field(obj, format_spec)
+        if conversion in self.SENSITIVE_CONVERSIONS:
+          Logger.sensitive_strings[piece] = self.format_field(utils.PASSWORDS_HIDE_STRING, format_spec)
+        pieces.append(piece)
+
+  def convert_field(self, value, conversion):
+    return self._convert_field(value, conversion, False)
+
   def _convert_field(self, value, conversion, is_protected):
     if conversion == 'e':
       return quote_bash_args(unicode(value))
@@ -90,6 +140,7 @@ class ConfigurationFormatter(Formatter):
 def format(format_string, *args, **kwargs):
   variables = sys._getframe(1).f_locals
   
-  result = checked_unite(kwargs, variables)
-  result.pop("self", None) # self kwarg would result in an error
-  return ConfigurationFormatter().format(format_string, args, **result)
+  if kwargs:
+    variables = checked_unite(kwargs, variables)
+  # self kwarg would result in an error
+  return ConfigurationFormatter().format_with_variables(format_string, (args,), variables, hidden_variables=("self",))
@@ -20,40 +20,76 @@ Ambari Agent
 
 """
 
-import time
 import os
-import resource_management
+from ambari_jinja2 import escape
+from ambari_jinja2.filters import do_dictsort
 from resource_management.core.resources import File
 from resource_management.core.providers import Provider
-from resource_management.core.source import InlineTemplate
+from resource_management.core.source import Source, InlineTemplate
 from resource_management.libraries.functions.format import format
 from resource_management.core.environment import Environment
 from resource_management.core.logger import Logger
 
+# values containing any of these are rendered as templates
+TEMPLATE_MARKERS = ["{{", "{%", "{#"]
+
+
+class XmlConfigContent(Source):
+  """
+  Serializes configurations into *-site.xml content.
+
+  The output is exactly what the former Jinja template of XmlConfigProvider produced
+  (same whitespace, sorting and escaping), but properties are written directly and
+  only values which look like templates are rendered by InlineTemplate.
+  """
+  def __init__(self, name, configurations, configuration_attributes):
+    super(XmlConfigContent, self).__init__(name)
+    self.configurations = configurations
+    self.configuration_attributes = configuration_attributes
+
+  def get_content(self):
+    attributes = self.configuration_attributes
+    if attributes is not None:
+      attributes = attributes.items()
+
+    result = [u"  <configuration>\n    "]
+    for key, value in do_dictsort(self.configurations):
+      result.append(u"\n    <property>\n      <name>")
+      result.append(unicode(escape(key)))
+      result.append(u"</name>\n      <value>")
+      result.append(unicode(escape(self.render_value(value))))
+      result.append(u"</value>")
+
+      if attributes is not None:
+        for attribute_name, attribute_occurrences in attributes:
+          for property_name, attribute_value in attribute_occurrences.items():
+            if property_name == key and attribute_name:
+              escaped_name = unicode(escape(attribute_name))
+              result.append(u"\n      <%s>%s</%s>" % (escaped_name, unicode(escape(attribute_value)), escaped_name))
+
+      result.append(u"\n    </property>\n    ")
+    result.append(u"\n  </configuration>")
+    return u"".join(result)
+
+  @staticmethod
+  def render_value(value):
+    value = str(value)
+    for marker in TEMPLATE_MARKERS:
+      if marker in value:
+        return InlineTemplate(value).get_content()
+    # plain text is rendered by Jinja with newlines normalized and the trailing one dropped
+    return u"\n".join(unicode(value).splitlines())
+
+  def __repr__(self):
+    return "XmlConfigContent('" + self.name + "')"
+
+
 class XmlConfigProvider(Provider):
   def action_create(self):
     filename = self.resource.filename
     xml_config_provider_config_dir = self.resource.conf_dir
 
-    # |e - for html-like escaping of <,>,',"
-    config_content = InlineTemplate('''  <configuration>
-    {% for key, value in configurations_dict|dictsort %}
-    <property>
-      <name>{{ key|e }}</name>
-      <value>{{ resource_management.core.source.InlineTemplate(str(value)).get_content() |e }}</value>
-      {%- if not configuration_attrs is none -%}
-      {%- for attrib_name, attrib_occurances in  configuration_attrs.items() -%}
-      {%- for property_name, attrib_value in  attrib_occurances.items() -%}
-      {% if property_name == key and attrib_name %}
-      <{{attrib_name|e}}>{{attrib_value|e}}</{{attrib_name|e}}>
-      {%- endif -%}
-      {%- endfor -%}
-      {%- endfor -%}
-      {%- endif %}
-    </property>
-    {% endfor %}
-  </configuration>''', extra_imports=[time, resource_management, resource_management.core, resource_management.core.source], configurations_dict=self.resource.configurations,
-                                    configuration_attrs=self.resource.configuration_attributes)
+    config_content = XmlConfigContent(filename, self.resource.configurations, self.resource.configuration_attributes)
 
     xml_config_dest_file_path = os.path.join(xml_config_provider_config_dir, filename)
     Logger.info("Generating config: {0}".format(xml_config_dest_file_path))
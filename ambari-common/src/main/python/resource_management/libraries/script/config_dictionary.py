@@ -18,6 +18,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 from resource_management.core.exceptions import Fail
+from resource_management.libraries.functions.cluster_host_info import expand_cluster_host_info_value, HOSTS_LIST_KEY
 
 IMMUTABLE_MESSAGE = """Configuration dictionary is immutable!
 
@@ -35,7 +36,7 @@ class ConfigDictionary(dict):
     Recursively turn dict to ConfigDictionary
     """
     for k, v in dictionary.iteritems():
-      if isinstance(v, dict):
+      if isinstance(v, dict) and not isinstance(v, ConfigDictionary):
         dictionary[k] = ConfigDictionary(v)
         
     super(ConfigDictionary, self).__init__(dictionary)
@@ -62,6 +63,45 @@ class ConfigDictionary(dict):
     return value
 
 
+class ClusterHostInfoDictionary(ConfigDictionary):
+  """
+  Immutable clusterHostInfo dictionary. Keeps host lists in the compressed
+  form sent by the server and expands every entry on first access.
+  """
+
+  def __init__(self, dictionary):
+    super(ClusterHostInfoDictionary, self).__init__(dictionary)
+    self.expanded_keys = set()
+
+  def __getitem__(self, name):
+    if name not in self.expanded_keys and dict.__contains__(self, name):
+      value = expand_cluster_host_info_value(name, dict.__getitem__(self, name),
+                                             dict.get(self, HOSTS_LIST_KEY))
+      dict.__setitem__(self, name, value)
+      self.expanded_keys.add(name)
+    return super(ClusterHostInfoDictionary, self).__getitem__(name)
+
+  def get(self, name, default=None):
+    return self[name] if name in self else default
+
+  def itervalues(self):
+    for name in self.iterkeys():
+      yield self[name]
+
+  def iteritems(self):
+    for name in self.iterkeys():
+      yield name, self[name]
+
+  def values(self):
+    return list(self.itervalues())
+
+  def items(self):
+    return list(self.iteritems())
+
+  def copy(self):
+    return dict(self.iteritems())
+
+
 class UnknownConfiguration():
   """
   Lazy failing for unknown configs.
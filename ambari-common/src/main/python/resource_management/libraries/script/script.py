@@ -23,6 +23,7 @@ __all__ = ["Script"]
 
 import re
 import os
+import marshal
 import sys
 import logging
 import platform
@@ -30,14 +31,15 @@ import inspect
 import tarfile
 import resource_management
 from ambari_commons import OSCheck, OSConst
-from ambari_commons.constants import UPGRADE_TYPE_NON_ROLLING, UPGRADE_TYPE_ROLLING
+from ambari_commons.constants import UPGRADE_TYPE_NON_ROLLING, UPGRADE_TYPE_ROLLING, COMMAND_MARSHAL_FILE_SUFFIX
 from ambari_commons.os_family_impl import OsFamilyFuncImpl, OsFamilyImpl
 from resource_management.libraries.resources import XmlConfig
 from resource_management.libraries.resources import PropertiesFile
 from resource_management.core.resources import File, Directory
-from resource_management.core.source import InlineTemplate
+from resource_management.core.source import InlineTemplate, template_cache
 from resource_management.core.environment import Environment
 from resource_management.core.logger import Logger
+from resource_management.core import sudo_broker
 from resource_management.core.exceptions import Fail, ClientComponentHasNoStatus, ComponentIsNotRunning
 from resource_management.core.resources.packaging import Package
 from resource_management.libraries.functions.version_select_util import get_component_version
@@ -46,7 +48,7 @@ from resource_management.libraries.functions.version import format_stack_version
 from resource_management.libraries.functions import stack_tools
 from resource_management.libraries.functions.constants import Direction
 from resource_management.libraries.functions import packages_analyzer
-from resource_management.libraries.script.config_dictionary import ConfigDictionary, UnknownConfiguration
+from resource_management.libraries.script.config_dictionary import ConfigDictionary, ClusterHostInfoDictionary, UnknownConfiguration
 from resource_management.core.resources.system import Execute
 from contextlib import closing
 from resource_management.libraries.functions.stack_features import check_stack_feature
@@ -74,6 +76,8 @@ USAGE = """Usage: {0} <COMMAND> <JSON_CONFIG> <BASEDIR> <STROUTPUT> <LOGGING_LEV
 
 _PASSWORD_MAP = {"/configurations/cluster-env/hadoop.user.name":"/configurations/cluster-env/hadoop.user.password"}
 STACK_VERSION_PLACEHOLDER = "${stack_version}"
+# directory under agent cache dir for compiled templates
+TEMPLATE_BYTECODE_CACHE_DIR = "template_bytecode"
 
 def get_path_from_configuration(name, configuration):
   subdicts = filter(None, name.split('/'))
@@ -222,7 +226,10 @@ class Script(object):
     try:
       with open(self.command_data_file) as f:
         pass
-        Script.config = ConfigDictionary(json.load(f))
+        config = Script.load_command_data(self.command_data_file)
+        if config.get('clusterHostInfoCompressed') and 'clusterHostInfo' in config:
+          config['clusterHostInfo'] = ClusterHostInfoDictionary(config['clusterHostInfo'])
+        Script.config = ConfigDictionary(config)
         # load passwords here(used on windows to impersonate different users)
         Script.passwords = {}
         for k, v in _PASSWORD_MAP.iteritems():
@@ -233,12 +240,25 @@ class Script(object):
       Logger.logger.exception("Can not read json file with command parameters: ")
       sys.exit(1)
 
+    from resource_management.libraries.functions.default import default
+    if not OSCheck.is_windows_family() and os.geteuid() != 0 and \
+        str(default("/hostLevelParams/agentSudoBroker", "false")).lower() == "true":
+      sudo_broker.start()
+
+    agent_cache_dir = default("/hostLevelParams/agentCacheDir", None)
+    if agent_cache_dir:
+      template_cache.set_bytecode_cache_dir(os.path.join(agent_cache_dir, TEMPLATE_BYTECODE_CACHE_DIR))
+
     # Run class method depending on a command type
     try:
       method = self.choose_method_to_execute(self.command_name)
       with Environment(self.basedir, tmp_dir=Script.tmp_dir) as env:
         env.config.download_path = Script.tmp_dir
-        method(env)
+        try:
+          method(env)
+        finally:
+          env.log_timing_profile()
+          Logger.debug("Template cache statistics: {0}".format(template_cache.get_statistics()))
     finally:
       if self.should_expose_component_version(self.command_name):
         self.save_component_version_to_structured_out()
@@ -313,6 +333,23 @@ class Script(object):
     """
     return Script.config
 
+  @staticmethod
+  def load_command_data(command_data_file):
+    """
+    Loads command parameters. Hooks and the script of one task read the same
+    command, so the agent may write a marshalled copy of it, which is much
+    faster to load than json. Json is used if the copy is missing or stale.
+    """
+    marshal_file = command_data_file + COMMAND_MARSHAL_FILE_SUFFIX
+    try:
+      if os.path.getmtime(marshal_file) >= os.path.getmtime(command_data_file):
+        with open(marshal_file, "rb") as f:
+          return marshal.load(f)
+    except (OSError, IOError, EOFError, ValueError, TypeError):
+      pass
+    with open(command_data_file) as f:
+      return json.load(f)
+
   @staticmethod
   def get_password(user):
     return Script.passwords[user]
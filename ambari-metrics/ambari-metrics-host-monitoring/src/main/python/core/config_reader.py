@@ -83,6 +83,8 @@ PID_DIR = os.path.join(os.sep, "var", "run", "ambari-metrics-host-monitoring")
 PID_OUT_FILE = PID_DIR + os.sep + "ambari-metrics-host-monitoring.pid"
 EXITCODE_OUT_FILE = PID_DIR + os.sep + "ambari-metrics-host-monitoring.exitcode"
 
+SPOOL_DIR = os.path.join(os.sep, "var", "lib", "ambari-metrics-monitor", "spool")
+
 SERVICE_USERNAME_KEY = "TMP_AMHM_USERNAME"
 SERVICE_PASSWORD_KEY = "TMP_AMHM_PASSWORD"
 
@@ -201,6 +203,15 @@ class Configuration:
   def get_send_interval(self):
     return int(self.get("emitter", "send_interval", 60))
 
+  def get_spool_dir(self):
+    return self.get("emitter", "spool_dir", SPOOL_DIR)
+
+  def get_spool_max_size(self):
+    return int(self.get("emitter", "spool_max_size_mb", 64)) * 1024 * 1024
+
+  def get_spool_segment_size(self):
+    return int(self.get("emitter", "spool_segment_size_kb", 1024)) * 1024
+
   def get_collector_sleep_interval(self):
     return int(self.get("collector", "collector_sleep_interval", 10))
 
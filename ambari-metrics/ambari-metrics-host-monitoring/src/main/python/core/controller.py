@@ -18,20 +18,25 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 
+import heapq
 import logging
 import threading
 import time
 from Queue import Queue
-from threading import Timer
 from application_metric_map import ApplicationMetricMap
 from event_definition import HostMetricCollectEvent, ProcessMetricCollectEvent
-from metric_collector import MetricsCollector
+from metric_collector import MetricsCollector, DEFAULT_HOST_APP_ID
 from emitter import Emitter
 from host_info import HostInfo
 
 logger = logging.getLogger()
 
 class Controller(threading.Thread):
+  """
+  Runs collections of all metric groups from its own thread, every group at its
+  collect interval. Collections of a group never overlap: if a collection takes
+  longer than the interval, the runs that were missed are skipped and counted.
+  """
 
   def __init__(self, config, stop_handler):
     # Process initialization code
@@ -50,42 +55,88 @@ class Controller(threading.Thread):
     self._stop_handler = stop_handler
     self.initialize_events_cache()
     self.emitter = Emitter(self.config, self.application_metric_map, stop_handler)
-    self._t = None
+    # heap of [next collection time, position in events cache, event]
+    self.schedule = []
+    # group name -> number of collections skipped, since the previous one was late
+    self.skipped_collections = {}
 
   def run(self):
     logger.info('Running Controller thread: %s' % threading.currentThread().getName())
 
     self.start_emitter()
+    self.initialize_schedule()
 
-    # Wake every 5 seconds to push events to the queue
     while True:
-      if (self.event_queue.full()):
-        logger.warn('Event Queue full!! Suspending further collections.')
-      else:
-        self.enqueque_events()
-      pass
+      delay = self.run_scheduled_events()
       # Wait for the service stop event instead of sleeping blindly
-      if 0 == self._stop_handler.wait(self.sleep_interval):
+      if 0 == self._stop_handler.wait(delay):
         logger.info('Shutting down Controller thread')
         break
 
-    if not self._t is None:
-      self._t.cancel()
-      self._t.join(5)
-
     # The emitter thread should have stopped by now, just ensure it has shut
     # down properly
     self.emitter.join(5)
     pass
 
-  # TODO: Optimize to not use Timer class and use the Queue instead
-  def enqueque_events(self):
-    # Queue events for up to a minute
-    for event in self.events_cache:
-      self._t = Timer(event.get_collect_interval(), self.metric_collector.process_event, args=(event,))
-      self._t.start()
+  def initialize_schedule(self):
+    now = time.time()
+    self.schedule = [[now, index, event] for index, event in enumerate(self.events_cache)]
+    heapq.heapify(self.schedule)
+    self.skipped_collections = dict((event.get_group_name(), 0) for event in self.events_cache)
+
+  def run_scheduled_events(self):
+    """
+    Collects all the groups that are due, returns seconds until the next collection
+    """
+    if not self.schedule:
+      return self.sleep_interval
+
+    # schedule is kept in wall clock time, which may be set back
+    now = time.time()
+    clock_set_back = False
+    for entry in self.schedule:
+      interval = max(entry[2].get_collect_interval(), 1)
+      if entry[0] - now > interval:
+        entry[0] = now + interval
+        clock_set_back = True
+    if clock_set_back:
+      heapq.heapify(self.schedule)
+
+    # every group is collected at most once per call, so stop requests are not delayed
+    for i in range(len(self.schedule)):
+      entry = self.schedule[0]
+      if entry[0] > time.time():
+        break
+      event = entry[2]
+      interval = max(event.get_collect_interval(), 1)
+      start_time = time.time()
+      try:
+        self.metric_collector.process_event(event)
+      except Exception, e:
+        logger.warn('Unable to collect {0} metrics. {1}'.format(event.get_group_name(), str(e)))
+      finish_time = time.time()
+
+      next_time = entry[0] + interval
+      if next_time <= finish_time:
+        skipped = int((finish_time - next_time) / interval) + 1
+        next_time += skipped * interval
+        self.skipped_collections[event.get_group_name()] += skipped
+        logger.debug('{0} metrics collection took {1} seconds, skipped {2} collections'
+                     .format(event.get_group_name(), finish_time - start_time, skipped))
+      pass
+      entry[0] = next_time
+      heapq.heapreplace(self.schedule, entry)
+      self.put_collection_metrics(event.get_group_name(), start_time, finish_time)
     pass
 
+    return max(0, self.schedule[0][0] - time.time())
+
+  def put_collection_metrics(self, group_name, start_time, finish_time):
+    self.application_metric_map.put_metric(DEFAULT_HOST_APP_ID, {
+      "monitor_{0}_collect_time".format(group_name): int((finish_time - start_time) * 1000),
+      "monitor_{0}_skipped".format(group_name): self.skipped_collections[group_name]
+    }, int(round(start_time * 1000)))
+
   def initialize_events_cache(self):
     self.events_cache = []
     try:
@@ -20,8 +20,11 @@ limitations under the License.
 
 import logging
 import threading
+import time
 
+from metric_collector import DEFAULT_HOST_APP_ID
 from security import CachedHTTPSConnection, CachedHTTPConnection
+from spool import MetricsSpool
 
 logger = logging.getLogger()
 
@@ -29,8 +32,18 @@ class Emitter(threading.Thread):
   AMS_METRICS_POST_URL = "/ws/v1/timeline/metrics/"
   RETRY_SLEEP_INTERVAL = 5
   MAX_RETRY_COUNT = 3
+  # Batches replayed from the spool per send interval
+  REPLAY_BATCH_LIMIT = 20
+  MAX_REPLAY_BACKOFF = 300
+  # Results of send
+  SENT = "sent"
+  REJECTED = "rejected"
+  FAILED = "failed"
   """
   Wake up every send interval seconds and empty the application metric map.
+  Batches which could not be delivered (connection errors, 5xx) are kept in the
+  spool and replayed, oldest first, once the collector is back. Batches the
+  collector rejects (4xx) would be rejected again, so they are dropped.
   """
   def __init__(self, config, application_metric_map, stop_handler):
     threading.Thread.__init__(self)
@@ -50,6 +63,17 @@ class Emitter(threading.Thread):
       self.connection = CachedHTTPConnection(config.get_server_host(),
                                              config.get_server_port(),
                                              timeout=timeout)
+    self.spool = None
+    spool_dir = config.get_spool_dir()
+    if spool_dir:
+      try:
+        self.spool = MetricsSpool(spool_dir, config.get_spool_max_size(),
+                                  config.get_spool_segment_size())
+      except (IOError, OSError), e:
+        logger.warn('Unable to use metrics spool at {0}, unsent metrics will '
+                    'be dropped. {1}'.format(spool_dir, str(e)))
+    self.replay_backoff = self.RETRY_SLEEP_INTERVAL
+    self.next_replay_time = 0
 
   def run(self):
     logger.info('Running Emitter thread: %s' % threading.currentThread().getName())
@@ -62,6 +86,8 @@ class Emitter(threading.Thread):
       #Wait for the service stop event instead of sleeping blindly
       if 0 == self._stop_handler.wait(self.send_interval):
         logger.info('Shutting down Emitter thread')
+        if self.spool is not None:
+          self.spool.close()
         return
     pass
 
@@ -71,29 +97,111 @@ class Emitter(threading.Thread):
     # After configured number of retries the data will not be sent to the
     # collector
     json_data = self.application_metric_map.flatten(None, True)
+    self.put_spool_metrics()
+
+    if self.spool is not None and self.spool.get_depth() > 0:
+      # Older batches go first, so this one waits in the spool as well
+      if json_data is not None:
+        self.spool.append(json_data)
+      self.replay_spool()
+      return
+    pass
+
     if json_data is None:
       logger.info("Nothing to emit, resume waiting.")
       return
     pass
 
-    response = None
     while retry_count < self.MAX_RETRY_COUNT:
-      try:
-        response = self.push_metrics(json_data)
-      except Exception, e:
-        logger.warn('Error sending metrics to server. %s' % str(e))
-      pass
+      result = self.send(json_data)
+      if result == self.SENT:
+        return
+      if result == self.REJECTED:
+        logger.warn("Metrics rejected by the collector are dropped.")
+        return
+      logger.warn("Retrying after {0} ...".format(self.RETRY_SLEEP_INTERVAL))
+      retry_count += 1
+      #Wait for the service stop event instead of sleeping blindly
+      if 0 == self._stop_handler.wait(self.RETRY_SLEEP_INTERVAL):
+        break
+    pass
 
-      if response and response.status == 200:
-        retry_count = self.MAX_RETRY_COUNT
-      else:
-        logger.warn("Retrying after {0} ...".format(self.RETRY_SLEEP_INTERVAL))
-        retry_count += 1
-        #Wait for the service stop event instead of sleeping blindly
-        if 0 == self._stop_handler.wait(self.RETRY_SLEEP_INTERVAL):
-          return
-      pass
+    if self.spool is not None:
+      logger.warn("Collector is not available, metrics are spooled for later delivery.")
+      self.spool.append(json_data)
+      self.schedule_replay(False)
+    pass
+
+  def replay_spool(self):
+    if time.time() < self.next_replay_time:
+      return
+    records = self.spool.peek(self.REPLAY_BATCH_LIMIT)
+    done = 0
+    rejected = 0
+    for timestamp, json_data in records:
+      result = self.send(json_data)
+      if result == self.FAILED:
+        break
+      if result == self.REJECTED:
+        # would block every later batch if it was kept at the head of the spool
+        rejected += 1
+      done += 1
+    pass
+    self.spool.ack(done, rejected)
+    if done < len(records):
+      # Keep replay progress across restarts
+      self.spool.compact()
+      self.schedule_replay(False)
+    else:
+      self.schedule_replay(True)
+    logger.info("Replayed {0} spooled metric batches, dropped {1} rejected ones, {2} remaining."
+                .format(done - rejected, rejected, self.spool.get_depth()))
+
+  def schedule_replay(self, succeeded):
+    """
+    Collector keeps failing - back off exponentially before the next replay
+    """
+    if succeeded:
+      self.replay_backoff = self.RETRY_SLEEP_INTERVAL
+      self.next_replay_time = 0
+    else:
+      self.next_replay_time = time.time() + self.replay_backoff
+      self.replay_backoff = min(self.replay_backoff * 2, self.MAX_REPLAY_BACKOFF)
+
+  def put_spool_metrics(self):
+    """
+    Spool state is reported along with host metrics, in the next batch
+    """
+    if self.spool is None:
+      return
+    stats = self.spool.get_stats()
+    self.application_metric_map.put_metric(DEFAULT_HOST_APP_ID, {
+      "monitor_spool_depth": stats["depth"],
+      "monitor_spool_size": stats["size"],
+      "monitor_spool_dropped": stats["dropped"],
+      "monitor_spool_rejected": stats["rejected"]
+    }, int(time.time() * 1000))
+
+  def send(self, json_data):
+    """
+    Returns SENT, REJECTED if the collector has answered with 4xx, or FAILED
+    if the batch should be sent again later
+    """
+    response = None
+    try:
+      response = self.push_metrics(json_data)
+    except Exception, e:
+      logger.warn('Error sending metrics to server. %s' % str(e))
     pass
+    if response is None:
+      return self.FAILED
+    if response.status == 200:
+      return self.SENT
+    if response.status // 100 == 4:
+      logger.warn('Collector has rejected metrics: retcode = {0}, reason = {1}'
+                  .format(response.status, response.reason))
+      return self.REJECTED
+    return self.FAILED
     # TODO verify certificate
   def push_metrics(self, data):
     headers = {"Content-Type" : "application/json",
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger()
+
+class MetricsSpool:
+  """
+  Size-bounded on-disk buffer of metric batches the collector did not accept.
+
+  Batches are appended to segment files, one record per line:
+  <timestamp>\t<json data>
+  A new segment is started once the current one grows over segment_size and on
+  every restart, so a record partially written by a crash never gets merged with
+  a new one. Batches are appended in collection order, so records are read back
+  oldest first. When the spool outgrows max_size, the oldest segments are dropped.
+  """
+  SEGMENT_PREFIX = "segment-"
+  SEGMENT_SUFFIX = ".spool"
+
+  def __init__(self, spool_dir, max_size, segment_size):
+    self.spool_dir = spool_dir
+    self.max_size = max_size
+    self.segment_size = min(segment_size, max_size)
+    self.lock = threading.RLock()
+    # [sequence number, size, records count] of every segment, oldest first
+    self.segments = []
+    # records of the oldest segment which were already replayed
+    self.head_offset = 0
+    self._head_cache = None
+    self._current = None
+    self.spooled_count = 0
+    self.replayed_count = 0
+    self.dropped_count = 0
+    self.rejected_count = 0
+    self.corrupted_count = 0
+
+    if not os.path.isdir(spool_dir):
+      os.makedirs(spool_dir)
+    self._load()
+  pass
+
+  def _load(self):
+    for name in sorted(os.listdir(self.spool_dir)):
+      if name.startswith(self.SEGMENT_PREFIX) and name.endswith(self.SEGMENT_SUFFIX):
+        try:
+          seq = int(name[len(self.SEGMENT_PREFIX):-len(self.SEGMENT_SUFFIX)])
+        except ValueError:
+          continue
+        path = self._get_segment_path(seq)
+        records = len(self._read_segment(path, True))
+        if records:
+          self.segments.append([seq, os.path.getsize(path), records])
+        else:
+          os.remove(path)
+      pass
+    pass
+    self.segments.sort()
+    if self.segments:
+      logger.info('Found {0} unsent metric batches in {1}'.format(self.get_depth(), self.spool_dir))
+  pass
+
+  def append(self, json_data):
+    """
+    Stores batch produced by ApplicationMetricMap.flatten
+    """
+    line = "{0}\t{1}\n".format(self._get_timestamp(json_data), json_data)
+    with self.lock:
+      if self._current is None or self.segments[-1][1] + len(line) > self.segment_size:
+        self._start_segment()
+      pass
+      self._current.write(line)
+      self._current.flush()
+      os.fsync(self._current.fileno())
+      self.segments[-1][1] += len(line)
+      self.segments[-1][2] += 1
+      self.spooled_count += 1
+      self._enforce_max_size()
+  pass
+
+  def peek(self, limit):
+    """
+    Returns up to limit oldest (timestamp, json data) records, without removing them
+    """
+    with self.lock:
+      if not self.segments:
+        return []
+      seq, size = self.segments[0][:2]
+      if self._head_cache is None or self._head_cache[:2] != (seq, size):
+        self._head_cache = (seq, size, self._read_segment(self._get_segment_path(seq)))
+      records = self._head_cache[2][self.head_offset:self.head_offset + limit]
+      for seq, size, count in self.segments[1:]:
+        if len(records) >= limit:
+          break
+        records.extend(self._read_segment(self._get_segment_path(seq))[:limit - len(records)])
+      return records
+  pass
+
+  def ack(self, count, rejected=0):
+    """
+    Removes count oldest records, once they were accepted by the collector,
+    or rejected (rejected of them) so that sending them again would not help
+    """
+    with self.lock:
+      self.replayed_count += count - rejected
+      self.rejected_count += rejected
+      self.head_offset += count
+      while self.segments and self.head_offset >= self.segments[0][2]:
+        self.head_offset -= self.segments[0][2]
+        self._remove_head_segment()
+      pass
+      if not self.segments:
+        self.head_offset = 0
+  pass
+
+  def compact(self):
+    """
+    Rewrites the oldest segment without the records already replayed, so their
+    space is reclaimed and they are not sent again after a restart.
+    """
+    with self.lock:
+      if not self.head_offset:
+        return
+      seq, size, records = self.segments[0]
+      if self._current is not None and len(self.segments) == 1:
+        # segment still being appended is replaced by a new one
+        self._current.close()
+        self._current = None
+      path = self._get_segment_path(seq)
+      remaining = self._read_segment(path)[self.head_offset:]
+      tmp_path = path + ".tmp"
+      with open(tmp_path, "w") as f:
+        for timestamp, json_data in remaining:
+          f.write("{0}\t{1}\n".format(timestamp, json_data))
+        f.flush()
+        os.fsync(f.fileno())
+      os.rename(tmp_path, path)
+      self.segments[0] = [seq, os.path.getsize(path), len(remaining)]
+      self.head_offset = 0
+      self._head_cache = None
+  pass
+
+  def close(self):
+    with self.lock:
+      self.compact()
+      if self._current is not None:
+        self._current.close()
+        self._current = None
+  pass
+
+  def get_depth(self):
+    """
+    Number of batches waiting to be sent
+    """
+    with self.lock:
+      return sum(segment[2] for segment in self.segments) - self.head_offset
+  pass
+
+  def get_stats(self):
+    with self.lock:
+      return {
+        "depth": self.get_depth(),
+        "size": sum(segment[1] for segment in self.segments),
+        "segments": len(self.segments),
+        "spooled": self.spooled_count,
+        "replayed": self.replayed_count,
+        "dropped": self.dropped_count,
+        "rejected": self.rejected_count,
+        "corrupted": self.corrupted_count
+      }
+  pass
+
+  def _start_segment(self):
+    if self._current is not None:
+      self._current.close()
+    seq = self.segments[-1][0] + 1 if self.segments else 0
+    self._current = open(self._get_segment_path(seq), "a")
+    self.segments.append([seq, 0, 0])
+  pass
+
+  def _enforce_max_size(self):
+    while len(self.segments) > 1 and sum(segment[1] for segment in self.segments) > self.max_size:
+      dropped = self.segments[0][2] - self.head_offset
+      self.dropped_count += dropped
+      logger.warn('Metrics spool is full, dropping {0} oldest batches'.format(dropped))
+      self.head_offset = 0
+      self._remove_head_segment()
+    pass
+  pass
+
+  def _remove_head_segment(self):
+    seq = self.segments.pop(0)[0]
+    if not self.segments and self._current is not None:
+      self._current.close()
+      self._current = None
+    try:
+      os.remove(self._get_segment_path(seq))
+    except OSError, e:
+      logger.warn('Unable to remove spool segment. %s' % str(e))
+    self._head_cache = None
+  pass
+
+  def _read_segment(self, path, count_corrupted=False):
+    records = []
+    with open(path, "r") as f:
+      for line in f:
+        try:
+          if not line.endswith("\n"):
+            raise ValueError("incomplete record")
+          timestamp, json_data = line[:-1].split("\t", 1)
+          records.append((long(timestamp), json_data))
+        except ValueError:
+          if count_corrupted:
+            self.corrupted_count += 1
+            logger.warn('Skipping corrupted record in {0}'.format(path))
+      pass
+    return records
+  pass
+
+  def _get_segment_path(self, seq):
+    return os.path.join(self.spool_dir, "{0}{1:010d}{2}".format(self.SEGMENT_PREFIX, seq, self.SEGMENT_SUFFIX))
+  pass
+
+  def _get_timestamp(self, json_data):
+    try:
+      return min(long(metric["starttime"]) for metric in json.loads(json_data)["metrics"])
+    except (ValueError, KeyError, TypeError):
+      return long(time.time() * 1000)
+  pass
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import logging
+
+from unittest import TestCase
+from only_for_platform import get_platform, PLATFORM_WINDOWS
+from mock.mock import patch, MagicMock
+
+if get_platform() != PLATFORM_WINDOWS:
+  os_distro_value = ('Suse','11','Final')
+else:
+  os_distro_value = ('win2012serverr2','6.3','WindowsServer')
+
+with patch("platform.linux_distribution", return_value = os_distro_value):
+  from ambari_commons import OSCheck
+  from config_reader import Configuration
+  from controller import Controller
+  from metric_collector import MetricsCollector
+  from stop_handler import bind_signal_handlers
+
+logger = logging.getLogger()
+
+class TestController(TestCase):
+
+  @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
+  @patch.object(Configuration, "get_spool_dir", new = MagicMock(return_value = ""))
+  @patch("controller.HostInfo", new = MagicMock())
+  def create_controller(self, metric_groups):
+    config = Configuration()
+    config.metric_groups = {"host_metric_groups": metric_groups, "process_metric_groups": {}}
+    controller = Controller(config, bind_signal_handlers())
+    controller.initialize_schedule()
+    return controller
+
+  @patch("time.time")
+  @patch.object(MetricsCollector, "process_event")
+  def test_scheduled_collections(self, process_event_mock, time_mock):
+    time_mock.return_value = 1000
+    collected = []
+    process_event_mock.side_effect = lambda event: collected.append(event.get_group_name())
+    controller = self.create_controller({"cpu_info": {"collect_every": "15", "metrics": []},
+                                         "disk_info": {"collect_every": "30", "metrics": []}})
+
+    self.assertEqual(controller.run_scheduled_events(), 15)
+    self.assertEqual(sorted(collected), ["cpu_info", "disk_info"])
+
+    time_mock.return_value = 1015
+    self.assertEqual(controller.run_scheduled_events(), 15)
+    self.assertEqual(collected[2:], ["cpu_info"])
+
+    time_mock.return_value = 1031
+    self.assertEqual(controller.run_scheduled_events(), 14)
+    self.assertEqual(sorted(collected[3:]), ["cpu_info", "disk_info"])
+    self.assertEqual(controller.skipped_collections, {"cpu_info": 0, "disk_info": 0})
+
+    host_metrics = controller.application_metric_map.app_metric_map["_HOST"]
+    self.assertEqual(host_metrics["monitor_cpu_info_collect_time"], {1000000: 0, 1015000: 0, 1031000: 0})
+    self.assertEqual(host_metrics["monitor_disk_info_skipped"], {1000000: 0, 1031000: 0})
+
+  @patch("time.time")
+  @patch.object(MetricsCollector, "process_event")
+  def test_slow_collection_is_skipped(self, process_event_mock, time_mock):
+    clock = [1000]
+    time_mock.side_effect = lambda: clock[0]
+    def slow_collection(event):
+      clock[0] += 25
+      raise Exception("collection failed")
+    process_event_mock.side_effect = slow_collection
+    controller = self.create_controller({"disk_info": {"collect_every": "10", "metrics": []}})
+
+    # collection finished at 1025, runs planned at 1010 and 1020 are skipped
+    self.assertEqual(controller.run_scheduled_events(), 5)
+    self.assertEqual(process_event_mock.call_count, 1)
+    self.assertEqual(controller.skipped_collections["disk_info"], 2)
+
+    host_metrics = controller.application_metric_map.app_metric_map["_HOST"]
+    self.assertEqual(host_metrics["monitor_disk_info_collect_time"], {1000000: 25000})
+    self.assertEqual(host_metrics["monitor_disk_info_skipped"], {1000000: 2})
+
+  @patch("time.time")
+  @patch.object(MetricsCollector, "process_event")
+  def test_clock_set_back(self, process_event_mock, time_mock):
+    time_mock.return_value = 1000
+    controller = self.create_controller({"cpu_info": {"collect_every": "15", "metrics": []}})
+    self.assertEqual(controller.run_scheduled_events(), 15)
+
+    # collections go on an interval later instead of waiting for the clock to catch up
+    time_mock.return_value = 500
+    self.assertEqual(controller.run_scheduled_events(), 15)
+    self.assertEqual(process_event_mock.call_count, 1)
+    time_mock.return_value = 515
+    self.assertEqual(controller.run_scheduled_events(), 15)
+    self.assertEqual(process_event_mock.call_count, 2)
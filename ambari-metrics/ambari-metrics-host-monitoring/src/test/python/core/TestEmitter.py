@@ -20,6 +20,8 @@ limitations under the License.
 
 import json
 import logging
+import shutil
+import tempfile
 
 from unittest import TestCase
 from only_for_platform import get_platform, PLATFORM_WINDOWS
@@ -42,6 +44,15 @@ logger = logging.getLogger()
 
 class TestEmitter(TestCase):
 
+  def setUp(self):
+    self.spool_dir = tempfile.mkdtemp()
+    self.spool_dir_patcher = patch.object(Configuration, "get_spool_dir", new = MagicMock(return_value = self.spool_dir))
+    self.spool_dir_patcher.start()
+
+  def tearDown(self):
+    self.spool_dir_patcher.stop()
+    shutil.rmtree(self.spool_dir)
+
   @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
   @patch.object(CachedHTTPConnection, "create_connection", new = MagicMock())
   @patch.object(CachedHTTPConnection, "request")
@@ -83,6 +94,94 @@ class TestEmitter(TestCase):
 
     self.assertEqual(request_mock.call_count, 3)
     self.assertUrlData(request_mock)
+    # Batch is kept for later delivery
+    self.assertEqual(emitter.spool.get_depth(), 1)
+
+  @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
+  @patch.object(CachedHTTPConnection, "create_connection", new = MagicMock())
+  @patch.object(CachedHTTPConnection, "request", new = MagicMock())
+  @patch.object(CachedHTTPConnection, "getresponse")
+  @patch("time.time")
+  def test_replay_spooled_metrics(self, time_mock, getresponse_mock):
+    time_mock.return_value = 1000
+    stop_handler = bind_signal_handlers()
+    failure = MagicMock(status = 503)
+    success = MagicMock(status = 200)
+
+    config = Configuration()
+    application_metric_map = ApplicationMetricMap("host","10.10.10.10")
+    application_metric_map.clear()
+    emitter = Emitter(config, application_metric_map, stop_handler)
+    emitter.RETRY_SLEEP_INTERVAL = .001
+    sent = []
+    emitter.push_metrics = lambda data: sent.append(data) or getresponse_mock()
+
+    # collector is down
+    getresponse_mock.return_value = failure
+    application_metric_map.put_metric("APP1", {"metric1":1}, 1)
+    emitter.submit_metrics()
+    self.assertEqual(emitter.spool.get_depth(), 1)
+    self.assertEqual(len(sent), 3)
+
+    # new batches are spooled behind the old ones while backing off
+    application_metric_map.put_metric("APP1", {"metric1":2}, 2)
+    emitter.submit_metrics()
+    self.assertEqual(emitter.spool.get_depth(), 2)
+    self.assertEqual(len(sent), 3)
+
+    # collector is back, everything is replayed oldest first
+    getresponse_mock.return_value = success
+    time_mock.return_value = 2000
+    application_metric_map.put_metric("APP1", {"metric1":3}, 3)
+    emitter.submit_metrics()
+    self.assertEqual(emitter.spool.get_depth(), 0)
+    replayed = [json.loads(data) for data in sent[3:]]
+    self.assertEqual(len(replayed), 3)
+    self.assertEqual([self.get_metric(batch, "metric1")["starttime"] for batch in replayed], [1, 2, 3])
+    # spool state is reported with host metrics
+    self.assertEqual(self.get_metric(replayed[2], "monitor_spool_depth")["metrics"].values(), [1])
+
+    emitter.submit_metrics()
+    self.assertEqual(len(sent), 7)
+    self.assertEqual(emitter.spool.get_stats()["replayed"], 3)
+
+  @patch.object(OSCheck, "os_distribution", new = MagicMock(return_value = os_distro_value))
+  @patch.object(CachedHTTPConnection, "create_connection", new = MagicMock())
+  @patch.object(CachedHTTPConnection, "request", new = MagicMock())
+  @patch.object(CachedHTTPConnection, "getresponse")
+  @patch("time.time")
+  def test_rejected_metrics_are_dropped(self, time_mock, getresponse_mock):
+    time_mock.return_value = 1000
+    stop_handler = bind_signal_handlers()
+
+    config = Configuration()
+    application_metric_map = ApplicationMetricMap("host","10.10.10.10")
+    application_metric_map.clear()
+    emitter = Emitter(config, application_metric_map, stop_handler)
+    emitter.RETRY_SLEEP_INTERVAL = .001
+    sent = []
+    emitter.push_metrics = lambda data: sent.append(data) or getresponse_mock()
+
+    # batch rejected right away is neither retried nor spooled
+    getresponse_mock.return_value = MagicMock(status = 400)
+    application_metric_map.put_metric("APP1", {"metric1":1}, 1)
+    emitter.submit_metrics()
+    self.assertEqual(len(sent), 1)
+    self.assertEqual(emitter.spool.get_depth(), 0)
+
+    # batch rejected on replay does not block the ones behind it
+    emitter.spool.append(sent[0])
+    getresponse_mock.side_effect = [MagicMock(status = 413), MagicMock(status = 200), MagicMock(status = 200)]
+    application_metric_map.put_metric("APP1", {"metric1":2}, 2)
+    emitter.submit_metrics()
+    self.assertEqual(emitter.spool.get_depth(), 0)
+    self.assertEqual(len(sent), 3)
+    self.assertEqual(emitter.spool.get_stats()["rejected"], 1)
+    self.assertEqual(emitter.spool.get_stats()["replayed"], 1)
+    self.assertEqual(self.get_metric(json.loads(sent[2]), "monitor_spool_depth")["appid"], "HOST")
+
+  def get_metric(self, batch, name):
+    return [metric for metric in batch['metrics'] if metric['metricname'] == name][0]
 
   def assertUrlData(self, request_mock):
     self.assertEqual(len(request_mock.call_args), 2)
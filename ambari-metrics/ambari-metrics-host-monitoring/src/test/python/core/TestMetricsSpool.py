@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+'''
+Licensed to the Apache Software Foundation (ASF) under one
+or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.  The ASF licenses this file
+to you under the Apache License, Version 2.0 (the
+"License"); you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase
+from spool import MetricsSpool
+
+logger = logging.getLogger()
+
+class TestMetricsSpool(TestCase):
+
+  def setUp(self):
+    self.spool_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.spool_dir)
+
+  def create_batch(self, starttime):
+    return json.dumps({"metrics": [{"metricname": "metric1", "starttime": starttime,
+                                    "metrics": {str(starttime): 1}}]})
+
+  def testAppendPeekAck(self):
+    spool = MetricsSpool(self.spool_dir, 1024 * 1024, 256)
+    for starttime in range(1, 11):
+      spool.append(self.create_batch(starttime))
+    pass
+
+    self.assertEqual(spool.get_depth(), 10)
+    self.assertTrue(spool.get_stats()["segments"] > 1)
+    records = spool.peek(3)
+    self.assertEqual([timestamp for timestamp, data in records], [1, 2, 3])
+    self.assertEqual(records[0][1], self.create_batch(1))
+
+    self.assertEqual([timestamp for timestamp, data in spool.peek(20)], range(1, 11))
+
+    while spool.get_depth() > 0:
+      spool.ack(len(spool.peek(3)))
+    self.assertEqual(spool.get_stats()["replayed"], 10)
+    self.assertEqual(os.listdir(self.spool_dir), [])
+
+  def testMaxSizeDropsOldestSegments(self):
+    batch_size = len(self.create_batch(100)) + 4
+    spool = MetricsSpool(self.spool_dir, batch_size * 6, batch_size * 2)
+    for starttime in range(100, 120):
+      spool.append(self.create_batch(starttime))
+    pass
+
+    stats = spool.get_stats()
+    self.assertTrue(stats["size"] <= batch_size * 6)
+    self.assertEqual(stats["dropped"] + stats["depth"], 20)
+    self.assertEqual(spool.peek(1)[0][0], 120 - stats["depth"])
+
+  def testReloadAfterRestart(self):
+    spool = MetricsSpool(self.spool_dir, 1024 * 1024, 1024 * 1024)
+    for starttime in range(1, 6):
+      spool.append(self.create_batch(starttime))
+    spool.ack(2)
+    spool.close()
+
+    # record partially written by a crash
+    with open(os.path.join(self.spool_dir, os.listdir(self.spool_dir)[0]), "a") as f:
+      f.write("6\t{\"metr")
+
+    spool = MetricsSpool(self.spool_dir, 1024 * 1024, 1024 * 1024)
+    self.assertEqual(spool.get_depth(), 3)
+    self.assertEqual(spool.get_stats()["corrupted"], 1)
+
+    # appends go to a new segment, after the ones left by the previous run
+    spool.append(self.create_batch(7))
+    self.assertEqual(spool.get_stats()["segments"], 2)
+    self.assertEqual([timestamp for timestamp, data in spool.peek(10)], [3, 4, 5, 7])
+    spool.ack(3)
+    self.assertEqual([timestamp for timestamp, data in spool.peek(10)], [7])
+
+  def testCompact(self):
+    spool = MetricsSpool(self.spool_dir, 1024 * 1024, 1024 * 1024)
+    for starttime in range(1, 6):
+      spool.append(self.create_batch(starttime))
+    size = spool.get_stats()["size"]
+
+    spool.ack(3)
+    spool.compact()
+    self.assertEqual(spool.get_depth(), 2)
+    self.assertTrue(spool.get_stats()["size"] < size)
+    self.assertEqual([timestamp for timestamp, data in spool.peek(10)], [4, 5])
+
+    spool.append(self.create_batch(6))
+    self.assertEqual([timestamp for timestamp, data in spool.peek(10)], [4, 5, 6])
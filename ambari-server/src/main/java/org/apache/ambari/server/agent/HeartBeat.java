@@ -20,6 +20,7 @@ package org.apache.ambari.server.agent;
 
 import java.util.ArrayList;
 import java.util.List;
+import java.util.Map;
 
 import org.apache.ambari.server.state.Alert;
 import org.codehaus.jackson.annotate.JsonProperty;
@@ -43,6 +44,12 @@ public class HeartBeat {
   private List<Alert> alerts = null;
   private RecoveryReport recoveryReport;
   private long recoveryTimestamp = -1;
+  private Map<String, Long> executionPoolMetrics = null;
+  private Map<String, Long> pythonForkServerMetrics = null;
+  private Map<String, Long> alertHttpClientMetrics = null;
+  private Map<String, Long> serverConnectionMetrics = null;
+  private boolean deltaHeartbeat = false;
+  private String stateDigest = null;
 
   public long getResponseId() {
     return responseId;
@@ -140,6 +147,104 @@ public class HeartBeat {
     this.mounts = mounts;
   }
 
+  /**
+   * Utilization of the agent execution commands pool, only reported when
+   * parallel execution is enabled on the agent.
+   *
+   * @return - pool metrics or {@code null}.
+   */
+  @JsonProperty("executionPoolMetrics")
+  public Map<String, Long> getExecutionPoolMetrics() {
+    return executionPoolMetrics;
+  }
+
+  @JsonProperty("executionPoolMetrics")
+  public void setExecutionPoolMetrics(Map<String, Long> executionPoolMetrics) {
+    this.executionPoolMetrics = executionPoolMetrics;
+  }
+
+  /**
+   * Startup latency of commands started by the agent python fork server, only
+   * reported when the fork server is enabled on the agent.
+   *
+   * @return - fork server metrics or {@code null}.
+   */
+  @JsonProperty("pythonForkServerMetrics")
+  public Map<String, Long> getPythonForkServerMetrics() {
+    return pythonForkServerMetrics;
+  }
+
+  @JsonProperty("pythonForkServerMetrics")
+  public void setPythonForkServerMetrics(Map<String, Long> pythonForkServerMetrics) {
+    this.pythonForkServerMetrics = pythonForkServerMetrics;
+  }
+
+  /**
+   * Requests made by web and metric alerts through the agent shared HTTP
+   * client, only reported once an alert has used it.
+   *
+   * @return - alert HTTP client metrics or {@code null}.
+   */
+  @JsonProperty("alertHttpClientMetrics")
+  public Map<String, Long> getAlertHttpClientMetrics() {
+    return alertHttpClientMetrics;
+  }
+
+  @JsonProperty("alertHttpClientMetrics")
+  public void setAlertHttpClientMetrics(Map<String, Long> alertHttpClientMetrics) {
+    this.alertHttpClientMetrics = alertHttpClientMetrics;
+  }
+
+  /**
+   * Number of requests the agent has sent to the server, their total latency
+   * and total bytes of request and response bodies on the wire, since the
+   * agent start.
+   *
+   * @return - server connection metrics or {@code null}.
+   */
+  @JsonProperty("serverConnectionMetrics")
+  public Map<String, Long> getServerConnectionMetrics() {
+    return serverConnectionMetrics;
+  }
+
+  @JsonProperty("serverConnectionMetrics")
+  public void setServerConnectionMetrics(Map<String, Long> serverConnectionMetrics) {
+    this.serverConnectionMetrics = serverConnectionMetrics;
+  }
+
+  /**
+   * Delta heartbeats carry only component statuses, alerts and agent
+   * environment which changed since the last heartbeat acknowledged by the
+   * server.
+   *
+   * @return {@code true} if this is a delta heartbeat.
+   */
+  @JsonProperty("deltaHeartbeat")
+  public boolean isDeltaHeartbeat() {
+    return deltaHeartbeat;
+  }
+
+  @JsonProperty("deltaHeartbeat")
+  public void setDeltaHeartbeat(boolean deltaHeartbeat) {
+    this.deltaHeartbeat = deltaHeartbeat;
+  }
+
+  /**
+   * Digest of the full host state known to the agent, only reported when
+   * delta heartbeats are enabled on the agent.
+   *
+   * @return - state digest or {@code null}.
+   */
+  @JsonProperty("stateDigest")
+  public String getStateDigest() {
+    return stateDigest;
+  }
+
+  @JsonProperty("stateDigest")
+  public void setStateDigest(String stateDigest) {
+    this.stateDigest = stateDigest;
+  }
+
   public List<Alert> getAlerts() {
     return alerts;
   }
@@ -156,6 +156,11 @@ public class HeartBeatHandler {
 
   private Map<String, HeartBeatResponse> hostResponses = new ConcurrentHashMap<String, HeartBeatResponse>();
 
+  /**
+   * State digest reported with the latest heartbeat of hosts in delta heartbeat mode.
+   */
+  private Map<String, String> hostStateDigests = new ConcurrentHashMap<String, String>();
+
   @Inject
   public HeartBeatHandler(Clusters fsm, ActionQueue aq, ActionManager am,
                           Injector injector) {
@@ -239,6 +244,10 @@ public class HeartBeatHandler {
     hostResponseIds.put(hostname, currentResponseId);
     hostResponses.put(hostname, response);
 
+    if (heartbeat.getStateDigest() != null && isResyncRequired(heartbeat)) {
+      response.setResyncHeartbeat(true);
+    }
+
     // If the host is waiting for component status updates, notify it
     if (heartbeat.componentStatus.size() > 0
         && hostObject.getState().equals(HostState.WAITING_FOR_HOST_STATUS_UPDATES)) {
@@ -509,10 +518,40 @@ public class HeartBeatHandler {
 
     Long requestId = 0L;
     hostResponseIds.put(hostname, requestId);
+    hostStateDigests.remove(hostname);
     response.setResponseId(requestId);
     return response;
   }
 
+  /**
+   * Checks whether the host state known to the server may differ from the one
+   * the agent builds its delta heartbeats on. This is the case when a heartbeat
+   * of the host failed to be processed, or when a delta which carries no changes
+   * reports a different state digest than the previous heartbeat.
+   *
+   * @param heartbeat heartbeat sent in delta heartbeat mode
+   * @return {@code true} if the agent has to send its full state.
+   */
+  private boolean isResyncRequired(HeartBeat heartbeat) {
+    String hostname = heartbeat.getHostname();
+    String previousDigest = hostStateDigests.put(hostname, heartbeat.getStateDigest());
+
+    if (heartbeatProcessor.pollResyncRequest(hostname)) {
+      LOG.warn("Heartbeat of host {} failed to be processed, requesting full state", hostname);
+      return true;
+    }
+
+    boolean noChanges = (heartbeat.getComponentStatus() == null || heartbeat.getComponentStatus().isEmpty())
+        && (heartbeat.getAlerts() == null || heartbeat.getAlerts().isEmpty())
+        && heartbeat.getAgentEnv() == null && heartbeat.getMounts() == null;
+    if (heartbeat.isDeltaHeartbeat() && noChanges && previousDigest != null
+        && !previousDigest.equals(heartbeat.getStateDigest())) {
+      LOG.warn("State digest of host {} has changed without any reported change, requesting full state", hostname);
+      return true;
+    }
+    return false;
+  }
+
   /**
    * Annotate the response with some housekeeping details.
    * hasMappedComponents - indicates if any components are mapped to the host
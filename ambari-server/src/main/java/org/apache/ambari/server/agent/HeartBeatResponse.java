@@ -69,6 +69,13 @@ public class HeartBeatResponse {
   @SerializedName("hasPendingTasks")
   private boolean hasPendingTasks = false;
 
+  /**
+   * Requests agent to send full state snapshot with the next heartbeat
+   * instead of a delta.
+   */
+  @SerializedName("resyncHeartbeat")
+  private boolean resyncHeartbeat = false;
+
   @SerializedName("recoveryConfig")
   private RecoveryConfig recoveryConfig;
 
@@ -178,6 +185,14 @@ public class HeartBeatResponse {
     this.hasPendingTasks = hasPendingTasks;
   }
 
+  public boolean isResyncHeartbeat() {
+    return resyncHeartbeat;
+  }
+
+  public void setResyncHeartbeat(boolean resyncHeartbeat) {
+    this.resyncHeartbeat = resyncHeartbeat;
+  }
+
   public void addExecutionCommand(ExecutionCommand execCmd) {
     executionCommands.add(execCmd);
   }
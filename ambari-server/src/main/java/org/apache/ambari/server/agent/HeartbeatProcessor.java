@@ -20,10 +20,12 @@ package org.apache.ambari.server.agent;
 
 import java.util.ArrayList;
 import java.util.Collection;
+import java.util.Collections;
 import java.util.Iterator;
 import java.util.List;
 import java.util.Map;
 import java.util.Set;
+import java.util.concurrent.ConcurrentHashMap;
 import java.util.concurrent.ConcurrentLinkedQueue;
 import java.util.concurrent.Executors;
 import java.util.concurrent.ScheduledExecutorService;
@@ -95,6 +97,12 @@ public class HeartbeatProcessor extends AbstractService{
 
   private ConcurrentLinkedQueue<HeartBeat> heartBeatsQueue = new ConcurrentLinkedQueue<>();
 
+  /**
+   * Hosts in delta heartbeat mode whose heartbeat failed to be processed, so the
+   * state known to the server may be incomplete until the agent sends a full one.
+   */
+  private final Set<String> resyncHosts = Collections.newSetFromMap(new ConcurrentHashMap<String, Boolean>());
+
   private volatile boolean shouldRun = true;
 
   //TODO rewrite to correlate with heartbeat frequency, hardcoded in agent as of now
@@ -171,6 +179,28 @@ public class HeartbeatProcessor extends AbstractService{
     return heartBeatsQueue.poll();
   }
 
+  /**
+   * Returns {@code true} once for a host whose heartbeat failed to be processed
+   * since the last call, in which case the agent has to resend its full state.
+   *
+   * @param hostname the host name
+   * @return {@code true} if full state of the host is required.
+   */
+  public boolean pollResyncRequest(String hostname) {
+    return resyncHosts.remove(hostname);
+  }
+
+  /**
+   * Remembers that a heartbeat sent in delta mode was not processed completely.
+   * Unchanged parts are left out of the following heartbeats, so they would
+   * never be repaired otherwise.
+   */
+  private void onProcessingFailure(HeartBeat heartbeat) {
+    if (heartbeat.getStateDigest() != null) {
+      resyncHosts.add(heartbeat.getHostname());
+    }
+  }
+
   /**
    * Processing task to be scheduled for execution
    */
@@ -179,17 +209,19 @@ public class HeartbeatProcessor extends AbstractService{
     @Override
     public void run() {
       while (shouldRun) {
+        HeartBeat heartbeat = pollHeartbeat();
+        if (heartbeat == null) {
+          break;
+        }
         try {
-          HeartBeat heartbeat = pollHeartbeat();
-          if (heartbeat == null) {
-            break;
-          }
           processHeartbeat(heartbeat);
         } catch (Exception e) {
           LOG.error("Exception received while processing heartbeat", e);
+          onProcessingFailure(heartbeat);
         } catch (Throwable throwable) {
           //catch everything to prevent task suppression
           LOG.error("ERROR: ", throwable);
+          onProcessingFailure(heartbeat);
         }
 
 
@@ -0,0 +1,229 @@
+/**
+ * Licensed to the Apache Software Foundation (ASF) under one
+ * or more contributor license agreements.  See the NOTICE file
+ * distributed with this work for additional information
+ * regarding copyright ownership.  The ASF licenses this file
+ * to you under the Apache License, Version 2.0 (the
+ * "License"); you may not use this file except in compliance
+ * with the License.  You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+package org.apache.ambari.server.api;
+
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.InputStreamReader;
+import java.io.UnsupportedEncodingException;
+import java.util.ArrayList;
+import java.util.Collections;
+import java.util.Enumeration;
+import java.util.List;
+import java.util.zip.GZIPInputStream;
+import java.util.zip.ZipException;
+
+import javax.servlet.Filter;
+import javax.servlet.FilterChain;
+import javax.servlet.FilterConfig;
+import javax.servlet.ReadListener;
+import javax.servlet.ServletException;
+import javax.servlet.ServletInputStream;
+import javax.servlet.ServletRequest;
+import javax.servlet.ServletResponse;
+import javax.servlet.http.HttpServletRequest;
+import javax.servlet.http.HttpServletRequestWrapper;
+import javax.servlet.http.HttpServletResponse;
+
+import org.slf4j.Logger;
+import org.slf4j.LoggerFactory;
+
+/**
+ * This filter decodes request bodies sent with <code>Content-Encoding: gzip</code>,
+ * as done by agents with <code>compress_requests</code> enabled. Jetty's GzipFilter
+ * only compresses responses.
+ *
+ * Requests in any other content encoding are answered with 415, and corrupted gzip
+ * bodies with 400, so that the agent falls back to uncompressed requests.
+ */
+public class GzipRequestFilter implements Filter {
+
+  private static final Logger LOG = LoggerFactory.getLogger(GzipRequestFilter.class);
+
+  static final String CONTENT_ENCODING_HEADER = "Content-Encoding";
+  static final String GZIP_ENCODING = "gzip";
+  static final String IDENTITY_ENCODING = "identity";
+
+  @Override
+  public void init(FilterConfig filterConfig) throws ServletException {
+
+  }
+
+  @Override
+  public void doFilter(ServletRequest request, ServletResponse response, FilterChain chain) throws IOException, ServletException {
+    if (request instanceof HttpServletRequest) {
+      HttpServletRequest httpServletRequest = (HttpServletRequest) request;
+      String contentEncoding = httpServletRequest.getHeader(CONTENT_ENCODING_HEADER);
+
+      if (contentEncoding != null && !contentEncoding.trim().isEmpty()
+          && !IDENTITY_ENCODING.equalsIgnoreCase(contentEncoding.trim())) {
+        if (!GZIP_ENCODING.equalsIgnoreCase(contentEncoding.trim())) {
+          ((HttpServletResponse) response).sendError(HttpServletResponse.SC_UNSUPPORTED_MEDIA_TYPE,
+              "Unsupported request content encoding " + contentEncoding);
+          return;
+        }
+
+        GZIPInputStream gzipInputStream;
+        try {
+          // reads the gzip header, so a body which is not gzip at all is rejected here
+          gzipInputStream = new GZIPInputStream(httpServletRequest.getInputStream());
+        } catch (ZipException e) {
+          LOG.warn("Unable to decode gzip request body of {}: {}", httpServletRequest.getRequestURI(), e.getMessage());
+          ((HttpServletResponse) response).sendError(HttpServletResponse.SC_BAD_REQUEST,
+              "Unable to decode gzip request body");
+          return;
+        }
+        request = new GzipRequestWrapper(httpServletRequest, gzipInputStream);
+      }
+    }
+
+    chain.doFilter(request, response);
+  }
+
+  @Override
+  public void destroy() {
+
+  }
+
+  /**
+   * Request with the decoded body and no Content-Encoding and Content-Length headers,
+   * which describe the encoded one.
+   */
+  static class GzipRequestWrapper extends HttpServletRequestWrapper {
+
+    private final ServletInputStream inputStream;
+    private BufferedReader reader;
+
+    GzipRequestWrapper(HttpServletRequest request, InputStream decodedStream) {
+      super(request);
+      inputStream = new DecodedInputStream(decodedStream);
+    }
+
+    @Override
+    public ServletInputStream getInputStream() throws IOException {
+      return inputStream;
+    }
+
+    @Override
+    public BufferedReader getReader() throws IOException {
+      if (reader == null) {
+        String characterEncoding = getCharacterEncoding();
+        try {
+          reader = new BufferedReader(new InputStreamReader(inputStream,
+              characterEncoding == null ? "ISO-8859-1" : characterEncoding));
+        } catch (UnsupportedEncodingException e) {
+          throw new IOException(e);
+        }
+      }
+      return reader;
+    }
+
+    @Override
+    public int getContentLength() {
+      return -1;
+    }
+
+    @Override
+    public long getContentLengthLong() {
+      return -1;
+    }
+
+    @Override
+    public String getHeader(String name) {
+      return isEncodingHeader(name) ? null : super.getHeader(name);
+    }
+
+    @Override
+    public Enumeration<String> getHeaders(String name) {
+      if (isEncodingHeader(name)) {
+        return Collections.enumeration(Collections.<String>emptyList());
+      }
+      return super.getHeaders(name);
+    }
+
+    @Override
+    public Enumeration<String> getHeaderNames() {
+      List<String> headerNames = new ArrayList<String>();
+      Enumeration<String> names = super.getHeaderNames();
+      while (names != null && names.hasMoreElements()) {
+        String name = names.nextElement();
+        if (!isEncodingHeader(name)) {
+          headerNames.add(name);
+        }
+      }
+      return Collections.enumeration(headerNames);
+    }
+
+    @Override
+    public int getIntHeader(String name) {
+      return isEncodingHeader(name) ? -1 : super.getIntHeader(name);
+    }
+
+    private static boolean isEncodingHeader(String name) {
+      return CONTENT_ENCODING_HEADER.equalsIgnoreCase(name) || "Content-Length".equalsIgnoreCase(name);
+    }
+  }
+
+  /**
+   * Blocking stream over the decoded body.
+   */
+  private static class DecodedInputStream extends ServletInputStream {
+
+    private final InputStream decodedStream;
+    private boolean finished = false;
+
+    DecodedInputStream(InputStream decodedStream) {
+      this.decodedStream = decodedStream;
+    }
+
+    @Override
+    public int read() throws IOException {
+      int b = decodedStream.read();
+      finished = b == -1;
+      return b;
+    }
+
+    @Override
+    public int read(byte[] b, int off, int len) throws IOException {
+      int count = decodedStream.read(b, off, len);
+      finished = count == -1;
+      return count;
+    }
+
+    @Override
+    public void close() throws IOException {
+      decodedStream.close();
+    }
+
+    @Override
+    public boolean isFinished() {
+      return finished;
+    }
+
+    @Override
+    public boolean isReady() {
+      return true;
+    }
+
+    @Override
+    public void setReadListener(ReadListener readListener) {
+      throw new UnsupportedOperationException("Asynchronous reading of gzip request body is not supported");
+    }
+  }
+}
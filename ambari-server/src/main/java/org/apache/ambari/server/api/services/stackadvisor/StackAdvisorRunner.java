@@ -18,16 +18,28 @@
 
 package org.apache.ambari.server.api.services.stackadvisor;
 
+import java.io.BufferedReader;
+import java.io.BufferedWriter;
 import java.io.File;
 import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStreamWriter;
 import java.util.ArrayList;
+import java.util.LinkedHashMap;
 import java.util.List;
+import java.util.Map;
+import java.util.concurrent.locks.Lock;
+import java.util.concurrent.locks.ReentrantLock;
 
 import org.apache.ambari.server.api.services.stackadvisor.commands.StackAdvisorCommandType;
+import org.apache.ambari.server.configuration.Configuration;
 import org.apache.commons.io.FileUtils;
+import org.codehaus.jackson.JsonNode;
+import org.codehaus.jackson.map.ObjectMapper;
 import org.slf4j.Logger;
 import org.slf4j.LoggerFactory;
 
+import com.google.inject.Inject;
 import com.google.inject.Singleton;
 
 @Singleton
@@ -35,8 +47,37 @@ public class StackAdvisorRunner {
 
   private final static Logger LOG = LoggerFactory.getLogger(StackAdvisorRunner.class);
 
+  private final static String DAEMON_ERROR_FILE = "stackadvisor-daemon.err";
+
+  @Inject
+  private Configuration configuration;
+
+  private final ObjectMapper mapper = new ObjectMapper();
+
+  /**
+   * Guards the daemon, which serves one request at a time.
+   */
+  private final Lock daemonLock = new ReentrantLock();
+
+  /**
+   * Long-lived {@code stack_advisor.py --daemon} process, started on first use.
+   */
+  private Process daemon;
+  private String daemonScript;
+  private BufferedWriter daemonInput;
+  private BufferedReader daemonOutput;
+
+  /**
+   * Set when the daemon could not be started, requests are then served by a
+   * new process each.
+   */
+  private volatile boolean daemonUnavailable = false;
+
   /**
    * Runs stack_advisor.py script in the specified {@code actionDirectory}.
+   * The request is served by the stack advisor daemon when it is enabled and
+   * not busy with another request, and by a new stack advisor process
+   * otherwise.
    *
    * @param script stack advisor script
    * @param saCommandType {@link StackAdvisorCommandType} to run.
@@ -47,6 +88,16 @@ public class StackAdvisorRunner {
     LOG.info(String.format("Script=%s, actionDirectory=%s, command=%s", script, actionDirectory,
         saCommandType));
 
+    if (isDaemonEnabled() && daemonLock.tryLock()) {
+      try {
+        if (runDaemonRequest(script, saCommandType, actionDirectory)) {
+          return;
+        }
+      } finally {
+        daemonLock.unlock();
+      }
+    }
+
     String outputFile = actionDirectory + File.separator + "stackadvisor.out";
     String errorFile = actionDirectory + File.separator + "stackadvisor.err";
 
@@ -108,6 +159,109 @@ public class StackAdvisorRunner {
     }
   }
 
+  private boolean isDaemonEnabled() {
+    return configuration != null && configuration.isStackAdvisorDaemonEnabled() && !daemonUnavailable;
+  }
+
+  /**
+   * Sends the request to the stack advisor daemon, starting it if needed.
+   * Must be called with {@link #daemonLock} held.
+   *
+   * @return false if the daemon could not serve the request, which should
+   *         then be run in a new process
+   * @throws StackAdvisorException if the stack advisor reported an error
+   */
+  private boolean runDaemonRequest(String script, StackAdvisorCommandType saCommandType,
+      File actionDirectory) throws StackAdvisorException {
+    if (daemon != null && !script.equals(daemonScript)) {
+      stopDaemon();
+    }
+    if (daemon == null) {
+      try {
+        startDaemon(script, actionDirectory.getParentFile());
+      } catch (IOException e) {
+        LOG.warn("Unable to start stack advisor daemon, running a stack advisor process per request", e);
+        daemonUnavailable = true;
+        return false;
+      }
+    }
+
+    JsonNode response;
+    try {
+      Map<String, String> request = new LinkedHashMap<String, String>();
+      request.put("action", saCommandType.toString());
+      request.put("hosts_file", actionDirectory + File.separator + "hosts.json");
+      request.put("services_file", actionDirectory + File.separator + "services.json");
+      daemonInput.write(mapper.writeValueAsString(request));
+      daemonInput.newLine();
+      daemonInput.flush();
+
+      String line = daemonOutput.readLine();
+      if (line == null) {
+        throw new IOException("Stack advisor daemon exited");
+      }
+      response = mapper.readTree(line);
+      if (response == null || !response.has("status")) {
+        throw new IOException("Unexpected stack advisor daemon response: " + line);
+      }
+    } catch (IOException e) {
+      LOG.warn("Stack advisor daemon failed, running the request in a new process", e);
+      stopDaemon();
+      return false;
+    }
+
+    LOG.info("Stack advisor daemon response: {}", response);
+    if (!"ok".equals(response.get("status").getTextValue())) {
+      String errorMessage = "Stack Advisor reported an error: " + response.path("message").getTextValue();
+      errorMessage += "\nStdErr file: " + daemonErrorFile(actionDirectory.getParentFile());
+      if (response.path("exit_code").getIntValue() == 1) {
+        throw new StackAdvisorRequestException(errorMessage);
+      }
+      throw new StackAdvisorException(errorMessage);
+    }
+    return true;
+  }
+
+  private void startDaemon(String script, File workDirectory) throws IOException {
+    List<String> builderParameters = new ArrayList<String>();
+    if (System.getProperty("os.name").contains("Windows")) {
+      builderParameters.add("cmd");
+      builderParameters.add("/c");
+      builderParameters.add(script + " --daemon --quiet");
+    } else {
+      // exec, so that destroying the process stops the daemon and not only the shell
+      builderParameters.add("sh");
+      builderParameters.add("-c");
+      builderParameters.add("exec " + script + " --daemon --quiet");
+    }
+
+    ProcessBuilder builder = new ProcessBuilder(builderParameters);
+    builder.redirectError(ProcessBuilder.Redirect.to(daemonErrorFile(workDirectory)));
+    LOG.info("Starting stack advisor daemon {}", builderParameters);
+
+    daemon = builder.start();
+    daemonScript = script;
+    daemonInput = new BufferedWriter(new OutputStreamWriter(daemon.getOutputStream(), "UTF-8"));
+    daemonOutput = new BufferedReader(new InputStreamReader(daemon.getInputStream(), "UTF-8"));
+  }
+
+  /**
+   * Stops the daemon, it is started again by the next request.
+   */
+  private void stopDaemon() {
+    if (daemon != null) {
+      daemon.destroy();
+    }
+    daemon = null;
+    daemonScript = null;
+    daemonInput = null;
+    daemonOutput = null;
+  }
+
+  private File daemonErrorFile(File workDirectory) {
+    return new File(workDirectory, DAEMON_ERROR_FILE);
+  }
+
   /**
    * Gets an instance of a {@link ProcessBuilder} that's ready to execute the
    * shell command to run the stack advisor script. This will take the
@@ -102,6 +102,8 @@ public class Configuration {
   public static final String RECOMMENDATIONS_DIR_DEFAULT = AmbariPath.getPath("/var/run/ambari-server/stack-recommendations");
   public static final String STACK_ADVISOR_SCRIPT = "stackadvisor.script";
   public static final String STACK_ADVISOR_SCRIPT_DEFAULT = AmbariPath.getPath("/var/lib/ambari-server/resources/scripts/stack_advisor.py");
+  public static final String STACK_ADVISOR_DAEMON_ENABLED = "stackadvisor.daemon.enabled";
+  public static final String STACK_ADVISOR_DAEMON_ENABLED_DEFAULT = "true";
   public static final String AMBARI_PYTHON_WRAP_KEY = "ambari.python.wrap";
   public static final String AMBARI_PYTHON_WRAP_DEFAULT = "ambari-python-wrap";
   public static final String API_AUTHENTICATED_USER = "api.authenticated.user";
@@ -1174,6 +1176,16 @@ public class Configuration {
     return properties.getProperty(STACK_ADVISOR_SCRIPT, STACK_ADVISOR_SCRIPT_DEFAULT);
   }
 
+  /**
+   * Determine whether or not stack advisor requests are served by a long-lived
+   * stack advisor process instead of a new process per request.
+   *
+   * @return true if the stack advisor daemon is enabled
+   */
+  public boolean isStackAdvisorDaemonEnabled() {
+    return Boolean.parseBoolean(properties.getProperty(STACK_ADVISOR_DAEMON_ENABLED, STACK_ADVISOR_DAEMON_ENABLED_DEFAULT));
+  }
+
   /**
    * @return a list of prefixes. Packages whose name starts with any of these
    * prefixes, should be skipped during upgrade.
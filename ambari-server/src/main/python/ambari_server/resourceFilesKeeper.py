@@ -22,12 +22,67 @@ import hashlib
 import os, sys
 import zipfile
 import glob
+import json
+import multiprocessing
 import pprint
+import time
 
 
 class KeeperException(Exception):
   pass
 
+
+class DirectoryManifest():
+  """
+  Size, mtime and sha1 of every file of a directory as of the last hash sum
+  calculation, together with the resulting directory hash. Lets
+  count_hash_sum skip reading files that have not been touched since then.
+  """
+
+  VERSION = 1
+
+  def __init__(self, directory_hash=None, files=None):
+    self.directory_hash = directory_hash
+    # relative path -> [size, mtime, sha1]
+    self.files = files or {}
+    self.changed = False
+    self.hashed_files = 0
+
+  @classmethod
+  def load(cls, path):
+    """
+    Returns manifest stored at path or an empty one if it is missing or can not be used
+    """
+    try:
+      with open(path) as fh:
+        data = json.load(fh)
+      if data.get("version") == cls.VERSION:
+        return cls(data["hash"], data["files"])
+    except (IOError, ValueError, KeyError, TypeError):
+      pass
+    return cls()
+
+  def save(self, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fh:
+      json.dump({"version": self.VERSION, "hash": self.directory_hash, "files": self.files}, fh)
+    os.rename(tmp_path, path)
+    os.chmod(path, 0o666)
+    self.changed = False
+
+  def is_unchanged(self, rel_path, stat):
+    entry = self.files.get(rel_path)
+    return entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime
+
+
+def _update_directory_archive_worker(args):
+  """
+  Entry point of archiving processes, see ResourceFilesKeeper.update_directory_archieves
+  """
+  resources_dir, stacks_dir, verbose, nozip, directory = args
+  keeper = ResourceFilesKeeper(resources_dir, stacks_dir, verbose, nozip)
+  return keeper._timed_update_directory_archive(directory)
+
 class ResourceFilesKeeper():
   """
   This class incapsulates all utility methods for resource files maintenance.
@@ -44,6 +99,7 @@ class ResourceFilesKeeper():
   ARCHIVABLE_DIRS = [HOOKS_DIR, PACKAGE_DIR]
 
   HASH_SUM_FILE=".hash"
+  MANIFEST_FILE=".hash_manifest"
   ARCHIVE_NAME="archive.zip"
 
   PYC_EXT=".pyc"
@@ -54,14 +110,23 @@ class ResourceFilesKeeper():
   # Change that to True to see debug output at stderr
   DEBUG=False
 
-  def __init__(self, resources_dir, stacks_dir, verbose=False, nozip=False):
+  # Number of processes used to archive directories on server start and during the maven build
+  DEFAULT_WORKERS = min(multiprocessing.cpu_count(), 8)
+
+  def __init__(self, resources_dir, stacks_dir, verbose=False, nozip=False, workers=1):
     """
       nozip = create only hash files and skip creating zip archives
+      workers = number of processes hashing and archiving directories concurrently,
+                1 processes them one by one in the calling process
     """
     self.resources_dir = resources_dir
     self.stacks_root = stacks_dir
     self.verbose = verbose
     self.nozip = nozip
+    self.workers = workers
+    # (directory, seconds, archive updated, files hashed) for every processed directory
+    self.timings = []
+    self.last_hashed_files = 0
 
 
   def perform_housekeeping(self):
@@ -69,23 +134,69 @@ class ResourceFilesKeeper():
     Performs housekeeping operations on resource files
     """
     self.update_directory_archieves()
+    for line in self.get_timing_report():
+      self.dbg_out(line)
     # probably, later we will need some additional operations
 
 
   def _iter_update_directory_archive(self, subdirs_list):
+    directories = []
     for subdir in subdirs_list:
       for root, dirs, _ in os.walk(subdir):
         for d in dirs:
           if d in self.ARCHIVABLE_DIRS:
             full_path = os.path.abspath(os.path.join(root, d))
-            self.update_directory_archive(full_path)
+            directories.append(full_path)
+    return directories
 
   def _update_resources_subdir_archive(self, subdir):
     archive_root = os.path.join(self.resources_dir, subdir)
     self.dbg_out("Updating archive for {0} dir at {1}...".format(subdir, archive_root))
 
-    # update the directories so that the .hash is generated
-    self.update_directory_archive(archive_root)
+    # the directory is updated as a whole so that the .hash is generated
+    return [archive_root]
+
+  def _update_directory_archives(self, directories):
+    """
+    Updates archives of given directories, concurrently if more than one worker is configured.
+    Directories are independent of each other, so every one of them is handled by a single process.
+    """
+    if self.workers > 1 and len(directories) > 1:
+      try:
+        pool = multiprocessing.Pool(min(self.workers, len(directories)))
+      except (OSError, ImportError), err:
+        self.dbg_out("Can not start archiving processes, falling back to serial mode: {0}".format(str(err)))
+      else:
+        try:
+          args = [(self.resources_dir, self.stacks_root, self.verbose, self.nozip, directory)
+                  for directory in directories]
+          self.timings.extend(pool.map(_update_directory_archive_worker, args))
+        finally:
+          pool.terminate()
+          pool.join()
+        return
+
+    for directory in directories:
+      self.timings.append(self._timed_update_directory_archive(directory))
+
+  def _timed_update_directory_archive(self, directory):
+    start = time.time()
+    updated = self.update_directory_archive(directory)
+    return directory, time.time() - start, bool(updated), self.last_hashed_files
+
+  def get_timing_report(self):
+    """
+    Returns lines describing time spent on every directory, slowest first
+    """
+    if not self.timings:
+      return []
+    total = sum(timing[1] for timing in self.timings)
+    updated = len([timing for timing in self.timings if timing[2]])
+    lines = ["Processed {0} directories in {1:.3f} s ({2} archives updated)".format(len(self.timings), total, updated)]
+    for directory, seconds, is_updated, hashed_files in sorted(self.timings, key=lambda timing: -timing[1]):
+      lines.append("{0:8.3f} s  {1:<9} {2:5} files hashed  {3}".format(seconds, "updated" if is_updated else "unchanged",
+                                                                    hashed_files, directory))
+    return lines
 
   def update_directory_archieves(self):
     """
@@ -96,7 +207,7 @@ class ResourceFilesKeeper():
     valid_stacks = self.list_stacks(self.stacks_root)
     self.dbg_out("Stacks: {0}".format(pprint.pformat(valid_stacks)))
     # Iterate over stack directories
-    self._iter_update_directory_archive(valid_stacks)
+    directories = self._iter_update_directory_archive(valid_stacks)
 
     # archive common services
     common_services_root = os.path.join(self.resources_dir, self.COMMON_SERVICES_DIR)
@@ -104,13 +215,15 @@ class ResourceFilesKeeper():
     valid_common_services = self.list_common_services(common_services_root)
     self.dbg_out("Common Services: {0}".format(pprint.pformat(valid_common_services)))
     # Iterate over common services directories
-    self._iter_update_directory_archive(valid_common_services)
+    directories += self._iter_update_directory_archive(valid_common_services)
 
     # custom actions
-    self._update_resources_subdir_archive(self.CUSTOM_ACTIONS_DIR)
+    directories += self._update_resources_subdir_archive(self.CUSTOM_ACTIONS_DIR)
 
     # agent host scripts
-    self._update_resources_subdir_archive(self.HOST_SCRIPTS_DIR)
+    directories += self._update_resources_subdir_archive(self.HOST_SCRIPTS_DIR)
+
+    self._update_directory_archives(directories)
 
 
   def _list_metainfo_dirs(self, root_dir):
@@ -144,10 +257,13 @@ class ResourceFilesKeeper():
   def update_directory_archive(self, directory):
     """
     If hash sum for directory is not present or differs from saved value,
-    recalculates hash sum and creates directory archive
+    recalculates hash sum and creates directory archive. Returns True if
+    the archive has been updated.
     """
     skip_empty_directory = True
-    cur_hash = self.count_hash_sum(directory)
+    manifest = self.read_manifest(directory)
+    cur_hash = self.count_hash_sum(directory, manifest)
+    self.last_hashed_files = manifest.hashed_files
     saved_hash = self.read_hash_sum(directory)
     if cur_hash != saved_hash:
       if not self.nozip:
@@ -155,19 +271,25 @@ class ResourceFilesKeeper():
       # Skip generation of .hash file is directory is empty
       if (skip_empty_directory and not os.listdir(directory)):
         self.dbg_out("Empty directory. Skipping generation of hash file for {0}".format(directory))
+        return False
       else:
         self.write_hash_sum(directory, cur_hash)
-      pass
+      self.write_manifest(directory, manifest)
+      return True
+    self.write_manifest(directory, manifest)
+    return False
 
-  def count_hash_sum(self, directory):
+  def count_hash_sum(self, directory, manifest=None):
     """
     Recursively counts hash sum of all files in directory and subdirectories.
     Files and directories are processed in alphabetical order.
     Ignores previously created directory archives and files containing
     previously calculated hashes. Compiled pyc files are also ignored
+
+    If manifest of the previous calculation is given, files with the same
+    size and mtime are not read again, and the manifest is updated in place.
     """
     try:
-      sha1 = hashlib.sha1()
       file_list = []
       for root, dirs, files in os.walk(directory):
         for f in files:
@@ -175,19 +297,82 @@ class ResourceFilesKeeper():
             full_path = os.path.abspath(os.path.join(root, f))
             file_list.append(full_path)
       file_list.sort()
-      for path in file_list:
+
+      if manifest is None:
+        sha1 = hashlib.sha1()
+        for path in file_list:
+          self.dbg_out("Counting hash of {0}".format(path))
+          self._read_file(path, sha1)
+        return sha1.hexdigest()
+
+      abs_src = os.path.abspath(directory)
+      rel_paths = [path[len(abs_src) + 1:] for path in file_list]
+      stats = [os.stat(path) for path in file_list]
+
+      if manifest.directory_hash is not None and set(rel_paths) == set(manifest.files):
+        # the directory hash covers contents of all files, so it stays the same as long
+        # as every touched file still has the content it had when the hash was counted
+        touched = [(path, rel_path, stat) for path, rel_path, stat in zip(file_list, rel_paths, stats)
+                   if not manifest.is_unchanged(rel_path, stat)]
+        file_hashes = []
+        for path, rel_path, stat in touched:
+          self.dbg_out("Counting hash of touched file {0}".format(path))
+          file_sha1 = hashlib.sha1()
+          self._read_file(path, file_sha1)
+          manifest.hashed_files += 1
+          file_hashes.append(file_sha1.hexdigest())
+          if file_hashes[-1] != manifest.files[rel_path][2]:
+            break
+        else:
+          for (path, rel_path, stat), file_hash in zip(touched, file_hashes):
+            manifest.files[rel_path] = [stat.st_size, stat.st_mtime, file_hash]
+            manifest.changed = True
+          return manifest.directory_hash
+
+      sha1 = hashlib.sha1()
+      files = {}
+      for path, rel_path, stat in zip(file_list, rel_paths, stats):
         self.dbg_out("Counting hash of {0}".format(path))
-        with open(path, 'rb') as fh:
-          while True:
-            data = fh.read(self.BUFFER)
-            if not data:
-              break
-            sha1.update(data)
-      return sha1.hexdigest()
+        file_sha1 = hashlib.sha1()
+        self._read_file(path, sha1, file_sha1)
+        manifest.hashed_files += 1
+        files[rel_path] = [stat.st_size, stat.st_mtime, file_sha1.hexdigest()]
+      manifest.directory_hash = sha1.hexdigest()
+      manifest.files = files
+      manifest.changed = True
+      return manifest.directory_hash
     except Exception, err:
       raise KeeperException("Can not calculate directory "
                             "hash: {0}".format(str(err)))
 
+  def _read_file(self, path, *hashes):
+    with open(path, 'rb') as fh:
+      while True:
+        data = fh.read(self.BUFFER)
+        if not data:
+          break
+        for h in hashes:
+          h.update(data)
+
+  def read_manifest(self, directory):
+    """
+    Returns manifest of the previous hash sum calculation, empty one if there is none
+    """
+    return DirectoryManifest.load(os.path.join(directory, self.MANIFEST_FILE))
+
+  def write_manifest(self, directory, manifest):
+    """
+    Saves manifest if it has been updated. Failures are not fatal, since without
+    manifest the next run just reads all the files again
+    """
+    if not manifest.changed:
+      return
+    manifest_file = os.path.join(directory, self.MANIFEST_FILE)
+    try:
+      manifest.save(manifest_file)
+    except Exception, err:
+      self.dbg_out("Can not write to file {0} : {1}".format(manifest_file, str(err)))
+
 
   def read_hash_sum(self, directory):
     """
@@ -255,7 +440,7 @@ class ResourceFilesKeeper():
     """
     returns True if filename is ignored when calculating hashing or archiving
     """
-    return filename in [self.HASH_SUM_FILE, self.ARCHIVE_NAME] or \
+    return filename in [self.HASH_SUM_FILE, self.MANIFEST_FILE, self.ARCHIVE_NAME] or \
            filename.endswith(self.PYC_EXT)
 
 
@@ -279,7 +464,8 @@ def main(argv=None):
   else:
     stacks_path = os.path.join(res_path, ResourceFilesKeeper.STACKS_DIR)
 
-  resource_files_keeper = ResourceFilesKeeper(res_path, stacks_path, nozip=True)
+  resource_files_keeper = ResourceFilesKeeper(res_path, stacks_path, nozip=True,
+                                              workers=ResourceFilesKeeper.DEFAULT_WORKERS)
   resource_files_keeper.perform_housekeeping()
 
 
@@ -85,7 +85,8 @@ def is_server_runing():
 def refresh_stack_hash(properties):
   resources_location = get_resources_location(properties)
   stacks_location = get_stack_location(properties)
-  resource_files_keeper = ResourceFilesKeeper(resources_location, stacks_location)
+  resource_files_keeper = ResourceFilesKeeper(resources_location, stacks_location,
+                                              workers=ResourceFilesKeeper.DEFAULT_WORKERS)
 
   try:
     print "Organizing resource files at {0}...".format(resources_location,
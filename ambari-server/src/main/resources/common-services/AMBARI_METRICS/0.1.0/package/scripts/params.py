@@ -121,6 +121,7 @@ ams_monitor_log_dir = config['configurations']['ams-env']['metrics_monitor_log_d
 ams_monitor_dir = "/usr/lib/python2.6/site-packages/resource_monitoring"
 ams_monitor_conf_dir = "/etc/ambari-metrics-monitor/conf"
 ams_monitor_pid_dir = status_params.ams_monitor_pid_dir
+ams_monitor_spool_dir = "/var/lib/ambari-metrics-monitor/spool"
 ams_monitor_script = "/usr/sbin/ambari-metrics-monitor"
 
 ams_grafana_script = "/usr/sbin/ambari-metrics-grafana"
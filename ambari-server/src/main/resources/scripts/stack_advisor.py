@@ -18,9 +18,11 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 
+import imp
 import json
 import os
 import sys
+import time
 import traceback
 
 RECOMMEND_COMPONENT_LAYOUT_ACTION = 'recommend-component-layout'
@@ -34,7 +36,18 @@ ALL_ACTIONS = [RECOMMEND_COMPONENT_LAYOUT_ACTION,
                RECOMMEND_CONFIGURATIONS,
                RECOMMEND_CONFIGURATION_DEPENDENCIES,
                VALIDATE_CONFIGURATIONS]
-USAGE = "Usage: <action> <hosts_file> <services_file>\nPossible actions are: {0}\n".format( str(ALL_ACTIONS) )
+RESULT_FILES = {
+  RECOMMEND_COMPONENT_LAYOUT_ACTION: "component-layout.json",
+  VALIDATE_COMPONENT_LAYOUT_ACTION: "component-layout-validation.json",
+  RECOMMEND_CONFIGURATIONS: "configurations.json",
+  RECOMMEND_CONFIGURATION_DEPENDENCIES: "configurations.json",
+  VALIDATE_CONFIGURATIONS: "configurations-validation.json"
+}
+DAEMON_OPTION = "--daemon"
+QUIET_OPTION = "--quiet"
+STATS_ACTION = "stats"
+USAGE = "Usage: <action> <hosts_file> <services_file> [{0}]\n       {1} [{0}]\nPossible actions are: {2}\n".format(
+  QUIET_OPTION, DAEMON_OPTION, str(ALL_ACTIONS))
 
 SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
 STACK_ADVISOR_PATH_TEMPLATE = os.path.join(SCRIPT_DIRECTORY, '../stacks/stack_advisor.py')
@@ -66,6 +79,13 @@ def dumpJson(json_object, dump_file):
 
 def main(argv=None):
   args = argv[1:]
+  # skips diagnostic output of advisors
+  quiet = QUIET_OPTION in args
+  args = [arg for arg in args if arg != QUIET_OPTION]
+
+  if args[:1] == [DAEMON_OPTION]:
+    StackAdvisorDaemon(quiet).serve(sys.stdin, sys.stdout)
+    return
 
   if len(args) < 3:
     sys.stderr.write(USAGE)
@@ -93,40 +113,46 @@ def main(argv=None):
     parentVersions = services["Versions"]["stack_hierarchy"]["stack_versions"]
 
   stackAdvisor = instantiateStackAdvisor(stackName, stackVersion, parentVersions)
+  stackAdvisor.quiet = quiet
 
   # Perform action
   actionDir = os.path.realpath(os.path.dirname(args[1]))
-  result = {}
-  result_file = "non_valid_result_file.json"
+  result = performAction(stackAdvisor, action, services, hosts)
+  result_file = os.path.join(actionDir, RESULT_FILES[action])
+
+  dumpJson(result, result_file)
+  pass
+
 
+def performAction(stackAdvisor, action, services, hosts):
   if action == RECOMMEND_COMPONENT_LAYOUT_ACTION:
-    result = stackAdvisor.recommendComponentLayout(services, hosts)
-    result_file = os.path.join(actionDir, "component-layout.json")
+    return stackAdvisor.recommendComponentLayout(services, hosts)
   elif action == VALIDATE_COMPONENT_LAYOUT_ACTION:
-    result = stackAdvisor.validateComponentLayout(services, hosts)
-    result_file = os.path.join(actionDir, "component-layout-validation.json")
+    return stackAdvisor.validateComponentLayout(services, hosts)
   elif action == RECOMMEND_CONFIGURATIONS:
-    result = stackAdvisor.recommendConfigurations(services, hosts)
-    result_file = os.path.join(actionDir, "configurations.json")
+    return stackAdvisor.recommendConfigurations(services, hosts)
   elif action == RECOMMEND_CONFIGURATION_DEPENDENCIES:
-    result = stackAdvisor.recommendConfigurationDependencies(services, hosts)
-    result_file = os.path.join(actionDir, "configurations.json")
+    return stackAdvisor.recommendConfigurationDependencies(services, hosts)
   else: # action == VALIDATE_CONFIGURATIONS
-    result = stackAdvisor.validateConfigurations(services, hosts)
-    result_file = os.path.join(actionDir, "configurations-validation.json")
+    return stackAdvisor.validateConfigurations(services, hosts)
 
-  dumpJson(result, result_file)
-  pass
 
+def loadDefaultStackAdvisor():
+  with open(STACK_ADVISOR_PATH_TEMPLATE, 'rb') as fp:
+    return imp.load_module('stack_advisor', fp, STACK_ADVISOR_PATH_TEMPLATE, ('.py', 'rb', imp.PY_SOURCE))
 
-def instantiateStackAdvisor(stackName, stackVersion, parentVersions):
-  """Instantiates StackAdvisor implementation for the specified Stack"""
-  import imp
 
-  with open(STACK_ADVISOR_PATH_TEMPLATE, 'rb') as fp:
-    default_stack_advisor = imp.load_module('stack_advisor', fp, STACK_ADVISOR_PATH_TEMPLATE, ('.py', 'rb', imp.PY_SOURCE))
+def loadStackAdvisorClass(stackName, stackVersion, parentVersions, default_stack_advisor=None):
+  """
+  Loads StackAdvisor implementations of the stack hierarchy and returns class for the specified Stack.
+  Implementations of the hierarchy are executed one after another in a new 'stack_advisor_impl' module,
+  since every version refers to the classes of its parent versions as globals of that module.
+  """
+  if default_stack_advisor is None:
+    default_stack_advisor = loadDefaultStackAdvisor()
   className = STACK_ADVISOR_DEFAULT_IMPL_CLASS
   stack_advisor = default_stack_advisor
+  stack_advisor_impl = imp.new_module('stack_advisor_impl')
 
   versions = [stackVersion]
   versions.extend(parentVersions)
@@ -136,7 +162,11 @@ def instantiateStackAdvisor(stackName, stackVersion, parentVersions):
       path = STACK_ADVISOR_IMPL_PATH_TEMPLATE.format(stackName, version)
 
       with open(path, 'rb') as fp:
-        stack_advisor = imp.load_module('stack_advisor_impl', fp, path, ('.py', 'rb', imp.PY_SOURCE))
+        code = compile(fp.read(), path, 'exec')
+      stack_advisor_impl.__file__ = path
+      sys.modules['stack_advisor_impl'] = stack_advisor_impl
+      exec code in stack_advisor_impl.__dict__
+      stack_advisor = stack_advisor_impl
       className = STACK_ADVISOR_IMPL_CLASS_TEMPLATE.format(stackName, version.replace('.', ''))
       print "StackAdvisor implementation for stack {0}, version {1} was loaded".format(stackName, version)
     except Exception as e:
@@ -146,11 +176,125 @@ def instantiateStackAdvisor(stackName, stackVersion, parentVersions):
   try:
     clazz = getattr(stack_advisor, className)
     print "Returning " + className + " implementation"
-    return clazz()
+    return clazz
   except Exception as e:
     traceback.print_exc()
     print "Returning default implementation"
-    return default_stack_advisor.DefaultStackAdvisor()
+    return default_stack_advisor.DefaultStackAdvisor
+
+
+def instantiateStackAdvisor(stackName, stackVersion, parentVersions):
+  """Instantiates StackAdvisor implementation for the specified Stack"""
+  return loadStackAdvisorClass(stackName, stackVersion, parentVersions)()
+
+
+class StackAdvisorDaemon(object):
+  """
+  Serves stack advisor requests in a long-lived process, so stack advisor
+  implementations are loaded once per stack hierarchy instead of once per request.
+
+  Requests and responses are JSON objects, one per line:
+    {"action": <action>, "hosts": {...}, "services": {...}}
+      -> {"status": "ok", "result": {...}, "latency": <seconds>}
+    {"action": <action>, "hosts_file": <path>, "services_file": <path>}
+      -> {"status": "ok", "result_file": <path>, "latency": <seconds>}, result file is the one
+         written by the per-request mode
+    {"action": "stats"} -> {"status": "ok", "result": {<action>: {"count": ..., ...}}}
+  A request may contain "quiet": true|false to override quiet mode the daemon was started with.
+  Failures are reported as {"status": "error", "exit_code": 1|2, "message": ...}, with exit code
+  the per-request mode would have. Anything printed by advisors goes to stderr.
+  """
+
+  def __init__(self, quiet=False):
+    self.quiet = quiet
+    self.default_stack_advisor = None
+    self.classes = {}
+    self.stats = {}
+
+  def serve(self, input_fp, output_fp):
+    # advisors print diagnostics, which must not get mixed with responses
+    sys.stdout = sys.stderr
+    try:
+      while True:
+        line = input_fp.readline()
+        if not line:
+          break
+        if not line.strip():
+          continue
+        output_fp.write(json.dumps(self.handle(line)) + "\n")
+        output_fp.flush()
+    finally:
+      sys.stdout = sys.__stdout__
+      sys.stderr.write("Stack advisor daemon stats: {0}\n".format(json.dumps(self.stats)))
+
+  def handle(self, line):
+    start = time.time()
+    action = None
+    try:
+      try:
+        request = json.loads(line)
+      except ValueError as err:
+        raise StackAdvisorException("Invalid request: {0}".format(str(err)))
+      action = request.get("action")
+      if action == STATS_ACTION:
+        return {"status": "ok", "result": self.stats}
+      if action not in ALL_ACTIONS:
+        raise StackAdvisorException("Unknown action: {0}".format(action))
+      response = self.perform(action, request)
+      exit_code = 0
+    except StackAdvisorException as err:
+      traceback.print_exc()
+      response, exit_code = {"status": "error", "exit_code": 1, "message": str(err)}, 1
+    except Exception as err:
+      traceback.print_exc()
+      response, exit_code = {"status": "error", "exit_code": 2, "message": str(err)}, 2
+
+    response["latency"] = time.time() - start
+    if action in ALL_ACTIONS:
+      self.record(action, response["latency"], exit_code)
+    return response
+
+  def perform(self, action, request):
+    if "hosts_file" in request:
+      hosts = loadJson(request["hosts_file"])
+      services = loadJson(request["services_file"])
+    else:
+      hosts = request["hosts"]
+      services = request["services"]
+
+    stackAdvisor = self.getStackAdvisorClass(services)()
+    stackAdvisor.quiet = request.get("quiet", self.quiet)
+    result = performAction(stackAdvisor, action, services, hosts)
+
+    if "hosts_file" in request:
+      result_file = os.path.join(os.path.realpath(os.path.dirname(request["hosts_file"])), RESULT_FILES[action])
+      dumpJson(result, result_file)
+      return {"status": "ok", "result_file": result_file}
+    return {"status": "ok", "result": result}
+
+  def getStackAdvisorClass(self, services):
+    stackName = services["Versions"]["stack_name"]
+    stackVersion = services["Versions"]["stack_version"]
+    parentVersions = []
+    if "stack_hierarchy" in services["Versions"]:
+      parentVersions = services["Versions"]["stack_hierarchy"]["stack_versions"]
+
+    key = (stackName, stackVersion, tuple(parentVersions))
+    if key not in self.classes:
+      if self.default_stack_advisor is None:
+        self.default_stack_advisor = loadDefaultStackAdvisor()
+      self.classes[key] = loadStackAdvisorClass(stackName, stackVersion, parentVersions, self.default_stack_advisor)
+    return self.classes[key]
+
+  def record(self, action, latency, exit_code):
+    stats = self.stats.setdefault(action, {"count": 0, "errors": 0, "total": 0.0, "min": None, "max": 0.0})
+    stats["count"] += 1
+    if exit_code:
+      stats["errors"] += 1
+    stats["total"] += latency
+    stats["min"] = latency if stats["min"] is None else min(stats["min"], latency)
+    stats["max"] = max(stats["max"], latency)
+    stats["mean"] = stats["total"] / stats["count"]
 
 
 if __name__ == '__main__':
@@ -72,9 +72,11 @@ class HDP206StackAdvisor(DefaultStackAdvisor):
            items.append({"type": 'host-component', "level": 'ERROR', "message": message, "component-name": componentName})
 
     # Validating host-usage
-    usedHostsListList = [component["StackServiceComponents"]["hostnames"] for component in componentsList if not self.isComponentNotValuable(component)]
-    usedHostsList = [item for sublist in usedHostsListList for item in sublist]
-    nonUsedHostsList = [item for item in hostsList if item not in usedHostsList]
+    usedHostsSet = set()
+    for component in componentsList:
+      if not self.isComponentNotValuable(component):
+        usedHostsSet.update(component["StackServiceComponents"]["hostnames"])
+    nonUsedHostsList = [item for item in hostsList if item not in usedHostsSet]
     for host in nonUsedHostsList:
       items.append( { "type": 'host-component', "level": 'ERROR', "message": 'Host is not used', "host": str(host) } )
 
@@ -306,19 +308,18 @@ class HDP206StackAdvisor(DefaultStackAdvisor):
     else:
       dataDirs = hdfsSiteProperties['dfs.datanode.data.dir'].split(",")
     #dfs.datanode.du.reserved should be set to 10-15% of volume size
-    mountPoints = []
-    mountPointDiskAvailableSpace = [] #kBytes
+    # hosts mostly share mount points, so only the largest volume of each mount point matters
+    mountPointDiskAvailableSpace = {} #kBytes
     for host in hosts["items"]:
       for diskInfo in host["Hosts"]["disk_info"]:
-        mountPoints.append(diskInfo["mountpoint"])
-        mountPointDiskAvailableSpace.append(long(diskInfo["size"]))
+        mountPoint = diskInfo["mountpoint"]
+        mountPointDiskAvailableSpace[mountPoint] = max(long(diskInfo["size"]),
+                                                       mountPointDiskAvailableSpace.get(mountPoint, 0l))
     maxFreeVolumeSize = 0l #kBytes
     for dataDir in dataDirs:
-      mp = getMountPointForDir(dataDir, mountPoints)
-      for i in range(len(mountPoints)):
-        if mp == mountPoints[i]:
-          if mountPointDiskAvailableSpace[i] > maxFreeVolumeSize:
-            maxFreeVolumeSize = mountPointDiskAvailableSpace[i]
+      mp = getMountPointForDir(dataDir, mountPointDiskAvailableSpace.keys())
+      if mp in mountPointDiskAvailableSpace and mountPointDiskAvailableSpace[mp] > maxFreeVolumeSize:
+        maxFreeVolumeSize = mountPointDiskAvailableSpace[mp]
 
     putHDFSSiteProperty('dfs.datanode.du.reserved', maxFreeVolumeSize * 1024 / 8) #Bytes
 
@@ -600,11 +601,11 @@ class HDP206StackAdvisor(DefaultStackAdvisor):
       putAmsHbaseSiteProperty("hbase.zookeeper.property.clientPort", "61181")
 
     mountpoints = ["/"]
+    hostsIndex = self.getHostsIndex(hosts)
     for collectorHostName in amsCollectorHosts:
-      for host in hosts["items"]:
-        if host["Hosts"]["host_name"] == collectorHostName:
-          mountpoints = self.getPreferredMountPoints(host["Hosts"])
-          break
+      host = hostsIndex.getHost(collectorHostName)
+      if host is not None:
+        mountpoints = self.getPreferredMountPoints(host["Hosts"])
     isLocalRootDir = rootDir.startswith("file://") or (defaultFs.startswith("file://") and rootDir.startswith("/"))
     if isLocalRootDir:
       rootDir = re.sub("^file:///|/", "", rootDir, count=1)
@@ -745,22 +746,18 @@ class HDP206StackAdvisor(DefaultStackAdvisor):
     """
     Returns the list of hostnames on which service component is installed
     """
-    if services is not None and serviceName in [service["StackServices"]["service_name"] for service in services["services"]]:
-      service = [serviceEntry for serviceEntry in services["services"] if serviceEntry["StackServices"]["service_name"] == serviceName][0]
-      components = [componentEntry for componentEntry in service["components"] if componentEntry["StackServiceComponents"]["component_name"] == componentName]
-      if (len(components) > 0 and len(components[0]["StackServiceComponents"]["hostnames"]) > 0):
-        componentHostnames = components[0]["StackServiceComponents"]["hostnames"]
+    if services is not None:
+      component = self.getServicesIndex(services).getComponent(serviceName, componentName)
+      if component is not None and len(component["StackServiceComponents"]["hostnames"]) > 0:
+        componentHostnames = component["StackServiceComponents"]["hostnames"]
         return componentHostnames
     return []
 
   def getHostsWithComponent(self, serviceName, componentName, services, hosts):
-    if services is not None and hosts is not None and serviceName in [service["StackServices"]["service_name"] for service in services["services"]]:
-      service = [serviceEntry for serviceEntry in services["services"] if serviceEntry["StackServices"]["service_name"] == serviceName][0]
-      components = [componentEntry for componentEntry in service["components"] if componentEntry["StackServiceComponents"]["component_name"] == componentName]
-      if (len(components) > 0 and len(components[0]["StackServiceComponents"]["hostnames"]) > 0):
-        componentHostnames = components[0]["StackServiceComponents"]["hostnames"]
-        componentHosts = [host for host in hosts["items"] if host["Hosts"]["host_name"] in componentHostnames]
-        return componentHosts
+    if services is not None and hosts is not None:
+      componentHostnames = self.getHostNamesWithComponent(serviceName, componentName, services)
+      if len(componentHostnames) > 0:
+        return self.getHostsIndex(hosts).getHosts(componentHostnames)
     return []
 
   def getHostWithComponent(self, serviceName, componentName, services, hosts):
@@ -772,10 +769,8 @@ class HDP206StackAdvisor(DefaultStackAdvisor):
   def getHostComponentsByCategories(self, hostname, categories, services, hosts):
     components = []
     if services is not None and hosts is not None:
-      for service in services["services"]:
-          components.extend([componentEntry for componentEntry in service["components"]
-                              if componentEntry["StackServiceComponents"]["component_category"] in categories
-                              and hostname in componentEntry["StackServiceComponents"]["hostnames"]])
+      components.extend([componentEntry for componentEntry in self.getServicesIndex(services).getHostComponents(hostname)
+                         if componentEntry["StackServiceComponents"]["component_category"] in categories])
     return components
 
   def getZKHostPortString(self, services, include_port=True):
@@ -918,9 +913,10 @@ class HDP206StackAdvisor(DefaultStackAdvisor):
             siteProperties = getSiteProperties(configurations, siteName)
             if siteProperties is not None:
               siteRecommendations = recommendedDefaults[siteName]["properties"]
-              print("SiteName: %s, method: %s\n" % (siteName, method.__name__))
-              print("Site properties: %s\n" % str(siteProperties))
-              print("Recommendations: %s\n********\n" % str(siteRecommendations))
+              if not self.quiet:
+                print("SiteName: %s, method: %s\n" % (siteName, method.__name__))
+                print("Site properties: %s\n" % str(siteProperties))
+                print("Recommendations: %s\n********\n" % str(siteRecommendations))
               resultItems = method(siteProperties, siteRecommendations, configurations, services, hosts)
               items.extend(resultItems)
 
@@ -1050,54 +1046,55 @@ class HDP206StackAdvisor(DefaultStackAdvisor):
                             {"config-name":'hbase.cluster.distributed', "item": distributed_item },
                             {"config-name":'hbase.zookeeper.property.clientPort', "item": hbase_zk_client_port_item }])
 
+    hostsIndex = self.getHostsIndex(hosts)
     for collectorHostName in amsCollectorHosts:
-      for host in hosts["items"]:
-        if host["Hosts"]["host_name"] == collectorHostName:
-          if op_mode == 'embedded' or is_local_root_dir:
-            validationItems.extend([{"config-name": 'hbase.rootdir', "item": self.validatorEnoughDiskSpace(properties, 'hbase.rootdir', host["Hosts"], recommendedDiskSpace)}])
-            validationItems.extend([{"config-name": 'hbase.rootdir', "item": self.validatorNotRootFs(properties, recommendedDefaults, 'hbase.rootdir', host["Hosts"])}])
-            validationItems.extend([{"config-name": 'hbase.tmp.dir', "item": self.validatorNotRootFs(properties, recommendedDefaults, 'hbase.tmp.dir', host["Hosts"])}])
-
-          dn_hosts = self.getComponentHostNames(services, "HDFS", "DATANODE")
-          if is_local_root_dir:
-            mountPoints = []
-            for mountPoint in host["Hosts"]["disk_info"]:
-              mountPoints.append(mountPoint["mountpoint"])
-            hbase_rootdir_mountpoint = getMountPointForDir(hbase_rootdir, mountPoints)
-            hbase_tmpdir_mountpoint = getMountPointForDir(hbase_tmpdir, mountPoints)
-            preferred_mountpoints = self.getPreferredMountPoints(host['Hosts'])
-            # hbase.rootdir and hbase.tmp.dir shouldn't point to the same partition
-            # if multiple preferred_mountpoints exist
-            if hbase_rootdir_mountpoint == hbase_tmpdir_mountpoint and \
-              len(preferred_mountpoints) > 1:
-              item = self.getWarnItem("Consider not using {0} partition for storing metrics temporary data. "
-                                      "{0} partition is already used as hbase.rootdir to store metrics data".format(hbase_tmpdir_mountpoint))
-              validationItems.extend([{"config-name":'hbase.tmp.dir', "item": item}])
-
-            # if METRICS_COLLECTOR is co-hosted with DATANODE
-            # cross-check dfs.datanode.data.dir and hbase.rootdir
-            # they shouldn't share same disk partition IO
-            hdfs_site = getSiteProperties(configurations, "hdfs-site")
-            dfs_datadirs = hdfs_site.get("dfs.datanode.data.dir").split(",") if hdfs_site and "dfs.datanode.data.dir" in hdfs_site else []
-            if dn_hosts and collectorHostName in dn_hosts and ams_site and \
-              dfs_datadirs and len(preferred_mountpoints) > len(dfs_datadirs):
-              for dfs_datadir in dfs_datadirs:
-                dfs_datadir_mountpoint = getMountPointForDir(dfs_datadir, mountPoints)
-                if dfs_datadir_mountpoint == hbase_rootdir_mountpoint:
-                  item = self.getWarnItem("Consider not using {0} partition for storing metrics data. "
-                                          "{0} is already used by datanode to store HDFS data".format(hbase_rootdir_mountpoint))
-                  validationItems.extend([{"config-name": 'hbase.rootdir', "item": item}])
-                  break
-          # If no local DN in distributed mode
-          elif collectorHostName not in dn_hosts and distributed.lower() == "true":
-            item = self.getWarnItem("It's recommended to install Datanode component on {0} "
-                                    "to speed up IO operations between HDFS and Metrics "
-                                    "Collector in distributed mode ".format(collectorHostName))
-            validationItems.extend([{"config-name": "hbase.cluster.distributed", "item": item}])
-          # Short circuit read should be enabled in distibuted mode
-          # if local DN installed
-          else:
-            validationItems.extend([{"config-name": "dfs.client.read.shortcircuit", "item": self.validatorEqualsToRecommendedItem(properties, recommendedDefaults, "dfs.client.read.shortcircuit")}])
+      host = hostsIndex.getHost(collectorHostName)
+      if host is not None:
+        if op_mode == 'embedded' or is_local_root_dir:
+          validationItems.extend([{"config-name": 'hbase.rootdir', "item": self.validatorEnoughDiskSpace(properties, 'hbase.rootdir', host["Hosts"], recommendedDiskSpace)}])
+          validationItems.extend([{"config-name": 'hbase.rootdir', "item": self.validatorNotRootFs(properties, recommendedDefaults, 'hbase.rootdir', host["Hosts"])}])
+          validationItems.extend([{"config-name": 'hbase.tmp.dir', "item": self.validatorNotRootFs(properties, recommendedDefaults, 'hbase.tmp.dir', host["Hosts"])}])
+
+        dn_hosts = self.getComponentHostNames(services, "HDFS", "DATANODE")
+        if is_local_root_dir:
+          mountPoints = []
+          for mountPoint in host["Hosts"]["disk_info"]:
+            mountPoints.append(mountPoint["mountpoint"])
+          hbase_rootdir_mountpoint = getMountPointForDir(hbase_rootdir, mountPoints)
+          hbase_tmpdir_mountpoint = getMountPointForDir(hbase_tmpdir, mountPoints)
+          preferred_mountpoints = self.getPreferredMountPoints(host['Hosts'])
+          # hbase.rootdir and hbase.tmp.dir shouldn't point to the same partition
+          # if multiple preferred_mountpoints exist
+          if hbase_rootdir_mountpoint == hbase_tmpdir_mountpoint and \
+            len(preferred_mountpoints) > 1:
+            item = self.getWarnItem("Consider not using {0} partition for storing metrics temporary data. "
+                                    "{0} partition is already used as hbase.rootdir to store metrics data".format(hbase_tmpdir_mountpoint))
+            validationItems.extend([{"config-name":'hbase.tmp.dir', "item": item}])
+
+          # if METRICS_COLLECTOR is co-hosted with DATANODE
+          # cross-check dfs.datanode.data.dir and hbase.rootdir
+          # they shouldn't share same disk partition IO
+          hdfs_site = getSiteProperties(configurations, "hdfs-site")
+          dfs_datadirs = hdfs_site.get("dfs.datanode.data.dir").split(",") if hdfs_site and "dfs.datanode.data.dir" in hdfs_site else []
+          if dn_hosts and collectorHostName in dn_hosts and ams_site and \
+            dfs_datadirs and len(preferred_mountpoints) > len(dfs_datadirs):
+            for dfs_datadir in dfs_datadirs:
+              dfs_datadir_mountpoint = getMountPointForDir(dfs_datadir, mountPoints)
+              if dfs_datadir_mountpoint == hbase_rootdir_mountpoint:
+                item = self.getWarnItem("Consider not using {0} partition for storing metrics data. "
+                                        "{0} is already used by datanode to store HDFS data".format(hbase_rootdir_mountpoint))
+                validationItems.extend([{"config-name": 'hbase.rootdir', "item": item}])
+                break
+        # If no local DN in distributed mode
+        elif collectorHostName not in dn_hosts and distributed.lower() == "true":
+          item = self.getWarnItem("It's recommended to install Datanode component on {0} "
+                                  "to speed up IO operations between HDFS and Metrics "
+                                  "Collector in distributed mode ".format(collectorHostName))
+          validationItems.extend([{"config-name": "hbase.cluster.distributed", "item": item}])
+        # Short circuit read should be enabled in distibuted mode
+        # if local DN installed
+        else:
+          validationItems.extend([{"config-name": "dfs.client.read.shortcircuit", "item": self.validatorEqualsToRecommendedItem(properties, recommendedDefaults, "dfs.client.read.shortcircuit")}])
 
     return self.toConfigurationValidationProblems(validationItems, "ams-hbase-site")
 
@@ -1198,57 +1195,58 @@ class HDP206StackAdvisor(DefaultStackAdvisor):
                 hostMasterComponents[hostName].append(component["StackServiceComponents"]["component_name"])
 
       amsCollectorHosts = self.getComponentHostNames(services, "AMBARI_METRICS", "METRICS_COLLECTOR")
+      hostsIndex = self.getHostsIndex(hosts)
       for collectorHostName in amsCollectorHosts:
-        for host in hosts["items"]:
-          if host["Hosts"]["host_name"] == collectorHostName:
-            # AMS Collector co-hosted with other master components in bigger clusters
-            if len(hosts['items']) > 31 and \
-                            len(hostMasterComponents[collectorHostName]) > 2 and \
-                            host["Hosts"]["total_mem"] < 32*mb: # < 32Gb(total_mem in k)
-              masterHostMessage = "Host {0} is used by multiple master components ({1}). " \
-                                  "It is recommended to use a separate host for the " \
-                                  "Ambari Metrics Collector component and ensure " \
-                                  "the host has sufficient memory available."
-
-              hbaseMasterHeapsizeItem = self.getWarnItem(masterHostMessage.format(
-                  collectorHostName, str(", ".join(hostMasterComponents[collectorHostName]))))
-              if hbaseMasterHeapsizeItem:
-                validationItems.extend([{"config-name": "hbase_master_heapsize", "item": hbaseMasterHeapsizeItem}])
-
-            # Check for unused RAM on AMS Collector node
-            hostComponents = []
-            for service in services["services"]:
-              for component in service["components"]:
-                if component["StackServiceComponents"]["hostnames"] is not None:
-                  if collectorHostName in component["StackServiceComponents"]["hostnames"]:
-                    hostComponents.append(component["StackServiceComponents"]["component_name"])
-
-            requiredMemory = getMemorySizeRequired(hostComponents, configurations)
-            unusedMemory = host["Hosts"]["total_mem"] * 1024 - requiredMemory # in bytes
-            if unusedMemory > 4*gb:  # warn user, if more than 4GB RAM is unused
-              heapPropertyToIncrease = "hbase_regionserver_heapsize" if is_hbase_distributed else "hbase_master_heapsize"
-              xmnPropertyToIncrease = "regionserver_xmn_size" if is_hbase_distributed else "hbase_master_xmn_size"
-              recommended_collector_heapsize = int((unusedMemory - 4*gb)/5) + collector_heapsize*mb
-              recommended_hbase_heapsize = int((unusedMemory - 4*gb)*4/5) + to_number(properties.get(heapPropertyToIncrease))*mb
-              recommended_hbase_heapsize = min(32*gb, recommended_hbase_heapsize) #Make sure heapsize <= 32GB
-              recommended_xmn_size = round_to_n(0.12*recommended_hbase_heapsize/mb,128)
-
-              if collector_heapsize < recommended_collector_heapsize or \
-                  to_number(properties[heapPropertyToIncrease]) < recommended_hbase_heapsize:
-                collectorHeapsizeItem = self.getWarnItem("{0} MB RAM is unused on the host {1} based on components " \
-                                                         "assigned. Consider allocating  {2} MB to " \
-                                                         "metrics_collector_heapsize in ams-env, " \
-                                                         "{3} MB to {4} in ams-hbase-env"
-                                                         .format(unusedMemory/mb, collectorHostName,
-                                                                 recommended_collector_heapsize/mb,
-                                                                 recommended_hbase_heapsize/mb,
-                                                                 heapPropertyToIncrease))
-                validationItems.extend([{"config-name": heapPropertyToIncrease, "item": collectorHeapsizeItem}])
-
-              if to_number(properties[xmnPropertyToIncrease]) < recommended_hbase_heapsize:
-                xmnPropertyToIncreaseItem = self.getWarnItem("Consider allocating {0} MB to use up some unused memory "
-                                                             "on host".format(recommended_xmn_size))
-                validationItems.extend([{"config-name": xmnPropertyToIncrease, "item": xmnPropertyToIncreaseItem}])
+        host = hostsIndex.getHost(collectorHostName)
+        if host is not None:
+          # AMS Collector co-hosted with other master components in bigger clusters
+          if len(hosts['items']) > 31 and \
+                          len(hostMasterComponents[collectorHostName]) > 2 and \
+                          host["Hosts"]["total_mem"] < 32*mb: # < 32Gb(total_mem in k)
+            masterHostMessage = "Host {0} is used by multiple master components ({1}). " \
+                                "It is recommended to use a separate host for the " \
+                                "Ambari Metrics Collector component and ensure " \
+                                "the host has sufficient memory available."
+
+            hbaseMasterHeapsizeItem = self.getWarnItem(masterHostMessage.format(
+                collectorHostName, str(", ".join(hostMasterComponents[collectorHostName]))))
+            if hbaseMasterHeapsizeItem:
+              validationItems.extend([{"config-name": "hbase_master_heapsize", "item": hbaseMasterHeapsizeItem}])
+
+          # Check for unused RAM on AMS Collector node
+          hostComponents = []
+          for service in services["services"]:
+            for component in service["components"]:
+              if component["StackServiceComponents"]["hostnames"] is not None:
+                if collectorHostName in component["StackServiceComponents"]["hostnames"]:
+                  hostComponents.append(component["StackServiceComponents"]["component_name"])
+
+          requiredMemory = getMemorySizeRequired(hostComponents, configurations)
+          unusedMemory = host["Hosts"]["total_mem"] * 1024 - requiredMemory # in bytes
+          if unusedMemory > 4*gb:  # warn user, if more than 4GB RAM is unused
+            heapPropertyToIncrease = "hbase_regionserver_heapsize" if is_hbase_distributed else "hbase_master_heapsize"
+            xmnPropertyToIncrease = "regionserver_xmn_size" if is_hbase_distributed else "hbase_master_xmn_size"
+            recommended_collector_heapsize = int((unusedMemory - 4*gb)/5) + collector_heapsize*mb
+            recommended_hbase_heapsize = int((unusedMemory - 4*gb)*4/5) + to_number(properties.get(heapPropertyToIncrease))*mb
+            recommended_hbase_heapsize = min(32*gb, recommended_hbase_heapsize) #Make sure heapsize <= 32GB
+            recommended_xmn_size = round_to_n(0.12*recommended_hbase_heapsize/mb,128)
+
+            if collector_heapsize < recommended_collector_heapsize or \
+                to_number(properties[heapPropertyToIncrease]) < recommended_hbase_heapsize:
+              collectorHeapsizeItem = self.getWarnItem("{0} MB RAM is unused on the host {1} based on components " \
+                                                       "assigned. Consider allocating  {2} MB to " \
+                                                       "metrics_collector_heapsize in ams-env, " \
+                                                       "{3} MB to {4} in ams-hbase-env"
+                                                       .format(unusedMemory/mb, collectorHostName,
+                                                               recommended_collector_heapsize/mb,
+                                                               recommended_hbase_heapsize/mb,
+                                                               heapPropertyToIncrease))
+              validationItems.extend([{"config-name": heapPropertyToIncrease, "item": collectorHeapsizeItem}])
+
+            if to_number(properties[xmnPropertyToIncrease]) < recommended_hbase_heapsize:
+              xmnPropertyToIncreaseItem = self.getWarnItem("Consider allocating {0} MB to use up some unused memory "
+                                                           "on host".format(recommended_xmn_size))
+              validationItems.extend([{"config-name": xmnPropertyToIncrease, "item": xmnPropertyToIncreaseItem}])
       pass
 
     return self.toConfigurationValidationProblems(validationItems, "ams-hbase-env")
@@ -328,9 +328,10 @@ class HDPWIN21StackAdvisor(DefaultStackAdvisor):
             siteProperties = getSiteProperties(configurations, siteName)
             if siteProperties is not None:
               siteRecommendations = recommendedDefaults[siteName]["properties"]
-              print("SiteName: %s, method: %s\n" % (siteName, method.__name__))
-              print("Site properties: %s\n" % str(siteProperties))
-              print("Recommendations: %s\n********\n" % str(siteRecommendations))
+              if not self.quiet:
+                print("SiteName: %s, method: %s\n" % (siteName, method.__name__))
+                print("Site properties: %s\n" % str(siteProperties))
+                print("Recommendations: %s\n********\n" % str(siteRecommendations))
               resultItems = method(siteProperties, siteRecommendations, configurations, services, hosts)
               items.extend(resultItems)
     clusterWideItems = self.validateClusterConfigurations(configurations, services, hosts)
@@ -19,6 +19,7 @@ limitations under the License.
 
 import socket
 import re
+from contextlib import contextmanager
 
 class StackAdvisor(object):
   """
@@ -300,6 +301,91 @@ class StackAdvisor(object):
 
 
 
+class ServicesIndex(object):
+  """
+  Lookup tables over services["services"], built once instead of scanning
+  services and components lists on every helper call.
+  Component dictionaries are referenced, not copied, so changes to their
+  attributes (e.g. hostnames) are visible through the index.
+  """
+
+  def __init__(self, servicesList):
+    self.servicesList = servicesList
+    self.signature = ServicesIndex.getSignature(servicesList)
+    self.services = {}
+    self.components = {}
+    self.componentsList = []
+    for service in servicesList:
+      serviceName = service["StackServices"]["service_name"]
+      self.services.setdefault(serviceName, service)
+      for component in service["components"]:
+        componentName = component["StackServiceComponents"]["component_name"]
+        self.components.setdefault((serviceName, componentName), component)
+        self.componentsList.append(component)
+    self.hostComponents = None
+    self.hostComponentsSignature = None
+
+  @staticmethod
+  def getSignature(servicesList):
+    return len(servicesList), sum(len(service["components"]) for service in servicesList)
+
+  def isValid(self):
+    return self.signature == ServicesIndex.getSignature(self.servicesList)
+
+  def getComponent(self, serviceName, componentName):
+    return self.components.get((serviceName, componentName))
+
+  def getHostComponents(self, hostName):
+    """
+    Returns components which have hostName in their hostnames, in services order
+    """
+    signature = [(id(hostNames), len(hostNames)) for hostNames in
+                 [component["StackServiceComponents"].get("hostnames") or [] for component in self.componentsList]]
+    if self.hostComponents is None or signature != self.hostComponentsSignature:
+      self.hostComponents = {}
+      for component in self.componentsList:
+        for componentHostName in set(component["StackServiceComponents"].get("hostnames") or []):
+          self.hostComponents.setdefault(componentHostName, []).append(component)
+      self.hostComponentsSignature = signature
+    return self.hostComponents.get(hostName, [])
+
+
+class HostsIndex(object):
+  """
+  Lookup tables over hosts["items"]
+  """
+
+  def __init__(self, hostsItems):
+    self.hostsItems = hostsItems
+    self.hostsList = [host["Hosts"]["host_name"] for host in hostsItems]
+    self.positions = {}
+    for position, hostName in enumerate(self.hostsList):
+      self.positions.setdefault(hostName, position)
+    self.fqdns = {}
+
+  def isValid(self):
+    return len(self.hostsItems) == len(self.hostsList)
+
+  def getHost(self, hostName):
+    position = self.positions.get(hostName)
+    return None if position is None else self.hostsItems[position]
+
+  def getHosts(self, hostNames):
+    """
+    Returns hosts items with given names, in hosts["items"] order
+    """
+    positions = sorted(self.positions[hostName] for hostName in set(hostNames) if hostName in self.positions)
+    return [self.hostsItems[position] for position in positions]
+
+  def getFqdn(self, hostName=None):
+    """
+    Cached socket.getfqdn, hostName None stands for the local host
+    """
+    if hostName not in self.fqdns:
+      self.fqdns[hostName] = socket.getfqdn() if hostName is None else socket.getfqdn(hostName)
+    return self.fqdns[hostName]
+
+
 class DefaultStackAdvisor(StackAdvisor):
   """
   Default stack advisor implementation.
@@ -309,12 +395,73 @@ class DefaultStackAdvisor(StackAdvisor):
   implement
   """
 
+  # Max number of services/hosts indexes kept by advisor instance
+  INDEXES_LIMIT = 16
+
+  # Set to True to skip diagnostic output of validations
+  quiet = False
+
+  @contextmanager
+  def invocation(self):
+    """
+    Scope of a single request (validation, recommendation). Results memoized
+    within it are dropped afterwards, since callers may change services and
+    hosts between requests.
+    """
+    if "_memo" in self.__dict__:
+      # nested call, e.g. recommendations made for validation
+      yield
+      return
+    self._memo = {}
+    try:
+      yield
+    finally:
+      del self._memo
+
+  def memoize(self, key, references, compute):
+    """
+    Returns compute() result memoized by key in the current invocation. Objects whose
+    ids are part of the key are given as references, so the ids stay valid.
+    """
+    memo = self.__dict__.get("_memo")
+    if memo is None:
+      return compute()
+    if key not in memo:
+      memo[key] = (references, compute())
+    return memo[key][1]
+
+  def getServicesIndex(self, services):
+    """
+    Returns ServicesIndex of services["services"], built on first use
+    """
+    return self.getIndex(services["services"], ServicesIndex)
+
+  def getHostsIndex(self, hosts):
+    """
+    Returns HostsIndex of hosts["items"], built on first use
+    """
+    return self.getIndex(hosts["items"], HostsIndex)
+
+  def getIndex(self, items, indexClass):
+    # indexes keep references to their lists, so list ids are not reused while they are cached
+    indexes = self.__dict__.setdefault("_indexes", {})
+    key = (indexClass, id(items))
+    index = indexes.get(key)
+    if index is None or not index.isValid():
+      if len(indexes) >= self.INDEXES_LIMIT:
+        indexes.clear()
+      index = indexes[key] = indexClass(items)
+    return index
+
+  def resetIndexes(self):
+    self.__dict__.pop("_indexes", None)
+
   def recommendComponentLayout(self, services, hosts):
     """Returns Services object with hostnames array populated for components"""
 
     stackName = services["Versions"]["stack_name"]
     stackVersion = services["Versions"]["stack_version"]
-    hostsList = [host["Hosts"]["host_name"] for host in hosts["items"]]
+    hostsList = list(self.getHostsIndex(hosts).hostsList)
     servicesList = [service["StackServices"]["service_name"] for service in services["services"]]
 
     layoutRecommendations = self.createComponentLayoutRecommendations(services, hosts)
@@ -339,7 +486,8 @@ class DefaultStackAdvisor(StackAdvisor):
       }
     }
 
-    hostsList = [host["Hosts"]["host_name"] for host in hosts["items"]]
+    hostsIndex = self.getHostsIndex(hosts)
+    hostsList = hostsIndex.hostsList
 
     hostsComponentsMap = {}
     for hostName in hostsList:
@@ -363,22 +511,23 @@ class DefaultStackAdvisor(StackAdvisor):
               hostIndex = 0
               while hostsCount > len(hostsForComponent) and hostIndex < len(hostsList):
                 currentHost = hostsList[hostIndex]
-                if self.isHostSuitableForComponent(currentHost, component):
+                if self.isHostSuitableForComponent(currentHost, component, hostsIndex):
                   hostsForComponent.append(currentHost)
                 hostIndex += 1
             else:
-              hostsForComponent = [self.getHostForComponent(component, hostsList)]
+              hostsForComponent = [self.getHostForComponent(component, hostsList, hostsIndex)]
           else:
-            hostsForComponent = [self.getHostForComponent(component, hostsList)]
+            hostsForComponent = [self.getHostForComponent(component, hostsList, hostsIndex)]
 
         #extend 'hostsComponentsMap' with 'hostsForComponent'
         for hostName in hostsForComponent:
           hostsComponentsMap[hostName].append( { "name":componentName } )
     #extend 'hostsComponentsMap' with Slave and Client Components
-    componentsListList = [service["components"] for service in services["services"]]
-    componentsList = [item for sublist in componentsListList for item in sublist]
-    usedHostsListList = [component["StackServiceComponents"]["hostnames"] for component in componentsList if not self.isComponentNotValuable(component)]
-    utilizedHosts = [item for sublist in usedHostsListList for item in sublist]
+    componentsList = self.getServicesIndex(services).componentsList
+    utilizedHosts = set()
+    for component in componentsList:
+      if not self.isComponentNotValuable(component):
+        utilizedHosts.update(component["StackServiceComponents"]["hostnames"])
     freeHosts = [hostName for hostName in hostsList if hostName not in utilizedHosts]
 
     for service in services["services"]:
@@ -427,18 +576,29 @@ class DefaultStackAdvisor(StackAdvisor):
           hostsComponentsMap[hostName].append( { "name": componentName } )
 
     #prepare 'host-group's from 'hostsComponentsMap'
-    host_groups = recommendations["blueprint"]["host_groups"]
-    bindings = recommendations["blueprint_cluster_binding"]["host_groups"]
-    index = 0
-    for key in hostsComponentsMap.keys():
-      index += 1
-      host_group_name = "host-group-{0}".format(index)
-      host_groups.append( { "name": host_group_name, "components": hostsComponentsMap[key] } )
-      bindings.append( { "name": host_group_name, "hosts": [{ "fqdn": key }] } )
-
+    self.groupHostsByComponents(recommendations, hostsComponentsMap)
     return recommendations
   pass
 
+  def groupHostsByComponents(self, recommendations, hostsComponentsMap):
+    """
+    Fills 'host-group's of layout recommendations. Hosts with the same set of components
+    share a host group, so the number of groups depends on the number of distinct layouts
+    rather than on the number of hosts.
+    """
+    host_groups = recommendations["blueprint"]["host_groups"]
+    bindings = recommendations["blueprint_cluster_binding"]["host_groups"]
+    groupBindings = {}
+    for hostName, components in hostsComponentsMap.items():
+      layout = tuple(sorted(component["name"] for component in components))
+      binding = groupBindings.get(layout)
+      if binding is None:
+        host_group_name = "host-group-{0}".format(len(host_groups) + 1)
+        host_groups.append( { "name": host_group_name, "components": components } )
+        binding = groupBindings[layout] = { "name": host_group_name, "hosts": [] }
+        bindings.append(binding)
+      binding["hosts"].append({ "fqdn": hostName })
+
   def isComponentUsingCardinalityForLayout(self, componentName):
     return False
 
@@ -461,7 +621,8 @@ class DefaultStackAdvisor(StackAdvisor):
 
   def validateConfigurations(self, services, hosts):
     """Returns array of Validation objects about issues with hostnames components assigned to"""
-    validationItems = self.getConfigurationsValidationItems(services, hosts)
+    with self.invocation():
+      validationItems = self.getConfigurationsValidationItems(services, hosts)
     return self.createValidationResponse(services, validationItems)
 
   def getComponentLayoutValidations(self, services, hosts):
@@ -470,6 +631,16 @@ class DefaultStackAdvisor(StackAdvisor):
   def getConfigurationClusterSummary(self, servicesList, hosts, components, services):
     pass
 
+  def getMemoizedConfigurationClusterSummary(self, servicesList, hosts, components, services):
+    """
+    getConfigurationClusterSummary memoized by services, components and host names,
+    e.g. config groups with the same hosts share it
+    """
+    key = ("clusterSummary", tuple(servicesList), tuple(components), id(services["services"]),
+           tuple(host["Hosts"]["host_name"] for host in hosts["items"]))
+    return self.memoize(key, services["services"],
+                        lambda: self.getConfigurationClusterSummary(servicesList, hosts, components, services))
+
   def getConfigurationsValidationItems(self, services, hosts):
     return []
 
@@ -493,10 +664,10 @@ class DefaultStackAdvisor(StackAdvisor):
                            host["Hosts"]["host_name"] in configGroup["hosts"]]}
 
       # Override clusterSummary
-      cgClusterSummary = self.getConfigurationClusterSummary(servicesList,
-                                                             cgHosts,
-                                                             components,
-                                                             cgServices)
+      cgClusterSummary = self.getMemoizedConfigurationClusterSummary(servicesList,
+                                                                     cgHosts,
+                                                                     components,
+                                                                     cgServices)
 
       configurations = {}
 
@@ -532,6 +703,11 @@ class DefaultStackAdvisor(StackAdvisor):
                 configElement][property] = value
 
   def recommendConfigurations(self, services, hosts):
+    with self.invocation():
+      return self.memoize(("recommendConfigurations", id(services), id(hosts)), (services, hosts),
+                          lambda: self.createConfigurationRecommendations(services, hosts))
+
+  def createConfigurationRecommendations(self, services, hosts):
     stackName = services["Versions"]["stack_name"]
     stackVersion = services["Versions"]["stack_version"]
     hostsList = [host["Hosts"]["host_name"] for host in hosts["items"]]
@@ -540,8 +716,6 @@ class DefaultStackAdvisor(StackAdvisor):
                   for service in services["services"]
                   for component in service["components"]]
 
-    clusterSummary = self.getConfigurationClusterSummary(servicesList, hosts, components, services)
-
     recommendations = {
       "Versions": {"stack_name": stackName, "stack_version": stackVersion},
       "hosts": hostsList,
@@ -563,6 +737,7 @@ class DefaultStackAdvisor(StackAdvisor):
                                  servicesList)
     else:
       configurations = recommendations["recommendations"]["blueprint"]["configurations"]
+      clusterSummary = self.getMemoizedConfigurationClusterSummary(servicesList, hosts, components, services)
 
       for service in servicesList:
         calculation = self.getServiceConfigurationRecommender(service)
@@ -599,7 +774,9 @@ class DefaultStackAdvisor(StackAdvisor):
       return None
     return serviceComponent.get(attribute, None)
 
-  def isLocalHost(self, hostName):
+  def isLocalHost(self, hostName, hostsIndex=None):
+    if hostsIndex is not None:
+      return hostsIndex.getFqdn(hostName) == hostsIndex.getFqdn()
     return socket.getfqdn(hostName) == socket.getfqdn()
 
   def isMasterComponentWithMultipleInstances(self, component):
@@ -620,7 +797,7 @@ class DefaultStackAdvisor(StackAdvisor):
   def getComponentCardinality(self, componentName):
     return self.getCardinalitiesDict().get(componentName, {"min": 1, "max": 1})
 
-  def getHostForComponent(self, component, hostsList):
+  def getHostForComponent(self, component, hostsList, hostsIndex=None):
     componentName = self.getComponentName(component)
 
     if len(hostsList) != 1:
@@ -630,7 +807,7 @@ class DefaultStackAdvisor(StackAdvisor):
       else:
         hostIndex = 0
       for host in hostsList[hostIndex:]:
-        if self.isHostSuitableForComponent(host, component):
+        if self.isHostSuitableForComponent(host, component, hostsIndex):
           return host
     return hostsList[0]
 
@@ -648,8 +825,8 @@ class DefaultStackAdvisor(StackAdvisor):
     service = self.getNotPreferableOnServerComponents()
     return componentName in service
 
-  def isHostSuitableForComponent(self, host, component):
-    return not (self.isComponentNotPreferableOnAmbariServerHost(component) and self.isLocalHost(host))
+  def isHostSuitableForComponent(self, host, component, hostsIndex=None):
+    return not (self.isComponentNotPreferableOnAmbariServerHost(component) and self.isLocalHost(host, hostsIndex))
 
   def getMastersWithMultipleInstances(self):
     return []
@@ -673,16 +850,15 @@ class DefaultStackAdvisor(StackAdvisor):
     return {}
 
   def getComponentHostNames(self, servicesDict, serviceName, componentName):
-    for service in servicesDict["services"]:
-      if service["StackServices"]["service_name"] == serviceName:
-        for component in service['components']:
-          if component["StackServiceComponents"]["component_name"] == componentName:
-            return component["StackServiceComponents"]["hostnames"]
+    component = self.getServicesIndex(servicesDict).getComponent(serviceName, componentName)
+    if component is not None:
+      return component["StackServiceComponents"]["hostnames"]
   pass
 
   def recommendConfigurationDependencies(self, services, hosts):
-    result = self.recommendConfigurations(services, hosts)
-    return self.filterResult(result, services)
+    with self.invocation():
+      result = self.recommendConfigurations(services, hosts)
+      return self.filterResult(result, services)
 
   # returns recommendations only for changed and depended properties
   def filterResult(self, result, services):
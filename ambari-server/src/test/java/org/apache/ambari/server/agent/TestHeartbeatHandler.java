@@ -34,6 +34,7 @@ import static org.easymock.EasyMock.anyObject;
 import static org.easymock.EasyMock.expect;
 import static org.easymock.EasyMock.replay;
 import static org.easymock.EasyMock.reset;
+import static org.easymock.EasyMock.verify;
 import static org.junit.Assert.assertEquals;
 import static org.junit.Assert.assertFalse;
 import static org.junit.Assert.assertTrue;
@@ -211,6 +212,59 @@ public class TestHeartbeatHandler {
     assertEquals(0, aq.dequeueAll(DummyHostname1).size());
   }
 
+  @Test
+  @SuppressWarnings("unchecked")
+  public void testDeltaHeartbeatResync() throws Exception {
+    ActionManager am = heartbeatTestHelper.getMockActionManager();
+    expect(am.getTasks(anyObject(List.class))).andReturn(new ArrayList<HostRoleCommand>()).anyTimes();
+    replay(am);
+    Clusters fsm = clusters;
+    fsm.addHost(DummyHostname1);
+    Host hostObject = clusters.getHost(DummyHostname1);
+    hostObject.setIPv4("ipv4");
+    hostObject.setIPv6("ipv6");
+    hostObject.setOsType(DummyOsType);
+
+    HeartBeatHandler handler = new HeartBeatHandler(fsm, new ActionQueue(), am, injector);
+    HeartbeatProcessor heartbeatProcessor = EasyMock.createNiceMock(HeartbeatProcessor.class);
+    expect(heartbeatProcessor.pollResyncRequest(DummyHostname1)).andReturn(false).times(3);
+    // one of the heartbeats failed to be processed meanwhile
+    expect(heartbeatProcessor.pollResyncRequest(DummyHostname1)).andReturn(true).once();
+    expect(heartbeatProcessor.pollResyncRequest(DummyHostname1)).andReturn(false).anyTimes();
+    replay(heartbeatProcessor);
+    handler.setHeartbeatProcessor(heartbeatProcessor);
+
+    Register reg = new Register();
+    HostInfo hi = new HostInfo();
+    hi.setHostName(DummyHostname1);
+    hi.setOS(DummyOs);
+    hi.setOSRelease(DummyOSRelease);
+    reg.setHostname(DummyHostname1);
+    reg.setHardwareProfile(hi);
+    reg.setAgentVersion(metaInfo.getServerVersion());
+    handler.handleRegistration(reg);
+    hostObject.setState(HostState.UNHEALTHY);
+
+    // full snapshot, unchanged delta, then a delta which does not add up to the state digest
+    assertFalse(handler.handleHeartBeat(createDeltaHeartbeat(0, false, "digest1")).isResyncHeartbeat());
+    assertFalse(handler.handleHeartBeat(createDeltaHeartbeat(1, true, "digest1")).isResyncHeartbeat());
+    assertTrue(handler.handleHeartBeat(createDeltaHeartbeat(2, true, "digest2")).isResyncHeartbeat());
+
+    assertTrue(handler.handleHeartBeat(createDeltaHeartbeat(3, false, "digest2")).isResyncHeartbeat());
+    assertFalse(handler.handleHeartBeat(createDeltaHeartbeat(4, false, "digest2")).isResyncHeartbeat());
+    verify(heartbeatProcessor);
+  }
+
+  private HeartBeat createDeltaHeartbeat(long responseId, boolean delta, String stateDigest) {
+    HeartBeat hb = new HeartBeat();
+    hb.setResponseId(responseId);
+    hb.setNodeStatus(new HostStatus(Status.HEALTHY, DummyHostStatus));
+    hb.setHostname(DummyHostname1);
+    hb.setDeltaHeartbeat(delta);
+    hb.setStateDigest(stateDigest);
+    return hb;
+  }
+
 
 
 
@@ -0,0 +1,160 @@
+/**
+ * Licensed to the Apache Software Foundation (ASF) under one
+ * or more contributor license agreements.  See the NOTICE file
+ * distributed with this work for additional information
+ * regarding copyright ownership.  The ASF licenses this file
+ * to you under the Apache License, Version 2.0 (the
+ * "License"); you may not use this file except in compliance
+ * with the License.  You may obtain a copy of the License at
+ *
+ * http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+package org.apache.ambari.server.api;
+
+import static org.easymock.EasyMock.anyString;
+import static org.easymock.EasyMock.capture;
+import static org.easymock.EasyMock.eq;
+import static org.easymock.EasyMock.expect;
+import static org.easymock.EasyMock.expectLastCall;
+import static org.easymock.EasyMock.same;
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertNull;
+
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.util.Arrays;
+import java.util.Collections;
+import java.util.zip.GZIPOutputStream;
+
+import javax.servlet.FilterChain;
+import javax.servlet.ReadListener;
+import javax.servlet.ServletInputStream;
+import javax.servlet.ServletRequest;
+import javax.servlet.http.HttpServletRequest;
+import javax.servlet.http.HttpServletResponse;
+
+import org.apache.commons.io.IOUtils;
+import org.easymock.Capture;
+import org.easymock.EasyMockSupport;
+import org.junit.Test;
+
+public class GzipRequestFilterTest extends EasyMockSupport {
+
+  private static final String BODY = "{\"responseId\":1,\"hostname\":\"c6401.ambari.apache.org\"}";
+
+  private GzipRequestFilter filter = new GzipRequestFilter();
+
+  @Test
+  public void testGzipRequestIsDecoded() throws Exception {
+    HttpServletRequest request = createNiceMock(HttpServletRequest.class);
+    HttpServletResponse response = createStrictMock(HttpServletResponse.class);
+    FilterChain filterChain = createStrictMock(FilterChain.class);
+    Capture<ServletRequest> requestCapture = new Capture<ServletRequest>();
+
+    expect(request.getHeader("Content-Encoding")).andReturn("gzip").anyTimes();
+    expect(request.getHeader("Content-Type")).andReturn("application/json").anyTimes();
+    expect(request.getHeaderNames()).andReturn(
+        Collections.enumeration(Arrays.asList("Content-Encoding", "Content-Length", "Content-Type"))).anyTimes();
+    expect(request.getContentLength()).andReturn(42).anyTimes();
+    expect(request.getInputStream()).andReturn(servletInputStream(gzip(BODY.getBytes("UTF-8")))).once();
+    filterChain.doFilter(capture(requestCapture), same(response));
+    expectLastCall().once();
+
+    replayAll();
+    filter.doFilter(request, response, filterChain);
+    verifyAll();
+
+    HttpServletRequest decodedRequest = (HttpServletRequest) requestCapture.getValue();
+    assertEquals(BODY, IOUtils.toString(decodedRequest.getInputStream(), "UTF-8"));
+    assertNull(decodedRequest.getHeader("Content-Encoding"));
+    assertEquals("application/json", decodedRequest.getHeader("Content-Type"));
+    assertEquals(-1, decodedRequest.getContentLength());
+    assertEquals(Collections.singletonList("Content-Type"), Collections.list(decodedRequest.getHeaderNames()));
+  }
+
+  @Test
+  public void testPlainRequestIsNotWrapped() throws Exception {
+    HttpServletRequest request = createNiceMock(HttpServletRequest.class);
+    HttpServletResponse response = createStrictMock(HttpServletResponse.class);
+    FilterChain filterChain = createStrictMock(FilterChain.class);
+
+    expect(request.getHeader("Content-Encoding")).andReturn(null).anyTimes();
+    filterChain.doFilter(same(request), same(response));
+    expectLastCall().once();
+
+    replayAll();
+    filter.doFilter(request, response, filterChain);
+    verifyAll();
+  }
+
+  @Test
+  public void testCorruptedGzipRequestIsRejected() throws Exception {
+    HttpServletRequest request = createNiceMock(HttpServletRequest.class);
+    HttpServletResponse response = createStrictMock(HttpServletResponse.class);
+    FilterChain filterChain = createStrictMock(FilterChain.class);
+
+    expect(request.getHeader("Content-Encoding")).andReturn("gzip").anyTimes();
+    expect(request.getInputStream()).andReturn(servletInputStream(BODY.getBytes("UTF-8"))).once();
+    response.sendError(eq(HttpServletResponse.SC_BAD_REQUEST), anyString());
+    expectLastCall().once();
+
+    replayAll();
+    filter.doFilter(request, response, filterChain);
+    verifyAll();
+  }
+
+  @Test
+  public void testUnsupportedEncodingIsRejected() throws Exception {
+    HttpServletRequest request = createNiceMock(HttpServletRequest.class);
+    HttpServletResponse response = createStrictMock(HttpServletResponse.class);
+    FilterChain filterChain = createStrictMock(FilterChain.class);
+
+    expect(request.getHeader("Content-Encoding")).andReturn("br").anyTimes();
+    response.sendError(eq(HttpServletResponse.SC_UNSUPPORTED_MEDIA_TYPE), anyString());
+    expectLastCall().once();
+
+    replayAll();
+    filter.doFilter(request, response, filterChain);
+    verifyAll();
+  }
+
+  private static byte[] gzip(byte[] data) throws IOException {
+    ByteArrayOutputStream out = new ByteArrayOutputStream();
+    GZIPOutputStream gzipOut = new GZIPOutputStream(out);
+    gzipOut.write(data);
+    gzipOut.close();
+    return out.toByteArray();
+  }
+
+  private static ServletInputStream servletInputStream(byte[] data) {
+    final ByteArrayInputStream in = new ByteArrayInputStream(data);
+    return new ServletInputStream() {
+      @Override
+      public int read() throws IOException {
+        return in.read();
+      }
+
+      @Override
+      public boolean isFinished() {
+        return in.available() == 0;
+      }
+
+      @Override
+      public boolean isReady() {
+        return true;
+      }
+
+      @Override
+      public void setReadListener(ReadListener readListener) {
+      }
+    };
+  }
+}
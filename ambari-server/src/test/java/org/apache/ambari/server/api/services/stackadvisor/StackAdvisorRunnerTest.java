@@ -23,12 +23,15 @@ import static org.junit.Assert.assertEquals;
 import static org.junit.Assert.fail;
 import static org.powermock.api.easymock.PowerMock.createNiceMock;
 import static org.powermock.api.easymock.PowerMock.replay;
+import static org.powermock.api.easymock.PowerMock.verify;
 import static org.powermock.api.support.membermodification.MemberModifier.stub;
 
 import java.io.File;
 import java.io.IOException;
 
 import org.apache.ambari.server.api.services.stackadvisor.commands.StackAdvisorCommandType;
+import org.apache.ambari.server.configuration.Configuration;
+import org.apache.commons.io.FileUtils;
 import org.junit.After;
 import org.junit.Before;
 import org.junit.Test;
@@ -37,6 +40,7 @@ import org.junit.runner.RunWith;
 import org.powermock.api.easymock.PowerMock;
 import org.powermock.core.classloader.annotations.PrepareForTest;
 import org.powermock.modules.junit4.PowerMockRunner;
+import org.powermock.reflect.Whitebox;
 
 /**
  * StackAdvisorRunner unit tests.
@@ -127,4 +131,70 @@ public class StackAdvisorRunnerTest {
     }
   }
 
+  @Test
+  public void testRunScript_daemon_processNotStarted() throws Exception {
+    File actionDirectory = temp.newFolder("actionDir");
+    ProcessBuilder processBuilder = PowerMock.createStrictMock(ProcessBuilder.class);
+    StackAdvisorRunner saRunner = createDaemonRunner();
+
+    stub(PowerMock.method(StackAdvisorRunner.class, "prepareShellCommand"))
+        .toReturn(processBuilder);
+    replay(processBuilder);
+    String script = createDaemonScript("echo '{\"status\": \"ok\", \"result_file\": \"component-layout.json\"}'");
+    saRunner.runScript(script, StackAdvisorCommandType.RECOMMEND_COMPONENT_LAYOUT, actionDirectory);
+    saRunner.runScript(script, StackAdvisorCommandType.RECOMMEND_CONFIGURATIONS, actionDirectory);
+    verify(processBuilder);
+  }
+
+  @Test(expected = StackAdvisorRequestException.class)
+  public void testRunScript_daemonExitCode1_throwsRequestException() throws Exception {
+    File actionDirectory = temp.newFolder("actionDir");
+    StackAdvisorRunner saRunner = createDaemonRunner();
+
+    String script = createDaemonScript("echo '{\"status\": \"error\", \"exit_code\": 1, \"message\": \"invalid\"}'");
+    saRunner.runScript(script, StackAdvisorCommandType.RECOMMEND_COMPONENT_LAYOUT, actionDirectory);
+  }
+
+  @Test
+  public void testRunScript_daemonExits_fallsBackToProcess() throws Exception {
+    File actionDirectory = temp.newFolder("actionDir");
+    ProcessBuilder processBuilder = createNiceMock(ProcessBuilder.class);
+    Process process = createNiceMock(Process.class);
+    StackAdvisorRunner saRunner = createDaemonRunner();
+
+    stub(PowerMock.method(StackAdvisorRunner.class, "prepareShellCommand"))
+        .toReturn(processBuilder);
+    expect(processBuilder.start()).andReturn(process);
+    expect(process.waitFor()).andReturn(0);
+    replay(processBuilder, process);
+    String script = createDaemonScript("exit 0");
+    saRunner.runScript(script, StackAdvisorCommandType.RECOMMEND_COMPONENT_LAYOUT, actionDirectory);
+    verify(processBuilder, process);
+  }
+
+  private StackAdvisorRunner createDaemonRunner() {
+    Configuration configuration = createNiceMock(Configuration.class);
+    expect(configuration.isStackAdvisorDaemonEnabled()).andReturn(true).anyTimes();
+    replay(configuration);
+
+    StackAdvisorRunner saRunner = new StackAdvisorRunner();
+    Whitebox.setInternalState(saRunner, "configuration", configuration);
+    return saRunner;
+  }
+
+  /**
+   * Creates a script which runs {@code response} for every request line it
+   * reads when started with --daemon.
+   */
+  private String createDaemonScript(String response) throws IOException {
+    File script = temp.newFile("stack_advisor.sh");
+    FileUtils.writeStringToFile(script, "#!/bin/sh\n"
+        + "[ \"$1\" = \"--daemon\" ] || exit 2\n"
+        + "while read line; do\n"
+        + "  " + response + "\n"
+        + "done\n");
+    script.setExecutable(true);
+    return script.getAbsolutePath();
+  }
+
 }
@@ -24,6 +24,7 @@ import subprocess
 import os
 import logging
 import tempfile
+import shutil
 import pprint
 from xml.dom import minidom
 
@@ -291,6 +292,82 @@ class TestResourceFilesKeeper(TestCase):
         self.fail('Unexpected exception thrown:' + str(e))
 
 
+  def test_count_hash_sum_with_manifest(self):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      os.makedirs(os.path.join(tmp_dir, "scripts"))
+      for name, content in [("metainfo.xml", "<metainfo/>"), ("scripts/a.py", "a = 1"), ("scripts/b.py", "b = 2")]:
+        with open(os.path.join(tmp_dir, name), "w") as fh:
+          fh.write(content)
+      resource_files_keeper = ResourceFilesKeeper(self.TEST_RESOURCES_DIR, tmp_dir)
+      expected_hash = resource_files_keeper.count_hash_sum(tmp_dir)
+
+      # first run reads everything
+      manifest = resource_files_keeper.read_manifest(tmp_dir)
+      self.assertEquals(resource_files_keeper.count_hash_sum(tmp_dir, manifest), expected_hash)
+      self.assertEquals(manifest.hashed_files, 3)
+      resource_files_keeper.write_manifest(tmp_dir, manifest)
+
+      # nothing is read while files are not touched
+      manifest = resource_files_keeper.read_manifest(tmp_dir)
+      with patch("__builtin__.open") as open_mock:
+        self.assertEquals(resource_files_keeper.count_hash_sum(tmp_dir, manifest), expected_hash)
+        self.assertFalse(open_mock.called)
+      self.assertFalse(manifest.changed)
+
+      # touched file with the same content is the only one read
+      a_path = os.path.join(tmp_dir, "scripts", "a.py")
+      os.utime(a_path, (1000, 1000))
+      manifest = resource_files_keeper.read_manifest(tmp_dir)
+      self.assertEquals(resource_files_keeper.count_hash_sum(tmp_dir, manifest), expected_hash)
+      self.assertEquals(manifest.hashed_files, 1)
+      self.assertTrue(manifest.changed)
+
+      # modified content leads to the full recalculation
+      with open(a_path, "w") as fh:
+        fh.write("a = 3")
+      os.utime(a_path, (2000, 2000))
+      manifest = resource_files_keeper.read_manifest(tmp_dir)
+      new_hash = resource_files_keeper.count_hash_sum(tmp_dir, manifest)
+      self.assertNotEquals(new_hash, expected_hash)
+      self.assertEquals(new_hash, resource_files_keeper.count_hash_sum(tmp_dir))
+      self.assertEquals(manifest.hashed_files, 4)
+    finally:
+      shutil.rmtree(tmp_dir)
+
+
+  def test_update_directory_archives_in_parallel(self):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      directories = []
+      for name in ["first", "second", "third"]:
+        directory = os.path.join(tmp_dir, name)
+        os.makedirs(directory)
+        with open(os.path.join(directory, "script.py"), "w") as fh:
+          fh.write(name)
+        directories.append(directory)
+
+      resource_files_keeper = ResourceFilesKeeper(self.TEST_RESOURCES_DIR, tmp_dir, workers=2)
+      resource_files_keeper._update_directory_archives(directories)
+      for directory in directories:
+        self.assertTrue(os.path.isfile(os.path.join(directory, ResourceFilesKeeper.ARCHIVE_NAME)))
+        self.assertTrue(os.path.isfile(os.path.join(directory, ResourceFilesKeeper.MANIFEST_FILE)))
+        self.assertEquals(resource_files_keeper.read_hash_sum(directory),
+                          resource_files_keeper.count_hash_sum(directory))
+      self.assertEquals(sorted([timing[0] for timing in resource_files_keeper.timings]), directories)
+      self.assertTrue(all(timing[2] for timing in resource_files_keeper.timings))
+
+      # second run finds nothing to update
+      resource_files_keeper = ResourceFilesKeeper(self.TEST_RESOURCES_DIR, tmp_dir)
+      resource_files_keeper._update_directory_archives(directories)
+      self.assertEquals([(timing[2], timing[3]) for timing in resource_files_keeper.timings], [(False, 0)] * 3)
+      report = resource_files_keeper.get_timing_report()
+      self.assertEquals(len(report), 4)
+      self.assertTrue(report[0].startswith("Processed 3 directories"))
+    finally:
+      shutil.rmtree(tmp_dir)
+
+
   def test_read_hash_sum(self):
     resource_files_keeper = ResourceFilesKeeper(self.TEST_RESOURCES_DIR, self.DUMMY_UNCHANGEABLE_PACKAGE)
     hash_sum = resource_files_keeper.read_hash_sum(self.DUMMY_UNCHANGEABLE_PACKAGE)
@@ -388,6 +465,7 @@ class TestResourceFilesKeeper(TestCase):
     resource_files_keeper = ResourceFilesKeeper(self.TEST_RESOURCES_DIR, self.DUMMY_UNCHANGEABLE_PACKAGE)
     self.assertTrue(resource_files_keeper.is_ignored(".hash"))
     self.assertTrue(resource_files_keeper.is_ignored("archive.zip"))
+    self.assertTrue(resource_files_keeper.is_ignored(".hash_manifest"))
     self.assertTrue(resource_files_keeper.is_ignored("dummy.pyc"))
     self.assertFalse(resource_files_keeper.is_ignored("dummy.py"))
     self.assertFalse(resource_files_keeper.is_ignored("1.sh"))
@@ -17,7 +17,11 @@ limitations under the License.
 '''
 
 from unittest import TestCase
+from StringIO import StringIO
+import json
 import os
+import shutil
+import tempfile
 
 class TestStackAdvisorInitialization(TestCase):
 
@@ -510,4 +514,54 @@ class TestStackAdvisorInitialization(TestCase):
                                 {'name': 'mapreduce.map.memory.mb', 'type': 'mapred-site'},
                                 {'name': 'mapreduce.reduce.memory.mb', 'type': 'mapred-site'}]
 
-    self.assertEquals(properties_dict, expected_properties_dict)
\ No newline at end of file
+    self.assertEquals(properties_dict, expected_properties_dict)
+
+  def test_stackAdvisorDaemon(self):
+    path_template = os.path.join(self.test_directory, '../resources/stacks/{0}/{1}/services/stack_advisor.py')
+    setattr(self.stack_advisor, "STACK_ADVISOR_IMPL_PATH_TEMPLATE", path_template)
+    services = {
+      "Versions": {
+        "stack_name": "XYZ",
+        "stack_version": "1.0.1",
+        "stack_hierarchy": {"stack_versions": ["1.0.0"]}
+      },
+      "services": [
+        {
+          "StackServices": {"service_name": "YARN"},
+          "components": [{"StackServiceComponents": {"component_name": "NODEMANAGER"}}]
+        }
+      ]
+    }
+    hosts = {"items": [{"Hosts": {"host_name": "host1"}}]}
+    action_dir = tempfile.mkdtemp()
+    try:
+      hosts_file = os.path.join(action_dir, "hosts.json")
+      services_file = os.path.join(action_dir, "services.json")
+      with open(hosts_file, "w") as fp:
+        json.dump(hosts, fp)
+      with open(services_file, "w") as fp:
+        json.dump(services, fp)
+      requests = [
+        {"action": "recommend-configurations", "hosts": hosts, "services": services},
+        {"action": "recommend-configurations", "hosts_file": hosts_file, "services_file": services_file},
+        {"action": "unknown-action"},
+        {"action": "stats"}
+      ]
+      output = StringIO()
+      daemon = self.stack_advisor.StackAdvisorDaemon()
+      daemon.serve(StringIO("\n".join([json.dumps(request) for request in requests]) + "\n"), output)
+      responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    finally:
+      shutil.rmtree(action_dir)
+
+    self.assertEquals(len(responses), 4)
+    self.assertEquals(responses[0]["status"], "ok")
+    yarn_configs = responses[0]["result"]["recommendations"]["blueprint"]["configurations"]["yarn-site"]["properties"]
+    self.assertEquals("-Xmx101m", yarn_configs["yarn.nodemanager.resource.memory-mb"])
+    self.assertEquals(responses[1], {"status": "ok", "result_file": os.path.join(os.path.realpath(action_dir), "configurations.json"),
+                                     "latency": responses[1]["latency"]})
+    self.assertEquals(responses[2]["status"], "error")
+    self.assertEquals(responses[2]["exit_code"], 1)
+    # stack advisor classes are loaded once
+    self.assertEquals(daemon.classes.keys(), [("XYZ", "1.0.1", ("1.0.0",))])
+    self.assertEquals(responses[3]["result"]["recommend-configurations"]["count"], 2)
@@ -96,6 +96,26 @@ class TestHDP206StackAdvisor(TestCase):
     }
     self.assertHostLayout(expectedComponentsHostsMap, result)
 
+  def test_recommendationGroupsHostsWithSameComponents(self):
+    servicesInfo = [
+      {
+        "name": "GANGLIA",
+        "components": [{"name": "GANGLIA_SERVER", "cardinality": "1", "category": "MASTER", "is_master": True, "hostnames": ["host1"]},
+                       {"name": "GANGLIA_MONITOR", "cardinality": "ALL", "category": "SLAVE", "is_master": False}]
+      }
+    ]
+    services = self.prepareServices(servicesInfo)
+    hosts = self.prepareHosts(["host1", "host2", "host3", "host4"])
+    result = self.stackAdvisor.recommendComponentLayout(services, hosts)
+
+    hostGroups = result["recommendations"]["blueprint"]["host_groups"]
+    bindings = result["recommendations"]["blueprint_cluster_binding"]["host_groups"]
+    self.assertEquals(len(hostGroups), 2)
+    self.assertEquals(sorted([group["name"] for group in hostGroups]), sorted([binding["name"] for binding in bindings]))
+    groupHosts = dict((binding["name"], sorted(host["fqdn"] for host in binding["hosts"])) for binding in bindings)
+    self.assertEquals(sorted(groupHosts.values()), [["host1"], ["host2", "host3", "host4"]])
+    self.assertHostLayout({"GANGLIA_SERVER": ["host1"], "GANGLIA_MONITOR": ["host1", "host2", "host3", "host4"]}, result)
+
   def test_recommendationIsNotPreferableOnAmbariServer(self):
     servicesInfo = [
       {
@@ -209,6 +229,58 @@ class TestHDP206StackAdvisor(TestCase):
     ]
     self.assertValidationResult(expectedItems, result)
 
+  @patch("sys.stdout")
+  def test_validationQuietMode(self, stdout_mock):
+    services = self.prepareServices([{"name": "YARN", "components": []}])
+    services["configurations"] = {"yarn-site":{"properties":{"yarn.nodemanager.resource.memory-mb": "0",
+                                                             "yarn.scheduler.minimum-allocation-mb": "str"}}}
+    hosts = self.prepareHosts([])
+
+    self.stackAdvisor.validateConfigurations(services, hosts)
+    self.assertTrue(stdout_mock.write.called)
+
+    stdout_mock.reset_mock()
+    self.stackAdvisor.quiet = True
+    result = self.stackAdvisor.validateConfigurations(services, hosts)
+    self.assertFalse(stdout_mock.write.called)
+    self.assertEquals(4, len(result["items"]))
+
+  def test_recommendConfigurationsMemoizesClusterSummary(self):
+    services = self.prepareServices([])
+    services["configurations"] = {}
+    services["config-groups"] = [{"configurations": {}, "hosts": ["host1"]},
+                                 {"configurations": {}, "hosts": ["host2"]},
+                                 {"configurations": {}, "hosts": ["host1"]}]
+    hosts = self.prepareHosts(["host1", "host2"])
+
+    with patch.object(self.stackAdvisor, "getConfigurationClusterSummary", return_value={}) as summary_mock:
+      result = self.stackAdvisor.recommendConfigurations(services, hosts)
+      # config groups with the same hosts share summary, summary of the whole cluster is not needed
+      self.assertEquals(2, summary_mock.call_count)
+      self.assertEquals(3, len(result["recommendations"]["config-groups"]))
+
+      # nothing is kept between requests
+      self.stackAdvisor.recommendConfigurations(services, hosts)
+      self.assertEquals(4, summary_mock.call_count)
+      self.assertFalse(hasattr(self.stackAdvisor, "_memo"))
+
+      del services["config-groups"]
+      self.stackAdvisor.recommendConfigurations(services, hosts)
+      self.assertEquals(5, summary_mock.call_count)
+
+  def test_validationRecommendsConfigurationsOnce(self):
+    services = self.prepareServices([{"name": "YARN", "components": []}])
+    services["configurations"] = {}
+    hosts = self.prepareHosts([])
+
+    with patch.object(self.stackAdvisor, "createConfigurationRecommendations",
+                      wraps=self.stackAdvisor.createConfigurationRecommendations) as recommend_mock:
+      with self.stackAdvisor.invocation():
+        first = self.stackAdvisor.recommendConfigurations(services, hosts)
+        self.stackAdvisor.validateConfigurations(services, hosts)
+        self.assertTrue(first is self.stackAdvisor.recommendConfigurations(services, hosts))
+      self.assertEquals(1, recommend_mock.call_count)
+
   def test_validationMinMax(self):
 
     configurations = {
@@ -1197,6 +1269,50 @@ class TestHDP206StackAdvisor(TestCase):
     expected = ["host1","host2","host3"]
     self.assertEquals(result, expected)
 
+  def test_getHostComponentsByCategories(self):
+    services = {
+      "services":  [
+        {
+          "StackServices": {
+            "service_name": "HDFS"
+          },
+          "components": [
+            {
+              "StackServiceComponents": {
+                "component_name": "NAMENODE",
+                "component_category": "MASTER",
+                "hostnames": ["host1"]
+              }
+            },
+            {
+              "StackServiceComponents": {
+                "component_name": "DATANODE",
+                "component_category": "SLAVE",
+                "hostnames": ["host1", "host2"]
+              }
+            }
+          ]
+        }
+      ],
+      "configurations": {}
+    }
+    hosts = {
+      "items": [{"Hosts": {"host_name": "host2"}}, {"Hosts": {"host_name": "host1"}}]
+    }
+
+    components = self.stackAdvisor.getHostComponentsByCategories("host1", ["MASTER", "SLAVE"], services, hosts)
+    self.assertEquals([component["StackServiceComponents"]["component_name"] for component in components],
+                      ["NAMENODE", "DATANODE"])
+    self.assertEquals(self.stackAdvisor.getHostComponentsByCategories("host2", ["MASTER"], services, hosts), [])
+    # hosts are returned in the order of hosts items
+    self.assertEquals(self.stackAdvisor.getHostsWithComponent("HDFS", "DATANODE", services, hosts), hosts["items"])
+
+    # changed hostnames are picked up by the index
+    services["services"][0]["components"][0]["StackServiceComponents"]["hostnames"].append("host2")
+    components = self.stackAdvisor.getHostComponentsByCategories("host2", ["MASTER"], services, hosts)
+    self.assertEquals([component["StackServiceComponents"]["component_name"] for component in components],
+                      ["NAMENODE"])
+
 
   def test_getZKHostPortString(self):
     configurations = {
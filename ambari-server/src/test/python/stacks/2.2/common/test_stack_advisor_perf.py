@@ -16,13 +16,74 @@ See the License for the specific language governing permissions and
 limitations under the License.
 '''
 
+import copy
 import json
 import os
+import sys
 import time
 import imp
 from unittest import TestCase
 from mock.mock import patch
 
+
+def synthesize_cluster(services, hosts, hosts_count):
+  """
+  Builds services and hosts of a cluster with hosts_count hosts by cloning hosts of a real one
+  """
+  items = []
+  for index in range(hosts_count):
+    host = copy.deepcopy(hosts["items"][index % len(hosts["items"])])
+    host["Hosts"]["host_name"] = "synthetic-{0}.example.com".format(index)
+    items.append(host)
+  services = copy.deepcopy(services)
+  # recorded services predate these request fields
+  services.setdefault("ambari-server-properties", {"ambari-server.user": "root"})
+  return services, {"items": items}
+
+
+def get_hosts_layout(layout):
+  """
+  Returns {host name: sorted component names} of recommended layout
+  """
+  components_by_group = dict((host_group["name"], sorted(component["name"] for component in host_group["components"]))
+                             for host_group in layout["recommendations"]["blueprint"]["host_groups"])
+  return dict((host["fqdn"], components_by_group[binding["name"]])
+              for binding in layout["recommendations"]["blueprint_cluster_binding"]["host_groups"]
+              for host in binding["hosts"])
+
+
+def apply_layout(services, layout):
+  """
+  Populates component hostnames of services with recommended layout, as if the cluster was installed
+  """
+  component_hosts = {}
+  for host_name, components in get_hosts_layout(layout).items():
+    for component in components:
+      component_hosts.setdefault(component, []).append(host_name)
+  for service in services["services"]:
+    for component in service["components"]:
+      component_name = component["StackServiceComponents"]["component_name"]
+      component["StackServiceComponents"]["hostnames"] = sorted(set(component_hosts.get(component_name, [])))
+
+
+def run_benchmark(stack_advisor_factory, services, hosts):
+  """
+  Runs stack advisor actions on a new and on an installed cluster, returns list of (action, seconds, result)
+  """
+  timings = []
+  def timed(action, method, *args):
+    start = time.time()
+    result = method(*args)
+    timings.append((action, time.time() - start, result))
+    return result
+
+  layout = timed("recommend-component-layout", stack_advisor_factory().recommendComponentLayout, services, hosts)
+  apply_layout(services, layout)
+  timed("validate-component-layout", stack_advisor_factory().validateComponentLayout, services, hosts)
+  timed("recommend-configurations", stack_advisor_factory().recommendConfigurations, services, hosts)
+  timed("validate-configurations", stack_advisor_factory().validateConfigurations, services, hosts)
+  return timings
+
 class TestHDP22StackAdvisor(TestCase):
 
   def instantiate_stack_advisor(self, testDirectory, base_stack_advisor_path):
@@ -41,6 +102,27 @@ class TestHDP22StackAdvisor(TestCase):
     clazz = getattr(stack_advisor_impl, hdp_206_stack_advisor_classname)
     return clazz()
 
+  @patch('socket.getfqdn')
+  def test_performance_large_cluster(self, getfqdn_method):
+    getfqdn_method.side_effect = lambda host='synthetic-0.example.com': host
+    testDirectory = os.path.dirname(os.path.abspath(__file__))
+    current_stack_advisor_path = os.path.join(testDirectory, '../../../../../main/resources/stacks/stack_advisor.py')
+    stack_advisor_factory = lambda: self.instantiate_stack_advisor(testDirectory, current_stack_advisor_path)
+    services, hosts = synthesize_cluster(json.load(open(os.path.join(testDirectory, '2/services.json'))),
+                                         json.load(open(os.path.join(testDirectory, '2/hosts.json'))), 2000)
+
+    timings = run_benchmark(stack_advisor_factory, services, hosts)
+    for action, time_taken, result in timings:
+      print "time taken by {0} on {1} hosts = {2}".format(action, len(hosts["items"]), time_taken)
+
+    layout = timings[0][2]
+    self.assertEquals(len(get_hosts_layout(layout)), 2000)
+    self.assertTrue(len(layout["recommendations"]["blueprint"]["host_groups"]) < 10)
+    layout_validation = timings[1][2]
+    self.assertEquals([item for item in layout_validation["items"] if item.get("message") == 'Host is not used'], [])
+    datanodes = stack_advisor_factory().getHostsWithComponent("HDFS", "DATANODE", services, hosts)
+    self.assertEquals(datanodes, hosts["items"])
+
   @patch('socket.getfqdn')
   def test_performance(self, getfqdn_method):
     getfqdn_method.side_effect = lambda host='perf400-a-1.c.pramod-thangali.internal': host
@@ -63,7 +145,22 @@ class TestHDP22StackAdvisor(TestCase):
       time_taken = time.time() - start
       print "time taken by current stack_advisor.py = " + str(time_taken)
 
-      self.assertEquals(recommendation, recommendation_old,
+      # hosts with the same components share host group now, so compare layouts host by host
+      self.assertEquals(get_hosts_layout(recommendation), get_hosts_layout(recommendation_old),
                         "current stack_advisor gives different results running on folder '" + folder_name + "'")
+      self.assertEquals(recommendation["hosts"], recommendation_old["hosts"])
+      self.assertTrue(len(recommendation["recommendations"]["blueprint"]["host_groups"]) <
+                      len(recommendation_old["recommendations"]["blueprint"]["host_groups"]))
 
 
+if __name__ == "__main__":
+  # Benchmark harness: test_stack_advisor_perf.py [hosts count]
+  test_directory = os.path.dirname(os.path.abspath(__file__))
+  advisor_path = os.path.join(test_directory, '../../../../../main/resources/stacks/stack_advisor.py')
+  hosts_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  with patch('socket.getfqdn', side_effect=lambda host='synthetic-0.example.com': host):
+    factory = lambda: TestHDP22StackAdvisor('test_performance').instantiate_stack_advisor(test_directory, advisor_path)
+    services, hosts = synthesize_cluster(json.load(open(os.path.join(test_directory, '2/services.json'))),
+                                         json.load(open(os.path.join(test_directory, '2/hosts.json'))), hosts_count)
+    for action, time_taken, result in run_benchmark(factory, services, hosts):
+      print "{0:<30} {1:>10.3f} s".format(action, time_taken)